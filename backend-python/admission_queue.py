@@ -0,0 +1,268 @@
+"""
+Hospital Admission Queue Engine
+===============================
+
+Clinical-priority bed queue backing ``patient_queue``:
+- One in-process queue per department keyed by (clinical priority rank,
+  queue entry time), so ``urgent`` always precedes ``high`` precedes
+  ``normal`` precedes ``low`` (the old string sort put ``urgent`` after
+  ``normal``)
+- A binary heap gives O(log n) next-patient selection; a sorted key list
+  gives each entry's position by bisection
+- Positions are persisted incrementally: an enqueue or dequeue shifts only
+  the entries behind it with one set-based UPDATE, so ``queue_position`` is
+  always the clinical order and SQL readers can simply sort by it
+- Wait estimates come from the department's observed bed-turnover rate in
+  ``bed_turnovers`` (beds released per minute) instead of a flat 90 minutes
+
+Writes run on the caller's session and commit with it; a caller that rolls
+back calls ``invalidate`` so the department is reloaded from the table.
+"""
+
+import bisect
+import heapq
+import itertools
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from database import Bed, BedTurnover, PatientQueue, Room
+
+
+PRIORITY_RANKS = {
+    "critical": 0, "emergency": 0, "urgent": 0,
+    "high": 1,
+    "normal": 2, "medium": 2, "routine": 2,
+    "low": 3,
+}
+DEFAULT_PRIORITY_RANK = PRIORITY_RANKS["normal"]
+TURNOVER_WINDOW_DAYS = 14
+DEFAULT_MINUTES_PER_BED = 90
+WAIT_ESTIMATE_TTL_SECONDS = 300
+
+QueueKey = Tuple[int, float, int]
+
+
+def priority_rank(priority_level: Optional[str]) -> int:
+    """Clinical rank for a priority label (lower is more urgent)."""
+    return PRIORITY_RANKS.get((priority_level or "").strip().lower(), DEFAULT_PRIORITY_RANK)
+
+
+class DepartmentQueue:
+    """Waiting entries of one department in clinical order."""
+
+    def __init__(self):
+        self.heap: List[Tuple[int, float, int, uuid.UUID]] = []
+        self.keys: List[QueueKey] = []
+        self.live: Dict[uuid.UUID, QueueKey] = {}
+
+    def push(self, queue_id: uuid.UUID, key: QueueKey) -> int:
+        """Insert an entry and return its 1-based position."""
+        heapq.heappush(self.heap, (*key, queue_id))
+        position = bisect.bisect_left(self.keys, key)
+        self.keys.insert(position, key)
+        self.live[queue_id] = key
+        return position + 1
+
+    def remove(self, queue_id: uuid.UUID) -> Optional[int]:
+        """Drop an entry (heap removal is lazy) and return the position it held."""
+        key = self.live.pop(queue_id, None)
+        if key is None:
+            return None
+        position = bisect.bisect_left(self.keys, key)
+        del self.keys[position]
+        return position + 1
+
+    def peek(self) -> Optional[Tuple[QueueKey, uuid.UUID]]:
+        while self.heap:
+            rank, entered, seq, queue_id = self.heap[0]
+            if self.live.get(queue_id) == (rank, entered, seq):
+                return (rank, entered, seq), queue_id
+            heapq.heappop(self.heap)
+        return None
+
+    def ordered_ids(self) -> List[uuid.UUID]:
+        by_key = {key: queue_id for queue_id, key in self.live.items()}
+        return [by_key[key] for key in self.keys]
+
+
+class AdmissionQueueEngine:
+    """Per-department priority queues persisted to ``patient_queue``."""
+
+    def __init__(self):
+        self._queues: Dict[uuid.UUID, DepartmentQueue] = {}
+        self._wait_rates: Dict[uuid.UUID, Tuple[float, float]] = {}
+        self._seq = itertools.count()
+        self._lock = threading.RLock()
+
+    # ---- loading ----
+
+    def _key(self, priority_level: Optional[str], entry_time: Optional[datetime]) -> QueueKey:
+        entered = (entry_time or datetime.now()).timestamp()
+        return priority_rank(priority_level), entered, next(self._seq)
+
+    def _queue(self, db: Session, department_id: uuid.UUID) -> DepartmentQueue:
+        queue = self._queues.get(department_id)
+        if queue is None:
+            queue = self._load(db, department_id)
+            self._queues[department_id] = queue
+        return queue
+
+    def _load(self, db: Session, department_id: uuid.UUID) -> DepartmentQueue:
+        rows = db.query(PatientQueue.id, PatientQueue.priority_level, PatientQueue.queue_entry_time,
+                        PatientQueue.queue_position).filter(
+            PatientQueue.department_id == department_id,
+            PatientQueue.status == "waiting",
+        ).all()
+        queue = DepartmentQueue()
+        stored = {}
+        for row in sorted(rows, key=lambda r: (priority_rank(r.priority_level),
+                                               r.queue_entry_time or datetime.min)):
+            queue.push(row.id, self._key(row.priority_level, row.queue_entry_time))
+            stored[row.id] = row.queue_position
+
+        # Renumber rows whose stored position disagrees with clinical order (one bulk UPDATE)
+        changes = [{"id": queue_id, "queue_position": position}
+                   for position, queue_id in enumerate(queue.ordered_ids(), start=1)
+                   if stored.get(queue_id) != position]
+        if changes:
+            db.execute(update(PatientQueue), changes)
+        return queue
+
+    def invalidate(self, department_id=None):
+        """Forget in-memory state (all departments, or one) so it reloads from the table."""
+        with self._lock:
+            if department_id is None:
+                self._queues.clear()
+            else:
+                self._queues.pop(uuid.UUID(str(department_id)), None)
+
+    # ---- queue operations ----
+
+    def enqueue(self, db: Session, entry: PatientQueue) -> int:
+        """Place a new waiting entry, shift the entries behind it, and set its position."""
+        with self._lock:
+            queue = self._queue(db, entry.department_id)
+            if entry.id is None:
+                entry.id = uuid.uuid4()
+            if entry.queue_entry_time is None:
+                entry.queue_entry_time = datetime.now()
+            position = queue.push(entry.id, self._key(entry.priority_level, entry.queue_entry_time))
+            db.execute(
+                update(PatientQueue)
+                .where(PatientQueue.department_id == entry.department_id,
+                       PatientQueue.status == "waiting",
+                       PatientQueue.queue_position >= position)
+                .values(queue_position=PatientQueue.queue_position + 1),
+                execution_options={"synchronize_session": False},
+            )
+            entry.queue_position = position
+            entry.estimated_wait_time = self.estimate_wait_minutes(db, entry.department_id, position)
+            return position
+
+    def dequeue(self, db: Session, entry: PatientQueue, new_status: str = "assigned") -> Optional[int]:
+        """Take an entry out of the waiting line and close the gap it leaves."""
+        with self._lock:
+            queue = self._queue(db, entry.department_id)
+            position = queue.remove(entry.id)
+            if position is None:
+                # Entry was added by another process; close its stored gap and resync later
+                position = entry.queue_position if entry.status == "waiting" else None
+                self._queues.pop(entry.department_id, None)
+            entry.status = new_status
+            if position is not None:
+                db.flush()
+                db.execute(
+                    update(PatientQueue)
+                    .where(PatientQueue.department_id == entry.department_id,
+                           PatientQueue.status == "waiting",
+                           PatientQueue.queue_position > position)
+                    .values(queue_position=PatientQueue.queue_position - 1),
+                    execution_options={"synchronize_session": False},
+                )
+            return position
+
+    def next_waiting(self, db: Session, department_id=None) -> Optional[PatientQueue]:
+        """Lock and return the most urgent waiting entry (across departments when none is given).
+
+        Entries another transaction already holds are skipped, so concurrent
+        assigners never hand out the same patient.
+        """
+        with self._lock:
+            if department_id is not None:
+                candidates = [self._queue(db, uuid.UUID(str(department_id)))]
+            else:
+                department_ids = [row[0] for row in db.query(PatientQueue.department_id).filter(
+                    PatientQueue.status == "waiting").distinct()]
+                candidates = [self._queue(db, dept_id) for dept_id in department_ids]
+
+            ordered = []
+            for queue in candidates:
+                top = queue.peek()
+                if top:
+                    ordered.append(top)
+            ordered.sort()
+            for _, queue_id in ordered:
+                entry = db.query(PatientQueue).filter(
+                    PatientQueue.id == queue_id, PatientQueue.status == "waiting"
+                ).with_for_update(skip_locked=True).first()
+                if entry is not None:
+                    return entry
+
+        # Head entries are locked elsewhere or stale: fall back to the persisted clinical order
+        query = db.query(PatientQueue).filter(PatientQueue.status == "waiting")
+        if department_id is not None:
+            query = query.filter(PatientQueue.department_id == uuid.UUID(str(department_id)))
+        return query.order_by(PatientQueue.queue_position, PatientQueue.queue_entry_time
+                              ).with_for_update(skip_locked=True).first()
+
+    # ---- wait estimation ----
+
+    def minutes_per_bed(self, db: Session, department_id) -> float:
+        """Observed minutes between released beds for a department, from recent turnovers."""
+        department_id = uuid.UUID(str(department_id))
+        cached = self._wait_rates.get(department_id)
+        if cached and time.monotonic() - cached[1] < WAIT_ESTIMATE_TTL_SECONDS:
+            return cached[0]
+
+        released_at = func.coalesce(BedTurnover.ready_time, BedTurnover.cleaning_end_time)
+        since = datetime.now() - timedelta(days=TURNOVER_WINDOW_DAYS)
+        released = db.query(func.count(BedTurnover.id)).join(
+            Bed, Bed.id == BedTurnover.bed_id
+        ).join(Room, Room.id == Bed.room_id).filter(
+            Room.department_id == department_id,
+            released_at >= since,
+        ).scalar() or 0
+
+        if released:
+            minutes = TURNOVER_WINDOW_DAYS * 24 * 60 / released
+        else:
+            minutes = DEFAULT_MINUTES_PER_BED
+        self._wait_rates[department_id] = (minutes, time.monotonic())
+        return minutes
+
+    def estimate_wait_minutes(self, db: Session, department_id, position: int) -> int:
+        """Expected minutes until ``position`` beds have been released in the department."""
+        if position is None or position < 1:
+            return 0
+        return int(round(position * self.minutes_per_bed(db, department_id)))
+
+    def refresh_wait_estimates(self, db: Session, department_id):
+        """Rewrite ``estimated_wait_time`` for every waiting entry of a department in one UPDATE."""
+        department_id = uuid.UUID(str(department_id))
+        minutes = self.minutes_per_bed(db, department_id)
+        db.execute(
+            update(PatientQueue)
+            .where(PatientQueue.department_id == department_id, PatientQueue.status == "waiting")
+            .values(estimated_wait_time=func.round(PatientQueue.queue_position * minutes)),
+            execution_options={"synchronize_session": False},
+        )
+
+
+# Global queue engine shared by agents
+admission_queue = AdmissionQueueEngine()
@@ -19,6 +19,8 @@ except ImportError:
     DATABASE_AVAILABLE = False
     print("WARNING: Database modules not available. Install dependencies: pip install sqlalchemy psycopg2-binary")
 
+from tool_batch import defer_interaction
+
 
 class BaseAgent(ABC):
     """Base class for all hospital management agents"""
@@ -58,7 +60,6 @@ class BaseAgent(ABC):
             return {"success": False, "message": "Database not available"}
         
         try:
-            db = self.get_db_session()
             interaction = AgentInteraction(
                 agent_type=self.agent_type,
                 query=query,
@@ -67,6 +68,10 @@ class BaseAgent(ABC):
                 tool_used=tool_used,
                 metadata=metadata or {}
             )
+            # Inside a /tools/batch request the batch writes all its audit rows in one insert
+            if defer_interaction(interaction):
+                return {"success": True, "message": "Interaction queued with tool batch"}
+            db = self.get_db_session()
             db.add(interaction)
             db.commit()
             db.refresh(interaction)
@@ -9,10 +9,22 @@ try:
     from discharge_report_models import TreatmentRecord, EquipmentUsage, StaffAssignment
     from database import SessionLocal
     from sqlalchemy import and_
+    from identifier_resolver import identifier_resolver, missing_identifiers
     DISCHARGE_DEPS = True
 except ImportError:
     DISCHARGE_DEPS = False
 
+def _parse_usage_time(value: str = None, end_of_day: bool = False):
+    """Parse a usage start/end time ('YYYY-MM-DD', 'YYYY-MM-DD HH:MM' or ISO); None when missing or invalid."""
+    if not value:
+        return None
+    try:
+        if len(value) <= 10:  # YYYY-MM-DD format
+            return datetime.fromisoformat(value + (" 23:59:59" if end_of_day else " 00:00:00"))
+        return datetime.fromisoformat(value.replace(' ', 'T') if ' ' in value else value)
+    except ValueError:
+        return None
+
 class DischargeAgent(BaseAgent):
     def __init__(self):
         super().__init__("Discharge Report Agent", "discharge_agent")
@@ -20,47 +32,25 @@ class DischargeAgent(BaseAgent):
 
     # Helper: robust patient lookup by name (supports "First Last" or partials)
     def _find_patient_by_name(self, db, patient_name: str):
+        if not patient_name:
+            return None
         try:
-            from database import Patient as CorePatient
+            from search_service import search_service
         except Exception:
             return None
-        if not patient_name:
-            return None
-        # Normalize and split tokens
-        name = (patient_name or "").strip()
-        tokens = [t for t in name.replace('  ', ' ').split(' ') if t]
-        q = db.query(CorePatient)
-        # Prefer two-token match: First Last
-        if len(tokens) >= 2:
-            first, last = tokens[0], tokens[1]
-            # 1) First startswith + Last startswith
-            p = (q.filter(CorePatient.first_name.ilike(f"{first}%"),
-                          CorePatient.last_name.ilike(f"{last}%")).first())
-            if p:
-                return p
-            # 2) Try reversed order
-            p = (q.filter(CorePatient.first_name.ilike(f"{last}%"),
-                          CorePatient.last_name.ilike(f"{first}%")).first())
-            if p:
-                return p
-            # 3) Fallback: first or last contains either token
-            p = (q.filter((CorePatient.first_name.ilike(f"%{first}%")) |
-                          (CorePatient.last_name.ilike(f"%{last}%"))).first())
-            if p:
-                return p
-        # Single-token fallback: match either first or last name
-        token = tokens[0]
-        p = (q.filter((CorePatient.first_name.ilike(f"%{token}%")) |
-                      (CorePatient.last_name.ilike(f"%{token}%"))).first())
-        return p
+        # Ranked trigram match; handles "First Last", "Last First" and partial names
+        return search_service.find_patient_by_name(db, patient_name.strip())
 
     def get_tools(self) -> List[str]:
         return [
             # Existing discharge tools
             "generate_discharge_report",
+            "generate_discharge_reports_batch",
             "add_treatment_record_simple",
             "add_treatment_record_by_codes",
             "add_equipment_usage_simple",
+            "add_equipment_usage_by_codes",
+            "record_equipment_usage_batch",
             "assign_staff_to_patient_simple",
             "complete_equipment_usage_simple",
             "list_discharge_reports",
@@ -100,6 +90,15 @@ class DischargeAgent(BaseAgent):
         self.log_interaction(query=f"Generate discharge report for bed {bed_id}", response=result.get("message",""), tool_used="generate_discharge_report")
         return result
 
+    def generate_discharge_reports_batch(self, bed_ids: List[str], discharge_condition: str = "stable", discharge_destination: str = "home") -> Dict[str, Any]:
+        """Generate discharge reports for several beds (e.g. end of shift) with batched section loading."""
+        if not DISCHARGE_DEPS or not self.generator:
+            return {"success": False, "message": "Discharge dependencies not available"}
+        result = self.generator.generate_discharge_reports(bed_ids=bed_ids, discharge_condition=discharge_condition, discharge_destination=discharge_destination)
+        summary = result.get("message") or f"Generated {result.get('generated', 0)} reports, {result.get('failed', 0)} failed"
+        self.log_interaction(query=f"Generate discharge reports for {len(bed_ids)} beds", response=summary, tool_used="generate_discharge_reports_batch")
+        return result
+
     def add_treatment_record_simple(self, patient_id: str, doctor_id: str, treatment_type: str, treatment_name: str) -> Dict[str, Any]:
         if not DISCHARGE_DEPS:
             return {"success": False, "message": "Discharge dependencies not available"}
@@ -129,27 +128,9 @@ class DischargeAgent(BaseAgent):
         from database import SessionLocal, EquipmentUsage as CoreEquipmentUsage
         db = SessionLocal()
         try:
-            # Parse start_time and end_time if provided
-            start_dt = datetime.now()
-            if start_time:
-                try:
-                    # Handle both full datetime and date-only formats
-                    if len(start_time) <= 10:  # YYYY-MM-DD format
-                        start_dt = datetime.fromisoformat(start_time + " 00:00:00")
-                    else:  # Full datetime format
-                        start_dt = datetime.fromisoformat(start_time.replace(' ', 'T') if ' ' in start_time else start_time)
-                except ValueError:
-                    start_dt = datetime.now()  # Fallback to current time
-            
-            end_dt = None
-            if end_time:
-                try:
-                    if len(end_time) <= 10:  # YYYY-MM-DD format
-                        end_dt = datetime.fromisoformat(end_time + " 23:59:59")
-                    else:  # Full datetime format
-                        end_dt = datetime.fromisoformat(end_time.replace(' ', 'T') if ' ' in end_time else end_time)
-                except ValueError:
-                    end_dt = None  # Keep as None if parsing fails
+            # Parse start_time and end_time if provided (invalid start falls back to now)
+            start_dt = _parse_usage_time(start_time) or datetime.now()
+            end_dt = _parse_usage_time(end_time, end_of_day=True)
             
             eu = CoreEquipmentUsage(
                 patient_id=uuid.UUID(patient_id),
@@ -186,50 +167,134 @@ class DischargeAgent(BaseAgent):
 
     def add_equipment_usage_by_codes(self, patient_number: str, equipment_id: str, employee_id: str, purpose: str, start_time: str = None, end_time: str = None, notes: str = None) -> Dict[str, Any]:
         """Add equipment usage using patient_number, equipment_id (code), and employee_id (staff code), not UUIDs."""
+        result = self.record_equipment_usage_batch([{
+            "patient_number": patient_number, "equipment_code": equipment_id, "employee_id": employee_id,
+            "purpose": purpose, "start_time": start_time, "end_time": end_time, "notes": notes
+        }])
+        if not result.get("success"):
+            rejected = result.get("rejected") or [{}]
+            return {"success": False, "message": "; ".join(rejected[0].get("errors", [])) or result.get("message")}
+        return {"success": True, "data": {"id": result["recorded"][0]["id"]}}
+
+    def record_equipment_usage_batch(self, events: List[Dict[str, Any]], partial: bool = False) -> Dict[str, Any]:
+        """Record many equipment usage events in one transaction.
+        
+        Each event names the patient (``patient_id`` or ``patient_number``),
+        equipment (``equipment_id`` or ``equipment_code``) and staff member
+        (``staff_id``, ``employee_id`` or ``used_by``) by code or UUID, plus
+        ``purpose`` (or ``purpose_of_use``), ``start_time``, ``end_time`` and
+        ``notes``. All identifiers are resolved in one query (see
+        identifier_resolver.py) and all rows are inserted with one
+        multi-row INSERT. Without ``partial`` any invalid event rejects the
+        batch; with it, only the invalid events are skipped.
+        """
         if not DISCHARGE_DEPS:
             return {"success": False, "message": "Discharge dependencies not available"}
-        from database import SessionLocal, Patient as CorePatient, Staff as CoreStaff, Equipment as CoreEquipment, EquipmentUsage as CoreEquipmentUsage
+        if not events:
+            return {"success": False, "message": "No equipment usage events provided"}
+        from sqlalchemy import insert
+        from database import SessionLocal, EquipmentUsage as CoreEquipmentUsage
+        
+        normalized = [{
+            "patient": event.get("patient_id") or event.get("patient_number"),
+            "equipment": event.get("equipment_id") or event.get("equipment_code"),
+            "staff": event.get("staff_id") or event.get("employee_id") or event.get("used_by"),
+            "purpose": event.get("purpose") or event.get("purpose_of_use"),
+            "start_time": event.get("start_time") or event.get("start_date_time"),
+            "end_time": event.get("end_time") or event.get("end_date_time"),
+            "notes": event.get("notes")
+        } for event in events]
+        
         db = SessionLocal()
         try:
-            patient = db.query(CorePatient).filter(CorePatient.patient_number == patient_number).first()
-            if not patient:
-                db.close()
-                return {"success": False, "message": f"Patient with number {patient_number} not found"}
-            staff = db.query(CoreStaff).filter(CoreStaff.employee_id == employee_id).first()
-            if not staff:
-                db.close()
-                return {"success": False, "message": f"Staff with employee_id {employee_id} not found"}
-            equipment = db.query(CoreEquipment).filter(CoreEquipment.equipment_id == equipment_id).first()
-            if not equipment:
+            resolution = identifier_resolver.resolve(db, {
+                "patient": [event["patient"] for event in normalized],
+                "equipment": [event["equipment"] for event in normalized],
+                "staff": [event["staff"] for event in normalized]
+            })
+            
+            now = datetime.now()
+            rows, recorded, rejected = [], [], []
+            for index, event in enumerate(normalized):
+                errors = [f"{label} is required" for label, key in
+                          (("Patient", "patient"), ("Equipment", "equipment"), ("Staff member", "staff"), ("Purpose", "purpose"))
+                          if not event[key]]
+                errors += missing_identifiers(resolution, [("patient", "Patient", event["patient"]),
+                                                           ("equipment", "Equipment", event["equipment"]),
+                                                           ("staff", "Staff member", event["staff"])])
+                if errors:
+                    rejected.append({"index": index, "errors": errors})
+                    continue
+                
+                row = {
+                    "id": uuid.uuid4(),
+                    "patient_id": resolution.id("patient", event["patient"]),
+                    "equipment_id": resolution.id("equipment", event["equipment"]),
+                    "staff_id": resolution.id("staff", event["staff"]),
+                    "purpose": event["purpose"],
+                    "start_time": _parse_usage_time(event["start_time"]) or now,
+                    "end_time": _parse_usage_time(event["end_time"], end_of_day=True),
+                    "notes": event["notes"],
+                    "created_at": now
+                }
+                rows.append(row)
+                recorded.append({
+                    "index": index,
+                    **{key: str(row[key]) for key in ("id", "patient_id", "equipment_id", "staff_id")},
+                    "purpose": row["purpose"],
+                    "start_time": row["start_time"].isoformat(),
+                    "end_time": row["end_time"].isoformat() if row["end_time"] else None,
+                    "notes": row["notes"]
+                })
+            
+            if rejected and not partial:
                 db.close()
-                return {"success": False, "message": f"Equipment with equipment_id {equipment_id} not found"}
-            eu = CoreEquipmentUsage(
-                patient_id=patient.id,
-                equipment_id=equipment.id,
-                staff_id=staff.id,
-                purpose=purpose,
-                start_time=datetime.fromisoformat(start_time) if start_time else datetime.now(),
-                end_time=datetime.fromisoformat(end_time) if end_time else None,
-                notes=notes
-            )
-            db.add(eu)
+                return {"success": False, "message": f"{len(rejected)} of {len(events)} events are invalid; nothing recorded",
+                        "recorded": [], "rejected": rejected}
+            
+            for start in range(0, len(rows), 500):
+                db.execute(insert(CoreEquipmentUsage).values(rows[start:start + 500]))
             db.commit()
-            db.refresh(eu)
             db.close()
-            return {"success": True, "data": {"id": str(eu.id)}}
+            
+            self.log_interaction(query=f"Record {len(events)} equipment usage events",
+                                 response=f"Recorded {len(recorded)}, rejected {len(rejected)}",
+                                 tool_used="record_equipment_usage_batch")
+            return {"success": True, "message": f"Recorded {len(recorded)} equipment usage events",
+                    "recorded": recorded, "rejected": rejected}
         except Exception as e:
             db.rollback()
             db.close()
-            return {"success": False, "message": str(e)}
+            return {"success": False, "message": f"Failed to record equipment usage: {str(e)}"}
 
-    def assign_staff_to_patient_simple(self, patient_id: str, staff_id: str, assignment_type: str = None, role: str = None) -> Dict[str, Any]:
+    def assign_staff_to_patient_simple(self, patient_id: str, staff_id: str = None, assignment_type: str = None, role: str = None, department_id: str = None, shift: str = None, specialization: str = None) -> Dict[str, Any]:
         if not DISCHARGE_DEPS:
             return {"success": False, "message": "Discharge dependencies not available"}
         # Support both "assignment_type" (agent) and "role" (server wrapper)
         assignment_value = assignment_type or role or "assigned"
         from database import SessionLocal, StaffAssignment as CoreStaffAssignment
+        from staff_assignment_service import staff_assignment_service
         db = SessionLocal()
         try:
+            if not staff_id or staff_id == "auto":
+                # No clinician given: pick the least-loaded eligible one
+                picked = staff_assignment_service.assign(
+                    db, patient_id, assignment_value, department_id=department_id,
+                    shift=shift, specialization=specialization
+                )
+                if not picked:
+                    db.rollback()
+                    db.close()
+                    return {"success": False, "message": "No eligible staff available for assignment"}
+                db.commit()
+                db.close()
+                return {"success": True, "data": {
+                    "id": picked["assignment_id"],
+                    "staff_id": picked["staff_id"],
+                    "staff_name": f"{picked['first_name']} {picked['last_name']}",
+                    "active_assignments": picked["active_assignments"]
+                }}
+            
             sa = CoreStaffAssignment(
                 patient_id=uuid.UUID(patient_id),
                 staff_id=uuid.UUID(staff_id),
@@ -552,23 +617,20 @@ class DischargeAgent(BaseAgent):
             return {"success": False, "message": "Discharge dependencies not available"}
         
         from database import SessionLocal, PatientQueue, Patient, Department
+        from admission_queue import admission_queue
         db = SessionLocal()
         try:
-            # Get next queue position
-            max_position = db.query(PatientQueue).filter(
-                PatientQueue.department_id == uuid.UUID(department_id)
-            ).count()
-            
             queue_entry = PatientQueue(
                 patient_id=uuid.UUID(patient_id),
                 department_id=uuid.UUID(department_id),
-                queue_position=max_position + 1,
                 bed_type_required=bed_type_required,
                 priority_level=priority_level,
                 medical_condition=medical_condition,
                 status="waiting"
             )
             
+            # Slot in by (clinical priority, entry time); entries behind it shift by one
+            admission_queue.enqueue(db, queue_entry)
             db.add(queue_entry)
             db.commit()
             db.refresh(queue_entry)
@@ -584,7 +646,7 @@ class DischargeAgent(BaseAgent):
                 "department_name": department.name if department else "Unknown",
                 "queue_position": queue_entry.queue_position,
                 "priority_level": priority_level,
-                "estimated_wait_time": self._calculate_estimated_wait_time(db, department_id, queue_entry.queue_position)
+                "estimated_wait_time": queue_entry.estimated_wait_time
             }
             
             db.close()
@@ -593,10 +655,17 @@ class DischargeAgent(BaseAgent):
         except Exception as e:
             db.rollback()
             db.close()
+            admission_queue.invalidate(department_id)
             return {"success": False, "message": str(e)}
 
     def get_patient_queue(self, department_id: str = None, status: str = "waiting") -> Dict[str, Any]:
-        """Get current patient queue for bed assignments."""
+        """Get current patient queue for bed assignments.
+
+        Read-only: rows are read straight from ``patient_queue`` sorted by
+        ``queue_position``. The admission queue engine writes those positions in
+        clinical order on every enqueue and dequeue; this method does not go
+        through the engine.
+        """
         if not DISCHARGE_DEPS:
             return {"success": False, "message": "Discharge dependencies not available"}
         
@@ -611,7 +680,10 @@ class DischargeAgent(BaseAgent):
             if status:
                 query = query.filter(PatientQueue.status == status)
             
-            queue_entries = query.order_by(PatientQueue.priority_level.desc(), PatientQueue.queue_position).all()
+            # Positions written by admission_queue; entry time breaks ties between rows
+            # of a department the engine has not renumbered yet
+            queue_entries = query.order_by(PatientQueue.department_id, PatientQueue.queue_position,
+                                           PatientQueue.queue_entry_time).all()
             
             queue_data = []
             for entry in queue_entries:
@@ -625,7 +697,8 @@ class DischargeAgent(BaseAgent):
                     "priority_level": entry.priority_level,
                     "bed_type_required": entry.bed_type_required,
                     "medical_condition": entry.medical_condition,
-                    "wait_time_minutes": (datetime.now() - entry.queue_entry_time).seconds // 60,
+                    "wait_time_minutes": int((datetime.now() - entry.queue_entry_time).total_seconds() // 60),
+                    "estimated_wait_time": entry.estimated_wait_time,
                     "status": entry.status
                 })
             
@@ -648,41 +721,42 @@ class DischargeAgent(BaseAgent):
         if not DISCHARGE_DEPS:
             return {"success": False, "message": "Discharge dependencies not available"}
         
-        from database import SessionLocal, PatientQueue, Bed, Patient, Department
+        from database import SessionLocal, Bed, Room, Patient
+        from bed_allocation import bed_allocator
+        from admission_queue import admission_queue
         db = SessionLocal()
         try:
             # Verify bed is available
-            bed = db.query(Bed).filter(Bed.id == uuid.UUID(bed_id)).first()
-            if not bed or bed.status != "available":
+            bed_row = db.query(Bed.status, Room.department_id).outerjoin(Room, Room.id == Bed.room_id).filter(
+                Bed.id == uuid.UUID(bed_id)).first()
+            if not bed_row or bed_row.status != "available":
                 db.close()
                 return {"success": False, "message": "Bed is not available for assignment"}
             
-            # Find next patient in queue
-            query = db.query(PatientQueue).filter(PatientQueue.status == "waiting")
-            
-            if department_id:
-                query = query.filter(PatientQueue.department_id == uuid.UUID(department_id))
-            elif bed.room and bed.room.department:
-                query = query.filter(PatientQueue.department_id == bed.room.department_id)
-            
-            next_patient = query.order_by(
-                PatientQueue.priority_level.desc(), 
-                PatientQueue.queue_position
-            ).first()
+            # Most urgent waiting patient; entries held by concurrent assigners are skipped
+            queue_department = department_id or bed_row.department_id
+            next_patient = admission_queue.next_waiting(db, queue_department)
             
             if not next_patient:
+                # Keep any position renumbering done while loading the queue
+                db.commit()
                 db.close()
                 return {"success": False, "message": "No patients waiting in queue"}
             
-            # Assign bed to patient
-            next_patient.assigned_bed_id = uuid.UUID(bed_id)
-            next_patient.assignment_time = datetime.now()
-            next_patient.status = "assigned"
+            # Claim the bed in the same transaction; loses cleanly if another assigner got it first
+            assignment_time = datetime.now()
+            claimed = bed_allocator.claim_bed(db, bed_id, next_patient.patient_id, assignment_time)
+            if not claimed:
+                db.rollback()
+                db.close()
+                admission_queue.invalidate(next_patient.department_id)
+                return {"success": False, "message": "Bed is not available for assignment"}
             
-            # Update bed status
-            bed.status = "occupied"
-            bed.current_patient_id = next_patient.patient_id
-            bed.updated_at = datetime.now()
+            # Assign bed to patient and close the gap in the queue
+            next_patient.assigned_bed_id = uuid.UUID(bed_id)
+            next_patient.assignment_time = assignment_time
+            admission_queue.dequeue(db, next_patient, "assigned")
+            admission_queue.refresh_wait_estimates(db, next_patient.department_id)
             
             # Update any active bed turnover
             from database import BedTurnover
@@ -701,6 +775,7 @@ class DischargeAgent(BaseAgent):
             # Get patient details for response
             patient = db.query(Patient).filter(Patient.id == next_patient.patient_id).first()
             
+            bed = db.query(Bed).filter(Bed.id == uuid.UUID(bed_id)).first()
             result = {
                 "success": True,
                 "assignment": {
@@ -721,21 +796,13 @@ class DischargeAgent(BaseAgent):
         except Exception as e:
             db.rollback()
             db.close()
+            admission_queue.invalidate()
             return {"success": False, "message": str(e)}
 
     def _calculate_estimated_wait_time(self, db, department_id: str, queue_position: int) -> int:
-        """Calculate estimated wait time based on queue position and average turnover time."""
-        # Simple estimation: assume 90 minutes average turnover time
-        from database import BedTurnover
-        avg_turnover_time = 90  # minutes
-        
-        # Get number of patients ahead in queue
-        patients_ahead = queue_position - 1
-        
-        # Estimate based on average turnover times
-        estimated_minutes = patients_ahead * avg_turnover_time
-        
-        return max(0, estimated_minutes)
+        """Calculate estimated wait time from the department's observed bed-turnover rate."""
+        from admission_queue import admission_queue
+        return admission_queue.estimate_wait_minutes(db, department_id, queue_position)
 
     # Additional helper methods for equipment and staff management
 
@@ -1343,89 +1410,11 @@ class DischargeAgent(BaseAgent):
     def auto_update_expired_cleaning_beds(self) -> Dict[str, Any]:
         """Automatically update beds that have completed their cleaning time to 'available' status.
         
-        This method checks all beds in 'cleaning' status and updates them to 'available' 
-        if their estimated cleaning duration has elapsed.
+        Expired cleanings and orphaned cleaning beds are promoted with set-based
+        UPDATE ... RETURNING statements in one transaction; the changed beds are returned.
         """
         if not DISCHARGE_DEPS:
             return {"success": False, "message": "Discharge dependencies not available"}
         
-        from database import SessionLocal, BedTurnover, Bed
-        db = SessionLocal()
-        try:
-            updated_beds = []
-            now = datetime.now()
-            
-            # Find all active cleaning processes
-            active_turnovers = db.query(BedTurnover).filter(
-                BedTurnover.status == "cleaning",
-                BedTurnover.cleaning_start_time.isnot(None)
-            ).all()
-            
-            for turnover in active_turnovers:
-                elapsed_minutes = (now - turnover.cleaning_start_time).seconds // 60
-                
-                # If cleaning time has elapsed
-                if elapsed_minutes >= turnover.estimated_cleaning_duration:
-                    bed = db.query(Bed).filter(Bed.id == turnover.bed_id).first()
-                    if bed and bed.status == "cleaning":
-                        # Update bed to available
-                        bed.status = "available"
-                        bed.updated_at = now
-                        
-                        # Mark turnover as completed
-                        turnover.status = "completed"
-                        turnover.cleaning_completion_time = now
-                        
-                        updated_beds.append({
-                            "bed_id": str(bed.id),
-                            "bed_number": bed.bed_number,
-                            "room_number": bed.room.room_number if bed.room else "Unknown",
-                            "elapsed_minutes": elapsed_minutes,
-                            "estimated_duration": turnover.estimated_cleaning_duration
-                        })
-                        
-                        print(f"🔄 Auto-updated bed {bed.bed_number} from cleaning to available after {elapsed_minutes} minutes")
-            
-            # Also check for beds stuck in cleaning status without active turnover
-            orphaned_cleaning_beds = db.query(Bed).filter(
-                Bed.status == "cleaning"
-            ).all()
-            
-            for bed in orphaned_cleaning_beds:
-                # Check if there's an active turnover for this bed
-                active_turnover = db.query(BedTurnover).filter(
-                    BedTurnover.bed_id == bed.id,
-                    BedTurnover.status.in_(["cleaning", "initiated"])
-                ).first()
-                
-                if not active_turnover:
-                    # No active turnover, but bed is in cleaning status - fix it
-                    bed.status = "available"
-                    bed.updated_at = now
-                    
-                    updated_beds.append({
-                        "bed_id": str(bed.id),
-                        "bed_number": bed.bed_number,
-                        "room_number": bed.room.room_number if bed.room else "Unknown",
-                        "reason": "orphaned_cleaning_status"
-                    })
-                    
-                    print(f"🔧 Fixed orphaned bed {bed.bed_number} - removed cleaning status without active turnover")
-            
-            db.commit()
-            
-            result = {
-                "success": True,
-                "updated_count": len(updated_beds),
-                "updated_beds": updated_beds,
-                "timestamp": now.isoformat(),
-                "message": f"Auto-updated {len(updated_beds)} beds from cleaning to available status"
-            }
-            
-            db.close()
-            return result
-            
-        except Exception as e:
-            db.rollback()
-            db.close()
-            return {"success": False, "message": str(e)}
+        from bed_turnover_sweeper import run_sweep
+        return run_sweep()
@@ -20,6 +20,8 @@ from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.runnables import RunnablePassthrough
 import logging
 
+from intent_router import describe_result, intent_router
+
 # Enhanced State Definitions
 class ConversationalState(TypedDict):
     """Enhanced state with conversational memory"""
@@ -270,6 +272,18 @@ class AdvancedOrchestratorAgent:
             """Analyze request to determine routing"""
             request = state["request"]
             
+            # Plain lookups are classified locally; only uncertain requests pay for the LLM
+            match = intent_router.route(request)
+            if match.routed:
+                return {
+                    **state,
+                    "intent": match.intent,
+                    "confidence": match.confidence,
+                    "required_agents": [match.agent],
+                    "priority_level": "high" if match.intent == "emergency" else "medium",
+                    "context_data": {"tool": match.tool, "arguments": match.arguments, "routed_by": match.source}
+                }
+            
             intent_prompt = ChatPromptTemplate.from_messages([
                 ("system", """Analyze this hospital management request and determine:
                 1. Primary intent (patient_care, staff_management, equipment, supplies, scheduling, reporting, emergency)
@@ -453,10 +467,13 @@ class EnhancedOrchestratorAgent:
     operations with conversational memory and intelligent routing.
     """
     
-    def __init__(self):
+    def __init__(self, tool_dispatch=None):
         # Use the existing AdvancedOrchestratorAgent as the core
         self.core_agent = AdvancedOrchestratorAgent()
         
+        # dispatch(tool_name, arguments) for requests the intent router sends straight to a tool
+        self.tool_dispatch = tool_dispatch
+        
         # Initialize memory saver for conversation persistence
         self.memory_saver = MemorySaver()
         # Alias for compatibility
@@ -478,11 +495,22 @@ class EnhancedOrchestratorAgent:
             try:
                 # Extract user message
                 user_message = ""
-                for msg in state["messages"]:
+                for msg in reversed(state["messages"]):
                     if isinstance(msg, HumanMessage):
                         user_message = msg.content
                         break
                 
+                # Plain lookups go straight to their tool without an LLM round trip
+                match = intent_router.route(user_message)
+                if match.routed:
+                    result = self._dispatch_tool(match.tool, match.arguments)
+                    return {
+                        **state,
+                        "messages": state["messages"] + [AIMessage(content=describe_result(match, result))],
+                        "current_workflow": "direct_tool",
+                        "workflow_data": {**(state.get("workflow_data") or {}), "routing": match.to_dict()}
+                    }
+                
                 # Use the core agent's sophisticated processing
                 if hasattr(self.core_agent, 'llm_primary'):
                     # Determine the best response based on the request type
@@ -627,6 +655,14 @@ What specific area would you like me to help you with?"""
         
         return workflow.compile(checkpointer=self.memory_saver)
     
+    def _dispatch_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
+        """Call a tool in-process, through the multi-agent orchestrator unless a dispatch was given."""
+        if self.tool_dispatch is None:
+            from .orchestrator_agent import OrchestratorAgent
+            orchestrator = OrchestratorAgent()
+            self.tool_dispatch = lambda name, args: orchestrator.route_request(name, **args)
+        return self.tool_dispatch(tool_name, arguments)
+    
     async def handle_conversation(self, message: str, user_id: str, 
                                 context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Handle conversational interaction with memory"""
@@ -653,6 +689,8 @@ What specific area would you like me to help you with?"""
                 "response": response_message,
                 "session_id": result.get("session_id"),
                 "workflow": result.get("current_workflow"),
+                "routing": (result.get("workflow_data") or {}).get("routing")
+                           if result.get("current_workflow") == "direct_tool" else None,
                 "context": result.get("user_context", {})
             }
             
@@ -8,6 +8,9 @@ from .base_agent import BaseAgent
 
 try:
     from database import Supply, SupplyCategory, InventoryTransaction, User, SessionLocal
+    from stock_ledger import StockMovement, stock_ledger
+    from supply_rollups import supply_rollups
+    from inventory_planning import inventory_planner
     DATABASE_AVAILABLE = True
 except ImportError:
     DATABASE_AVAILABLE = False
@@ -32,7 +35,8 @@ class InventoryAgent(BaseAgent):
             "delete_supply",
             "get_low_stock_supplies",
             "list_inventory_transactions",
-            "get_supply_usage_report"
+            "get_supply_usage_report",
+            "get_inventory_plan"
         ]
     
     def get_capabilities(self) -> List[str]:
@@ -43,6 +47,7 @@ class InventoryAgent(BaseAgent):
             "Supply category management",
             "Inventory transaction logging",
             "Automated reorder point tracking",
+            "Consumption-based reorder points and stock-out risk",
             "Supply usage analytics and reporting"
         ]
     
@@ -246,62 +251,35 @@ class InventoryAgent(BaseAgent):
 
     def update_supply_stock(self, supply_id: str, quantity_change: int, transaction_type: str,
                            performed_by: str = None, user_id: str = None, notes: str = None) -> Dict[str, Any]:
-        """Update supply stock levels and log the transaction."""
+        """Update supply stock levels and log the transaction.
+        
+        The stock change is one guarded UPDATE (see stock_ledger.py), so
+        concurrent updates cannot overwrite each other or go below zero.
+        """
         if not DATABASE_AVAILABLE:
             return {"success": False, "message": "Database not available"}
         
         try:
             db = self.get_db_session()
-            supply = db.query(Supply).filter(Supply.id == uuid.UUID(supply_id)).first()
-            
-            if not supply:
-                db.close()
-                return {"success": False, "message": "Supply not found"}
-            
-            # Calculate new stock level
-            old_stock = supply.current_stock
-            new_stock = old_stock + quantity_change
-            
-            if new_stock < 0:
-                db.close()
-                return {"success": False, "message": f"Insufficient stock. Current: {old_stock}, Requested: {abs(quantity_change)}"}
-            
-            # Update stock
-            supply.current_stock = new_stock
-            
-            # Create inventory transaction record
             # Use performed_by if provided, otherwise use user_id for backward compatibility
-            user_for_transaction = performed_by or user_id
-            transaction = InventoryTransaction(
-                supply_id=uuid.UUID(supply_id),
+            result = stock_ledger.apply_movement(db, StockMovement(
+                supply_id=supply_id,
+                quantity=quantity_change,
                 transaction_type=transaction_type,
-                quantity=quantity_change,  # Use quantity instead of quantity_change
-                performed_by=uuid.UUID(user_for_transaction) if user_for_transaction else None,
-                notes=f"{notes or ''} | Stock changed from {old_stock} to {new_stock}".strip(" |")
-            )
-            
-            db.add(transaction)
-            db.commit()
-            db.refresh(supply)
-            db.refresh(transaction)
-            
-            supply_result = self.serialize_model(supply)
-            transaction_result = self.serialize_model(transaction)
+                performed_by=performed_by or user_id,
+                notes=notes
+            ))
             db.close()
             
-            # Log the interaction
-            self.log_interaction(
-                query=f"Update stock for supply {supply_id}: {quantity_change} ({transaction_type})",
-                response=f"Stock updated from {old_stock} to {new_stock}",
-                tool_used="update_supply_stock"
-            )
+            if not result["success"]:
+                return result
             
             return {
                 "success": True, 
                 "message": "Supply stock updated successfully", 
                 "data": {
-                    "supply": supply_result,
-                    "transaction": transaction_result
+                    "supply": result["supply"],
+                    "transaction": result["transaction"]
                 }
             }
         except Exception as e:
@@ -422,9 +400,16 @@ class InventoryAgent(BaseAgent):
         except Exception as e:
             return {"error": f"Failed to list inventory transactions: {str(e)}"}
 
-    def get_supply_usage_report(self, supply_id: str = None, start_date: str = None, 
-                               end_date: str = None) -> Dict[str, Any]:
-        """Get supply usage report for the specified period."""
+    def get_supply_usage_report(self, supply_id: str = None, start_date: str = None,
+                               end_date: str = None, include_details: bool = False,
+                               page: int = 1, page_size: int = 100) -> Dict[str, Any]:
+        """Get supply usage report for the specified period.
+        
+        Totals are aggregated in SQL from the daily rollups (see
+        supply_rollups.py), so a year-long report does not read every
+        transaction. Raw transactions are only returned with
+        ``include_details``, one page at a time, most recent first.
+        """
         if not DATABASE_AVAILABLE:
             return {"error": "Database not available"}
         
@@ -443,69 +428,90 @@ class InventoryAgent(BaseAgent):
             else:
                 start_date_obj = end_date_obj - timedelta(days=30)  # Default to 30 days
             
-            query = db.query(InventoryTransaction).filter(
-                InventoryTransaction.transaction_date >= start_date_obj,
-                InventoryTransaction.transaction_date <= end_date_obj
-            )
-            
-            if supply_id:
-                query = query.filter(InventoryTransaction.supply_id == uuid.UUID(supply_id))
+            report = supply_rollups.usage_totals(db, start_date_obj, end_date_obj, supply_id)
             
-            transactions = query.all()
-            
-            # Process usage statistics
-            usage_stats = {}
-            for transaction in transactions:
-                supply_id_str = str(transaction.supply_id)
-                if supply_id_str not in usage_stats:
-                    usage_stats[supply_id_str] = {
-                        "total_in": 0,
-                        "total_out": 0,
-                        "net_change": 0,
-                        "transaction_count": 0
-                    }
-                
-                stats = usage_stats[supply_id_str]
-                stats["transaction_count"] += 1
-                
-                quantity = transaction.quantity
-                if transaction.transaction_type == "in":
-                    stats["total_in"] += abs(quantity)
-                    stats["net_change"] += abs(quantity)
-                elif transaction.transaction_type == "out":
-                    stats["total_out"] += abs(quantity)
-                    stats["net_change"] -= abs(quantity)
-                else:  # adjustment
-                    if quantity > 0:
-                        stats["total_in"] += quantity
-                        stats["net_change"] += quantity
-                    else:
-                        stats["total_out"] += abs(quantity)
-                        stats["net_change"] += quantity  # quantity is already negative for adjustments
-            
-            result = [self.serialize_model(transaction) for transaction in transactions]
+            result = []
+            pagination = None
+            if include_details:
+                page = max(int(page or 1), 1)
+                page_size = min(max(int(page_size or 100), 1), 500)
+                query = db.query(InventoryTransaction).filter(
+                    InventoryTransaction.transaction_date >= start_date_obj,
+                    InventoryTransaction.transaction_date <= end_date_obj
+                )
+                if supply_id:
+                    query = query.filter(InventoryTransaction.supply_id == uuid.UUID(supply_id))
+                # One extra row tells whether another page exists without counting the period
+                transactions = query.order_by(InventoryTransaction.transaction_date.desc(),
+                                              InventoryTransaction.id.desc()) \
+                    .offset((page - 1) * page_size).limit(page_size + 1).all()
+                result = [self.serialize_model(transaction) for transaction in transactions[:page_size]]
+                pagination = {"page": page, "page_size": page_size, "has_more": len(transactions) > page_size}
             db.close()
             
             # Log the interaction
             days_diff = (end_date_obj - start_date_obj).days
             self.log_interaction(
                 query=f"Get supply usage report for {days_diff} days" + (f" (supply: {supply_id})" if supply_id else ""),
-                response=f"Generated usage report with {len(result)} transactions",
+                response=f"Generated usage report for {len(report['usage_statistics'])} supplies",
                 tool_used="get_supply_usage_report"
             )
             
             return {
                 "data": result,
-                "usage_statistics": usage_stats,
+                "usage_statistics": report["usage_statistics"],
+                "pagination": pagination,
                 "period": {
                     "start_date": start_date_obj.isoformat(),
                     "end_date": end_date_obj.isoformat(),
-                    "days": days_diff
+                    "days": days_diff,
+                    "rollup_days": report["rollup_days"]
                 }
             }
         except Exception as e:
             return {"error": f"Failed to generate supply usage report: {str(e)}"}
 
+    def get_inventory_plan(self, supply_id: str = None, history_days: int = 90, service_level: float = 0.95,
+                           lead_time_days: float = None, lead_time_std_days: float = None,
+                           supplier_lead_times: Dict[str, float] = None, trials: int = 2000,
+                           only_at_risk: bool = False, limit: int = 50) -> Dict[str, Any]:
+        """Reorder points, safety stock, days of cover and stock-out risk from actual consumption.
+        
+        Unlike ``get_low_stock_supplies`` (fixed ``minimum_stock_level``),
+        the levels follow each supply's daily usage and supplier lead
+        time; see inventory_planning.py.
+        """
+        if not DATABASE_AVAILABLE:
+            return {"success": False, "message": "Database not available"}
+        
+        try:
+            db = self.get_db_session()
+            result = inventory_planner.plan(
+                db, supply_id=supply_id, history_days=history_days, service_level=service_level,
+                lead_time_days=lead_time_days, lead_time_std_days=lead_time_std_days,
+                supplier_lead_times=supplier_lead_times, trials=trials
+            )
+            db.close()
+            if not result["success"]:
+                return result
+            
+            if only_at_risk:
+                result["data"] = [row for row in result["data"]
+                                  if row["status"] == "reorder_now" or (row["stockout_probability"] or 0) > 0]
+            result["data"] = result["data"][:limit]
+            
+            # Log the interaction
+            summary = result["summary"]
+            self.log_interaction(
+                query="Get inventory plan" + (f" (supply: {supply_id})" if supply_id else ""),
+                response=f"{summary['reorder_now']} of {summary['supplies']} supplies at or below their reorder point",
+                tool_used="get_inventory_plan"
+            )
+            
+            return result
+        except Exception as e:
+            return {"success": False, "message": f"Failed to build inventory plan: {str(e)}"}
+
     def delete_supply(self, supply_id: str) -> Dict[str, Any]:
         """Delete a supply item."""
         if not DATABASE_AVAILABLE:
@@ -18,7 +18,9 @@ from langchain_core.runnables import RunnablePassthrough
 
 # Import database models
 try:
-    from database import Patient, Bed, Staff, Equipment, Department, SessionLocal
+    from database import Patient, Bed, Equipment, Department, SessionLocal
+    from bed_allocation import BedCriteria, bed_allocator
+    from staff_assignment_service import staff_assignment_service
     DATABASE_AVAILABLE = True
 except ImportError:
     DATABASE_AVAILABLE = False
@@ -222,27 +224,40 @@ class PatientAdmissionWorkflow:
                 state["error_message"] = "Database not available"
                 return state
             
+            patient_data = state.get("patient_data") or {}
+            criteria = BedCriteria.from_request(
+                department_id=patient_data.get("department_id"),
+                room_type=patient_data.get("room_type"),
+                bed_type=patient_data.get("bed_type"),
+                isolation=patient_data.get("isolation", False),
+            )
+            
             db = SessionLocal()
             try:
-                # Find available beds
-                available_beds = db.query(Bed).filter(Bed.status == "available").all()
+                if state.get("patient_id"):
+                    # Select and reserve in one statement so parallel admissions never share a bed
+                    selected_bed = bed_allocator.claim(db, state["patient_id"], criteria)
+                    db.commit()
+                else:
+                    bed_id = bed_allocator.peek(db, criteria)
+                    selected_bed = None
+                    if bed_id:
+                        bed = db.query(Bed.id, Bed.bed_number).filter(Bed.id == uuid.UUID(bed_id)).first()
+                        selected_bed = {"bed_id": str(bed.id), "bed_number": bed.bed_number} if bed else None
                 
-                if not available_beds:
+                if not selected_bed:
                     state["workflow_status"] = "no_beds_available"
                     state["messages"].append(
                         AIMessage(content="No beds currently available. Patient added to waitlist.")
                     )
                     return state
                 
-                # Use simple selection - first available bed (can be enhanced later)
-                selected_bed = available_beds[0]
-                
-                state["bed_id"] = str(selected_bed.id)
+                state["bed_id"] = selected_bed["bed_id"]
                 state["workflow_status"] = "bed_found"
                 state["steps_completed"].append("bed_selection")
                 
                 state["messages"].append(
-                    AIMessage(content=f"Selected bed: {selected_bed.bed_number}")
+                    AIMessage(content=f"Selected bed: {selected_bed['bed_number']}")
                 )
                 
             finally:
@@ -281,14 +296,17 @@ class PatientAdmissionWorkflow:
             
             db = SessionLocal()
             try:
-                # Update bed status
+                # Confirm the reservation made during selection, or claim the bed now
                 bed = db.query(Bed).filter(Bed.id == uuid.UUID(state["bed_id"])).first()
+                patient_uuid = uuid.UUID(state["patient_id"])
+                if bed and bed.patient_id != patient_uuid:
+                    # Bed was only peeked at during selection; claim it now unless someone beat us to it
+                    if not bed_allocator.claim_bed(db, bed.id, patient_uuid):
+                        state["error_message"] = f"Bed {bed.bed_number} was assigned to another patient"
+                        state["workflow_status"] = "bed_assignment_error"
+                        return state
+                    db.refresh(bed)
                 if bed:
-                    bed.status = "occupied"
-                    # Only assign patient_id if patient was created in this workflow
-                    if state.get("patient_id"):
-                        bed.patient_id = uuid.UUID(state["patient_id"])
-                    
                     # Update patient status only if patient was created
                     if state.get("patient_id"):
                         patient = db.query(Patient).filter(Patient.id == uuid.UUID(state["patient_id"])).first()
@@ -322,96 +340,58 @@ class PatientAdmissionWorkflow:
             if not DATABASE_AVAILABLE:
                 return state
             
+            patient_data = state.get("patient_data") or {}
+            department_id = patient_data.get("department_id")
+            stamp = datetime.now().strftime('%Y-%m-%d %H:%M')
+            
             db = SessionLocal()
             try:
-                # Find available staff (role is in User model)
-                available_doctors = db.query(Staff).join(Staff.user).filter(
-                    Staff.status == "active",
-                    Staff.user.has(role="doctor")
-                ).all()
-                
-                available_nurses = db.query(Staff).join(Staff.user).filter(
-                    Staff.status == "active", 
-                    Staff.user.has(role="nurse")
-                ).all()
+                if state.get("patient_id"):
+                    # Least-loaded eligible clinicians; rows stay locked until commit
+                    doctor = staff_assignment_service.assign(
+                        db, state["patient_id"], "primary_doctor", role="doctor",
+                        department_id=department_id,
+                        specialization=patient_data.get("specialization"),
+                        bed_id=state.get("bed_id"),
+                        responsibilities="Primary medical care, treatment planning, discharge planning",
+                        notes=f"Assigned via LangGraph automated workflow on {stamp}"
+                    )
+                    nurse = staff_assignment_service.assign(
+                        db, state["patient_id"], "primary_nurse", role="nurse",
+                        department_id=department_id,
+                        bed_id=state.get("bed_id"),
+                        responsibilities="Patient care, medication administration, monitoring vital signs",
+                        notes=f"Assigned via LangGraph automated workflow on {stamp}"
+                    )
+                else:
+                    # No patient yet: report who would be assigned without recording it
+                    doctor = staff_assignment_service.pick_least_loaded(db, "doctor", department_id)
+                    nurse = staff_assignment_service.pick_least_loaded(db, "nurse", department_id)
                 
-                # Assign primary doctor and nurse
-                if available_doctors and available_nurses:
+                if doctor and nurse:
+                    db.commit()
                     assigned_staff = []
-                    
-                    # Create actual StaffAssignment database records
-                    if state.get("patient_id"):
-                        from database import StaffAssignment
-                        
-                        # Assign primary doctor
-                        doctor_assignment = StaffAssignment(
-                            id=uuid.uuid4(),
-                            patient_id=uuid.UUID(state["patient_id"]),
-                            staff_id=available_doctors[0].id,
-                            bed_id=uuid.UUID(state["bed_id"]) if state.get("bed_id") else None,
-                            assignment_type="primary_doctor",
-                            start_date=datetime.now(),
-                            shift="day",
-                            responsibilities="Primary medical care, treatment planning, discharge planning",
-                            notes=f"Assigned via LangGraph automated workflow on {datetime.now().strftime('%Y-%m-%d %H:%M')}"
-                        )
-                        db.add(doctor_assignment)
-                        
-                        # Assign primary nurse
-                        nurse_assignment = StaffAssignment(
-                            id=uuid.uuid4(),
-                            patient_id=uuid.UUID(state["patient_id"]),
-                            staff_id=available_nurses[0].id,
-                            bed_id=uuid.UUID(state["bed_id"]) if state.get("bed_id") else None,
-                            assignment_type="primary_nurse",
-                            start_date=datetime.now(),
-                            shift="day",
-                            responsibilities="Patient care, medication administration, monitoring vital signs",
-                            notes=f"Assigned via LangGraph automated workflow on {datetime.now().strftime('%Y-%m-%d %H:%M')}"
-                        )
-                        db.add(nurse_assignment)
-                        
-                        # Commit the assignments
-                        db.commit()
-                        
-                        assigned_staff = [
-                            {
-                                "staff_id": str(available_doctors[0].id), 
-                                "role": "primary_doctor",
-                                "name": f"Dr. {available_doctors[0].user.first_name} {available_doctors[0].user.last_name}",
-                                "assignment_id": str(doctor_assignment.id)
-                            },
-                            {
-                                "staff_id": str(available_nurses[0].id), 
-                                "role": "primary_nurse",
-                                "name": f"{available_nurses[0].user.first_name} {available_nurses[0].user.last_name}",
-                                "assignment_id": str(nurse_assignment.id)
-                            }
-                        ]
-                    else:
-                        # Fallback to memory-only assignments if no patient ID yet
-                        assigned_staff = [
-                            {
-                                "staff_id": str(available_doctors[0].id), 
-                                "role": "primary_doctor",
-                                "name": f"Dr. {available_doctors[0].user.first_name} {available_doctors[0].user.last_name}"
-                            },
-                            {
-                                "staff_id": str(available_nurses[0].id), 
-                                "role": "primary_nurse",
-                                "name": f"{available_nurses[0].user.first_name} {available_nurses[0].user.last_name}"
-                            }
-                        ]
+                    for staff, role, title in ((doctor, "primary_doctor", "Dr. "), (nurse, "primary_nurse", "")):
+                        entry = {
+                            "staff_id": staff["staff_id"],
+                            "role": role,
+                            "name": f"{title}{staff['first_name']} {staff['last_name']}",
+                            "active_assignments": staff["active_assignments"]
+                        }
+                        if staff.get("assignment_id"):
+                            entry["assignment_id"] = staff["assignment_id"]
+                        assigned_staff.append(entry)
                     
                     state["staff_assignments"] = assigned_staff
                     state["workflow_status"] = "staff_assigned"
                     state["steps_completed"].append("staff_assignment")
                     
                     state["messages"].append(
-                        AIMessage(content=f"Staff assigned: Dr. {available_doctors[0].user.first_name} {available_doctors[0].user.last_name} and {available_nurses[0].user.first_name} {available_nurses[0].user.last_name}")
+                        AIMessage(content=f"Staff assigned: {assigned_staff[0]['name']} and {assigned_staff[1]['name']}")
                     )
                 else:
-                    state["error_message"] = f"Insufficient staff - Doctors: {len(available_doctors)}, Nurses: {len(available_nurses)}"
+                    db.rollback()
+                    state["error_message"] = f"Insufficient staff - Doctor available: {bool(doctor)}, Nurse available: {bool(nurse)}"
                     state["workflow_status"] = "error"
                 
             finally:
@@ -498,10 +478,28 @@ class PatientAdmissionWorkflow:
         
         return state
     
+    def release_claimed_bed(self, state: PatientAdmissionState):
+        """Free the bed claimed during selection when the admission does not complete"""
+        if not (DATABASE_AVAILABLE and state.get("bed_id") and state.get("patient_id")):
+            return
+        try:
+            db = SessionLocal()
+            try:
+                if bed_allocator.release(db, state["bed_id"], state["patient_id"]):
+                    db.commit()
+                    state["steps_completed"].append("bed_released")
+                    state["messages"].append(AIMessage(content="Claimed bed released after the failed admission"))
+            finally:
+                db.close()
+        except Exception as e:
+            state["messages"].append(AIMessage(content=f"Could not release claimed bed: {str(e)}"))
+    
     def finalize_admission_process(self, state: PatientAdmissionState) -> PatientAdmissionState:
         """Finalize the admission process"""
         if state.get("error_message"):
             state["workflow_status"] = "admission_failed"
+            # Bed selection commits its claim; nothing else would free it
+            self.release_claimed_bed(state)
         else:
             # Check if core components are completed
             steps = state.get("steps_completed", [])
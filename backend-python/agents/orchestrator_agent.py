@@ -3,7 +3,6 @@
 import uuid
 import json
 from typing import Any, Dict, List, Optional, Tuple
-import re
 from datetime import datetime, date
 from .base_agent import BaseAgent
 
@@ -283,7 +282,8 @@ class OrchestratorAgent(BaseAgent):
             if tool_name == 'update_meeting_status':
                 nl = (kwargs.get('query') or '') or (kwargs.get('status') or '')
                 meeting_id = kwargs.get('meeting_id')
-                if nl and re.search(r"\b(cancel|cancelled|cancellation|call off|postpone|reschedul|move|shift|postponed|abort)\b", nl, re.IGNORECASE):
+                from meeting_parser import is_update_request
+                if is_update_request(nl):
                     composed_query = nl
                     if meeting_id:
                         composed_query = f"{nl} meeting id {meeting_id}"
@@ -573,13 +573,38 @@ class OrchestratorAgent(BaseAgent):
             if not staff_result.get("data"):
                 return {"success": False, "message": "No active staff found in department", "details": results}
             
-            # Step 2: Get department schedule requirements (simplified)
+            # Step 2: Current workload per clinician (open assignments), least loaded first
+            workloads = {}
+            try:
+                from database import SessionLocal
+                from staff_assignment_service import staff_assignment_service
+                db = SessionLocal()
+                try:
+                    workloads = {w["staff_id"]: w for w in staff_assignment_service.workloads(db, department_id)}
+                finally:
+                    db.close()
+                results["steps"].append({"step": "get_staff_workload", "result": {"success": True, "count": len(workloads)}})
+            except Exception as e:
+                results["steps"].append({"step": "get_staff_workload", "result": {"success": False, "message": str(e)}})
+            
+            # Step 3: Get department schedule requirements, balancing toward the least loaded
             staff_list = staff_result["data"]
+            staff_members = [
+                {
+                    "id": staff["id"],
+                    "position": staff["position"],
+                    "shift_pattern": staff.get("shift_pattern"),
+                    "active_assignments": workloads.get(staff["id"], {}).get("active_assignments", 0)
+                }
+                for staff in staff_list
+            ]
+            staff_members.sort(key=lambda member: (member["active_assignments"], member["id"]))
             schedule_info = {
                 "total_staff": len(staff_list),
                 "date": date,
                 "department_id": department_id,
-                "staff_members": [{"id": staff["id"], "position": staff["position"]} for staff in staff_list]
+                "staff_members": staff_members,
+                "next_assignee": staff_members[0]["id"] if staff_members else None
             }
             results["steps"].append({"step": "generate_schedule", "result": {"success": True, "data": schedule_info}})
             
@@ -4,11 +4,12 @@ import uuid
 from datetime import datetime, date
 from typing import Any, Dict, List, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
+from sqlalchemy import or_
 from .base_agent import BaseAgent
 
 try:
     from database import Patient, SessionLocal
+    from search_service import search_service
     DATABASE_AVAILABLE = True
 except ImportError:
     DATABASE_AVAILABLE = False
@@ -27,6 +28,8 @@ class PatientAgent(BaseAgent):
             "list_patients",
             "get_patient_by_id",
             "search_patients",
+            "resolve_patient_names",
+            "lookup_patient_numbers",
             "update_patient",
             "delete_patient",
             "get_patient_medical_history_summary"
@@ -99,6 +102,7 @@ class PatientAgent(BaseAgent):
             db.commit()
             db.refresh(patient)
             result = self.serialize_model(patient)
+            search_service.patient_numbers.add(patient.patient_number, str(patient.id))
             db.close()
             
             # Ensure result is not None
@@ -199,41 +203,33 @@ class PatientAgent(BaseAgent):
             return {"error": f"Failed to get patient: {str(e)}"}
 
     def search_patients(self, patient_number: str = None, first_name: str = None, 
-                       last_name: str = None, phone: str = None, email: str = None) -> Dict[str, Any]:
-        """Search for patients by various criteria."""
+                       last_name: str = None, phone: str = None, email: str = None,
+                       status: str = None, limit: int = 50) -> Dict[str, Any]:
+        """Search for patients by various criteria.
+        
+        Matching is fuzzy (trigram similarity) and results are ranked best match first;
+        each result carries a ``match_score`` between 0 and 1.
+        """
         if not DATABASE_AVAILABLE:
             return {"error": "Database not available"}
         
         try:
             db = self.get_db_session()
-            query = db.query(Patient)
-            
-            # Build search filters
-            filters = []
-            search_criteria = []
-            
-            if patient_number:
-                filters.append(Patient.patient_number.ilike(f"%{patient_number}%"))
-                search_criteria.append(f"patient_number: {patient_number}")
-            if first_name:
-                filters.append(Patient.first_name.ilike(f"%{first_name}%"))
-                search_criteria.append(f"first_name: {first_name}")
-            if last_name:
-                filters.append(Patient.last_name.ilike(f"%{last_name}%"))
-                search_criteria.append(f"last_name: {last_name}")
-            if phone:
-                filters.append(Patient.phone.ilike(f"%{phone}%"))
-                search_criteria.append(f"phone: {phone}")
-            if email:
-                filters.append(Patient.email.ilike(f"%{email}%"))
-                search_criteria.append(f"email: {email}")
-            
-            # Apply filters
-            if filters:
-                query = query.filter(and_(*filters))
-            
-            patients = query.all()
-            result = [self.serialize_model(patient) for patient in patients]
+            search_criteria = [f"{field}: {value}" for field, value in (
+                ("patient_number", patient_number), ("first_name", first_name),
+                ("last_name", last_name), ("phone", phone), ("email", email)
+            ) if value]
+            
+            matches = search_service.search_patients(
+                db, patient_number=patient_number, first_name=first_name,
+                last_name=last_name, phone=phone, email=email,
+                status=status, limit=limit
+            )
+            result = []
+            for patient, score in matches:
+                patient_data = self.serialize_model(patient)
+                patient_data["match_score"] = round(score, 3)
+                result.append(patient_data)
             db.close()
             
             # Log the interaction
@@ -247,6 +243,35 @@ class PatientAgent(BaseAgent):
         except Exception as e:
             return {"error": f"Failed to search patients: {str(e)}"}
 
+    def resolve_patient_names(self, names: List[str]) -> Dict[str, Any]:
+        """Resolve many patient names to their best-matching patient in one round trip.
+        
+        Args:
+            names: Free-text patient names, e.g. ["John Smith", "Garcia"]
+        """
+        if not DATABASE_AVAILABLE:
+            return {"error": "Database not available"}
+        
+        try:
+            db = self.get_db_session()
+            resolved = search_service.resolve_patient_names(db, names)
+            db.close()
+            
+            found = sum(1 for match in resolved.values() if match)
+            return {"data": resolved, "resolved_count": found, "unresolved": [n for n, m in resolved.items() if not m]}
+        except Exception as e:
+            return {"error": f"Failed to resolve patient names: {str(e)}"}
+
+    def lookup_patient_numbers(self, prefix: str, limit: int = 10) -> Dict[str, Any]:
+        """Autocomplete patient numbers by prefix (e.g. "P10") from the in-memory index."""
+        if not DATABASE_AVAILABLE:
+            return {"error": "Database not available"}
+        
+        try:
+            return {"data": search_service.lookup_patient_numbers(prefix, limit)}
+        except Exception as e:
+            return {"error": f"Failed to look up patient numbers: {str(e)}"}
+
     def update_patient(self, patient_id: str, first_name: str = None, last_name: str = None,
                       gender: str = None, phone: str = None, email: str = None,
                       address: str = None, emergency_contact_name: str = None,
@@ -330,9 +355,11 @@ class PatientAgent(BaseAgent):
                 return {"success": False, "message": "Patient not found"}
             
             patient_name = f"{patient.first_name} {patient.last_name}"  # Store for logging
+            patient_number = patient.patient_number
             db.delete(patient)
             db.commit()
             db.close()
+            search_service.patient_numbers.remove(patient_number)
             
             # Log the interaction
             self.log_interaction(
@@ -22,18 +22,25 @@ from typing import Any, Dict, List, Optional
 from .base_agent import BaseAgent
 
 try:
-    from database import SessionLocal, PatientSupplyUsage, Patient, Supply, User, Bed
-    from sqlalchemy import and_, or_, desc
+    from database import SessionLocal, PatientSupplyUsage, Patient, Supply, SupplyCategory, User, Bed, Staff
+    from sqlalchemy import and_, or_, desc, func
+    from sqlalchemy.orm import joinedload
+    from stock_ledger import stock_ledger
+    from identifier_resolver import as_uuid, identifier_resolver
     DATABASE_AVAILABLE = True
 except ImportError:
     DATABASE_AVAILABLE = False
 
+MEDICATION_CATEGORY_KEYWORDS = ("medication", "drug", "pharmaceutical", "medicine")
+
+
 class PatientSupplyUsageAgent(BaseAgent):
     def __init__(self):
         super().__init__("Patient Supply Usage Agent", "supply_usage_agent")
         self.available_tools = [
             "record_patient_supply_usage",
             "record_patient_supply_usage_by_code",  # Convenience method for user-friendly codes
+            "record_medication_round",
             "get_patient_supply_usage",
             "update_supply_usage_status",
             "get_supply_usage_for_discharge_report",
@@ -45,6 +52,7 @@ class PatientSupplyUsageAgent(BaseAgent):
         self.tool_descriptions = {
             "record_patient_supply_usage": "Record medication or supply usage for a patient",
             "record_patient_supply_usage_by_code": "Record patient supply usage using user-friendly codes (patient number, item code, employee ID)",
+            "record_medication_round": "Record a whole nursing/medication round (many patients and supplies) in one transaction",
             "get_patient_supply_usage": "Get specific supply usage record by ID",
             "update_supply_usage_status": "Update status of supply usage (administered, completed, discontinued)",
             "get_supply_usage_for_discharge_report": "Get all supply usage for a patient's discharge report",
@@ -106,53 +114,41 @@ class PatientSupplyUsageAgent(BaseAgent):
         try:
             db = self.get_db_session()
             
-            # Debug: Print incoming parameters
-            print(f"🔍 SUPPLY USAGE DEBUG: Recording supply usage")
-            print(f"  - patient_id: {patient_id} (type: {type(patient_id)})")
-            print(f"  - patient_number: {patient_number}")
-            print(f"  - supply_id: {supply_id}")
-            print(f"  - staff_id: {staff_id}")
-            
             # Find patient by ID or patient number
-            patient = None
+            patient_uuid = None
             if patient_id:
                 try:
-                    patient = db.query(Patient).filter(Patient.id == uuid.UUID(patient_id)).first()
-                    print(f"🔍 SUPPLY USAGE DEBUG: Found patient by ID: {patient.id if patient else 'None'}")
+                    patient_uuid = db.query(Patient.id).filter(Patient.id == uuid.UUID(patient_id)).scalar()
                 except ValueError:
-                    print(f"❌ SUPPLY USAGE DEBUG: Invalid patient ID format: {patient_id}")
                     db.close()
                     return {"success": False, "message": "Invalid patient ID format"}
             elif patient_number:
-                patient = db.query(Patient).filter(Patient.patient_number == patient_number).first()
-                print(f"🔍 SUPPLY USAGE DEBUG: Found patient by number: {patient.id if patient else 'None'}")
+                patient_uuid = db.query(Patient.id).filter(Patient.patient_number == patient_number).scalar()
             else:
                 db.close()
                 return {"success": False, "message": "Either patient_id or patient_number must be provided"}
             
-            if not patient:
+            if not patient_uuid:
                 db.close()
                 return {"success": False, "message": f"Patient not found with {'ID: ' + patient_id if patient_id else 'number: ' + patient_number}"}
             
-            print(f"✅ SUPPLY USAGE DEBUG: Using patient UUID: {patient.id} for {patient.first_name} {patient.last_name}")
-            
             # Find supply by ID or item code
-            supply = None
+            supply_uuid = None
             if supply_id:
                 # Look up by supply ID (UUID)
                 try:
-                    supply = db.query(Supply).filter(Supply.id == uuid.UUID(supply_id)).first()
+                    supply_uuid = db.query(Supply.id).filter(Supply.id == uuid.UUID(supply_id)).scalar()
                 except ValueError:
                     db.close()
                     return {"success": False, "message": "Invalid supply ID format"}
             elif supply_item_code:
                 # Look up by item code
-                supply = db.query(Supply).filter(Supply.item_code == supply_item_code).first()
+                supply_uuid = db.query(Supply.id).filter(Supply.item_code == supply_item_code).scalar()
             else:
                 db.close()
                 return {"success": False, "message": "Either supply_id or supply_item_code must be provided"}
             
-            if not supply:
+            if not supply_uuid:
                 db.close()
                 return {"success": False, "message": f"Supply not found with {'ID: ' + supply_id if supply_id else 'item code: ' + supply_item_code}"}
             
@@ -164,122 +160,68 @@ class PatientSupplyUsageAgent(BaseAgent):
                 except ValueError:
                     db.close()
                     return {"success": False, "message": "Invalid administered_by_id format"}
-            elif staff_id:
-                # Enhanced staff_id handling: support both Employee IDs and User UUIDs
-                try:
-                    # First, try to parse as UUID (User ID)
-                    administered_by_uuid = uuid.UUID(staff_id)
-                except ValueError:
-                    # If UUID parsing fails, treat as Employee ID and look up staff
-                    from database import Staff
-                    staff = db.query(Staff).filter(Staff.employee_id == staff_id).first()
-                    if staff:
-                        administered_by_uuid = staff.user_id  # Staff references User table
-                    else:
-                        db.close()
-                        return {"success": False, "message": f"Staff not found with employee ID: {staff_id}"}
-            elif employee_id:
-                # Look up staff by employee_id
-                from database import Staff
-                staff = db.query(Staff).filter(Staff.employee_id == employee_id).first()
-                if staff:
-                    administered_by_uuid = staff.user_id  # Staff references User table
-                else:
+            elif staff_id or employee_id:
+                # Employee IDs (e.g. 'EMP1005') and User UUIDs are both accepted
+                administered_by_uuid = self._resolve_user_id(db, staff_id or employee_id)
+                if not administered_by_uuid:
                     db.close()
-                    return {"success": False, "message": f"Staff not found with employee ID: {employee_id}"}
+                    return {"success": False, "message": f"Staff not found with employee ID: {staff_id or employee_id}"}
             
-            # Resolve prescribed_by if provided (Enhanced to handle Employee IDs)
+            # Resolve prescribed_by if provided (Employee IDs or User UUIDs)
             prescribed_by_uuid = None
             if prescribed_by_id:
-                try:
-                    # First, try to parse as UUID (User ID)
-                    prescribed_by_uuid = uuid.UUID(prescribed_by_id)
-                except ValueError:
-                    # If UUID parsing fails, treat as Employee ID and look up staff
-                    from database import Staff
-                    staff = db.query(Staff).filter(Staff.employee_id == prescribed_by_id).first()
-                    if staff:
-                        prescribed_by_uuid = staff.user_id  # Staff references User table
-                    else:
-                        db.close()
-                        return {"success": False, "message": f"Prescribing staff not found with employee ID: {prescribed_by_id}"}
-            
-            # Calculate costs
-            unit_cost = supply.unit_cost or 0
-            total_cost = float(unit_cost) * quantity_used if unit_cost else 0
+                prescribed_by_uuid = self._resolve_user_id(db, prescribed_by_id)
+                if not prescribed_by_uuid:
+                    db.close()
+                    return {"success": False, "message": f"Prescribing staff not found with employee ID: {prescribed_by_id}"}
             
             # Parse dates
             start_date_obj = datetime.fromisoformat(start_date).date() if start_date else date.today()
             end_date_obj = datetime.fromisoformat(end_date).date() if end_date else None
+            prescribed_date = datetime.now()
+            
+            # Usage row, stock decrement and ledger entry in one transaction
+            entry = {
+                "patient_id": patient_uuid,
+                "supply_id": supply_uuid,
+                "quantity_used": quantity_used,
+                "prescribed_by_id": prescribed_by_uuid,
+                "administered_by_id": administered_by_uuid,
+                "bed_id": bed_id,
+                "dosage": dosage,
+                "frequency": frequency,
+                "administration_route": administration_route,
+                "indication": indication if indication else notes,  # Use notes as indication if provided
+                "prescribed_date": prescribed_date,
+                "start_date": start_date_obj,
+                "end_date": end_date_obj
+            }
+            result = stock_ledger.record_round(db, [entry])
+            db.close()
             
-            # Debug: Print what we're about to record
-            print(f"📝 SUPPLY USAGE DEBUG: Creating usage record")
-            print(f"  - patient.id: {patient.id} (type: {type(patient.id)})")
-            print(f"  - supply.id: {supply.id}")
-            print(f"  - quantity_used: {quantity_used}")
-            
-            # Create usage record
-            usage = PatientSupplyUsage(
-                patient_id=patient.id,  # Use the resolved patient ID
-                supply_id=supply.id,  # Use the resolved supply ID
-                quantity_used=quantity_used,
-                unit_cost=unit_cost,
-                total_cost=total_cost,
-                prescribed_by_id=prescribed_by_uuid,
-                administered_by_id=administered_by_uuid,
-                bed_id=uuid.UUID(bed_id) if bed_id else None,
-                dosage=dosage,
-                frequency=frequency,
-                administration_route=administration_route,
-                indication=indication if indication else notes,  # Use notes as indication if provided
-                prescribed_date=datetime.now(),
-                start_date=start_date_obj,
-                end_date=end_date_obj,
-                status="prescribed"
-            )
-            
-            db.add(usage)
-            db.commit()
-            db.refresh(usage)
-            
-            print(f"✅ SUPPLY USAGE DEBUG: Record created with ID: {usage.id}, patient_id: {usage.patient_id}")
-            
-            # Update supply inventory
-            supply.current_stock -= quantity_used
-            db.commit()
+            if not result["success"]:
+                reason = next(iter(result["rejected"].values()), result.get("message"))
+                return {"success": False, "message": f"Failed to record supply usage: {reason}"}
             
-            # Force-load all attributes to avoid detached instance issues
+            recorded = result["recorded"][0]
             usage_dict = {
-                'id': str(usage.id),
-                'patient_id': str(usage.patient_id),
-                'supply_id': str(usage.supply_id),
-                'quantity_used': usage.quantity_used,
-                'unit_cost': float(usage.unit_cost) if usage.unit_cost else 0,
-                'total_cost': float(usage.total_cost) if usage.total_cost else 0,
-                'dosage': usage.dosage,
-                'frequency': usage.frequency,
-                'administration_route': usage.administration_route,
-                'indication': usage.indication,
-                'status': usage.status,
-                'prescribed_date': usage.prescribed_date.isoformat() if usage.prescribed_date else None,
-                'start_date': usage.start_date.isoformat() if usage.start_date else None,
-                'end_date': usage.end_date.isoformat() if usage.end_date else None
+                'id': recorded["id"],
+                'patient_id': recorded["patient_id"],
+                'supply_id': recorded["supply_id"],
+                'quantity_used': quantity_used,
+                'unit_cost': recorded["unit_cost"],
+                'total_cost': recorded["total_cost"],
+                'dosage': dosage,
+                'frequency': frequency,
+                'administration_route': administration_route,
+                'indication': entry["indication"],
+                'status': "prescribed",
+                'prescribed_date': prescribed_date.isoformat(),
+                'start_date': start_date_obj.isoformat(),
+                'end_date': end_date_obj.isoformat() if end_date_obj else None,
+                'remaining_stock': recorded["remaining_stock"]
             }
             
-            # Get additional data for logging before closing session
-            supply_name = supply.name
-            supply_unit = supply.unit_of_measure
-            patient_name = f"{patient.first_name} {patient.last_name}"
-            
-            db.close()
-            
-            # Log the interaction
-            self.log_interaction(
-                query=f"Record {quantity_used} {supply_unit} of {supply_name} for patient {patient_name}",
-                response=f"Supply usage recorded successfully",
-                tool_used="record_patient_supply_usage"
-            )
-            
             return {"success": True, "message": "Supply usage recorded successfully", "data": usage_dict}
             
         except Exception as e:
@@ -287,6 +229,129 @@ class PatientSupplyUsageAgent(BaseAgent):
             db.close()
             return {"success": False, "message": f"Failed to record supply usage: {str(e)}"}
 
+    def _resolve_user_id(self, db, identifier: str) -> Optional[uuid.UUID]:
+        """User UUID for a User UUID or a staff Employee ID."""
+        try:
+            return uuid.UUID(identifier)
+        except ValueError:
+            return db.query(Staff.user_id).filter(Staff.employee_id == identifier).scalar()
+
+    def record_medication_round(self, administrations: List[Dict[str, Any]], administered_by: str = None,
+                                partial: bool = False) -> Dict[str, Any]:
+        """
+        Record a whole medication/nursing round in one transaction.
+        
+        Each administration names a patient (patient_id or patient_number), a
+        supply (supply_id or supply_item_code) and quantity_used, plus the
+        optional fields of record_patient_supply_usage. Identifiers are
+        resolved with one query per kind, stock for every supply in the round
+        is moved atomically, and usage and ledger rows are inserted in chunks.
+        
+        Args:
+            administrations: List of administration dicts
+            administered_by: Default administering staff (Employee ID or User UUID)
+            partial: Record what can be recorded when some entries fail, instead of nothing
+        """
+        if not DATABASE_AVAILABLE:
+            return {"success": False, "message": "Database not available"}
+        if not administrations:
+            return {"success": False, "message": "No administrations provided"}
+
+        try:
+            db = self.get_db_session()
+            resolved, unresolved = self._resolve_round(db, administrations, administered_by)
+            if unresolved and not partial:
+                db.close()
+                return {"success": False, "message": f"{len(unresolved)} administrations could not be resolved",
+                        "data": {"unresolved": unresolved}}
+            if not resolved:
+                db.close()
+                return {"success": False, "message": "No administrations could be resolved",
+                        "data": {"unresolved": unresolved}}
+
+            result = stock_ledger.record_round(db, resolved, partial=partial)
+            db.close()
+
+            if not result["success"]:
+                return {"success": False, "message": result["message"],
+                        "data": {"rejected": result["rejected"], "unresolved": unresolved}}
+
+            return {
+                "success": True,
+                "message": f"Recorded {len(result['recorded'])} of {len(administrations)} administrations",
+                "data": {
+                    "recorded": result["recorded"],
+                    "rejected": result["rejected"],
+                    "unresolved": unresolved,
+                    "stock": result["stock"]
+                }
+            }
+        except Exception as e:
+            db.rollback()
+            db.close()
+            return {"success": False, "message": f"Failed to record medication round: {str(e)}"}
+
+    def _resolve_round(self, db, administrations: List[Dict[str, Any]], administered_by: str = None):
+        """Resolve patient, supply and staff identifiers for a round in one query (identifier_resolver.py)."""
+        patient_keys, supply_keys, staff_keys = set(), set(), set()
+        for entry in administrations:
+            patient_keys.add(entry.get("patient_id") or entry.get("patient_number"))
+            supply_keys.add(entry.get("supply_id") or entry.get("supply_item_code"))
+            for key in ("administered_by_id", "staff_id", "employee_id", "prescribed_by_id"):
+                if entry.get(key):
+                    staff_keys.add(entry[key])
+        if administered_by:
+            staff_keys.add(administered_by)
+
+        # Staff UUIDs are user ids and are used as given; only employee IDs need a lookup
+        employee_ids = [k for k in staff_keys if not as_uuid(k)]
+        resolution = identifier_resolver.resolve(db, {
+            "patient": patient_keys, "supply": supply_keys, "staff": employee_ids
+        })
+        patients = {k: resolution.id("patient", k) for k in patient_keys if resolution.get("patient", k)}
+        supplies = {k: resolution.id("supply", k) for k in supply_keys if resolution.get("supply", k)}
+        staff = {str(u): u for u in map(as_uuid, staff_keys) if u}
+        for key in employee_ids:
+            row = resolution.get("staff", key)
+            if row:
+                staff[key] = row["user_id"]
+
+        resolved, unresolved = [], []
+        for index, entry in enumerate(administrations):
+            patient_key = entry.get("patient_id") or entry.get("patient_number")
+            supply_key = entry.get("supply_id") or entry.get("supply_item_code")
+            administering = (entry.get("administered_by_id") or entry.get("staff_id")
+                             or entry.get("employee_id") or administered_by)
+            prescribing = entry.get("prescribed_by_id")
+            # Staff UUIDs are keyed in canonical form; employee IDs as given
+            administering = str(as_uuid(administering)) if as_uuid(administering) else administering
+            prescribing = str(as_uuid(prescribing)) if as_uuid(prescribing) else prescribing
+            errors = []
+            if patient_key not in patients:
+                errors.append(f"Patient not found: {patient_key}")
+            if supply_key not in supplies:
+                errors.append(f"Supply not found: {supply_key}")
+            if administering and administering not in staff:
+                errors.append(f"Staff not found: {administering}")
+            if prescribing and prescribing not in staff:
+                errors.append(f"Prescribing staff not found: {prescribing}")
+            if errors:
+                unresolved.append({"index": index, "errors": errors})
+                continue
+
+            resolved.append({
+                **entry,
+                "patient_id": patients[patient_key],
+                "supply_id": supplies[supply_key],
+                "quantity_used": entry.get("quantity_used") or 1,
+                "administered_by_id": staff.get(administering) if administering else None,
+                "prescribed_by_id": staff.get(prescribing) if prescribing else None,
+                "indication": entry.get("indication") or entry.get("notes"),
+                "start_date": datetime.fromisoformat(entry["start_date"]).date() if entry.get("start_date") else None,
+                "end_date": datetime.fromisoformat(entry["end_date"]).date() if entry.get("end_date") else None
+            })
+        return resolved, unresolved
+
     def record_patient_supply_usage_by_code(self, patient_number: str = None, patient_id: str = None, 
                                           supply_item_code: str = None, quantity_used: int = 1, 
                                           staff_id: str = None, employee_id: str = None,
@@ -399,41 +464,58 @@ class PatientSupplyUsageAgent(BaseAgent):
             db.close()
             return {"success": False, "message": f"Failed to update supply usage status: {str(e)}"}
 
+    def _stay_filters(self, patient_id: str, admission_date: str = None, discharge_date: str = None):
+        """Filters selecting a patient's usage rows within an optional stay window."""
+        filters = [PatientSupplyUsage.patient_id == uuid.UUID(patient_id)]
+        if admission_date:
+            filters.append(PatientSupplyUsage.prescribed_date >= datetime.fromisoformat(admission_date))
+        if discharge_date:
+            filters.append(PatientSupplyUsage.prescribed_date <= datetime.fromisoformat(discharge_date))
+        return filters
+
     def get_supply_usage_for_discharge_report(self, patient_id: str, 
                                             admission_date: str = None, 
                                             discharge_date: str = None) -> Dict[str, Any]:
-        """Get all supply usage for a patient's discharge report."""
+        """Get all supply usage for a patient's discharge report.
+        
+        Counts and costs per group are summed in SQL; the itemised rows are
+        loaded in one query with their supply, category and prescriber.
+        """
         if not DATABASE_AVAILABLE:
             return {"success": False, "message": "Database not available"}
 
         try:
             db = self.get_db_session()
+            filters = self._stay_filters(patient_id, admission_date, discharge_date)
+            
+            is_medication = or_(*[func.lower(SupplyCategory.name).contains(keyword)
+                                  for keyword in MEDICATION_CATEGORY_KEYWORDS])
+            group = func.coalesce(is_medication, False).label("is_medication")
+            totals = {
+                row.is_medication: row
+                for row in db.query(group,
+                                    func.count(PatientSupplyUsage.id).label("item_count"),
+                                    func.coalesce(func.sum(PatientSupplyUsage.total_cost), 0).label("total_cost"))
+                .select_from(PatientSupplyUsage)
+                .outerjoin(Supply, PatientSupplyUsage.supply_id == Supply.id)
+                .outerjoin(SupplyCategory, Supply.category_id == SupplyCategory.id)
+                .filter(*filters)
+                .group_by(group)
+            }
+            total_items = sum(row.item_count for row in totals.values())
             
-            # Build query
-            query = db.query(PatientSupplyUsage).filter(
-                PatientSupplyUsage.patient_id == uuid.UUID(patient_id)
-            )
-            
-            # Add date filters if provided
-            if admission_date:
-                admission_dt = datetime.fromisoformat(admission_date)
-                query = query.filter(PatientSupplyUsage.prescribed_date >= admission_dt)
-            
-            if discharge_date:
-                discharge_dt = datetime.fromisoformat(discharge_date)
-                query = query.filter(PatientSupplyUsage.prescribed_date <= discharge_dt)
-            
-            # Order by prescribed date
-            usage_records = query.order_by(PatientSupplyUsage.prescribed_date).all()
-            
-            if not usage_records:
+            if not total_items:
                 db.close()
                 return {"success": True, "data": [], "message": "No supply usage found for this patient"}
             
+            usage_records = db.query(PatientSupplyUsage).filter(*filters).options(
+                joinedload(PatientSupplyUsage.supply).joinedload(Supply.category),
+                joinedload(PatientSupplyUsage.prescribed_by)
+            ).order_by(PatientSupplyUsage.prescribed_date).all()
+            
             # Group by supply type for better reporting
             medications = []
             supplies = []
-            total_cost = 0
             
             for usage in usage_records:
                 usage_data = self.serialize_model(usage)
@@ -448,13 +530,10 @@ class PatientSupplyUsageAgent(BaseAgent):
                 if usage.prescribed_by:
                     usage_data["prescribed_by_name"] = f"{usage.prescribed_by.first_name} {usage.prescribed_by.last_name}"
                 
-                # Calculate costs
-                total_cost += float(usage.total_cost or 0)
-                
                 # Categorize as medication or supply
                 if usage.supply and usage.supply.category:
                     category_name = usage.supply.category.name.lower()
-                    if any(med_keyword in category_name for med_keyword in ['medication', 'drug', 'pharmaceutical', 'medicine']):
+                    if any(med_keyword in category_name for med_keyword in MEDICATION_CATEGORY_KEYWORDS):
                         medications.append(usage_data)
                     else:
                         supplies.append(usage_data)
@@ -463,22 +542,25 @@ class PatientSupplyUsageAgent(BaseAgent):
             
             db.close()
             
+            total_cost = round(sum(float(row.total_cost) for row in totals.values()), 2)
             result = {
                 "medications": medications,
                 "medical_supplies": supplies,
-                "total_items": len(usage_records),
-                "total_cost": round(total_cost, 2),
+                "total_items": total_items,
+                "total_cost": total_cost,
                 "summary": {
-                    "medications_count": len(medications),
-                    "supplies_count": len(supplies),
-                    "total_cost": round(total_cost, 2)
+                    "medications_count": totals[True].item_count if True in totals else 0,
+                    "supplies_count": totals[False].item_count if False in totals else 0,
+                    "medications_cost": round(float(totals[True].total_cost), 2) if True in totals else 0,
+                    "supplies_cost": round(float(totals[False].total_cost), 2) if False in totals else 0,
+                    "total_cost": total_cost
                 }
             }
             
             # Log the interaction
             self.log_interaction(
                 query=f"Get supply usage for discharge report - patient {patient_id}",
-                response=f"Retrieved {len(usage_records)} usage records for discharge report",
+                response=f"Retrieved {total_items} usage records for discharge report",
                 tool_used="get_supply_usage_for_discharge_report"
             )
             
@@ -633,80 +715,74 @@ class PatientSupplyUsageAgent(BaseAgent):
     def calculate_patient_medication_costs(self, patient_id: str, 
                                          admission_date: str = None,
                                          discharge_date: str = None) -> Dict[str, Any]:
-        """Calculate total medication costs for a patient stay."""
+        """Calculate total medication costs for a patient stay.
+        
+        Category totals come from one SQL ``GROUP BY``; the per-item lines
+        from one joined query.
+        """
         if not DATABASE_AVAILABLE:
             return {"success": False, "message": "Database not available"}
 
         try:
             db = self.get_db_session()
+            filters = self._stay_filters(patient_id, admission_date, discharge_date)
+            category = func.coalesce(SupplyCategory.name, "Unknown").label("category")
             
-            # Build query
-            query = db.query(PatientSupplyUsage).filter(
-                PatientSupplyUsage.patient_id == uuid.UUID(patient_id)
-            )
-            
-            # Add date filters if provided
-            if admission_date:
-                admission_dt = datetime.fromisoformat(admission_date)
-                query = query.filter(PatientSupplyUsage.prescribed_date >= admission_dt)
-            
-            if discharge_date:
-                discharge_dt = datetime.fromisoformat(discharge_date)
-                query = query.filter(PatientSupplyUsage.prescribed_date <= discharge_dt)
+            def stay_query(*columns):
+                return db.query(*columns).select_from(PatientSupplyUsage) \
+                    .outerjoin(Supply, PatientSupplyUsage.supply_id == Supply.id) \
+                    .outerjoin(SupplyCategory, Supply.category_id == SupplyCategory.id) \
+                    .filter(*filters)
             
-            usage_records = query.all()
+            # Calculate costs by category
+            cost_breakdown = {
+                row.category: {
+                    "category": row.category,
+                    "total_cost": float(row.total_cost),
+                    "item_count": row.item_count,
+                    "items": []
+                }
+                for row in stay_query(category,
+                                      func.count(PatientSupplyUsage.id).label("item_count"),
+                                      func.coalesce(func.sum(PatientSupplyUsage.total_cost), 0).label("total_cost"))
+                .group_by(category).order_by(category)
+            }
             
-            if not usage_records:
+            if not cost_breakdown:
                 db.close()
                 return {"success": True, "data": {"total_cost": 0, "breakdown": []}, 
                        "message": "No supply usage found for cost calculation"}
             
-            # Calculate costs by category
-            cost_breakdown = {}
-            total_cost = 0
-            
-            for usage in usage_records:
-                cost = float(usage.total_cost or 0)
-                total_cost += cost
-                
-                category = "Unknown"
-                if usage.supply and usage.supply.category:
-                    category = usage.supply.category.name
-                
-                if category not in cost_breakdown:
-                    cost_breakdown[category] = {
-                        "category": category,
-                        "total_cost": 0,
-                        "item_count": 0,
-                        "items": []
-                    }
-                
-                cost_breakdown[category]["total_cost"] += cost
-                cost_breakdown[category]["item_count"] += 1
-                cost_breakdown[category]["items"].append({
-                    "supply_name": usage.supply.name if usage.supply else "Unknown",
-                    "quantity": usage.quantity_used,
-                    "unit_cost": float(usage.unit_cost or 0),
-                    "total_cost": cost,
-                    "prescribed_date": usage.prescribed_date.isoformat() if usage.prescribed_date else None
+            for item in stay_query(category, Supply.name, PatientSupplyUsage.quantity_used,
+                                   PatientSupplyUsage.unit_cost, PatientSupplyUsage.total_cost,
+                                   PatientSupplyUsage.prescribed_date) \
+                    .order_by(PatientSupplyUsage.prescribed_date):
+                cost_breakdown[item.category]["items"].append({
+                    "supply_name": item.name or "Unknown",
+                    "quantity": item.quantity_used,
+                    "unit_cost": float(item.unit_cost or 0),
+                    "total_cost": float(item.total_cost or 0),
+                    "prescribed_date": item.prescribed_date.isoformat() if item.prescribed_date else None
                 })
             
             db.close()
             
+            total_cost = sum(entry["total_cost"] for entry in cost_breakdown.values())
+            total_items = sum(entry["item_count"] for entry in cost_breakdown.values())
             result = {
                 "total_cost": round(total_cost, 2),
                 "breakdown": list(cost_breakdown.values()),
                 "summary": {
-                    "total_items": len(usage_records),
+                    "total_items": total_items,
                     "total_categories": len(cost_breakdown),
-                    "average_cost_per_item": round(total_cost / len(usage_records), 2) if usage_records else 0
+                    "average_cost_per_item": round(total_cost / total_items, 2) if total_items else 0
                 }
             }
             
             # Log the interaction
             self.log_interaction(
                 query=f"Calculate medication costs for patient {patient_id}",
-                response=f"Total cost: ${total_cost:.2f} for {len(usage_records)} items",
+                response=f"Total cost: ${total_cost:.2f} for {total_items} items",
                 tool_used="calculate_patient_medication_costs"
             )
             
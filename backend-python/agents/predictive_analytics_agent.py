@@ -38,6 +38,15 @@ class ForecastHorizon(Enum):
     MONTHLY = "monthly"
     QUARTERLY = "quarterly"
 
+# Length of one forecast period in days
+HORIZON_DAYS = {
+    ForecastHorizon.HOURLY.value: 1 / 24,
+    ForecastHorizon.DAILY.value: 1,
+    ForecastHorizon.WEEKLY.value: 7,
+    ForecastHorizon.MONTHLY.value: 30,
+    ForecastHorizon.QUARTERLY.value: 91,
+}
+
 @dataclass
 class PredictionResult:
     prediction_id: str
@@ -181,6 +190,7 @@ class AdvancedPredictiveSystem:
                 db = SessionLocal()
                 
                 historical_data = []
+                external_factors = dict(state.get("external_factors") or {})
                 
                 if prediction_type == "bed_demand":
                     historical_data = self.collect_bed_demand_data(db, forecast_periods * 3)
@@ -188,6 +198,7 @@ class AdvancedPredictiveSystem:
                     historical_data = self.collect_staff_requirement_data(db, forecast_periods * 2)
                 elif prediction_type == "supply_consumption":
                     historical_data = self.collect_supply_consumption_data(db, forecast_periods * 4)
+                    external_factors["inventory_plan"] = self.collect_inventory_plan(db)
                 elif prediction_type == "equipment_failure":
                     historical_data = self.collect_equipment_failure_data(db, forecast_periods * 12)
                 
@@ -195,7 +206,8 @@ class AdvancedPredictiveSystem:
                 
                 return {
                     **state,
-                    "historical_data": historical_data
+                    "historical_data": historical_data,
+                    "external_factors": external_factors
                 }
                 
             except Exception as e:
@@ -261,6 +273,7 @@ class AdvancedPredictiveSystem:
                 Historical data patterns: {historical_data}
                 Prediction type: {prediction_type}
                 Forecast periods: {forecast_periods}
+                External factors (e.g. reorder points and stock-out risk per supply): {external_factors}
                 
                 Analyze the data for:
                 1. Trends and seasonality
@@ -296,7 +309,8 @@ class AdvancedPredictiveSystem:
                 raw_response = prediction_chain.invoke({
                     "historical_data": json.dumps(historical_data[-100:]),  # Last 100 data points
                     "prediction_type": prediction_type,
-                    "forecast_periods": forecast_periods
+                    "forecast_periods": forecast_periods,
+                    "external_factors": json.dumps(state.get("external_factors") or {})
                 })
                 
                 # Extract JSON from response content
@@ -327,18 +341,23 @@ class AdvancedPredictiveSystem:
                     "predictions": predictions,
                     "confidence_intervals": confidence_intervals,
                     "accuracy_metrics": accuracy_metrics,
-                    "recommendations": insights
+                    "recommendations": self.inventory_recommendations(state) + insights
                 }
                 
             except Exception as e:
                 self.logger.error(f"Error generating predictions: {e}")
                 # Generate fallback predictions based on prediction type
                 fallback_predictions = []
+                plan_summary = (state.get("external_factors") or {}).get("inventory_plan", {}).get("summary")
                 for i in range(min(forecast_periods, 7)):  # Limit to 7 periods
                     if prediction_type == "bed_demand":
                         forecast_value = 75 + (i * 2)  # Gradual increase
                     elif prediction_type == "staff_requirements":
                         forecast_value = 20  # Stable staffing
+                    elif prediction_type == "supply_consumption" and plan_summary:
+                        # Units consumed per period at the observed daily rate
+                        period_days = HORIZON_DAYS.get(state.get("forecast_horizon"), 1)
+                        forecast_value = round(plan_summary["total_daily_usage"] * period_days, 1)
                     elif prediction_type == "supply_consumption":
                         forecast_value = 100 - (i * 5)  # Gradual decrease
                     else:
@@ -355,7 +374,8 @@ class AdvancedPredictiveSystem:
                     "predictions": fallback_predictions,
                     "confidence_intervals": [],
                     "accuracy_metrics": {"confidence_score": 0.7, "mape": 0.15},
-                    "recommendations": ["Unable to generate predictions due to technical limitations."]
+                    "recommendations": self.inventory_recommendations(state) or
+                                       ["Unable to generate predictions due to technical limitations."]
                 }
         
         def validate_predictions(state: PredictiveState) -> PredictiveState:
@@ -533,34 +553,24 @@ class AdvancedPredictiveSystem:
             return []
     
     def collect_supply_consumption_data(self, db, periods: int) -> List[Dict[str, Any]]:
-        """Collect historical supply consumption data"""
+        """Collect historical supply consumption data (units used per day, from the daily rollups)"""
         try:
-            from database import Supply, PatientSupplyUsage
+            from inventory_planning import inventory_planner
             
-            # Simulate daily supply consumption data
-            data = []
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=periods)
+            history = inventory_planner.history(db, periods)
+            total_supplies = len(history.supplies)
             
-            current_date = start_date
-            while current_date <= end_date:
-                # Get total supplies and usage
-                total_supplies = db.query(Supply).count()
-                daily_usage = db.query(PatientSupplyUsage).filter(
-                    PatientSupplyUsage.prescribed_date >= current_date,
-                    PatientSupplyUsage.prescribed_date < current_date + timedelta(days=1)
-                ).count()
-                
+            data = []
+            for day in history.daily_totals():
+                current_date = datetime.strptime(day["date"], "%Y-%m-%d")
                 data.append({
-                    "date": current_date.strftime("%Y-%m-%d"),
+                    "date": day["date"],
                     "total_supplies": total_supplies,
-                    "daily_usage": daily_usage,
-                    "usage_rate": (daily_usage / total_supplies * 100) if total_supplies > 0 else 0,
+                    "daily_usage": day["units"],
+                    "usage_rate": (day["units"] / total_supplies * 100) if total_supplies > 0 else 0,
                     "day_of_week": current_date.weekday(),
                     "month": current_date.month
                 })
-                
-                current_date += timedelta(days=1)
             
             return data
             
@@ -568,6 +578,38 @@ class AdvancedPredictiveSystem:
             self.logger.error(f"Error collecting supply consumption data: {e}")
             return []
     
+    def collect_inventory_plan(self, db, at_risk: int = 10) -> Dict[str, Any]:
+        """Reorder points and stock-out risk for the supply forecast (see inventory_planning.py)"""
+        try:
+            from inventory_planning import inventory_planner
+            
+            plan = inventory_planner.plan(db)
+            if not plan.get("success"):
+                return {}
+            fields = ("name", "current_stock", "avg_daily_usage", "reorder_point", "days_of_cover",
+                      "stockout_probability", "suggested_order_quantity", "status")
+            return {
+                "summary": plan["summary"],
+                "at_risk_supplies": [{key: row[key] for key in fields}
+                                     for row in plan["data"][:at_risk] if row["status"] == "reorder_now"]
+            }
+            
+        except Exception as e:
+            self.logger.error(f"Error collecting inventory plan: {e}")
+            return {}
+    
+    def inventory_recommendations(self, state: PredictiveState) -> List[str]:
+        """Reorder recommendations from the inventory plan in the workflow state"""
+        plan = (state.get("external_factors") or {}).get("inventory_plan") or {}
+        recommendations = []
+        for row in plan.get("at_risk_supplies", []):
+            cover = f"{row['days_of_cover']} days of cover" if row["days_of_cover"] is not None else "no cover"
+            risk = (f", {row['stockout_probability']:.0%} stock-out risk over the lead time"
+                    if row["stockout_probability"] is not None else "")
+            recommendations.append(f"Reorder {row['suggested_order_quantity']} x {row['name']}: "
+                                   f"{row['current_stock']} on hand, {cover}{risk}")
+        return recommendations
+    
     def collect_equipment_failure_data(self, db, periods: int) -> List[Dict[str, Any]]:
         """Collect historical equipment failure data"""
         try:
@@ -8,16 +8,56 @@ and predictive warning capabilities for hospital management.
 
 import asyncio
 import json
+import math
+import numpy as np
 import uuid
-from typing import Any, Dict, List, Optional, TypedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, TypedDict
 from datetime import datetime, timedelta
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 from langgraph.graph import StateGraph, END, START
 from langchain_core.messages import BaseMessage, SystemMessage
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 import logging
+from monitoring_history import AlertHistory, MetricRingBuffer, capacity_for
+from escalation_scheduler import EscalationScheduler, EscalationStore
+
+# Metrics checked for sustained trends, with the direction that is a problem
+TREND_METRICS = {
+    "occupancy_rate": 1,
+    "utilization_rate": 1,
+    "low_stock_rate": 1,
+    "operational_rate": -1,
+}
+
+# Monitor name -> monitoring type (AlertCategory value)
+MONITOR_TYPES = {
+    "bed_monitor": "bed_occupancy",
+    "staff_monitor": "staff_utilization",
+    "equipment_monitor": "equipment_status",
+    "supply_monitor": "supply_levels",
+    "patient_safety_monitor": "patient_safety",
+}
+
+# Threshold-checked metrics per monitor: (metric, warning key, critical key, direction)
+THRESHOLD_METRICS = {
+    "bed_monitor": [
+        ("occupancy_rate", "occupancy_warning", "occupancy_critical", 1),
+        ("available_beds", "availability_warning", None, -1),
+    ],
+    "staff_monitor": [
+        ("utilization_rate", "utilization_warning", "utilization_critical", 1),
+    ],
+    "supply_monitor": [
+        ("min_days_of_cover", "days_of_cover_warning", "days_of_cover_critical", -1),
+    ],
+}
+
+DEFAULT_HYSTERESIS = 2
+DEFAULT_COOLDOWN = 900  # seconds
+CHANGE_TOLERANCE = 1e-6
 
 class AlertLevel(Enum):
     INFO = "info"
@@ -47,9 +87,71 @@ class Alert:
     resolved: bool = False
     escalated: bool = False
 
+# Rule level index -> alert level
+RULE_LEVELS = [None, AlertLevel.WARNING, AlertLevel.CRITICAL]
+
+@dataclass
+class ThresholdRule:
+    """Warning/critical threshold on one metric with hysteresis and a per-level cooldown"""
+    metric: str
+    warning: float
+    critical: Optional[float] = None
+    direction: int = 1  # 1: higher is worse, -1: lower is worse
+    hysteresis: float = DEFAULT_HYSTERESIS
+    cooldown: float = DEFAULT_COOLDOWN
+    level: int = 0
+    last_alerted: Dict[int, float] = field(default_factory=dict)
+    
+    def level_for(self, value: float, margin: float = 0) -> int:
+        """Level reached by ``value`` with thresholds relaxed by ``margin``"""
+        def exceeds(threshold):
+            return threshold is not None and (value - threshold) * self.direction >= -margin
+        if exceeds(self.critical):
+            return 2
+        if exceeds(self.warning):
+            return 1
+        return 0
+    
+    def threshold(self, level: int) -> Optional[float]:
+        return self.critical if level == 2 else self.warning
+    
+    def update(self, value: float, now: float) -> Optional[Dict[str, Any]]:
+        """Advance the rule state; returns the crossing event, or None when the level holds.
+        
+        Levels rise as soon as a threshold is reached but only fall once the
+        value is back past the threshold by ``hysteresis``, so a metric
+        hovering around a threshold does not flap. A rise into a level that
+        alerted within ``cooldown`` is suppressed without moving the level, so
+        the alert fires on the first reading after the cooldown if the breach
+        continues.
+        """
+        previous = self.level
+        raised = self.level_for(value)
+        held = self.level_for(value, self.hysteresis)
+        if raised > previous:
+            # Highest reached level whose cooldown has passed
+            for level in range(raised, previous, -1):
+                last = self.last_alerted.get(level)
+                if last is None or now - last >= self.cooldown:
+                    self.level = level
+                    self.last_alerted[level] = now
+                    return {"from": previous, "to": level, "rising": True, "cooled_down": True}
+            return {"from": previous, "to": previous, "rising": True, "cooled_down": False}
+        if held < previous:
+            self.level = held
+            return {"from": previous, "to": held, "rising": False, "cooled_down": True}
+        return None
+
+class _TemplateValues(dict):
+    """Alert template values; placeholders without data render as n/a"""
+    def __missing__(self, key):
+        return "n/a"
+
 class MonitoringState(TypedDict):
     """State for real-time monitoring workflow"""
     monitoring_type: str
+    monitor_name: str
+    active_conditions: int
     current_metrics: Dict[str, Any]
     historical_data: List[Dict[str, Any]]
     alert_conditions: List[Dict[str, Any]]
@@ -64,8 +166,9 @@ class RealTimeMonitoringSystem:
     Features:
     - Real-time metric collection and analysis
     - Intelligent alerting with ML-based thresholds
+    - Edge-triggered alerts: hysteresis, cooldowns and (category, resource) deduplication
     - Predictive warnings before issues occur
-    - Automated escalation procedures
+    - Automated escalation procedures (one heap-driven scheduler, persisted and replayed)
     - Dashboard integration with live updates
     - Mobile push notifications
     """
@@ -76,10 +179,32 @@ class RealTimeMonitoringSystem:
         self.setup_workflows()
         self.setup_notification_system()
         
-        # Initialize monitoring state
-        self.active_monitors = {}
-        self.alert_history = []
+        # Initialize monitoring state: one metric ring buffer per monitor
+        self.active_monitors: Dict[str, MetricRingBuffer] = {}
+        self.alert_history = AlertHistory()
+        
+        # Edge-triggered alerting: rule state, open alerts by (category, resource), counters
+        self.threshold_rules = {
+            name: self.build_threshold_rules(name, config)
+            for name, config in self.monitoring_agents.items()
+        }
+        self.open_alerts: Dict[Tuple[str, str], Alert] = {}
+        self.trend_last_alerted: Dict[Tuple[str, str], float] = {}
+        self.monitoring_stats = {
+            "evaluations": 0,
+            "unchanged_samples": 0,
+            "alerts_raised": 0,
+            "alerts_deduplicated": 0,
+            "alerts_resolved": 0,
+            "cooldown_suppressed": 0,
+            "llm_calls": 0,
+            "llm_calls_suppressed": 0
+        }
         self.escalation_rules = self.load_escalation_rules()
+        self.escalation_scheduler = EscalationScheduler(self.handle_escalation_due)
+        self.escalation_store = EscalationStore()
+        # One writer thread keeps escalation rows in call order and off the event loop
+        self.escalation_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="escalation-store")
         
         # Initialize ML models for predictive monitoring
         self.prediction_models = {}
@@ -116,6 +241,8 @@ class RealTimeMonitoringSystem:
                     "occupancy_critical": 95,
                     "availability_warning": 5
                 },
+                "hysteresis": {"occupancy_rate": 3, "available_beds": 2},
+                "cooldown": 900,  # seconds before the same level re-alerts
                 "predictive_window": 4  # hours
             },
             
@@ -127,6 +254,8 @@ class RealTimeMonitoringSystem:
                     "fatigue_warning": 12,  # hours worked
                     "overtime_warning": 40  # hours per week
                 },
+                "hysteresis": {"utilization_rate": 3},
+                "cooldown": 1800,
                 "predictive_window": 8  # hours
             },
             
@@ -138,6 +267,7 @@ class RealTimeMonitoringSystem:
                     "maintenance_due": 7,  # days
                     "calibration_due": 30  # days
                 },
+                "cooldown": 1800,
                 "predictive_window": 24  # hours
             },
             
@@ -146,9 +276,12 @@ class RealTimeMonitoringSystem:
                 "thresholds": {
                     "stock_warning": 20,  # percentage
                     "stock_critical": 10,
+                    "days_of_cover_warning": 7,  # days, from actual consumption
+                    "days_of_cover_critical": 3,
                     "expiry_warning": 30,  # days
                     "consumption_anomaly": 150  # percentage of normal
                 },
+                "cooldown": 3600,
                 "predictive_window": 72  # hours
             },
             
@@ -159,6 +292,7 @@ class RealTimeMonitoringSystem:
                     "vitals_anomaly": 2,  # standard deviations
                     "medication_interaction": 1
                 },
+                "cooldown": 600,
                 "predictive_window": 1  # hour
             }
         }
@@ -244,49 +378,90 @@ class RealTimeMonitoringSystem:
                 return state
         
         def analyze_metrics(state: MonitoringState) -> MonitoringState:
-            """Analyze metrics against thresholds and patterns"""
+            """Detect newly crossed thresholds and trends (edge-triggered, deduplicated)"""
             current_metrics = state["current_metrics"]
-            thresholds = state.get("thresholds", {})
-            monitoring_type = state["monitoring_type"]
+            monitor_name = state.get("monitor_name")
+            category = state["monitoring_type"]
+            config = self.monitoring_agents.get(monitor_name, {})
+            now = datetime.now().timestamp()
+            
+            self.monitoring_stats["evaluations"] += 1
+            if not current_metrics:
+                return {**state, "alert_conditions": []}
+            
+            # Compare with the previous sample before this one joins the ring buffer
+            history = self.active_monitors.get(monitor_name)
+            previous = history.latest() if history is not None else {}
+            self.store_historical_metrics(monitor_name, current_metrics)
+            history = self.active_monitors[monitor_name]
+            
+            if previous and not self.metrics_changed(previous, current_metrics):
+                # Nothing moved: no rule can change level and no new trend can start
+                self.monitoring_stats["unchanged_samples"] += 1
+                return {
+                    **state,
+                    "alert_conditions": [],
+                    "active_conditions": self.count_open_alerts(category)
+                }
             
             alert_conditions = []
             
-            # Check threshold violations
-            for metric, value in current_metrics.items():
-                if metric in thresholds:
-                    threshold_config = thresholds[metric]
-                    
-                    if isinstance(threshold_config, dict):
-                        if "critical" in threshold_config and value >= threshold_config["critical"]:
-                            alert_conditions.append({
-                                "metric": metric,
-                                "value": value,
-                                "threshold": threshold_config["critical"],
-                                "level": AlertLevel.CRITICAL,
-                                "type": "threshold_violation"
-                            })
-                        elif "warning" in threshold_config and value >= threshold_config["warning"]:
-                            alert_conditions.append({
-                                "metric": metric,
-                                "value": value,
-                                "threshold": threshold_config["warning"],
-                                "level": AlertLevel.WARNING,
-                                "type": "threshold_violation"
-                            })
-            
-            # Analyze trends and patterns
-            historical_data = state.get("historical_data", [])
-            if len(historical_data) >= 3:
-                trend_analysis = self.analyze_trends(historical_data, current_metrics)
-                alert_conditions.extend(trend_analysis)
+            # Threshold crossings with hysteresis and cooldowns
+            for rule in self.threshold_rules.get(monitor_name, []):
+                value = current_metrics.get(rule.metric)
+                if value is None:
+                    continue
+                event = rule.update(value, now)
+                if event is None:
+                    continue
+                key = (category, rule.metric)
+                if not event["rising"]:
+                    if rule.level == 0:
+                        self.resolve_open_alert(key)
+                    continue
+                if not event["cooled_down"]:
+                    self.monitoring_stats["cooldown_suppressed"] += 1
+                    continue
+                condition = {
+                    "metric": rule.metric,
+                    "resource": rule.metric,
+                    "value": value,
+                    "threshold": rule.threshold(rule.level),
+                    "level": RULE_LEVELS[rule.level],
+                    "type": "threshold_violation"
+                }
+                if self.is_duplicate_alert(key, condition["level"]):
+                    continue
+                alert_conditions.append(condition)
+            
+            # Trends: one open alert per metric trend until the trend ends
+            trending = set()
+            if len(history) >= 3:
+                window_hours = config.get("predictive_window", 4)
+                for condition in self.analyze_trends(history, current_metrics, window_hours):
+                    condition["resource"] = f"{condition['metric']}:trend"
+                    key = (category, condition["resource"])
+                    trending.add(key)
+                    if self.is_duplicate_alert(key, condition["level"]):
+                        continue
+                    last = self.trend_last_alerted.get(key)
+                    if last is not None and now - last < config.get("cooldown", DEFAULT_COOLDOWN):
+                        self.monitoring_stats["cooldown_suppressed"] += 1
+                        continue
+                    self.trend_last_alerted[key] = now
+                    alert_conditions.append(condition)
+            for key in [k for k in self.open_alerts if k[0] == category and k[1].endswith(":trend")]:
+                if key not in trending:
+                    self.resolve_open_alert(key)
             
             return {
                 **state,
-                "alert_conditions": alert_conditions
+                "alert_conditions": alert_conditions,
+                "active_conditions": self.count_open_alerts(category)
             }
         
         def generate_alerts(state: MonitoringState) -> MonitoringState:
-            """Generate alerts based on conditions"""
+            """Generate alerts for newly crossed conditions"""
             alert_conditions = state.get("alert_conditions", [])
             monitoring_type = state["monitoring_type"]
             active_alerts = []
@@ -295,6 +470,16 @@ class RealTimeMonitoringSystem:
                 alert = self.create_alert(condition, monitoring_type, state["current_metrics"])
                 active_alerts.append(alert)
                 
+                # A higher level for the same resource supersedes the open alert
+                key = (monitoring_type, condition.get("resource", condition["metric"]))
+                superseded = self.open_alerts.get(key)
+                if superseded is not None:
+                    superseded.resolved = True
+                    self.cancel_escalation(superseded.id)
+                    alert.data["supersedes"] = superseded.id
+                self.open_alerts[key] = alert
+                self.monitoring_stats["alerts_raised"] += 1
+                
                 # Log alert
                 self.logger.warning(f"Alert generated: {alert.title} - {alert.message}")
             
@@ -310,6 +495,9 @@ class RealTimeMonitoringSystem:
             monitoring_type = state["monitoring_type"]
             
             if not alert_conditions:
+                if state.get("active_conditions"):
+                    # Still past a threshold but nothing newly crossed: no new advice to ask for
+                    self.monitoring_stats["llm_calls_suppressed"] += 1
                 return {**state, "recommendations": []}
             
             # Use LLM to generate intelligent recommendations
@@ -330,6 +518,7 @@ class RealTimeMonitoringSystem:
             ])
             
             try:
+                self.monitoring_stats["llm_calls"] += 1
                 recommendation_chain = recommendation_prompt | self.llm
                 response = recommendation_chain.invoke({
                     "monitoring_type": monitoring_type,
@@ -454,20 +643,36 @@ class RealTimeMonitoringSystem:
     def collect_supply_metrics(self, db) -> Dict[str, Any]:
         """Collect supply level and consumption metrics"""
         try:
-            from database import Supply
+            from sqlalchemy import text
+            from inventory_planning import inventory_planner
             
-            supplies = db.query(Supply).all()
-            total_supplies = len(supplies)
-            low_stock_supplies = sum(1 for s in supplies if s.current_stock <= s.reorder_level)
+            counts = db.execute(text(
+                "SELECT count(*) AS total, "
+                "count(*) FILTER (WHERE current_stock <= minimum_stock_level) AS low_stock FROM supplies"
+            )).one()
+            total_supplies = counts.total
+            low_stock_supplies = counts.low_stock
             
             low_stock_rate = (low_stock_supplies / total_supplies * 100) if total_supplies > 0 else 0
             
-            return {
+            metrics = {
                 "total_supplies": total_supplies,
                 "low_stock_supplies": low_stock_supplies,
                 "low_stock_rate": low_stock_rate,
                 "timestamp": datetime.now().isoformat()
             }
+            
+            # Reorder points and cover from consumption (no Monte Carlo on the monitoring path)
+            plan = inventory_planner.plan(db, trials=0)
+            if plan.get("success"):
+                summary = plan["summary"]
+                metrics["reorder_point_breaches"] = summary["reorder_now"]
+                lowest = summary["lowest_cover"]
+                if lowest:
+                    metrics["min_days_of_cover"] = lowest["days_of_cover"]
+                    metrics["supply_name"] = lowest["name"]
+                    metrics["current_stock"] = lowest["current_stock"]
+            return metrics
         except Exception as e:
             self.logger.error(f"Error collecting supply metrics: {e}")
             return {}
@@ -490,27 +695,97 @@ class RealTimeMonitoringSystem:
             self.logger.error(f"Error collecting patient safety metrics: {e}")
             return {}
     
-    def analyze_trends(self, historical_data: List[Dict], current_metrics: Dict) -> List[Dict]:
-        """Analyze trends in historical data"""
+    def analyze_trends(self, history: MetricRingBuffer, current_metrics: Dict,
+                       window_hours: float = 4) -> List[Dict]:
+        """Analyze trends over the monitor's ring buffer (vectorized window statistics)"""
         trend_alerts = []
         
-        # Simple trend analysis (would be more sophisticated in real implementation)
-        if len(historical_data) >= 3:
-            # Example: Check for increasing bed occupancy trend
-            if "occupancy_rate" in current_metrics:
-                recent_rates = [d.get("occupancy_rate", 0) for d in historical_data[-3:]]
-                if all(recent_rates[i] < recent_rates[i+1] for i in range(len(recent_rates)-1)):
-                    # Increasing trend detected
-                    trend_alerts.append({
-                        "metric": "occupancy_rate",
-                        "value": current_metrics["occupancy_rate"],
-                        "level": AlertLevel.WARNING,
-                        "type": "increasing_trend",
-                        "trend_data": recent_rates
-                    })
+        for metric, direction in TREND_METRICS.items():
+            if metric not in current_metrics:
+                continue
+            _, recent = history.series(metric, last=3)
+            if recent.size < 3:
+                continue
+            # Sustained movement in the bad direction over the last three samples
+            if not (np.diff(recent) * direction > 0).all():
+                continue
+            stats = history.window_stats(metric, seconds=window_hours * 3600)
+            if stats["slope_per_hour"] * direction <= 0:
+                continue
+            stats["projected"] = stats["latest"] + stats["slope_per_hour"] * window_hours
+            trend_alerts.append({
+                "metric": metric,
+                "value": current_metrics[metric],
+                "level": AlertLevel.WARNING,
+                "type": "increasing_trend" if direction > 0 else "decreasing_trend",
+                "trend_data": recent.tolist(),
+                "statistics": stats
+            })
         
         return trend_alerts
     
+    def build_threshold_rules(self, monitor_name: str, config: Dict) -> List[ThresholdRule]:
+        """Threshold rules for a monitor from its configured thresholds"""
+        thresholds = config.get("thresholds", {})
+        hysteresis = config.get("hysteresis", {})
+        rules = []
+        for metric, warning_key, critical_key, direction in THRESHOLD_METRICS.get(monitor_name, []):
+            if warning_key not in thresholds:
+                continue
+            rules.append(ThresholdRule(
+                metric=metric,
+                warning=thresholds[warning_key],
+                critical=thresholds.get(critical_key) if critical_key else None,
+                direction=direction,
+                hysteresis=hysteresis.get(metric, DEFAULT_HYSTERESIS),
+                cooldown=config.get("cooldown", DEFAULT_COOLDOWN)
+            ))
+        return rules
+    
+    def metrics_changed(self, previous: Dict, current: Dict) -> bool:
+        """True when any numeric metric moved since the previous sample"""
+        for name, value in current.items():
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                continue
+            old = previous.get(name)
+            if old is None or not math.isclose(old, value, rel_tol=CHANGE_TOLERANCE, abs_tol=CHANGE_TOLERANCE):
+                return True
+        return False
+    
+    def is_duplicate_alert(self, key: Tuple[str, str], level: AlertLevel) -> bool:
+        """An open alert for the same (category, resource) at this level or higher"""
+        existing = self.open_alerts.get(key)
+        if existing is None or existing.resolved:
+            return False
+        ranks = [AlertLevel.INFO, AlertLevel.WARNING, AlertLevel.CRITICAL, AlertLevel.EMERGENCY]
+        if ranks.index(existing.level) >= ranks.index(level):
+            self.monitoring_stats["alerts_deduplicated"] += 1
+            return True
+        return False
+    
+    def resolve_open_alert(self, key: Tuple[str, str]):
+        """Resolve the open alert for (category, resource) once its condition clears"""
+        alert = self.open_alerts.pop(key, None)
+        if alert is not None and not alert.resolved:
+            alert.resolved = True
+            self.cancel_escalation(alert.id)
+            self.monitoring_stats["alerts_resolved"] += 1
+            self.logger.info(f"Alert resolved: {alert.id} ({key[0]}/{key[1]})")
+    
+    def count_open_alerts(self, category: str) -> int:
+        return sum(1 for key in self.open_alerts if key[0] == category)
+    
+    def get_monitoring_stats(self) -> Dict[str, Any]:
+        """Alerting and LLM counters plus current rule levels"""
+        return {
+            **self.monitoring_stats,
+            "open_alerts": len(self.open_alerts),
+            "rule_levels": {
+                f"{name}.{rule.metric}": rule.level
+                for name, rules in self.threshold_rules.items() for rule in rules
+            }
+        }
+    
     def create_alert(self, condition: Dict, monitoring_type: str, metrics: Dict) -> Alert:
         """Create alert from condition"""
         category = AlertCategory(monitoring_type)
@@ -518,11 +793,13 @@ class RealTimeMonitoringSystem:
         
         template = self.alert_templates.get(category, {}).get(level, "Alert: {metric} - {value}")
         
-        # Format alert message
-        message = template.format(
-            **condition,
-            **metrics
-        )
+        # Format alert message; rate metrics also fill their short placeholder ({occupancy}, {utilization})
+        values = _TemplateValues({**metrics, **condition})
+        for name, value in [(condition.get("metric", ""), condition.get("value")), *metrics.items()]:
+            if name.endswith("_rate") and isinstance(value, (int, float)):
+                values.setdefault(name[:-len("_rate")], round(value, 1))
+        values.setdefault("department", "all departments")
+        message = template.format_map(values)
         
         alert = Alert(
             id=str(uuid.uuid4()),
@@ -594,7 +871,9 @@ class RealTimeMonitoringSystem:
     
     async def start_monitoring_loops(self):
         """Start background monitoring loops"""
-        monitoring_tasks = []
+        # Pending escalations survive restarts; overdue ones fire as soon as the driver starts
+        await self.replay_escalations()
+        monitoring_tasks = [asyncio.create_task(self.escalation_scheduler.run())]
         
         for monitor_name, config in self.monitoring_agents.items():
             task = asyncio.create_task(
@@ -615,7 +894,9 @@ class RealTimeMonitoringSystem:
                 workflow = self.workflows["real_time_monitoring"]
                 
                 state = MonitoringState(
-                    monitoring_type=monitor_name.replace("_monitor", ""),
+                    monitoring_type=MONITOR_TYPES.get(monitor_name, monitor_name.replace("_monitor", "")),
+                    monitor_name=monitor_name,
+                    active_conditions=0,
                     current_metrics={},
                     historical_data=[],
                     alert_conditions=[],
@@ -626,13 +907,10 @@ class RealTimeMonitoringSystem:
                 
                 result = await workflow.ainvoke(state)
                 
-                # Process any alerts
+                # Process newly raised alerts (metrics were stored in the ring buffer during analysis)
                 if result.get("active_alerts"):
                     await self.process_alerts(result["active_alerts"])
                 
-                # Store metrics for historical analysis
-                self.store_historical_metrics(monitor_name, result["current_metrics"])
-                
             except Exception as e:
                 self.logger.error(f"Error in monitoring loop {monitor_name}: {e}")
             
@@ -648,9 +926,9 @@ class RealTimeMonitoringSystem:
             # Add to alert history
             self.alert_history.append(alert)
             
-            # Start escalation timer if needed
-            if alert.level in [AlertLevel.CRITICAL, AlertLevel.EMERGENCY]:
-                asyncio.create_task(self.escalation_timer(alert))
+            # Schedule escalation if needed
+            if alert.level in [AlertLevel.CRITICAL, AlertLevel.EMERGENCY] and not alert.resolved:
+                await self.schedule_escalation(alert)
     
     async def send_alert_notifications(self, alert: Alert):
         """Send alert notifications through configured channels"""
@@ -664,17 +942,104 @@ class RealTimeMonitoringSystem:
                 except Exception as e:
                     self.logger.error(f"Error sending notification via {channel}: {e}")
     
-    async def escalation_timer(self, alert: Alert):
-        """Handle alert escalation timing"""
-        escalation_rule = self.escalation_rules.get(alert.level, {})
-        escalation_time = escalation_rule.get("escalation_time", 30) * 60  # Convert to seconds
+    async def schedule_escalation(self, alert: Alert, due_at: Optional[datetime] = None, persist: bool = True):
+        """Schedule the alert's escalation on the shared scheduler and persist it"""
+        if due_at is None:
+            escalation_rule = self.escalation_rules.get(alert.level, {})
+            due_at = alert.timestamp + timedelta(minutes=escalation_rule.get("escalation_time", 30))
         
-        await asyncio.sleep(escalation_time)
+        self.escalation_scheduler.schedule(alert.id, alert.level.value, due_at.timestamp(), alert)
+        if persist:
+            await asyncio.wrap_future(self.write_escalation(
+                self.escalation_store.save,
+                alert.id, alert.category.value, alert.level.value, alert.title, alert.message,
+                alert.source, alert.data, alert.timestamp, due_at
+            ))
+    
+    def write_escalation(self, method, *args) -> Future:
+        """Queue an escalation store write on the single writer thread"""
+        return self.escalation_writer.submit(method, *args)
+    
+    async def handle_escalation_due(self, alert: Alert):
+        """Escalation deadline reached: escalate if still unacknowledged and unresolved"""
+        if alert.acknowledged or alert.resolved:
+            await asyncio.wrap_future(self.write_escalation(self.escalation_store.mark, alert.id, "cancelled"))
+            return
+        await self.escalate_alert(alert)
+        await asyncio.wrap_future(self.write_escalation(self.escalation_store.mark, alert.id, "escalated"))
+    
+    async def replay_escalations(self) -> int:
+        """Reschedule escalations persisted before the last shutdown"""
+        pending = await asyncio.to_thread(self.escalation_store.load_pending)
+        for row in pending:
+            try:
+                alert = Alert(
+                    id=row["alert_id"],
+                    category=AlertCategory(row["category"]),
+                    level=AlertLevel(row["level"]),
+                    title=row["title"],
+                    message=row["message"] or "",
+                    timestamp=row["raised_at"],
+                    source=row["source"] or "real_time_monitoring",
+                    data=row["data"]
+                )
+            except ValueError as e:
+                self.logger.error(f"Skipping unreadable escalation {row['alert_id']}: {e}")
+                continue
+            self.alert_history.append(alert)
+            # Reopen it so the same condition is deduplicated instead of raising a second alert
+            condition = alert.data.get("condition") or {}
+            resource = condition.get("resource", condition.get("metric"))
+            if resource:
+                self.open_alerts[(alert.category.value, resource)] = alert
+            await self.schedule_escalation(alert, due_at=row["due_at"], persist=False)
         
-        # Check if alert is still active and unacknowledged
-        if not alert.acknowledged and not alert.resolved:
-            alert.escalated = True
-            await self.escalate_alert(alert)
+        if pending:
+            self.logger.info(f"Replayed {len(pending)} pending escalations")
+        return len(pending)
+    
+    def cancel_escalation(self, alert_id: str) -> bool:
+        """Cancel a pending escalation (O(1) on the scheduler, safe from worker threads)
+
+        The store update is queued on the writer thread rather than run here,
+        since callers include LangGraph nodes and the event loop itself.
+        """
+        if not self.escalation_scheduler.cancel(alert_id):
+            return False
+        self.write_escalation(self.escalation_store.mark, alert_id, "cancelled")
+        return True
+    
+    def acknowledge_alert(self, alert_id: str) -> bool:
+        """Acknowledge an alert and stop its escalation"""
+        alert = self.alert_history.get(alert_id)
+        if alert is None:
+            return False
+        alert.acknowledged = True
+        self.cancel_escalation(alert_id)
+        return True
+    
+    def resolve_alert(self, alert_id: str) -> bool:
+        """Resolve an alert and stop its escalation"""
+        alert = self.alert_history.get(alert_id)
+        if alert is None:
+            return False
+        alert.resolved = True
+        for key, open_alert in list(self.open_alerts.items()):
+            if open_alert.id == alert_id:
+                del self.open_alerts[key]
+        self.cancel_escalation(alert_id)
+        return True
+    
+    def get_escalation_status(self) -> Dict[str, Any]:
+        """Pending escalations by level plus scheduler counters"""
+        next_due = self.escalation_scheduler.next_due()
+        return {
+            "pending": len(self.escalation_scheduler),
+            "pending_by_level": self.escalation_scheduler.counts_by_level(),
+            "next_due": datetime.fromtimestamp(next_due).isoformat() if next_due else None,
+            "escalated": self.escalation_scheduler.fired,
+            "cancelled": self.escalation_scheduler.cancelled
+        }
     
     async def escalate_alert(self, alert: Alert):
         """Escalate unacknowledged alert"""
@@ -687,24 +1052,29 @@ class RealTimeMonitoringSystem:
         alert.escalated = True
     
     def store_historical_metrics(self, monitor_name: str, metrics: Dict):
-        """Store metrics for historical analysis"""
-        if monitor_name not in self.active_monitors:
-            self.active_monitors[monitor_name] = []
-        
-        # Add timestamp
-        metrics_with_timestamp = {
-            **metrics,
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        self.active_monitors[monitor_name].append(metrics_with_timestamp)
+        """Store metrics in the monitor's ring buffer (O(1); samples older than 24 hours are evicted)"""
+        history = self.active_monitors.get(monitor_name)
+        if history is None:
+            interval = self.monitoring_agents.get(monitor_name, {}).get("interval", 60)
+            history = self.active_monitors[monitor_name] = MetricRingBuffer(capacity_for(interval))
         
-        # Keep only recent history (last 24 hours)
-        cutoff_time = datetime.now() - timedelta(hours=24)
-        self.active_monitors[monitor_name] = [
-            m for m in self.active_monitors[monitor_name]
-            if datetime.fromisoformat(m["timestamp"]) > cutoff_time
-        ]
+        history.append(metrics, timestamp=datetime.now())
+    
+    @property
+    def active_alerts(self) -> Dict[str, Alert]:
+        """Unresolved alerts by id"""
+        return self.alert_history.active()
+    
+    def get_alert(self, alert_id: str) -> Optional[Alert]:
+        """Look up an alert by id"""
+        return self.alert_history.get(alert_id)
+    
+    def get_metric_statistics(self, monitor_name: str, metric: str, window_hours: float = 1) -> Dict[str, Any]:
+        """Window statistics for one monitored metric"""
+        history = self.active_monitors.get(monitor_name)
+        if history is None:
+            return {"metric": metric, "count": 0}
+        return history.window_stats(metric, seconds=window_hours * 3600)
     
     # Notification methods (placeholder implementations)
     async def send_email_notification(self, alert: Alert):
@@ -772,12 +1142,26 @@ class RealTimeMonitoringAgent:
                 "status": "operational",
                 "active_monitors": len(self.monitoring_system.active_monitors),
                 "active_alerts": len(self.monitoring_system.active_alerts),
+                "monitoring_stats": self.monitoring_system.get_monitoring_stats(),
+                "escalations": self.monitoring_system.get_escalation_status(),
                 "uptime": "operational",
                 "timestamp": datetime.now().isoformat()
             }
         except Exception as e:
             return {"status": "error", "error": str(e)}
     
+    def acknowledge_alert(self, alert_id: str) -> Dict[str, Any]:
+        """Acknowledge an alert, cancelling its pending escalation"""
+        if self.monitoring_system.acknowledge_alert(alert_id):
+            return {"status": "success", "alert_id": alert_id}
+        return {"status": "error", "alert_id": alert_id, "error": "Alert not found"}
+    
+    def resolve_alert(self, alert_id: str) -> Dict[str, Any]:
+        """Resolve an alert, cancelling its pending escalation"""
+        if self.monitoring_system.resolve_alert(alert_id):
+            return {"status": "success", "alert_id": alert_id}
+        return {"status": "error", "alert_id": alert_id, "error": "Alert not found"}
+    
     def get_active_alerts(self) -> List[Dict[str, Any]]:
         """Get all active alerts"""
         try:
@@ -8,6 +8,7 @@ from .base_agent import BaseAgent
 
 try:
     from database import Room, Bed, Patient, Department, SessionLocal
+    from bed_allocation import bed_allocator, allocate_bed
     DATABASE_AVAILABLE = True
 except ImportError:
     DATABASE_AVAILABLE = False
@@ -32,6 +33,7 @@ class RoomBedAgent(BaseAgent):
             "get_bed_by_id",
             "get_bed_by_number",
             "assign_bed_to_patient",
+            "allocate_bed",
             "discharge_bed",
             "update_bed_status"
         ]
@@ -370,36 +372,30 @@ class RoomBedAgent(BaseAgent):
         
         try:
             db = self.get_db_session()
-            bed = db.query(Bed).filter(Bed.id == uuid.UUID(bed_id)).first()
-            patient = db.query(Patient).filter(Patient.id == uuid.UUID(patient_id)).first()
-            
-            if not bed:
-                db.close()
-                return {"success": False, "message": "Bed not found"}
+            patient = db.query(Patient.id).filter(Patient.id == uuid.UUID(patient_id)).first()
             if not patient:
                 db.close()
                 return {"success": False, "message": "Patient not found"}
-            if bed.status != "available":
+            
+            # Conditional UPDATE ... WHERE status = 'available': only one concurrent caller can win
+            claimed = bed_allocator.claim_bed(db, bed_id, patient_id, admission_date)
+            if not claimed:
+                bed = db.query(Bed.status).filter(Bed.id == uuid.UUID(bed_id)).first()
+                db.rollback()
                 db.close()
+                if not bed:
+                    return {"success": False, "message": "Bed not found"}
                 return {"success": False, "message": f"Bed is not available (current status: {bed.status})"}
             
-            # Assign bed to patient
-            bed.patient_id = uuid.UUID(patient_id)
-            bed.status = "occupied"
-            if admission_date:
-                bed.admission_date = datetime.strptime(admission_date, "%Y-%m-%d").date()
-            else:
-                bed.admission_date = date.today()
-            
             db.commit()
-            db.refresh(bed)
+            bed = db.query(Bed).filter(Bed.id == uuid.UUID(bed_id)).first()
             result = self.serialize_model(bed)
             db.close()
             
             # Log the interaction (avoid accessing patient object after session close)
             self.log_interaction(
                 query=f"Assign bed {bed_id} to patient {patient_id}",
-                response=f"Bed {bed.bed_number} assigned to patient {patient_id}",
+                response=f"Bed {claimed['bed_number']} assigned to patient {patient_id}",
                 tool_used="assign_bed_to_patient"
             )
             
@@ -409,6 +405,42 @@ class RoomBedAgent(BaseAgent):
             db.close()
             return {"success": False, "message": f"Failed to assign bed: {str(e)}"}
 
+    def allocate_bed(self, patient_id: str, department_id: str = None, room_type: str = None,
+                     bed_type: str = None, isolation: bool = False,
+                     admission_date: str = None) -> Dict[str, Any]:
+        """Find and claim the first free bed matching the patient's needs in one atomic step."""
+        if not DATABASE_AVAILABLE:
+            return {"success": False, "message": "Database not available"}
+        
+        try:
+            db = self.get_db_session()
+            patient = db.query(Patient.id).filter(Patient.id == uuid.UUID(patient_id)).first()
+            if not patient:
+                db.close()
+                return {"success": False, "message": "Patient not found"}
+            
+            claimed = allocate_bed(db, patient_id, department_id=department_id, room_type=room_type,
+                                   bed_type=bed_type, isolation=isolation, admission_date=admission_date)
+            if not claimed:
+                db.rollback()
+                db.close()
+                return {"success": False, "message": "No available bed matches the requested criteria"}
+            
+            db.commit()
+            db.close()
+            
+            self.log_interaction(
+                query=f"Allocate bed for patient {patient_id}",
+                response=f"Bed {claimed['bed_number']} allocated to patient {patient_id}",
+                tool_used="allocate_bed"
+            )
+            
+            return {"success": True, "message": "Bed allocated successfully", "data": claimed}
+        except Exception as e:
+            db.rollback()
+            db.close()
+            return {"success": False, "message": f"Failed to allocate bed: {str(e)}"}
+
     def discharge_bed(self, bed_id: str, discharge_date: str = None) -> Dict[str, Any]:
         """Discharge a patient from a bed."""
         if not DATABASE_AVAILABLE:
@@ -495,6 +527,8 @@ class RoomBedAgent(BaseAgent):
             db.refresh(bed)
             result = self.serialize_model(bed)
             db.close()
+            if status == "available":
+                bed_allocator.index.invalidate()
             
             # Log the interaction
             self.log_interaction(
@@ -8,6 +8,7 @@ from .base_agent import BaseAgent
 
 try:
     from database import Staff, User, Department, SessionLocal
+    from search_service import search_service
     DATABASE_AVAILABLE = True
 except ImportError:
     DATABASE_AVAILABLE = False
@@ -57,7 +58,9 @@ class StaffAgent(BaseAgent):
             "update_staff",
             "delete_staff",
             "get_staff_by_department",
-            "update_staff_status"
+            "update_staff_status",
+            "resolve_staff_names",
+            "lookup_employee_ids"
         ]
     
     def get_capabilities(self) -> List[str]:
@@ -112,6 +115,7 @@ class StaffAgent(BaseAgent):
             user_username = user.username
             
             result = self.serialize_model(staff)
+            search_service.employee_ids.add(staff.employee_id, str(staff.id))
             db.close()
             
             # Add user data to result
@@ -349,6 +353,7 @@ class StaffAgent(BaseAgent):
             db.delete(staff)
             db.commit()
             db.close()
+            search_service.employee_ids.remove(employee_id)
             
             # Log the interaction
             self.log_interaction(
@@ -360,3 +365,33 @@ class StaffAgent(BaseAgent):
             return {"success": True, "message": "Staff deleted successfully"}
         except Exception as e:
             return {"success": False, "message": f"Failed to delete staff: {str(e)}"}
+
+    def resolve_staff_names(self, names: List[str], active_only: bool = True) -> Dict[str, Any]:
+        """Resolve many staff names to their best-matching staff member in one round trip.
+        
+        Args:
+            names: Staff names (first, last or full), e.g. ["Shamil", "Sarah Johnson"]
+            active_only: Only match staff with status "active"
+        """
+        if not DATABASE_AVAILABLE:
+            return {"error": "Database not available"}
+        
+        try:
+            db = self.get_db_session()
+            resolved = search_service.resolve_staff_names(db, names, active_only=active_only)
+            db.close()
+            
+            found = sum(1 for match in resolved.values() if match)
+            return {"data": resolved, "resolved_count": found, "unresolved": [n for n, m in resolved.items() if not m]}
+        except Exception as e:
+            return {"error": f"Failed to resolve staff names: {str(e)}"}
+
+    def lookup_employee_ids(self, prefix: str, limit: int = 10) -> Dict[str, Any]:
+        """Autocomplete employee IDs by prefix (e.g. "EMP0") from the in-memory index."""
+        if not DATABASE_AVAILABLE:
+            return {"error": "Database not available"}
+        
+        try:
+            return {"data": search_service.lookup_employee_ids(prefix, limit)}
+        except Exception as e:
+            return {"error": f"Failed to look up employee IDs: {str(e)}"}
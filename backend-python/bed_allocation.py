@@ -0,0 +1,345 @@
+"""
+Hospital Bed Allocation Engine
+==============================
+
+Contention-safe bed allocation for admissions and queue assignments:
+- A bed is selected and claimed in one statement: a conditional
+  ``UPDATE beds ... WHERE id = (SELECT ... FOR UPDATE SKIP LOCKED LIMIT 1)
+  AND status = 'available' RETURNING``, so two concurrent admissions can
+  never be handed the same bed and nobody waits on a bed someone else holds
+- Requests filter by department, room type, bed type and isolation needs
+  (isolation = an ``isolation`` room or a single-occupancy room)
+- An in-process availability index keyed by (department, room type, bed
+  type, isolation) makes candidate lookup a bucket read; the claim statement
+  only probes those primary keys, and falls back to the filtered query when
+  the index is stale
+- Claims run on the caller's session, so queue and turnover updates commit
+  atomically with the bed
+
+The index is a hint, never the source of truth: the UPDATE re-checks
+``status = 'available'`` and the index refreshes on a TTL or on a miss.
+
+Usage:
+    python bed_allocation.py --benchmark [--workers 16] [--claims 4]
+"""
+
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import Session
+
+from database import Bed, Room, SessionLocal
+
+
+AVAILABILITY_INDEX_TTL_SECONDS = 60
+CANDIDATE_BATCH = 16
+ISOLATION_ROOM_TYPE = "isolation"
+
+IndexKey = Tuple[Optional[str], str, str, bool]
+
+
+def _norm(value: Optional[str]) -> str:
+    return (value or "").strip().lower()
+
+
+def _as_uuid(value) -> Optional[uuid.UUID]:
+    if value is None or isinstance(value, uuid.UUID):
+        return value
+    return uuid.UUID(str(value))
+
+
+@dataclass(frozen=True)
+class BedCriteria:
+    """What an admission needs from a bed; ``None`` means any."""
+
+    department_id: Optional[str] = None
+    room_type: Optional[str] = None
+    bed_type: Optional[str] = None
+    isolation: bool = False
+
+    @classmethod
+    def from_request(cls, department_id: str = None, room_type: str = None,
+                     bed_type: str = None, isolation: bool = False) -> "BedCriteria":
+        return cls(
+            department_id=str(department_id) if department_id else None,
+            room_type=_norm(room_type) or None,
+            bed_type=_norm(bed_type) or None,
+            isolation=bool(isolation),
+        )
+
+    def matches(self, key: IndexKey) -> bool:
+        department_id, room_type, bed_type, isolation_capable = key
+        return ((self.department_id is None or self.department_id == department_id)
+                and (self.room_type is None or self.room_type == room_type)
+                and (self.bed_type is None or self.bed_type == bed_type)
+                and (not self.isolation or isolation_capable))
+
+    def apply(self, query):
+        """Add these filters to a select already joined to Room."""
+        if self.department_id:
+            query = query.where(Room.department_id == _as_uuid(self.department_id))
+        if self.room_type:
+            query = query.where(func.lower(Room.room_type) == self.room_type)
+        if self.bed_type:
+            query = query.where(func.lower(Bed.bed_type) == self.bed_type)
+        if self.isolation:
+            query = query.where(_isolation_capable())
+        return query
+
+
+def _isolation_capable():
+    return or_(func.lower(Room.room_type) == ISOLATION_ROOM_TYPE, Room.capacity == 1)
+
+
+class BedAvailabilityIndex:
+    """Available bed ids bucketed by (department, room type, bed type, isolation)."""
+
+    def __init__(self, ttl_seconds: int = AVAILABILITY_INDEX_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._buckets: Dict[IndexKey, Dict[uuid.UUID, None]] = {}
+        self._bed_keys: Dict[uuid.UUID, IndexKey] = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = 0.0
+
+    def _load(self, db: Session):
+        rows = db.execute(
+            select(Bed.id, Room.department_id, Room.room_type, Bed.bed_type, _isolation_capable())
+            .join(Room, Room.id == Bed.room_id)
+            .where(Bed.status == "available")
+            .order_by(Room.room_number, Bed.bed_number)
+        ).all()
+        buckets: Dict[IndexKey, Dict[uuid.UUID, None]] = {}
+        bed_keys: Dict[uuid.UUID, IndexKey] = {}
+        for bed_id, department_id, room_type, bed_type, isolation_capable in rows:
+            key = (str(department_id) if department_id else None, _norm(room_type), _norm(bed_type),
+                   bool(isolation_capable))
+            buckets.setdefault(key, {})[bed_id] = None
+            bed_keys[bed_id] = key
+        self._buckets, self._bed_keys = buckets, bed_keys
+        self._loaded_at = time.monotonic()
+
+    def candidates(self, db: Session, criteria: BedCriteria, limit: int) -> List[uuid.UUID]:
+        """Up to ``limit`` bed ids believed available for the criteria."""
+        with self._lock:
+            if time.monotonic() - self._loaded_at > self.ttl_seconds:
+                self._load(db)
+            found: List[uuid.UUID] = []
+            # Buckets are few (departments x room types x bed types), so matching keys is cheap
+            for key, beds in self._buckets.items():
+                if criteria.matches(key):
+                    for bed_id in beds:
+                        found.append(bed_id)
+                        if len(found) >= limit:
+                            return found
+            return found
+
+    def discard(self, bed_ids: Iterable[uuid.UUID]):
+        with self._lock:
+            for bed_id in bed_ids:
+                key = self._bed_keys.pop(bed_id, None)
+                if key is not None:
+                    self._buckets[key].pop(bed_id, None)
+
+    def size(self) -> int:
+        return len(self._bed_keys)
+
+
+class BedAllocator:
+    """Selects and claims beds atomically on the caller's session (caller commits)."""
+
+    def __init__(self, candidate_batch: int = CANDIDATE_BATCH,
+                 index_ttl_seconds: int = AVAILABILITY_INDEX_TTL_SECONDS):
+        self.candidate_batch = candidate_batch
+        self.index = BedAvailabilityIndex(index_ttl_seconds)
+        self.stats = {"index_hits": 0, "fallback_claims": 0, "no_bed": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    @staticmethod
+    def _claim_values(patient_id, admission_date) -> Dict[str, Any]:
+        if isinstance(admission_date, str):
+            admission_date = datetime.strptime(admission_date, "%Y-%m-%d")
+        return {
+            "status": "occupied",
+            "patient_id": _as_uuid(patient_id),
+            "admission_date": admission_date or date.today(),
+            "updated_at": func.now(),
+        }
+
+    def _claim_statement(self, criteria: BedCriteria, values: Dict[str, Any],
+                         candidate_ids: List[uuid.UUID] = None):
+        pick = select(Bed.id).join(Room, Room.id == Bed.room_id).where(Bed.status == "available")
+        pick = criteria.apply(pick)
+        if candidate_ids:
+            pick = pick.where(Bed.id.in_(candidate_ids))
+        pick = (pick.order_by(Room.room_number, Bed.bed_number)
+                .limit(1)
+                .with_for_update(of=Bed, skip_locked=True))
+        return (update(Bed)
+                .where(Bed.id == pick.scalar_subquery(), Bed.status == "available")
+                .values(**values)
+                .returning(Bed.id, Bed.bed_number, Bed.room_id))
+
+    @staticmethod
+    def _claimed(row) -> Dict[str, Any]:
+        return {"bed_id": str(row.id), "bed_number": row.bed_number, "room_id": str(row.room_id)}
+
+    def claim(self, db: Session, patient_id, criteria: BedCriteria = None,
+              admission_date=None) -> Optional[Dict[str, Any]]:
+        """Claim the first free bed matching ``criteria`` for a patient; None when none is free."""
+        criteria = criteria or BedCriteria()
+        values = self._claim_values(patient_id, admission_date)
+        options = {"synchronize_session": False}
+
+        candidates = self.index.candidates(db, criteria, self.candidate_batch)
+        if candidates:
+            row = db.execute(self._claim_statement(criteria, values, candidates),
+                             execution_options=options).first()
+            if row:
+                self.index.discard([row.id])
+                self._count("index_hits")
+                return self._claimed(row)
+            # Every candidate was taken or locked; drop them until the next refresh
+            self.index.discard(candidates)
+
+        row = db.execute(self._claim_statement(criteria, values), execution_options=options).first()
+        if row:
+            # Found a bed the index did not know about, so it is out of date
+            self.index.invalidate()
+            self._count("fallback_claims")
+            return self._claimed(row)
+        self._count("no_bed")
+        return None
+
+    def claim_bed(self, db: Session, bed_id, patient_id, admission_date=None) -> Optional[Dict[str, Any]]:
+        """Claim a specific bed if it is still available; None if someone else has it."""
+        row = db.execute(
+            update(Bed)
+            .where(Bed.id == _as_uuid(bed_id), Bed.status == "available")
+            .values(**self._claim_values(patient_id, admission_date))
+            .returning(Bed.id, Bed.bed_number, Bed.room_id),
+            execution_options={"synchronize_session": False},
+        ).first()
+        if row:
+            self.index.discard([row.id])
+            return self._claimed(row)
+        return None
+
+    def release(self, db: Session, bed_id, patient_id) -> bool:
+        """Undo a claim: free the bed if it is still held for this patient (caller commits)."""
+        row = db.execute(
+            update(Bed)
+            .where(Bed.id == _as_uuid(bed_id), Bed.patient_id == _as_uuid(patient_id), Bed.status == "occupied")
+            .values(status="available", patient_id=None, admission_date=None, updated_at=func.now())
+            .returning(Bed.id),
+            execution_options={"synchronize_session": False},
+        ).first()
+        if row:
+            self.index.invalidate()
+        return row is not None
+
+    def peek(self, db: Session, criteria: BedCriteria = None) -> Optional[str]:
+        """A bed id that looks available, without claiming it."""
+        candidates = self.index.candidates(db, criteria or BedCriteria(), 1)
+        return str(candidates[0]) if candidates else None
+
+
+# Global allocator shared by agents and workflows
+bed_allocator = BedAllocator()
+
+
+def allocate_bed(db: Session, patient_id, department_id: str = None, room_type: str = None,
+                 bed_type: str = None, isolation: bool = False, admission_date=None) -> Optional[Dict[str, Any]]:
+    """Convenience wrapper around the global allocator."""
+    criteria = BedCriteria.from_request(department_id, room_type, bed_type, isolation)
+    return bed_allocator.claim(db, patient_id, criteria, admission_date)
+
+
+def run_benchmark(workers: int = 16, claims_per_worker: int = 4):
+    """Parallel admissions against the live beds table; every transaction is rolled back.
+
+    Each worker claims beds in its own transaction and holds them until all
+    workers are done, so any double assignment would show up as the same bed
+    id held by two open transactions.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    allocator = BedAllocator()
+    barrier = threading.Barrier(workers)
+    latencies: List[float] = []
+    latency_lock = threading.Lock()
+
+    def worker(_):
+        db = SessionLocal()
+        claimed = []
+        try:
+            for _ in range(claims_per_worker):
+                started = time.perf_counter()
+                result = allocator.claim(db, None)
+                elapsed = (time.perf_counter() - started) * 1000
+                with latency_lock:
+                    latencies.append(elapsed)
+                if result:
+                    claimed.append(result["bed_id"])
+            barrier.wait(timeout=60)
+            return claimed
+        finally:
+            db.rollback()
+            db.close()
+
+    db = SessionLocal()
+    try:
+        available = db.query(func.count(Bed.id)).filter(Bed.status == "available").scalar()
+        started = time.perf_counter()
+        db.query(Bed).filter(Bed.status == "available").all()
+        legacy_ms = (time.perf_counter() - started) * 1000
+    finally:
+        db.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(worker, range(workers)))
+    wall = time.perf_counter() - started
+
+    all_claims = [bed for claimed in results for bed in claimed]
+    duplicates = len(all_claims) - len(set(all_claims))
+    latencies.sort()
+    print(f"Available beds: {available}; attempted claims: {workers * claims_per_worker}")
+    print(f"Claimed: {len(all_claims)} distinct: {len(set(all_claims))} double assignments: {duplicates}")
+    if latencies:
+        print(f"Claim latency p50 {latencies[len(latencies) // 2]:.2f} ms, "
+              f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.2f} ms; wall {wall * 1000:.0f} ms")
+    print(f"Legacy full available-bed load: {legacy_ms:.2f} ms per admission")
+    print(f"Allocator stats: {allocator.stats}")
+    if duplicates:
+        print("❌ Double assignments detected")
+    else:
+        print("✅ Zero double assignments under parallel admissions")
+    return duplicates == 0
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Bed allocation engine")
+    parser.add_argument("--benchmark", action="store_true", help="Run the parallel admission benchmark")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--claims", type=int, default=4, help="Claims per worker")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        sys.exit(0 if run_benchmark(args.workers, args.claims) else 1)
+    parser.print_help()
@@ -0,0 +1,234 @@
+"""
+Bed Turnover Sweeper
+====================
+
+Set-based promotion of beds whose cleaning has finished:
+- Expired cleanings (``cleaning_start_time + estimated_cleaning_duration``
+  has passed) are completed and their beds made available in one
+  ``WITH ... UPDATE ... FROM ... RETURNING`` statement
+- Orphaned beds (status ``cleaning`` with no active turnover) are fixed in
+  a second ``UPDATE ... FROM ... RETURNING``
+- Both run in one transaction, so the sweep costs the same two round trips
+  for ten beds or ten thousand; elapsed time is computed in SQL from the
+  full interval, not ``timedelta.seconds`` (which wrapped after a day)
+- Every changed bed is returned as a delta row, and ``TurnoverSweeper``
+  runs the sweep on a schedule and keeps the last result
+
+Usage:
+    python bed_turnover_sweeper.py              # run one sweep and print the changed beds
+    python bed_turnover_sweeper.py --benchmark  # round trips at 1k/5k beds (rolled back)
+"""
+
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, engine
+
+
+DEFAULT_CLEANING_MINUTES = 45
+SWEEP_INTERVAL_SECONDS = int(os.getenv("BED_SWEEP_INTERVAL_SECONDS", "60"))
+
+_PROMOTE_EXPIRED_SQL = text("""
+    WITH expired AS (
+        SELECT t.id AS turnover_id, t.bed_id,
+               FLOOR(EXTRACT(EPOCH FROM (:now - t.cleaning_start_time)) / 60)::int AS elapsed_minutes,
+               COALESCE(t.estimated_cleaning_duration, :default_minutes) AS estimated_duration
+        FROM bed_turnovers t
+        JOIN beds b ON b.id = t.bed_id
+        WHERE t.status = 'cleaning'
+          AND t.cleaning_start_time IS NOT NULL
+          AND b.status = 'cleaning'
+          AND t.cleaning_start_time
+              + make_interval(mins => COALESCE(t.estimated_cleaning_duration, :default_minutes)) <= :now
+        FOR UPDATE OF t, b SKIP LOCKED
+    ), completed AS (
+        UPDATE bed_turnovers t
+        SET status = 'completed', cleaning_end_time = :now, updated_at = :now
+        FROM expired e
+        WHERE t.id = e.turnover_id
+        RETURNING t.id
+    )
+    UPDATE beds b
+    SET status = 'available', updated_at = :now
+    FROM expired e, rooms r
+    WHERE b.id = e.bed_id AND r.id = b.room_id
+    RETURNING b.id AS bed_id, b.bed_number, r.room_number, r.department_id,
+              e.elapsed_minutes, e.estimated_duration
+""")
+
+_FIX_ORPHANED_SQL = text("""
+    UPDATE beds b
+    SET status = 'available', updated_at = :now
+    FROM rooms r
+    WHERE r.id = b.room_id
+      AND b.status = 'cleaning'
+      AND NOT EXISTS (
+          SELECT 1 FROM bed_turnovers t
+          WHERE t.bed_id = b.id AND t.status IN ('cleaning', 'initiated')
+      )
+    RETURNING b.id AS bed_id, b.bed_number, r.room_number, r.department_id
+""")
+
+
+def _delta(row, reason: str, now: datetime) -> Dict[str, Any]:
+    change = {
+        "bed_id": str(row.bed_id),
+        "bed_number": row.bed_number,
+        "room_number": row.room_number,
+        "department_id": str(row.department_id) if row.department_id else None,
+        "old_status": "cleaning",
+        "new_status": "available",
+        "reason": reason,
+        "updated_at": now.isoformat(),
+    }
+    if reason == "cleaning_completed":
+        change["elapsed_minutes"] = row.elapsed_minutes
+        change["estimated_duration"] = row.estimated_duration
+    return change
+
+
+def sweep_expired_cleanings(db: Session, now: datetime = None) -> List[Dict[str, Any]]:
+    """Promote expired cleanings and orphaned cleaning beds; caller commits.
+
+    Returns one delta row per bed that changed.
+    """
+    now = now or datetime.now()
+    params = {"now": now, "default_minutes": DEFAULT_CLEANING_MINUTES}
+    changed = [_delta(row, "cleaning_completed", now)
+               for row in db.execute(_PROMOTE_EXPIRED_SQL, params)]
+    changed += [_delta(row, "orphaned_cleaning_status", now)
+                for row in db.execute(_FIX_ORPHANED_SQL, {"now": now})]
+    return changed
+
+
+def run_sweep(session_factory=SessionLocal) -> Dict[str, Any]:
+    """One sweep in its own transaction, in the tool result format."""
+    db = session_factory()
+    now = datetime.now()
+    try:
+        changed = sweep_expired_cleanings(db, now)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        return {"success": False, "message": str(e)}
+    finally:
+        db.close()
+
+    if changed:
+        # Newly available beds must be visible to the allocator immediately
+        from bed_allocation import bed_allocator
+        bed_allocator.index.invalidate()
+
+    return {
+        "success": True,
+        "updated_count": len(changed),
+        "updated_beds": changed,
+        "timestamp": now.isoformat(),
+        "message": f"Auto-updated {len(changed)} beds from cleaning to available status",
+    }
+
+
+class TurnoverSweeper:
+    """Runs ``run_sweep`` every ``interval_seconds`` on a daemon thread."""
+
+    def __init__(self, interval_seconds: int = SWEEP_INTERVAL_SECONDS):
+        self.interval_seconds = interval_seconds
+        self.last_result: Optional[Dict[str, Any]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sweep_once(self) -> Dict[str, Any]:
+        result = run_sweep()
+        self.last_result = result
+        if result.get("success") and result["updated_beds"]:
+            for bed in result["updated_beds"]:
+                print(f"🔄 Bed {bed['bed_number']} cleaning -> available ({bed['reason']})")
+        elif not result.get("success"):
+            print(f"⚠️ Bed turnover sweep failed: {result.get('message')}")
+        return result
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            self.sweep_once()
+
+    def start(self):
+        if self.interval_seconds <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="bed-turnover-sweeper", daemon=True)
+        self._thread.start()
+        print(f"🧹 Bed turnover sweeper running every {self.interval_seconds}s")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+
+# Global sweeper started by the MCP server
+turnover_sweeper = TurnoverSweeper()
+
+
+def run_benchmark(sizes=(1000, 5000)):
+    """Seed N cleaning beds inside a transaction, sweep, count statements, roll back."""
+    import time
+    import uuid
+
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for size in sizes:
+        db = SessionLocal()
+        try:
+            department_id = db.execute(text("SELECT id FROM departments LIMIT 1")).scalar()
+            room_id = uuid.uuid4()
+            db.execute(text("INSERT INTO rooms (id, room_number, department_id, capacity, status) "
+                            "VALUES (:id, :number, :dept, :size, 'available')"),
+                       {"id": room_id, "number": f"SWEEP{size}", "dept": department_id, "size": size})
+            bed_ids = [uuid.uuid4() for _ in range(size)]
+            db.execute(text("INSERT INTO beds (id, bed_number, room_id, status) "
+                            "SELECT id, 'S' || ord, :room, 'cleaning' "
+                            "FROM unnest(CAST(:ids AS uuid[])) WITH ORDINALITY AS s(id, ord)"),
+                       {"room": room_id, "ids": bed_ids})
+            # Three quarters expired, the rest still cleaning (half of those orphaned)
+            db.execute(text("""
+                INSERT INTO bed_turnovers (id, bed_id, status, discharge_time, cleaning_start_time,
+                                           estimated_cleaning_duration)
+                SELECT gen_random_uuid(), id, 'cleaning', now(),
+                       now() - CASE WHEN ord % 4 = 0 THEN interval '5 minutes' ELSE interval '2 days' END, 30
+                FROM unnest(CAST(:ids AS uuid[])) WITH ORDINALITY AS s(id, ord)
+                WHERE ord % 8 <> 0
+            """), {"ids": bed_ids})
+
+            statements.clear()
+            event.listen(engine, "before_cursor_execute", count_statement)
+            started = time.perf_counter()
+            changed = sweep_expired_cleanings(db)
+            elapsed = (time.perf_counter() - started) * 1000
+            event.remove(engine, "before_cursor_execute", count_statement)
+
+            expired = sum(1 for c in changed if c["reason"] == "cleaning_completed")
+            print(f"{size} cleaning beds: {len(changed)} promoted ({expired} expired, "
+                  f"{len(changed) - expired} orphaned) in {len(statements)} round trips, {elapsed:.1f} ms")
+        except Exception as e:
+            print(f"⚠️ Sweep benchmark skipped: {e}")
+        finally:
+            db.rollback()
+            db.close()
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    if "--benchmark" in sys.argv:
+        run_benchmark()
+    else:
+        print(json.dumps(run_sweep(), indent=2, default=str))
@@ -7,6 +7,8 @@ import asyncio
 import json
 import traceback
 import os
+import time
+from collections.abc import Mapping
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 from datetime import datetime, date, timedelta
@@ -15,11 +17,48 @@ import random
 import re
 from dotenv import load_dotenv
 import google.generativeai as genai
+from tool_batch import SingleFlight, is_read_only
 
 # Load environment variables
 load_dotenv()
 
 
+class ToolResult(Mapping):
+    """A tool response that is parsed from JSON the first time it is read."""
+
+    def __init__(self, tool_name, response_text):
+        self.tool_name = tool_name
+        self.response_text = response_text
+        self._parsed = None
+
+    @property
+    def data(self):
+        if self._parsed is None:
+            if not self.response_text.strip():
+                print(f"⚠️ Tool {self.tool_name} returned empty text")
+                self._parsed = {"success": False, "message": "Empty response text"}
+            else:
+                try:
+                    parsed = json.loads(self.response_text)
+                    self._parsed = parsed if isinstance(parsed, dict) else {"result": parsed}
+                except json.JSONDecodeError as json_error:
+                    print(f"⚠️ JSON parsing failed for {self.tool_name}: {json_error}")
+                    self._parsed = {"success": False, "message": f"Invalid JSON response: {self.response_text[:100]}"}
+        return self._parsed
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return repr(self.data)
+
+
 class HospitalManagementClient:
     def __init__(self):
         self.session = None
@@ -27,6 +66,11 @@ class HospitalManagementClient:
         self.agent_memory = {}  # Store agent context and decisions
         self.available_tools = []
         self.llm_model = None
+        # Concurrent tool calls share the one MCP session, at most this many in flight
+        self.max_concurrency = int(os.getenv("MCP_CLIENT_CONCURRENCY", "8"))
+        self.verbose = os.getenv("MCP_CLIENT_VERBOSE", "").lower() in ("1", "true", "yes")
+        self._call_semaphore = None
+        self._inflight_reads = SingleFlight()
         self._initialize_llm()
         
     def _initialize_llm(self):
@@ -129,9 +173,11 @@ class HospitalManagementClient:
                 return f"Found {len(equipment)} equipment items in the system"
                 
             elif any(word in query_lower for word in ["supplies", "inventory", "stock"]):
-                result = await self._safe_call_tool("list_supplies", {})
+                result, low_stock = await asyncio.gather(
+                    self._safe_call_tool("list_supplies", {}),
+                    self._safe_call_tool("list_supplies", {"low_stock_only": True})
+                )
                 supplies = result.get("supplies", [])
-                low_stock = await self._safe_call_tool("list_supplies", {"low_stock_only": True})
                 low_count = len(low_stock.get("supplies", []))
                 return f"Inventory: {len(supplies)} total items, {low_count} items need restocking"
                 
@@ -221,14 +267,18 @@ class HospitalManagementClient:
         """Analyze current hospital state and identify optimization opportunities."""
         print("\n🧠 === AGENTIC AI ANALYSIS ===")
         
-        # Gather comprehensive hospital data
-        users = await self._safe_call_tool("list_users", {})
-        departments = await self._safe_call_tool("list_departments", {})
-        patients = await self._safe_call_tool("list_patients", {})
-        beds = await self._safe_call_tool("list_beds", {})
-        equipment = await self._safe_call_tool("list_equipment", {})
-        supplies = await self._safe_call_tool("list_supplies", {})
-        low_stock = await self._safe_call_tool("list_supplies", {"low_stock_only": True})
+        # Gather comprehensive hospital data (independent calls, issued together)
+        data = await self._gather_tools({
+            "users": ("list_users", {}),
+            "departments": ("list_departments", {}),
+            "patients": ("list_patients", {}),
+            "beds": ("list_beds", {}),
+            "equipment": ("list_equipment", {}),
+            "supplies": ("list_supplies", {}),
+            "low_stock": ("list_supplies", {"low_stock_only": True}),
+        }, label="State analysis")
+        users, departments, patients = data["users"], data["departments"], data["patients"]
+        beds, equipment, low_stock = data["beds"], data["equipment"], data["low_stock"]
         
         # Analyze data and make intelligent decisions
         analysis = {
@@ -273,12 +323,13 @@ class HospitalManagementClient:
             self._patient_flow_optimization
         ]
         
-        for task in management_tasks:
-            try:
-                await task()
-                await asyncio.sleep(0.5)  # Pause between tasks
-            except Exception as e:
-                print(f"⚠️ Task {task.__name__} failed: {e}")
+        # The tasks only read, so they run together; shared reads are fetched once
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(task() for task in management_tasks), return_exceptions=True)
+        for task, outcome in zip(management_tasks, outcomes):
+            if isinstance(outcome, Exception):
+                print(f"⚠️ Task {task.__name__} failed: {outcome}")
+        print(f"⏱️ Management cycle: {len(management_tasks)} tasks in {(time.perf_counter() - started) * 1000:.0f} ms")
         
         # Log agent activities
         await self._log_agent_activities()
@@ -315,17 +366,16 @@ class HospitalManagementClient:
         """Optimize hospital resources using AI algorithms."""
         print("\n⚡ === SMART RESOURCE OPTIMIZATION ===")
         
-        # Bed optimization
-        bed_recommendations = await self._optimize_bed_distribution()
-        
-        # Equipment optimization
-        equipment_optimization = await self._optimize_equipment_allocation()
-        
-        # Supply chain optimization
-        supply_optimization = await self._optimize_supply_chain()
-        
-        # Staff optimization
-        staff_optimization = await self._optimize_staff_allocation()
+        # Bed, equipment, supply chain and staff optimization are independent
+        started = time.perf_counter()
+        (bed_recommendations, equipment_optimization,
+         supply_optimization, staff_optimization) = await asyncio.gather(
+            self._optimize_bed_distribution(),
+            self._optimize_equipment_allocation(),
+            self._optimize_supply_chain(),
+            self._optimize_staff_allocation()
+        )
+        print(f"⏱️ Optimization: 4 analyses in {(time.perf_counter() - started) * 1000:.0f} ms")
         
         optimization_report = {
             "beds": bed_recommendations,
@@ -341,36 +391,54 @@ class HospitalManagementClient:
     # === INTELLIGENT HELPER METHODS ===
     
     async def _safe_call_tool(self, tool_name, params):
-        """Safely call MCP tool with error handling."""
+        """Safely call MCP tool with error handling; identical in-flight read calls share one request."""
+        if is_read_only(tool_name):
+            key = (tool_name, json.dumps(params, sort_keys=True, default=str))
+            return await self._inflight_reads.do(key, lambda: self._call_tool(tool_name, params))
+        return await self._call_tool(tool_name, params)
+    
+    async def _call_tool(self, tool_name, params):
+        """Call one tool on the shared session, bounded by the concurrency cap."""
+        if self._call_semaphore is None:
+            self._call_semaphore = asyncio.Semaphore(self.max_concurrency)
+        started = time.perf_counter()
         try:
-            print(f"🔧 Calling tool: {tool_name} with params: {params}")
-            result = await self.session.call_tool(tool_name, params)
+            async with self._call_semaphore:
+                result = await self.session.call_tool(tool_name, params)
             
             if not result.content:
                 print(f"⚠️ Tool {tool_name} returned empty content")
                 return {"success": False, "message": "Empty response from server"}
             
-            response_text = result.content[0].text
-            print(f"📄 Raw response: {response_text[:200]}...")
-            
-            if not response_text.strip():
-                print(f"⚠️ Tool {tool_name} returned empty text")
-                return {"success": False, "message": "Empty response text"}
-            
-            try:
-                parsed_result = json.loads(response_text)
-                print(f"✅ Parsed result: {parsed_result}")
-                return parsed_result
-            except json.JSONDecodeError as json_error:
-                print(f"⚠️ JSON parsing failed for {tool_name}: {json_error}")
-                print(f"🔍 Response text: '{response_text}'")
-                return {"success": False, "message": f"Invalid JSON response: {response_text[:100]}"}
+            return ToolResult(tool_name, result.content[0].text)
                 
         except Exception as e:
             print(f"⚠️ Tool {tool_name} failed with exception: {e}")
-            import traceback
-            traceback.print_exc()
+            if self.verbose:
+                traceback.print_exc()
             return {"success": False, "message": str(e)}
+        finally:
+            if self.verbose:
+                print(f"🔧 {tool_name} {params} {(time.perf_counter() - started) * 1000:.1f} ms")
+    
+    async def _gather_tools(self, calls, label="Tool calls"):
+        """Issue independent tool calls concurrently; ``{key: (tool, params)}`` -> ``{key: result}``.
+        
+        Prints per-call latency, so the wall time can be compared with the sum of the calls.
+        """
+        async def timed(key, tool_name, params):
+            started = time.perf_counter()
+            result = await self._safe_call_tool(tool_name, params)
+            return key, result, (time.perf_counter() - started) * 1000
+        
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(timed(key, tool, params) for key, (tool, params) in calls.items()))
+        wall_ms = (time.perf_counter() - started) * 1000
+        
+        latencies = ", ".join(f"{calls[key][0]} {ms:.0f}" for key, _, ms in outcomes)
+        print(f"⏱️ {label}: {len(outcomes)} calls in {wall_ms:.0f} ms "
+              f"(sum {sum(ms for _, _, ms in outcomes):.0f} ms; {latencies} ms)")
+        return {key: result for key, result, _ in outcomes}
     
     def _calculate_bed_occupancy(self, beds_data):
         """Calculate bed occupancy statistics."""
@@ -437,8 +505,10 @@ class HospitalManagementClient:
         """Intelligently manage bed allocation."""
         print("🛏️  Managing bed allocation...")
         
-        beds = await self._safe_call_tool("list_beds", {})
-        patients = await self._safe_call_tool("list_patients", {})
+        beds, patients = await asyncio.gather(
+            self._safe_call_tool("list_beds", {}),
+            self._safe_call_tool("list_patients", {})
+        )
         
         # Find unassigned patients and available beds
         available_beds = [b for b in beds.get("beds", []) if b.get("status") == "available"]
@@ -524,8 +594,10 @@ class HospitalManagementClient:
     
     async def _optimize_bed_distribution(self):
         """Optimize bed distribution across departments."""
-        beds = await self._safe_call_tool("list_beds", {})
-        departments = await self._safe_call_tool("list_departments", {})
+        beds, departments = await asyncio.gather(
+            self._safe_call_tool("list_beds", {}),
+            self._safe_call_tool("list_departments", {})
+        )
         
         # Analyze bed distribution and recommend changes
         return {"status": "analyzed", "recommendations": ["Balanced distribution"]}
@@ -1266,9 +1338,12 @@ class HospitalManagementClient:
         print("\n📊 === MASTER DATA SUMMARY ===")
         
         # Get all master data
-        users = await self._safe_call_tool("list_users", {})
-        departments = await self._safe_call_tool("list_departments", {})
-        rooms = await self._safe_call_tool("list_rooms", {})
+        data = await self._gather_tools({
+            "users": ("list_users", {}),
+            "departments": ("list_departments", {}),
+            "rooms": ("list_rooms", {}),
+        }, label="Master data")
+        users, departments, rooms = data["users"], data["departments"], data["rooms"]
         
         print(f"\n👥 Users: {len(users.get('users', []))}")
         if users.get("users"):
@@ -0,0 +1,300 @@
+"""
+Discharge Report Data Loader
+============================
+
+Loads every clinical section a discharge report needs for one or many
+hospital stays in a handful of batched queries:
+
+- Treatments (with prescribing doctor), equipment usage (with equipment,
+  category and operator), supply usage (with supply, category, prescriber
+  and administrator) and staff assignments (with staff user and department)
+- One query per section for all requested stays, instead of one query per
+  section per patient plus lazy loads per row
+- Optional "most recent N" fallback, fetched in one windowed query only for
+  the stays whose in-stay window came back empty
+- Results are plain dictionaries, so report builders never touch lazy
+  relationships and the session can be closed as soon as loading finishes
+"""
+
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, case, func, or_
+from sqlalchemy.orm import Session, aliased
+
+from database import (
+    Department, Equipment, EquipmentCategory, EquipmentUsage, PatientSupplyUsage,
+    Staff, StaffAssignment, Supply, SupplyCategory, TreatmentRecord, User
+)
+
+PROCEDURE_TYPES = ("procedure", "surgery", "therapy")
+MEDICATION_CATEGORY_KEYWORDS = ("medication", "drug", "pharmaceutical", "medicine")
+
+
+def is_medication_category(category_name: Optional[str]) -> bool:
+    """Return True when a supply category name describes a medication."""
+    name = (category_name or "").lower()
+    return any(keyword in name for keyword in MEDICATION_CATEGORY_KEYWORDS)
+
+
+@dataclass
+class StayWindow:
+    """A single patient stay to load report sections for."""
+
+    key: str
+    patient_id: uuid.UUID
+    admission_date: datetime
+    discharge_date: datetime
+
+
+@dataclass
+class StaySections:
+    """Plain-row report sections for one stay.
+
+    ``recent_*`` lists are only populated when the loader was asked for a
+    fallback and the matching in-stay list is empty.
+    """
+
+    treatments: List[Dict[str, Any]] = field(default_factory=list)
+    equipment_usage: List[Dict[str, Any]] = field(default_factory=list)
+    supply_usage: List[Dict[str, Any]] = field(default_factory=list)
+    staff_assignments: List[Dict[str, Any]] = field(default_factory=list)
+    recent_treatments: List[Dict[str, Any]] = field(default_factory=list)
+    recent_equipment_usage: List[Dict[str, Any]] = field(default_factory=list)
+    recent_supply_usage: List[Dict[str, Any]] = field(default_factory=list)
+
+    def treatments_of(self, types: Iterable[str], recent_limit: int = 0) -> List[Dict[str, Any]]:
+        """In-stay treatments of the given types, falling back to the most recent ones."""
+        types = set(types)
+        rows = [t for t in self.treatments if t["treatment_type"] in types]
+        if rows or not recent_limit:
+            return rows
+        return [t for t in self.recent_treatments if t["treatment_type"] in types][:recent_limit]
+
+
+class DischargeReportDataLoader:
+    """Batch loader for discharge report sections."""
+
+    def __init__(self, padding: timedelta = timedelta(days=1), recent_fallback: int = 10):
+        # padding widens the treatment/equipment/supply windows on both sides;
+        # recent_fallback=0 disables the "most recent records" fallback
+        self.padding = padding
+        self.recent_fallback = recent_fallback
+
+    def load(self, db: Session, stays: List[StayWindow]) -> Dict[str, StaySections]:
+        """Load all sections for ``stays`` and return them keyed by ``StayWindow.key``."""
+        sections = {stay.key: StaySections() for stay in stays}
+        if not stays:
+            return sections
+
+        self._load_treatments(db, stays, sections)
+        self._load_equipment_usage(db, stays, sections)
+        self._load_supply_usage(db, stays, sections)
+        self._load_staff_assignments(db, stays, sections)
+        return sections
+
+    # ---- window helpers ----
+
+    def _padded(self, stay: StayWindow):
+        return stay.admission_date - self.padding, stay.discharge_date + self.padding
+
+    def _window_clause(self, patient_col, time_col, stays: List[StayWindow]):
+        return or_(*[
+            and_(patient_col == stay.patient_id,
+                 time_col >= self._padded(stay)[0],
+                 time_col <= self._padded(stay)[1])
+            for stay in stays
+        ])
+
+    def _distribute(self, rows, stays, sections, attr, time_key):
+        """Assign each row to every stay of its patient whose padded window covers it."""
+        by_patient = defaultdict(list)
+        for stay in stays:
+            by_patient[stay.patient_id].append(stay)
+        for row in rows:
+            for stay in by_patient.get(row["patient_id"], []):
+                start, end = self._padded(stay)
+                ts = row[time_key]
+                if ts is not None and start <= ts <= end:
+                    getattr(sections[stay.key], attr).append(row)
+
+    def _distribute_recent(self, rows, stays, sections, attr, needed):
+        for stay in stays:
+            if stay.key not in needed:
+                continue
+            target = getattr(sections[stay.key], attr)
+            target.extend(row for row in rows if row["patient_id"] == stay.patient_id)
+
+    @staticmethod
+    def _ranked(query, partition_cols, order_col, limit):
+        """Wrap ``query`` so only the top ``limit`` rows per partition are returned."""
+        rank = func.row_number().over(partition_by=partition_cols, order_by=order_col.desc()).label("rn")
+        subq = query.add_columns(rank).subquery()
+        return subq, subq.c.rn <= limit
+
+    @staticmethod
+    def _rows(query) -> List[Dict[str, Any]]:
+        return [dict(row._mapping) for row in query]
+
+    # ---- sections ----
+
+    def _treatment_query(self, db: Session):
+        doctor = aliased(User)
+        return (db.query(
+                    TreatmentRecord.id, TreatmentRecord.patient_id, TreatmentRecord.treatment_type,
+                    TreatmentRecord.treatment_name, TreatmentRecord.description, TreatmentRecord.dosage,
+                    TreatmentRecord.frequency, TreatmentRecord.duration, TreatmentRecord.start_date,
+                    TreatmentRecord.end_date, TreatmentRecord.status, TreatmentRecord.notes,
+                    TreatmentRecord.side_effects, TreatmentRecord.effectiveness,
+                    doctor.first_name.label("doctor_first_name"),
+                    doctor.last_name.label("doctor_last_name"))
+                .outerjoin(doctor, doctor.id == TreatmentRecord.doctor_id))
+
+    def _load_treatments(self, db, stays, sections):
+        rows = self._rows(self._treatment_query(db)
+                          .filter(self._window_clause(TreatmentRecord.patient_id, TreatmentRecord.start_date, stays))
+                          .order_by(TreatmentRecord.start_date))
+        self._distribute(rows, stays, sections, "treatments", "start_date")
+
+        if not self.recent_fallback:
+            return
+        # Each report section (all treatments, medications, procedures) falls back
+        # independently, so rank per treatment group: the overall top N is always
+        # contained in the union of the per-group top N.
+        needed = set()
+        for stay in stays:
+            s = sections[stay.key]
+            types = {t["treatment_type"] for t in s.treatments}
+            if not s.treatments or "medication" not in types or not types & set(PROCEDURE_TYPES):
+                needed.add(stay.key)
+        if not needed:
+            return
+        patient_ids = {stay.patient_id for stay in stays if stay.key in needed}
+        group = case(
+            (TreatmentRecord.treatment_type == "medication", "medication"),
+            (TreatmentRecord.treatment_type.in_(PROCEDURE_TYPES), "procedure"),
+            else_="other",
+        )
+        subq, top_n = self._ranked(
+            self._treatment_query(db).filter(TreatmentRecord.patient_id.in_(patient_ids)),
+            [TreatmentRecord.patient_id, group], TreatmentRecord.start_date, self.recent_fallback)
+        recent = self._rows(db.query(*[c for c in subq.c if c.key != "rn"])
+                            .filter(top_n)
+                            .order_by(subq.c.start_date.desc()))
+        self._distribute_recent(recent, stays, sections, "recent_treatments", needed)
+
+    def _equipment_query(self, db: Session):
+        operator = aliased(User)
+        return (db.query(
+                    EquipmentUsage.id, EquipmentUsage.patient_id, EquipmentUsage.purpose,
+                    EquipmentUsage.start_time, EquipmentUsage.end_time, EquipmentUsage.duration_minutes,
+                    EquipmentUsage.status, EquipmentUsage.readings, EquipmentUsage.notes,
+                    Equipment.name.label("equipment_name"),
+                    EquipmentCategory.name.label("equipment_category"),
+                    operator.first_name.label("operator_first_name"),
+                    operator.last_name.label("operator_last_name"))
+                .outerjoin(Equipment, Equipment.id == EquipmentUsage.equipment_id)
+                .outerjoin(EquipmentCategory, EquipmentCategory.id == Equipment.category_id)
+                .outerjoin(Staff, Staff.id == EquipmentUsage.staff_id)
+                .outerjoin(operator, operator.id == Staff.user_id))
+
+    def _load_equipment_usage(self, db, stays, sections):
+        rows = self._rows(self._equipment_query(db)
+                          .filter(self._window_clause(EquipmentUsage.patient_id, EquipmentUsage.start_time, stays))
+                          .order_by(EquipmentUsage.start_time))
+        self._distribute(rows, stays, sections, "equipment_usage", "start_time")
+
+        needed = {stay.key for stay in stays if not sections[stay.key].equipment_usage}
+        if not self.recent_fallback or not needed:
+            return
+        patient_ids = {stay.patient_id for stay in stays if stay.key in needed}
+        subq, top_n = self._ranked(
+            self._equipment_query(db).filter(EquipmentUsage.patient_id.in_(patient_ids)),
+            [EquipmentUsage.patient_id], EquipmentUsage.start_time, self.recent_fallback)
+        recent = self._rows(db.query(*[c for c in subq.c if c.key != "rn"])
+                            .filter(top_n)
+                            .order_by(subq.c.start_time.desc()))
+        self._distribute_recent(recent, stays, sections, "recent_equipment_usage", needed)
+
+    def _supply_query(self, db: Session):
+        prescriber = aliased(User)
+        administrator = aliased(User)
+        return (db.query(
+                    PatientSupplyUsage.id, PatientSupplyUsage.patient_id, PatientSupplyUsage.quantity_used,
+                    PatientSupplyUsage.unit_cost, PatientSupplyUsage.total_cost, PatientSupplyUsage.dosage,
+                    PatientSupplyUsage.frequency, PatientSupplyUsage.administration_route,
+                    PatientSupplyUsage.indication, PatientSupplyUsage.prescribed_date,
+                    PatientSupplyUsage.administration_date, PatientSupplyUsage.start_date,
+                    PatientSupplyUsage.end_date, PatientSupplyUsage.status, PatientSupplyUsage.effectiveness,
+                    PatientSupplyUsage.side_effects, PatientSupplyUsage.notes,
+                    PatientSupplyUsage.administered_by_id,
+                    Supply.name.label("supply_name"), Supply.item_code.label("supply_code"),
+                    Supply.unit_of_measure.label("unit_of_measure"),
+                    SupplyCategory.name.label("supply_category"),
+                    prescriber.first_name.label("prescriber_first_name"),
+                    prescriber.last_name.label("prescriber_last_name"),
+                    administrator.first_name.label("administrator_first_name"),
+                    administrator.last_name.label("administrator_last_name"))
+                .outerjoin(Supply, Supply.id == PatientSupplyUsage.supply_id)
+                .outerjoin(SupplyCategory, SupplyCategory.id == Supply.category_id)
+                .outerjoin(prescriber, prescriber.id == PatientSupplyUsage.prescribed_by_id)
+                .outerjoin(administrator, administrator.id == PatientSupplyUsage.administered_by_id))
+
+    def _load_supply_usage(self, db, stays, sections):
+        rows = self._rows(self._supply_query(db)
+                          .filter(self._window_clause(PatientSupplyUsage.patient_id, PatientSupplyUsage.prescribed_date, stays))
+                          .order_by(PatientSupplyUsage.prescribed_date))
+        self._distribute(rows, stays, sections, "supply_usage", "prescribed_date")
+
+        needed = {stay.key for stay in stays if not sections[stay.key].supply_usage}
+        if not self.recent_fallback or not needed:
+            return
+        patient_ids = {stay.patient_id for stay in stays if stay.key in needed}
+        subq, top_n = self._ranked(
+            self._supply_query(db).filter(PatientSupplyUsage.patient_id.in_(patient_ids)),
+            [PatientSupplyUsage.patient_id], PatientSupplyUsage.prescribed_date, self.recent_fallback)
+        recent = self._rows(db.query(*[c for c in subq.c if c.key != "rn"])
+                            .filter(top_n)
+                            .order_by(subq.c.prescribed_date.desc()))
+        self._distribute_recent(recent, stays, sections, "recent_supply_usage", needed)
+
+    def _load_staff_assignments(self, db, stays, sections):
+        # Staff assignments use the unpadded stay window and any overlap counts
+        overlap = or_(*[
+            and_(StaffAssignment.patient_id == stay.patient_id,
+                 StaffAssignment.start_date <= stay.discharge_date,
+                 or_(StaffAssignment.end_date >= stay.admission_date, StaffAssignment.end_date.is_(None)))
+            for stay in stays
+        ])
+        member = aliased(User)
+        rows = self._rows(db.query(
+                    StaffAssignment.id, StaffAssignment.patient_id, StaffAssignment.assignment_type,
+                    StaffAssignment.start_date, StaffAssignment.end_date, StaffAssignment.shift,
+                    StaffAssignment.responsibilities, StaffAssignment.notes,
+                    Staff.position.label("position"),
+                    member.first_name.label("staff_first_name"),
+                    member.last_name.label("staff_last_name"),
+                    Department.name.label("department_name"))
+                .outerjoin(Staff, Staff.id == StaffAssignment.staff_id)
+                .outerjoin(member, member.id == Staff.user_id)
+                .outerjoin(Department, Department.id == Staff.department_id)
+                .filter(overlap)
+                .order_by(StaffAssignment.start_date))
+
+        for stay in stays:
+            target = sections[stay.key].staff_assignments
+            for row in rows:
+                if (row["patient_id"] == stay.patient_id
+                        and row["start_date"] <= stay.discharge_date
+                        and (row["end_date"] is None or row["end_date"] >= stay.admission_date)):
+                    target.append(row)
+
+
+def full_name(first: Optional[str], last: Optional[str], default: Optional[str] = "Unknown") -> Optional[str]:
+    """Join a first/last name pair from a loaded row, or return ``default`` when absent."""
+    if first is None and last is None:
+        return default
+    return f"{first} {last}"
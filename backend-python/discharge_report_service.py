@@ -11,17 +11,23 @@ import json
 import uuid
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
-from sqlalchemy.orm import Session
-from database import SessionLocal, Patient, Bed, User, Staff, Equipment, TreatmentRecord, EquipmentUsage, StaffAssignment, DischargeReport
+from sqlalchemy.orm import Session, joinedload
+from database import SessionLocal, Patient, Bed, Room, User, Staff, Equipment, DischargeReport
+from discharge_report_loader import (
+    DischargeReportDataLoader, StaySections, StayWindow, PROCEDURE_TYPES,
+    full_name, is_medication_category
+)
 
 class PatientDischargeReportGenerator:
     """Generate comprehensive discharge reports for patients."""
-    
-    def __init__(self):
-        self.session = SessionLocal()
-    
-    def generate_discharge_report(self, 
-                                bed_id: str, 
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        # Exact stay window, no "recent records" fallback
+        self.loader = DischargeReportDataLoader(padding=timedelta(0), recent_fallback=0)
+
+    def generate_discharge_report(self,
+                                bed_id: str,
                                 discharge_date: datetime = None,
                                 discharge_condition: str = "stable",
                                 discharge_destination: str = "home",
@@ -30,7 +36,7 @@ class PatientDischargeReportGenerator:
                                 generated_by_user_id: str = None) -> Dict[str, Any]:
         """
         Generate a comprehensive discharge report for a patient.
-        
+
         Args:
             bed_id: UUID of the bed being discharged
             discharge_date: Date of discharge (defaults to now)
@@ -40,92 +46,187 @@ class PatientDischargeReportGenerator:
             follow_up_required: Follow-up care requirements
             generated_by_user_id: User generating the report
         """
-        
+
+        db = self.session_factory()
         try:
-            # Get bed and patient information
-            bed = self.session.query(Bed).filter(Bed.id == uuid.UUID(bed_id)).first()
-            if not bed or not bed.patient_id:
-                return {"success": False, "message": "Bed not found or no patient assigned"}
-            
-            patient = bed.patient
-            if not patient:
-                return {"success": False, "message": "Patient not found"}
-            
-            discharge_date = discharge_date or datetime.now()
-            
-            # If no admission date is set, use a reasonable default that includes historical data
-            if bed.admission_date:
-                admission_date = bed.admission_date
-            else:
-                # Default to 30 days ago to include recent supply usage and treatments
-                admission_date = datetime.now() - timedelta(days=30)
-                print(f"⚠️ No admission date set for bed {bed.bed_number}, using default: {admission_date}")
-            
-            length_of_stay = (discharge_date - admission_date).days
-            
-            # Generate report sections
-            report_data = {
-                "patient_summary": self._get_patient_summary(patient, bed, admission_date, discharge_date),
-                "treatment_summary": self._get_treatment_summary(patient.id, admission_date, discharge_date),
-                "equipment_summary": self._get_equipment_summary(patient.id, admission_date, discharge_date),
-                "staff_summary": self._get_staff_summary(patient.id, admission_date, discharge_date),
-                "medications": self._get_medications_summary(patient.id, admission_date, discharge_date),
-                "supply_usage": self._get_supply_usage_summary(patient.id, admission_date, discharge_date),
-                "procedures": self._get_procedures_summary(patient.id, admission_date, discharge_date),
-                "appointments": self._get_appointments_summary(patient.id, admission_date, discharge_date)
-            }
-            
-            # Create discharge report record
-            report_number = f"DR-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
-            
-            # Use Admin User as default if no user provided
-            default_user_id = "e89313e0-a3ff-4dc6-b163-983a96161e8f"  # Stephanie Smith (Admin)
-            generated_by_id = uuid.UUID(generated_by_user_id) if generated_by_user_id else uuid.UUID(default_user_id)
-            
-            discharge_report = DischargeReport(
-                patient_id=patient.id,
-                bed_id=uuid.UUID(bed_id),
-                generated_by=generated_by_id,
-                report_number=report_number,
-                admission_date=admission_date,
-                discharge_date=discharge_date,
-                length_of_stay_days=length_of_stay,
-                patient_summary=json.dumps(report_data["patient_summary"]),
-                treatment_summary=json.dumps(report_data["treatment_summary"]),
-                equipment_summary=json.dumps(report_data["equipment_summary"]),
-                staff_summary=json.dumps(report_data["staff_summary"]),
-                medications=json.dumps(report_data["medications"]),
-                supply_usage=json.dumps(report_data["supply_usage"]),
-                procedures=json.dumps(report_data["procedures"]),
-                discharge_instructions=discharge_instructions,
-                follow_up_required=follow_up_required,
-                discharge_condition=discharge_condition,
-                discharge_destination=discharge_destination
-            )
-            
-            self.session.add(discharge_report)
-            self.session.commit()
-            
-            # Generate formatted report
-            formatted_report = self._format_discharge_report(report_data, discharge_report)
-            
-            return {
-                "success": True,
-                "report_id": str(discharge_report.id),
-                "report_number": report_number,
-                "patient_name": f"{patient.first_name} {patient.last_name}",
-                "formatted_report": formatted_report,
-                "raw_data": report_data,
-                "supply_usage": report_data["supply_usage"],  # Include supply usage in main response
-                "equipment_usage": report_data["equipment_summary"]  # Include equipment usage in main response
-            }
-            
+            stay, error = self._resolve_stay(self._load_beds(db, [bed_id]).get(bed_id), discharge_date)
+            if error:
+                return {"success": False, "message": error}
+
+            sections = self.loader.load(db, [stay["window"]])
+            result = self._create_report(db, stay, sections[stay["window"].key],
+                                         generated_by_user_id=generated_by_user_id,
+                                         discharge_condition=discharge_condition,
+                                         discharge_destination=discharge_destination,
+                                         discharge_instructions=discharge_instructions,
+                                         follow_up_required=follow_up_required)
+            db.commit()
+            return result
+
         except Exception as e:
-            self.session.rollback()
+            db.rollback()
             return {"success": False, "message": f"Failed to generate discharge report: {str(e)}"}
         finally:
-            self.session.close()
-    
+            db.close()
+
+    def generate_discharge_reports(self, bed_ids: List[str], **kwargs) -> Dict[str, Any]:
+        """
+        Generate discharge reports for many beds at once (e.g. end of shift).
+
+        Args:
+            bed_ids: UUIDs of the beds being discharged
+            **kwargs: Same options as generate_discharge_report (except bed_id)
+        """
+        bed_ids = list(dict.fromkeys(b for b in bed_ids if b))
+        if not bed_ids:
+            return {"success": False, "message": "No bed IDs provided"}
+
+        discharge_date = kwargs.pop("discharge_date", None)
+        db = self.session_factory()
+        try:
+            beds = self._load_beds(db, bed_ids)
+            stays, results = {}, {}
+            for bed_id in bed_ids:
+                stay, error = self._resolve_stay(beds.get(bed_id), discharge_date)
+                if error:
+                    results[bed_id] = {"success": False, "bed_id": bed_id, "message": error}
+                else:
+                    stays[bed_id] = stay
+
+            sections = self.loader.load(db, [stay["window"] for stay in stays.values()])
+            for bed_id, stay in stays.items():
+                try:
+                    with db.begin_nested():
+                        result = self._create_report(db, stay, sections[stay["window"].key], **kwargs)
+                    results[bed_id] = {"bed_id": bed_id, **result}
+                except Exception as e:
+                    results[bed_id] = {"success": False, "bed_id": bed_id,
+                                       "message": f"Failed to generate discharge report: {str(e)}"}
+            db.commit()
+
+            reports = [results[bed_id] for bed_id in bed_ids]
+            generated = sum(1 for r in reports if r.get("success"))
+            return {"success": generated > 0, "generated": generated,
+                    "failed": len(reports) - generated, "reports": reports}
+
+        except Exception as e:
+            db.rollback()
+            return {"success": False, "message": f"Failed to generate discharge reports: {str(e)}"}
+        finally:
+            db.close()
+
+    def _load_beds(self, db: Session, bed_ids: List[str]) -> Dict[str, Bed]:
+        """Fetch beds with room, department and patient in one query, keyed by the given IDs."""
+        wanted = {}
+        for bed_id in bed_ids:
+            try:
+                wanted[uuid.UUID(str(bed_id))] = bed_id
+            except ValueError:
+                continue
+        if not wanted:
+            return {}
+        beds = (db.query(Bed)
+                .options(joinedload(Bed.room).joinedload(Room.department), joinedload(Bed.patient))
+                .filter(Bed.id.in_(list(wanted)))
+                .all())
+        return {wanted[bed.id]: bed for bed in beds}
+
+    def _resolve_stay(self, bed, discharge_date: datetime = None):
+        """Resolve patient and stay window for an occupied bed. Returns (stay, error)."""
+        if not bed or not bed.patient_id:
+            return None, "Bed not found or no patient assigned"
+
+        patient = bed.patient
+        if not patient:
+            return None, "Patient not found"
+
+        discharge_date = discharge_date or datetime.now()
+
+        # If no admission date is set, use a reasonable default that includes historical data
+        if bed.admission_date:
+            admission_date = bed.admission_date
+        else:
+            # Default to 30 days ago to include recent supply usage and treatments
+            admission_date = datetime.now() - timedelta(days=30)
+            print(f"⚠️ No admission date set for bed {bed.bed_number}, using default: {admission_date}")
+
+        return {
+            "bed": bed,
+            "patient": patient,
+            "admission_date": admission_date,
+            "discharge_date": discharge_date,
+            "window": StayWindow(key=str(bed.id), patient_id=patient.id,
+                                 admission_date=admission_date, discharge_date=discharge_date)
+        }, None
+
+    def _create_report(self, db: Session, stay: Dict[str, Any], sections: StaySections,
+                       discharge_condition: str = "stable",
+                       discharge_destination: str = "home",
+                       discharge_instructions: str = "",
+                       follow_up_required: str = "",
+                       generated_by_user_id: str = None) -> Dict[str, Any]:
+        """Build report sections from loaded rows and stage the DischargeReport record."""
+        patient, bed = stay["patient"], stay["bed"]
+        admission_date, discharge_date = stay["admission_date"], stay["discharge_date"]
+        length_of_stay = (discharge_date - admission_date).days
+
+        # Generate report sections
+        report_data = {
+            "patient_summary": self._get_patient_summary(patient, bed, admission_date, discharge_date),
+            "treatment_summary": self._get_treatment_summary(sections),
+            "equipment_summary": self._get_equipment_summary(sections),
+            "staff_summary": self._get_staff_summary(sections, discharge_date),
+            "medications": self._get_medications_summary(sections),
+            "supply_usage": self._get_supply_usage_summary(sections),
+            "procedures": self._get_procedures_summary(sections),
+            "appointments": self._get_appointments_summary(patient.id, admission_date, discharge_date)
+        }
+
+        # Create discharge report record
+        report_number = f"DR-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
+
+        # Use Admin User as default if no user provided
+        default_user_id = "e89313e0-a3ff-4dc6-b163-983a96161e8f"  # Stephanie Smith (Admin)
+        generated_by_id = uuid.UUID(generated_by_user_id) if generated_by_user_id else uuid.UUID(default_user_id)
+
+        discharge_report = DischargeReport(
+            patient_id=patient.id,
+            bed_id=bed.id,
+            generated_by=generated_by_id,
+            report_number=report_number,
+            admission_date=admission_date,
+            discharge_date=discharge_date,
+            length_of_stay_days=length_of_stay,
+            patient_summary=json.dumps(report_data["patient_summary"]),
+            treatment_summary=json.dumps(report_data["treatment_summary"]),
+            equipment_summary=json.dumps(report_data["equipment_summary"]),
+            staff_summary=json.dumps(report_data["staff_summary"]),
+            medications=json.dumps(report_data["medications"]),
+            supply_usage=json.dumps(report_data["supply_usage"]),
+            procedures=json.dumps(report_data["procedures"]),
+            discharge_instructions=discharge_instructions,
+            follow_up_required=follow_up_required,
+            discharge_condition=discharge_condition,
+            discharge_destination=discharge_destination
+        )
+
+        db.add(discharge_report)
+        db.flush()
+
+        # Generate formatted report
+        formatted_report = self._format_discharge_report(report_data, discharge_report)
+
+        return {
+            "success": True,
+            "report_id": str(discharge_report.id),
+            "report_number": report_number,
+            "patient_name": f"{patient.first_name} {patient.last_name}",
+            "formatted_report": formatted_report,
+            "raw_data": report_data,
+            "supply_usage": report_data["supply_usage"],  # Include supply usage in main response
+            "equipment_usage": report_data["equipment_summary"]  # Include equipment usage in main response
+        }
+
     def _get_patient_summary(self, patient, bed, admission_date, discharge_date) -> Dict[str, Any]:
         """Get patient demographic and admission summary."""
         return {
@@ -150,225 +251,127 @@ class PatientDischargeReportGenerator:
             "discharge_date": discharge_date.isoformat(),
             "length_of_stay_days": (discharge_date - admission_date).days
         }
-    
-    def _get_treatment_summary(self, patient_id, admission_date, discharge_date) -> List[Dict[str, Any]]:
+
+    def _get_treatment_summary(self, sections: StaySections) -> List[Dict[str, Any]]:
         """Get all treatments during the stay."""
-        treatments = self.session.query(TreatmentRecord).filter(
-            TreatmentRecord.patient_id == patient_id,
-            TreatmentRecord.start_date >= admission_date,
-            TreatmentRecord.start_date <= discharge_date
-        ).all()
-        
         return [{
-            "treatment_type": t.treatment_type,
-            "treatment_name": t.treatment_name,
-            "description": t.description,
-            "doctor": f"{t.doctor.first_name} {t.doctor.last_name}" if t.doctor else "Unknown",
-            "start_date": t.start_date.isoformat(),
-            "end_date": t.end_date.isoformat() if t.end_date else None,
-            "status": t.status,
-            "effectiveness": t.effectiveness,
-            "notes": t.notes
-        } for t in treatments]
-    
-    def _get_equipment_summary(self, patient_id, admission_date, discharge_date) -> List[Dict[str, Any]]:
+            "treatment_type": t["treatment_type"],
+            "treatment_name": t["treatment_name"],
+            "description": t["description"],
+            "doctor": full_name(t["doctor_first_name"], t["doctor_last_name"]),
+            "start_date": t["start_date"].isoformat(),
+            "end_date": t["end_date"].isoformat() if t["end_date"] else None,
+            "status": t["status"],
+            "effectiveness": t["effectiveness"],
+            "notes": t["notes"]
+        } for t in sections.treatments]
+
+    def _get_equipment_summary(self, sections: StaySections) -> List[Dict[str, Any]]:
         """Get all equipment used during the stay."""
-        equipment_usage = self.session.query(EquipmentUsage).filter(
-            EquipmentUsage.patient_id == patient_id,
-            EquipmentUsage.start_time >= admission_date,
-            EquipmentUsage.start_time <= discharge_date
-        ).all()
-        
         return [{
-            "equipment_name": eu.equipment.name if eu.equipment else "Unknown",
-            "equipment_type": eu.equipment.category.name if eu.equipment and eu.equipment.category else "Unknown",
-            "purpose": eu.purpose,
-            "start_time": eu.start_time.isoformat(),
-            "end_time": eu.end_time.isoformat() if eu.end_time else None,
-            "duration_minutes": eu.duration_minutes,
-            "operated_by": f"{eu.staff.user.first_name} {eu.staff.user.last_name}" if eu.staff and eu.staff.user else "Unknown",
-            "status": eu.status,
-            "readings": eu.readings,
-            "notes": eu.notes
-        } for eu in equipment_usage]
-    
-    def _get_staff_summary(self, patient_id, admission_date, discharge_date) -> List[Dict[str, Any]]:
+            "equipment_name": eu["equipment_name"] or "Unknown",
+            "equipment_type": eu["equipment_category"] or "Unknown",
+            "purpose": eu["purpose"],
+            "start_time": eu["start_time"].isoformat(),
+            "end_time": eu["end_time"].isoformat() if eu["end_time"] else None,
+            "duration_minutes": eu["duration_minutes"],
+            "operated_by": full_name(eu["operator_first_name"], eu["operator_last_name"]),
+            "status": eu["status"],
+            "readings": eu["readings"],
+            "notes": eu["notes"]
+        } for eu in sections.equipment_usage]
+
+    def _get_staff_summary(self, sections: StaySections, discharge_date) -> List[Dict[str, Any]]:
         """Get all staff assignments during the stay."""
-        staff_assignments = self.session.query(StaffAssignment).filter(
-            StaffAssignment.patient_id == patient_id,
-            StaffAssignment.start_date <= discharge_date,
-            (StaffAssignment.end_date >= admission_date) | (StaffAssignment.end_date.is_(None))
-        ).all()
-        
         return [{
-            "staff_name": f"{sa.staff.user.first_name} {sa.staff.user.last_name}" if sa.staff and sa.staff.user else "Unknown",
-            "position": sa.staff.position if sa.staff else "Unknown",
-            "department": sa.staff.department.name if sa.staff and sa.staff.department else "Unknown",
-            "assignment_type": sa.assignment_type,
-            "start_date": sa.start_date.isoformat(),
-            "end_date": sa.end_date.isoformat() if sa.end_date else discharge_date.isoformat(),
-            "shift": sa.shift,
-            "responsibilities": sa.responsibilities,
-            "notes": sa.notes
-        } for sa in staff_assignments]
-    
-    def _get_medications_summary(self, patient_id, admission_date, discharge_date) -> List[Dict[str, Any]]:
+            "staff_name": full_name(sa["staff_first_name"], sa["staff_last_name"]),
+            "position": sa["position"] or "Unknown",
+            "department": sa["department_name"] or "Unknown",
+            "assignment_type": sa["assignment_type"],
+            "start_date": sa["start_date"].isoformat(),
+            "end_date": sa["end_date"].isoformat() if sa["end_date"] else discharge_date.isoformat(),
+            "shift": sa["shift"],
+            "responsibilities": sa["responsibilities"],
+            "notes": sa["notes"]
+        } for sa in sections.staff_assignments]
+
+    def _get_medications_summary(self, sections: StaySections) -> List[Dict[str, Any]]:
         """Get medication treatments."""
-        medications = self.session.query(TreatmentRecord).filter(
-            TreatmentRecord.patient_id == patient_id,
-            TreatmentRecord.treatment_type == "medication",
-            TreatmentRecord.start_date >= admission_date,
-            TreatmentRecord.start_date <= discharge_date
-        ).all()
-        
         return [{
-            "medication_name": m.treatment_name,
-            "dosage": m.dosage,
-            "frequency": m.frequency,
-            "duration": m.duration,
-            "prescribed_by": f"{m.doctor.first_name} {m.doctor.last_name}" if m.doctor else "Unknown",
-            "start_date": m.start_date.isoformat(),
-            "end_date": m.end_date.isoformat() if m.end_date else None,
-            "status": m.status,
-            "side_effects": m.side_effects,
-            "effectiveness": m.effectiveness
-        } for m in medications]
-    
-    def _get_supply_usage_summary(self, patient_id, admission_date, discharge_date) -> Dict[str, Any]:
+            "medication_name": m["treatment_name"],
+            "dosage": m["dosage"],
+            "frequency": m["frequency"],
+            "duration": m["duration"],
+            "prescribed_by": full_name(m["doctor_first_name"], m["doctor_last_name"]),
+            "start_date": m["start_date"].isoformat(),
+            "end_date": m["end_date"].isoformat() if m["end_date"] else None,
+            "status": m["status"],
+            "side_effects": m["side_effects"],
+            "effectiveness": m["effectiveness"]
+        } for m in sections.treatments_of(["medication"])]
+
+    def _get_supply_usage_summary(self, sections: StaySections) -> Dict[str, Any]:
         """Get supply and medication usage from inventory system."""
-        try:
-            from database import PatientSupplyUsage
-            
-            # Query patient supply usage records
-            usage_records = self.session.query(PatientSupplyUsage).filter(
-                PatientSupplyUsage.patient_id == patient_id,
-                PatientSupplyUsage.prescribed_date >= admission_date,
-                PatientSupplyUsage.prescribed_date <= discharge_date
-            ).all()
-            
-            if not usage_records:
-                return {
-                    "medications": [],
-                    "medical_supplies": [],
-                    "total_cost": 0,
-                    "summary": {
-                        "total_items": 0,
-                        "medications_count": 0,
-                        "supplies_count": 0,
-                        "total_cost": 0
-                    }
-                }
-            
-            medications = []
-            medical_supplies = []
-            total_cost = 0
-            
-            for usage in usage_records:
-                # Debug logging
-                print(f"🔍 Processing usage record: {usage.id}")
-                print(f"  Supply object: {usage.supply}")
-                print(f"  Supply name: {getattr(usage.supply, 'name', 'No name attribute') if usage.supply else 'No supply object'}")
-                print(f"  Supply category: {getattr(usage.supply, 'category', 'No category attribute') if usage.supply else 'No supply object'}")
-                
-                # Build usage data
-                usage_data = {
-                    "item_name": usage.supply.name if usage.supply else "Unknown",
-                    "category": usage.supply.category.name if usage.supply and usage.supply.category else "Unknown",
-                    "quantity_used": usage.quantity_used,
-                    "unit_of_measure": usage.supply.unit_of_measure if usage.supply else "",
-                    "dosage": usage.dosage,
-                    "frequency": usage.frequency,
-                    "administration_route": usage.administration_route,
-                    "indication": usage.indication,
-                    "prescribed_by": f"{usage.prescribed_by.first_name} {usage.prescribed_by.last_name}" if usage.prescribed_by else "Unknown",
-                    "administered_by": f"{usage.administered_by.first_name} {usage.administered_by.last_name}" if usage.administered_by else None,
-                    "prescribed_date": usage.prescribed_date.isoformat() if usage.prescribed_date else None,
-                    "administration_date": usage.administration_date.isoformat() if usage.administration_date else None,
-                    "start_date": usage.start_date.isoformat() if usage.start_date else None,
-                    "end_date": usage.end_date.isoformat() if usage.end_date else None,
-                    "status": usage.status,
-                    "effectiveness": usage.effectiveness,
-                    "side_effects": usage.side_effects,
-                    "unit_cost": float(usage.unit_cost or 0),
-                    "total_cost": float(usage.total_cost or 0),
-                    "notes": usage.notes
-                }
-                
-                # Calculate total cost
-                total_cost += float(usage.total_cost or 0)
-                
-                # Categorize as medication or supply
-                if usage.supply and usage.supply.category:
-                    category_name = usage.supply.category.name.lower()
-                    print(f"  Category: {category_name}")
-                    
-                    if any(med_keyword in category_name for med_keyword in ['medication', 'drug', 'pharmaceutical', 'medicine']):
-                        print(f"  → Categorized as MEDICATION")
-                        medications.append(usage_data)
-                    else:
-                        print(f"  → Categorized as MEDICAL SUPPLY")
-                        medical_supplies.append(usage_data)
-                else:
-                    print(f"  → Categorized as MEDICAL SUPPLY (no category)")
-                    medical_supplies.append(usage_data)
-                
-                print(f"  Medications count: {len(medications)}")
-                print(f"  Medical supplies count: {len(medical_supplies)}")
-            
-            result = {
-                "medications": medications,
-                "medical_supplies": medical_supplies,
-                "total_cost": round(total_cost, 2),
-                "summary": {
-                    "total_items": len(usage_records),
-                    "medications_count": len(medications),
-                    "supplies_count": len(medical_supplies),
-                    "total_cost": round(total_cost, 2)
-                }
+        medications = []
+        medical_supplies = []
+        total_cost = 0
+
+        for usage in sections.supply_usage:
+            usage_data = {
+                "item_name": usage["supply_name"] or "Unknown",
+                "category": usage["supply_category"] or "Unknown",
+                "quantity_used": usage["quantity_used"],
+                "unit_of_measure": usage["unit_of_measure"] or "",
+                "dosage": usage["dosage"],
+                "frequency": usage["frequency"],
+                "administration_route": usage["administration_route"],
+                "indication": usage["indication"],
+                "prescribed_by": full_name(usage["prescriber_first_name"], usage["prescriber_last_name"]),
+                "administered_by": full_name(usage["administrator_first_name"], usage["administrator_last_name"], default=None),
+                "prescribed_date": usage["prescribed_date"].isoformat() if usage["prescribed_date"] else None,
+                "administration_date": usage["administration_date"].isoformat() if usage["administration_date"] else None,
+                "start_date": usage["start_date"].isoformat() if usage["start_date"] else None,
+                "end_date": usage["end_date"].isoformat() if usage["end_date"] else None,
+                "status": usage["status"],
+                "effectiveness": usage["effectiveness"],
+                "side_effects": usage["side_effects"],
+                "unit_cost": float(usage["unit_cost"] or 0),
+                "total_cost": float(usage["total_cost"] or 0),
+                "notes": usage["notes"]
             }
-            
-            print(f"🔍 Final result:")
-            print(f"  Medications: {len(result['medications'])}")
-            print(f"  Medical supplies: {len(result['medical_supplies'])}")
-            print(f"  Total cost: ${result['total_cost']}")
-            print(f"  Summary: {result['summary']}")
-            
-            return result
-            
-        except Exception as e:
-            # Fallback to empty data if PatientSupplyUsage is not available
-            return {
-                "medications": [],
-                "medical_supplies": [],
-                "total_cost": 0,
-                "summary": {
-                    "total_items": 0,
-                    "medications_count": 0,
-                    "supplies_count": 0,
-                    "total_cost": 0
-                }
+            total_cost += float(usage["total_cost"] or 0)
+
+            # Categorize as medication or supply
+            if is_medication_category(usage["supply_category"]):
+                medications.append(usage_data)
+            else:
+                medical_supplies.append(usage_data)
+
+        return {
+            "medications": medications,
+            "medical_supplies": medical_supplies,
+            "total_cost": round(total_cost, 2),
+            "summary": {
+                "total_items": len(sections.supply_usage),
+                "medications_count": len(medications),
+                "supplies_count": len(medical_supplies),
+                "total_cost": round(total_cost, 2)
             }
-    
-    def _get_procedures_summary(self, patient_id, admission_date, discharge_date) -> List[Dict[str, Any]]:
+        }
+
+    def _get_procedures_summary(self, sections: StaySections) -> List[Dict[str, Any]]:
         """Get procedure treatments."""
-        procedures = self.session.query(TreatmentRecord).filter(
-            TreatmentRecord.patient_id == patient_id,
-            TreatmentRecord.treatment_type.in_(["procedure", "surgery", "therapy"]),
-            TreatmentRecord.start_date >= admission_date,
-            TreatmentRecord.start_date <= discharge_date
-        ).all()
-        
         return [{
-            "procedure_name": p.treatment_name,
-            "type": p.treatment_type,
-            "description": p.description,
-            "performed_by": f"{p.doctor.first_name} {p.doctor.last_name}" if p.doctor else "Unknown",
-            "date": p.start_date.isoformat(),
-            "status": p.status,
-            "effectiveness": p.effectiveness,
-            "notes": p.notes
-        } for p in procedures]
-    
+            "procedure_name": p["treatment_name"],
+            "type": p["treatment_type"],
+            "description": p["description"],
+            "performed_by": full_name(p["doctor_first_name"], p["doctor_last_name"]),
+            "date": p["start_date"].isoformat(),
+            "status": p["status"],
+            "effectiveness": p["effectiveness"],
+            "notes": p["notes"]
+        } for p in sections.treatments_of(PROCEDURE_TYPES)]
+
     def _get_appointments_summary(self, patient_id, admission_date, discharge_date) -> List[Dict[str, Any]]:
         """Get appointments during the stay."""
         # Note: Appointment model not available, returning empty list
@@ -5,26 +5,39 @@ Patient Discharge Report Generator - Integrated Version
 Comprehensive discharge report system that generates detailed reports
 including admission details, treatments, equipment usage, staff assignments,
 and discharge recommendations.
+
+Section data is fetched through DischargeReportDataLoader in a few batched
+queries per report (or per batch of beds), on a short-lived session per call.
 """
 
 import json
 import uuid
 from datetime import datetime, timedelta, date
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
+from sqlalchemy import func, tuple_
 from sqlalchemy.orm import Session, joinedload
 from database import (
-    SessionLocal, Patient, Bed, User, Staff, Equipment, Supply, PatientSupplyUsage,
+    SessionLocal, Patient, Bed, User, Staff, Equipment,
     TreatmentRecord, EquipmentUsage, StaffAssignment, DischargeReport, Room, Department
 )
+from discharge_report_loader import (
+    DischargeReportDataLoader, StaySections, StayWindow, PROCEDURE_TYPES,
+    full_name, is_medication_category
+)
 
 class PatientDischargeReportGenerator:
-    """Generate comprehensive discharge reports for patients."""
-    
-    def __init__(self):
-        self.session = SessionLocal()
-    
-    def generate_discharge_report(self, 
-                                bed_id: str, 
+    """Generate comprehensive discharge reports for patients.
+
+    Each call works on its own short-lived session, so one generator instance
+    can be shared (e.g. by the discharge agent) and reused across reports.
+    """
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self.loader = DischargeReportDataLoader(padding=timedelta(days=1), recent_fallback=10)
+
+    def generate_discharge_report(self,
+                                bed_id: str,
                                 discharge_date: datetime = None,
                                 discharge_condition: str = "stable",
                                 discharge_destination: str = "home",
@@ -35,130 +48,270 @@ class PatientDischargeReportGenerator:
         """
         Generate a comprehensive discharge report for a patient.
         """
-        
+
+        db = self.session_factory()
         try:
-            # Get bed information with eager-loaded relationships
-            bed = (self.session.query(Bed)
-                   .options(joinedload(Bed.room).joinedload(Room.department))
-                   .filter(Bed.id == uuid.UUID(bed_id))
-                   .first())
-            if not bed:
-                return {"success": False, "message": "Bed not found"}
-            
-            # Check if bed is currently occupied or was recently discharged
-            patient = None
-            admission_date = None
-            
-            # If a patient_id is explicitly provided, use that as authoritative
-            if patient_id:
-                try:
-                    patient = self.session.query(Patient).filter(Patient.id == uuid.UUID(patient_id)).first()
-                except Exception:
-                    patient = None
-                if patient:
-                    admission_date = self._find_admission_date_for_patient_bed(patient.id, bed_id)
-            
-            if not patient:
-                if bed.patient_id:
-                    # Bed is currently occupied
-                    patient = bed.patient
-                    admission_date = bed.admission_date
-                else:
-                    # Bed is available, check if it was recently discharged
-                    patient = self._find_recent_patient_for_bed(bed_id)
-                    if patient and not admission_date:
-                        admission_date = self._find_admission_date_for_patient_bed(patient.id, bed_id)
-                
-            if not patient:
-                return {"success": False, "message": "No patient found for this bed (current or recent)"}
-            
-            # Admission date fallback if still missing
-            if not admission_date:
-                admission_date = bed.admission_date or (datetime.now() - timedelta(days=1))
-            
-            # Determine discharge date with correct precedence and type handling
-            if discharge_date is not None:
-                final_discharge_dt = discharge_date
-            elif getattr(bed, 'discharge_date', None):
-                bd = bed.discharge_date
-                # If we have a datetime at midnight (likely from a date-only set), adjust to current time
-                if isinstance(bd, datetime) and bd.time().hour == 0 and bd.time().minute == 0 and bd.time().second == 0:
-                    final_discharge_dt = datetime.combine(bd.date(), datetime.now().time())
-                elif isinstance(bd, date) and not isinstance(bd, datetime):
-                    final_discharge_dt = datetime.combine(bd, datetime.now().time())
-                else:
-                    final_discharge_dt = bd
-            else:
-                final_discharge_dt = datetime.now()
-            
-            # Normalize LOS using date-only difference to avoid 0-days due to times
-            los_days = (final_discharge_dt.date() - admission_date.date()).days
-            if los_days < 0:
-                los_days = 0
-            
-            # Generate report sections
-            report_data = {
-                "patient_summary": self._get_patient_summary(patient, bed, admission_date, final_discharge_dt),
-                "treatment_summary": self._get_treatment_summary(patient.id, admission_date, final_discharge_dt),
-                "equipment_summary": self._get_equipment_summary(patient.id, admission_date, final_discharge_dt),
-                "supply_usage_summary": self._get_supply_usage_summary(patient.id, admission_date, final_discharge_dt),
-                "staff_summary": self._get_staff_summary(patient.id, admission_date, final_discharge_dt),
-                "medications": self._get_medications_summary(patient.id, admission_date, final_discharge_dt),
-                "procedures": self._get_procedures_summary(patient.id, admission_date, final_discharge_dt)
-            }
-            
-            # Create discharge report record
-            report_number = f"DR-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
-            
+            beds = self._load_beds(db, [bed_id])
+            stay, error = self._resolve_stays(db, beds, [bed_id], patient_id, discharge_date)[bed_id]
+            if error:
+                return {"success": False, "message": error}
+
+            sections = self.loader.load(db, [stay["window"]])
+
             # Get or find a user for generated_by
             if not generated_by_user_id:
-                default_user = self.session.query(User).filter(User.role == 'doctor').first() or self.session.query(User).first()
-                if default_user:
-                    generated_by_user_id = str(default_user.id)
-            
-            discharge_report = DischargeReport(
-                patient_id=patient.id,
-                bed_id=uuid.UUID(bed_id),
-                generated_by=uuid.UUID(generated_by_user_id) if generated_by_user_id else None,
-                report_number=report_number,
-                admission_date=admission_date,
-                discharge_date=final_discharge_dt,
-                length_of_stay_days=los_days,
-                patient_summary=json.dumps(report_data["patient_summary"]),
-                treatment_summary=json.dumps(report_data["treatment_summary"]),
-                equipment_summary=json.dumps(report_data["equipment_summary"]),
-                supply_usage=json.dumps(report_data["supply_usage_summary"]),  # Added missing supply usage field
-                staff_summary=json.dumps(report_data["staff_summary"]),
-                medications=json.dumps(report_data["medications"]),
-                procedures=json.dumps(report_data["procedures"]),
-                discharge_instructions=discharge_instructions,
-                follow_up_required=follow_up_required,
-                discharge_condition=discharge_condition,
-                discharge_destination=discharge_destination
-            )
-            
-            self.session.add(discharge_report)
-            self.session.commit()
-            
-            # Generate formatted report
-            formatted_report = self._format_discharge_report(report_data, discharge_report)
-            
+                generated_by_user_id = self._default_generated_by(db)
+
+            result = self._create_report(db, stay, sections[stay["window"].key],
+                                         generated_by_user_id=generated_by_user_id,
+                                         discharge_condition=discharge_condition,
+                                         discharge_destination=discharge_destination,
+                                         discharge_instructions=discharge_instructions,
+                                         follow_up_required=follow_up_required)
+            db.commit()
+            return result
+
+        except Exception as e:
+            db.rollback()
+            return {"success": False, "message": f"Failed to generate discharge report: {str(e)}"}
+        finally:
+            db.close()
+
+    def generate_discharge_reports(self,
+                                   bed_ids: List[str],
+                                   discharge_condition: str = "stable",
+                                   discharge_destination: str = "home",
+                                   discharge_instructions: str = "",
+                                   follow_up_required: str = "",
+                                   generated_by_user_id: str = None) -> Dict[str, Any]:
+        """
+        Generate discharge reports for many beds at once (e.g. end of shift).
+
+        Beds are fetched in one query and the clinical sections for every stay
+        are loaded in a single batched pass. Each report is written under its own
+        savepoint so one failing bed does not discard the rest of the batch.
+        """
+        bed_ids = list(dict.fromkeys(b for b in bed_ids if b))
+        if not bed_ids:
+            return {"success": False, "message": "No bed IDs provided"}
+
+        db = self.session_factory()
+        try:
+            beds = self._load_beds(db, bed_ids)
+            stays = {}
+            results = {}
+            for bed_id, (stay, error) in self._resolve_stays(db, beds, bed_ids).items():
+                if error:
+                    results[bed_id] = {"success": False, "bed_id": bed_id, "message": error}
+                else:
+                    stays[bed_id] = stay
+
+            sections = self.loader.load(db, [stay["window"] for stay in stays.values()])
+
+            if not generated_by_user_id:
+                generated_by_user_id = self._default_generated_by(db)
+
+            for bed_id, stay in stays.items():
+                try:
+                    with db.begin_nested():
+                        result = self._create_report(db, stay, sections[stay["window"].key],
+                                                     generated_by_user_id=generated_by_user_id,
+                                                     discharge_condition=discharge_condition,
+                                                     discharge_destination=discharge_destination,
+                                                     discharge_instructions=discharge_instructions,
+                                                     follow_up_required=follow_up_required)
+                    results[bed_id] = {"bed_id": bed_id, **result}
+                except Exception as e:
+                    results[bed_id] = {"success": False, "bed_id": bed_id,
+                                       "message": f"Failed to generate discharge report: {str(e)}"}
+            db.commit()
+
+            reports = [results[bed_id] for bed_id in bed_ids]
+            generated = sum(1 for r in reports if r.get("success"))
             return {
-                "success": True,
-                "report_id": str(discharge_report.id),
-                "report_number": report_number,
-                "patient_name": f"{patient.first_name} {patient.last_name}",
-                "formatted_report": formatted_report,
-                "raw_data": report_data
+                "success": generated > 0,
+                "generated": generated,
+                "failed": len(reports) - generated,
+                "reports": reports
             }
-            
+
         except Exception as e:
-            self.session.rollback()
-            return {"success": False, "message": f"Failed to generate discharge report: {str(e)}"}
+            db.rollback()
+            return {"success": False, "message": f"Failed to generate discharge reports: {str(e)}"}
         finally:
-            self.session.close()
+            db.close()
+
+    def _load_beds(self, db: Session, bed_ids: List[str]) -> Dict[str, Bed]:
+        """Fetch beds with room, department and current patient in one query, keyed by the given IDs."""
+        wanted = {}
+        for bed_id in bed_ids:
+            try:
+                wanted[uuid.UUID(str(bed_id))] = bed_id
+            except ValueError:
+                continue
+        if not wanted:
+            return {}
+        beds = (db.query(Bed)
+                .options(joinedload(Bed.room).joinedload(Room.department), joinedload(Bed.patient))
+                .filter(Bed.id.in_(list(wanted)))
+                .all())
+        return {wanted[bed.id]: bed for bed in beds}
+
+    def _resolve_stays(self, db: Session, beds: Dict[str, Bed], bed_ids: List[str],
+                       patient_id: str = None, discharge_date: datetime = None) -> Dict[str, Tuple[Optional[Dict[str, Any]], Optional[str]]]:
+        """Resolve patient, admission/discharge dates and LOS for each bed. Returns {bed_id: (stay, error)}.
+
+        Explicit patients, recent patients of free beds and admission dates are each
+        looked up once for all beds rather than per bed.
+        """
+        patients: Dict[str, Patient] = {}
+        admission_dates: Dict[str, Optional[datetime]] = {}
+        lookup_admission: Dict[str, bool] = {}
+
+        # If a patient_id is explicitly provided, use that as authoritative
+        explicit = None
+        if patient_id:
+            try:
+                explicit = db.query(Patient).filter(Patient.id == uuid.UUID(patient_id)).first()
+            except Exception:
+                explicit = None
+
+        # Check if each bed is currently occupied or was recently discharged
+        free_beds = []
+        for bed_id in bed_ids:
+            bed = beds.get(bed_id)
+            if not bed:
+                continue
+            if explicit:
+                patients[bed_id] = explicit
+                lookup_admission[bed_id] = True
+            elif bed.patient_id:
+                patients[bed_id] = bed.patient
+                admission_dates[bed_id] = bed.admission_date
+            else:
+                free_beds.append(bed_id)
+
+        if free_beds:
+            recent = self._find_recent_patients(db, [beds[bed_id].id for bed_id in free_beds])
+            for bed_id in free_beds:
+                if beds[bed_id].id in recent:
+                    patients[bed_id] = recent[beds[bed_id].id]
+                    lookup_admission[bed_id] = True
+
+        if lookup_admission:
+            found = self._find_admission_dates(db, [(patients[bed_id].id, beds[bed_id].id) for bed_id in lookup_admission])
+            for bed_id in lookup_admission:
+                admission_dates[bed_id] = found[(patients[bed_id].id, beds[bed_id].id)]
+
+        return {bed_id: self._build_stay(beds.get(bed_id), patients.get(bed_id), admission_dates.get(bed_id), discharge_date)
+                for bed_id in bed_ids}
+
+    def _build_stay(self, bed, patient, admission_date: Optional[datetime], discharge_date: datetime = None):
+        """Stay window for a resolved bed and patient. Returns (stay, error)."""
+        if not bed:
+            return None, "Bed not found"
+        if not patient:
+            return None, "No patient found for this bed (current or recent)"
+
+        # Admission date fallback if still missing
+        if not admission_date:
+            admission_date = bed.admission_date or (datetime.now() - timedelta(days=1))
+
+        # Determine discharge date with correct precedence and type handling
+        if discharge_date is not None:
+            final_discharge_dt = discharge_date
+        elif getattr(bed, 'discharge_date', None):
+            bd = bed.discharge_date
+            # If we have a datetime at midnight (likely from a date-only set), adjust to current time
+            if isinstance(bd, datetime) and bd.time().hour == 0 and bd.time().minute == 0 and bd.time().second == 0:
+                final_discharge_dt = datetime.combine(bd.date(), datetime.now().time())
+            elif isinstance(bd, date) and not isinstance(bd, datetime):
+                final_discharge_dt = datetime.combine(bd, datetime.now().time())
+            else:
+                final_discharge_dt = bd
+        else:
+            final_discharge_dt = datetime.now()
+
+        # Normalize LOS using date-only difference to avoid 0-days due to times
+        los_days = (final_discharge_dt.date() - admission_date.date()).days
+        if los_days < 0:
+            los_days = 0
+
+        bed_id = str(bed.id)
+        return {
+            "bed": bed,
+            "patient": patient,
+            "admission_date": admission_date,
+            "discharge_date": final_discharge_dt,
+            "los_days": los_days,
+            "window": StayWindow(key=bed_id, patient_id=patient.id,
+                                 admission_date=admission_date, discharge_date=final_discharge_dt)
+        }, None
+
+    def _default_generated_by(self, db: Session) -> Optional[str]:
+        default_user = db.query(User).filter(User.role == 'doctor').first() or db.query(User).first()
+        return str(default_user.id) if default_user else None
+
+    def _create_report(self, db: Session, stay: Dict[str, Any], sections: StaySections,
+                       generated_by_user_id: Optional[str], discharge_condition: str,
+                       discharge_destination: str, discharge_instructions: str,
+                       follow_up_required: str) -> Dict[str, Any]:
+        """Build report sections from loaded rows and stage the DischargeReport record."""
+        patient = stay["patient"]
+        admission_date = stay["admission_date"]
+        final_discharge_dt = stay["discharge_date"]
+
+        # Generate report sections
+        report_data = {
+            "patient_summary": self._get_patient_summary(db, patient, stay["bed"], admission_date, final_discharge_dt),
+            "treatment_summary": self._get_treatment_summary(sections),
+            "equipment_summary": self._get_equipment_summary(sections),
+            "supply_usage_summary": self._get_supply_usage_summary(sections),
+            "staff_summary": self._get_staff_summary(sections, final_discharge_dt),
+            "medications": self._get_medications_summary(sections),
+            "procedures": self._get_procedures_summary(sections)
+        }
+
+        # Create discharge report record
+        report_number = f"DR-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
+
+        discharge_report = DischargeReport(
+            patient_id=patient.id,
+            bed_id=stay["bed"].id,
+            generated_by=uuid.UUID(generated_by_user_id) if generated_by_user_id else None,
+            report_number=report_number,
+            admission_date=admission_date,
+            discharge_date=final_discharge_dt,
+            length_of_stay_days=stay["los_days"],
+            patient_summary=json.dumps(report_data["patient_summary"]),
+            treatment_summary=json.dumps(report_data["treatment_summary"]),
+            equipment_summary=json.dumps(report_data["equipment_summary"]),
+            supply_usage=json.dumps(report_data["supply_usage_summary"]),  # Added missing supply usage field
+            staff_summary=json.dumps(report_data["staff_summary"]),
+            medications=json.dumps(report_data["medications"]),
+            procedures=json.dumps(report_data["procedures"]),
+            discharge_instructions=discharge_instructions,
+            follow_up_required=follow_up_required,
+            discharge_condition=discharge_condition,
+            discharge_destination=discharge_destination
+        )
 
-    def _get_bed_context(self, bed) -> Dict[str, Any]:
+        db.add(discharge_report)
+        db.flush()
+
+        # Generate formatted report
+        formatted_report = self._format_discharge_report(report_data, discharge_report)
+
+        return {
+            "success": True,
+            "report_id": str(discharge_report.id),
+            "report_number": report_number,
+            "patient_name": f"{patient.first_name} {patient.last_name}",
+            "formatted_report": formatted_report,
+            "raw_data": report_data
+        }
+
+    def _get_bed_context(self, db: Session, bed) -> Dict[str, Any]:
         """Safely resolve bed number, room number, department name, and bed type even if relationships aren't eager-loaded."""
         bed_number = getattr(bed, 'bed_number', None)
         bed_type = getattr(bed, 'bed_type', None)
@@ -172,11 +325,11 @@ class PatientDischargeReportGenerator:
                     department_name = getattr(bed.room.department, 'name', None)
             # Fallback to explicit queries
             if (room_number is None or department_name is None) and getattr(bed, 'room_id', None):
-                room = self.session.query(Room).filter(Room.id == bed.room_id).first()
+                room = db.query(Room).filter(Room.id == bed.room_id).first()
                 if room:
                     room_number = room_number or room.room_number
                     if getattr(room, 'department_id', None):
-                        dept = self.session.query(Department).filter(Department.id == room.department_id).first()
+                        dept = db.query(Department).filter(Department.id == room.department_id).first()
                         if dept:
                             department_name = department_name or dept.name
         except Exception:
@@ -188,22 +341,22 @@ class PatientDischargeReportGenerator:
             "department": department_name
         }
 
-    def _get_patient_summary(self, patient, bed, admission_date, discharge_date) -> Dict[str, Any]:
+    def _get_patient_summary(self, db: Session, patient, bed, admission_date, discharge_date) -> Dict[str, Any]:
         """Get patient demographic and admission summary."""
         # Ensure dates are datetime objects
         if isinstance(admission_date, str):
             admission_date = datetime.fromisoformat(admission_date)
         if isinstance(discharge_date, str):
             discharge_date = datetime.fromisoformat(discharge_date)
-            
+
         # Calculate length of stay safely using date-only difference
         length_of_stay = (discharge_date.date() - admission_date.date()).days
         if length_of_stay < 0:
             length_of_stay = 0
-        
+
         # Resolve bed context robustly
-        bed_info = self._get_bed_context(bed) if bed else {"bed_number": None, "room": None, "bed_type": None, "department": None}
-        
+        bed_info = self._get_bed_context(db, bed) if bed else {"bed_number": None, "room": None, "bed_type": None, "department": None}
+
         return {
             "patient_id": str(patient.id),
             "patient_number": patient.patient_number,
@@ -227,251 +380,132 @@ class PatientDischargeReportGenerator:
             "discharge_date": discharge_date.isoformat(),
             "length_of_stay_days": length_of_stay
         }
-    
-    def _get_treatment_summary(self, patient_id, admission_date, discharge_date) -> List[Dict[str, Any]]:
+
+    # Section builders work on rows from DischargeReportDataLoader. The loader
+    # widens windows by one day and supplies the 10 most recent records when
+    # nothing falls inside the stay window.
+
+    def _get_treatment_summary(self, sections: StaySections) -> List[Dict[str, Any]]:
         """Get all treatments during the stay."""
-        # Make date filtering more inclusive - look for treatments within a reasonable window
-        # Extend the window to catch treatments that might be slightly outside the exact dates
-        extended_start = admission_date - timedelta(days=1) if admission_date else datetime.now() - timedelta(days=30)
-        extended_end = discharge_date + timedelta(days=1) if discharge_date else datetime.now()
-        
-        # Primary query: treatments within the stay period
-        treatments = self.session.query(TreatmentRecord).filter(
-            TreatmentRecord.patient_id == patient_id,
-            TreatmentRecord.start_date >= extended_start,
-            TreatmentRecord.start_date <= extended_end
-        ).all()
-        
-        # Fallback: if no treatments found with date filtering, get recent treatments for this patient
-        if not treatments:
-            treatments = self.session.query(TreatmentRecord).filter(
-                TreatmentRecord.patient_id == patient_id
-            ).order_by(TreatmentRecord.start_date.desc()).limit(10).all()
-        
+        treatments = sections.treatments or sections.recent_treatments[:10]
+
         return [{
-            "treatment_type": t.treatment_type,
-            "treatment_name": t.treatment_name,
-            "description": t.description,
-            "doctor": f"{t.doctor.first_name} {t.doctor.last_name}" if t.doctor else "Unknown",
-            "start_date": t.start_date.isoformat(),
-            "end_date": t.end_date.isoformat() if t.end_date else None,
-            "status": t.status,
-            "effectiveness": t.effectiveness,
-            "notes": t.notes
+            "treatment_type": t["treatment_type"],
+            "treatment_name": t["treatment_name"],
+            "description": t["description"],
+            "doctor": full_name(t["doctor_first_name"], t["doctor_last_name"]),
+            "start_date": t["start_date"].isoformat(),
+            "end_date": t["end_date"].isoformat() if t["end_date"] else None,
+            "status": t["status"],
+            "effectiveness": t["effectiveness"],
+            "notes": t["notes"]
         } for t in treatments]
-    
-    def _get_equipment_summary(self, patient_id, admission_date, discharge_date) -> List[Dict[str, Any]]:
+
+    def _get_equipment_summary(self, sections: StaySections) -> List[Dict[str, Any]]:
         """Get all equipment used during the stay."""
-        # Make date filtering more inclusive - look for equipment usage within a reasonable window
-        extended_start = admission_date - timedelta(days=1) if admission_date else datetime.now() - timedelta(days=30)
-        extended_end = discharge_date + timedelta(days=1) if discharge_date else datetime.now()
-        
-        # Primary query: equipment usage within the stay period
-        equipment_usage = self.session.query(EquipmentUsage).filter(
-            EquipmentUsage.patient_id == patient_id,
-            EquipmentUsage.start_time >= extended_start,
-            EquipmentUsage.start_time <= extended_end
-        ).all()
-        
-        # Fallback: if no equipment usage found with date filtering, get recent usage for this patient
-        if not equipment_usage:
-            equipment_usage = self.session.query(EquipmentUsage).filter(
-                EquipmentUsage.patient_id == patient_id
-            ).order_by(EquipmentUsage.start_time.desc()).limit(10).all()
-        
+        equipment_usage = sections.equipment_usage or sections.recent_equipment_usage
+
         return [{
-            "equipment_name": eu.equipment.name if eu.equipment else "Unknown",
-            "equipment_type": eu.equipment.category.name if eu.equipment and eu.equipment.category else "Unknown",
-            "purpose": eu.purpose,
-            "start_time": eu.start_time.isoformat(),
-            "end_time": eu.end_time.isoformat() if eu.end_time else None,
-            "duration_minutes": eu.duration_minutes,
-            "operated_by": f"{eu.staff.user.first_name} {eu.staff.user.last_name}" if eu.staff and eu.staff.user else "Unknown",
-            "readings": eu.readings,
-            "notes": eu.notes
+            "equipment_name": eu["equipment_name"] or "Unknown",
+            "equipment_type": eu["equipment_category"] or "Unknown",
+            "purpose": eu["purpose"],
+            "start_time": eu["start_time"].isoformat(),
+            "end_time": eu["end_time"].isoformat() if eu["end_time"] else None,
+            "duration_minutes": eu["duration_minutes"],
+            "operated_by": full_name(eu["operator_first_name"], eu["operator_last_name"]),
+            "readings": eu["readings"],
+            "notes": eu["notes"]
         } for eu in equipment_usage]
-    
-    def _get_supply_usage_summary(self, patient_id: str, admission_date: datetime, discharge_date: datetime) -> dict:
+
+    def _get_supply_usage_summary(self, sections: StaySections) -> dict:
         """Get supply usage summary."""
-        # Debug: Print patient_id and its type
-        print(f"🔍 DEBUG: Looking for supply usage for patient_id: {patient_id} (type: {type(patient_id)})")
-        
-        # Convert patient_id to UUID if it's a string
-        try:
-            if isinstance(patient_id, str):
-                patient_uuid = uuid.UUID(patient_id)
-            else:
-                patient_uuid = patient_id
-            print(f"🔍 DEBUG: Converted to UUID: {patient_uuid}")
-        except ValueError:
-            print(f"❌ DEBUG: Invalid UUID format: {patient_id}")
-            return {"total_supplies_used": 0, "supply_details": []}
-        
-        # Make date filtering more inclusive - look for supply usage within a reasonable window
-        extended_start = admission_date - timedelta(days=1) if admission_date else datetime.now() - timedelta(days=30)
-        extended_end = discharge_date + timedelta(days=1) if discharge_date else datetime.now()
-        
-        print(f"🔍 DEBUG: Date range: {extended_start} to {extended_end}")
-        
-        # Primary query: supply usage within the stay period
-        supply_usage = self.session.query(PatientSupplyUsage).filter(
-            PatientSupplyUsage.patient_id == patient_uuid,
-            PatientSupplyUsage.prescribed_date >= extended_start,
-            PatientSupplyUsage.prescribed_date <= extended_end
-        ).all()
-        
-        print(f"🔍 DEBUG: Found {len(supply_usage)} supply usage records with date filter")
-        
-        # Fallback: if no supply usage found with date filtering, get recent usage for this patient
-        if not supply_usage:
-            supply_usage = self.session.query(PatientSupplyUsage).filter(
-                PatientSupplyUsage.patient_id == patient_uuid
-            ).order_by(PatientSupplyUsage.prescribed_date.desc()).limit(10).all()
-            print(f"🔍 DEBUG: Fallback query found {len(supply_usage)} supply usage records")
-        
+        supply_usage = sections.supply_usage or sections.recent_supply_usage
+
         if not supply_usage:
-            print(f"❌ DEBUG: No supply usage found for patient {patient_uuid}")
             return {"total_supplies_used": 0, "supply_details": []}
-        
+
         supply_details = []
         for usage in supply_usage:
-            supply = self.session.query(Supply).filter(Supply.id == usage.supply_id).first()
-            admin_date = usage.administration_date or usage.prescribed_date
-            supply_detail = {
-                "supply_name": supply.name if supply else "Unknown Supply",
-                "supply_code": supply.item_code if supply else "Unknown",
-                "quantity_used": usage.quantity_used,
+            admin_date = usage["administration_date"] or usage["prescribed_date"]
+            supply_details.append({
+                "supply_name": usage["supply_name"] or "Unknown Supply",
+                "supply_code": usage["supply_code"] or "Unknown",
+                "quantity_used": usage["quantity_used"],
                 "date_used": admin_date.strftime("%Y-%m-%d") if admin_date else "N/A",
-                "administered_by": str(usage.administered_by_id) if usage.administered_by_id else "N/A",
-                "notes": usage.notes or "N/A"
-            }
-            supply_details.append(supply_detail)
-            print(f"🔍 DEBUG: Added supply: {supply_detail}")
-        
-        result = {
+                "administered_by": str(usage["administered_by_id"]) if usage["administered_by_id"] else "N/A",
+                "notes": usage["notes"] or "N/A"
+            })
+
+        return {
             "total_supplies_used": len(supply_usage),
             "supply_details": supply_details
         }
-        print(f"✅ DEBUG: Returning supply summary: {result}")
-        return result
 
-    def _get_staff_summary(self, patient_id, admission_date, discharge_date) -> List[Dict[str, Any]]:
+    def _get_staff_summary(self, sections: StaySections, discharge_date) -> List[Dict[str, Any]]:
         """Get all staff assignments during the stay."""
-        staff_assignments = self.session.query(StaffAssignment).filter(
-            StaffAssignment.patient_id == patient_id,
-            StaffAssignment.start_date <= discharge_date,
-            (StaffAssignment.end_date >= admission_date) | (StaffAssignment.end_date.is_(None))
-        ).all()
-        
         return [{
-            "staff_name": f"{sa.staff.user.first_name} {sa.staff.user.last_name}" if sa.staff and sa.staff.user else "Unknown",
-            "position": sa.staff.position if sa.staff else "Unknown",
-            "department": sa.staff.department.name if sa.staff and sa.staff.department else "Unknown",
-            "assignment_type": sa.assignment_type,
-            "start_date": sa.start_date.isoformat(),
-            "end_date": sa.end_date.isoformat() if sa.end_date else discharge_date.isoformat(),
-            "shift": sa.shift,
-            "responsibilities": sa.responsibilities,
-            "notes": sa.notes
-        } for sa in staff_assignments]
-    
-    def _get_medications_summary(self, patient_id, admission_date, discharge_date) -> List[Dict[str, Any]]:
+            "staff_name": full_name(sa["staff_first_name"], sa["staff_last_name"]),
+            "position": sa["position"] or "Unknown",
+            "department": sa["department_name"] or "Unknown",
+            "assignment_type": sa["assignment_type"],
+            "start_date": sa["start_date"].isoformat(),
+            "end_date": sa["end_date"].isoformat() if sa["end_date"] else discharge_date.isoformat(),
+            "shift": sa["shift"],
+            "responsibilities": sa["responsibilities"],
+            "notes": sa["notes"]
+        } for sa in sections.staff_assignments]
+
+    def _get_medications_summary(self, sections: StaySections) -> List[Dict[str, Any]]:
         """Get medication treatments."""
-        # Extended date filtering for more inclusive medication search
-        extended_start = admission_date - timedelta(days=1) if admission_date else datetime.now() - timedelta(days=30)
-        extended_end = discharge_date + timedelta(days=1) if discharge_date else datetime.now()
-        
-        # Primary query: medications within the stay period
-        medications = self.session.query(TreatmentRecord).filter(
-            TreatmentRecord.patient_id == patient_id,
-            TreatmentRecord.treatment_type == "medication",
-            TreatmentRecord.start_date >= extended_start,
-            TreatmentRecord.start_date <= extended_end
-        ).all()
-        
-        # Fallback: if no medications found with date filtering, get recent medications for this patient
-        if not medications:
-            medications = self.session.query(TreatmentRecord).filter(
-                TreatmentRecord.patient_id == patient_id,
-                TreatmentRecord.treatment_type == "medication"
-            ).order_by(TreatmentRecord.start_date.desc()).limit(10).all()
+        medications = sections.treatments_of(["medication"], recent_limit=10)
         meds_list = [{
-            "medication_name": m.treatment_name,
-            "dosage": m.dosage,
-            "frequency": m.frequency,
-            "duration": m.duration,
-            "prescribed_by": f"{m.doctor.first_name} {m.doctor.last_name}" if m.doctor else "Unknown",
-            "start_date": m.start_date.isoformat(),
-            "end_date": m.end_date.isoformat() if m.end_date else None,
-            "status": m.status,
-            "side_effects": m.side_effects,
-            "effectiveness": m.effectiveness
+            "medication_name": m["treatment_name"],
+            "dosage": m["dosage"],
+            "frequency": m["frequency"],
+            "duration": m["duration"],
+            "prescribed_by": full_name(m["doctor_first_name"], m["doctor_last_name"]),
+            "start_date": m["start_date"].isoformat(),
+            "end_date": m["end_date"].isoformat() if m["end_date"] else None,
+            "status": m["status"],
+            "side_effects": m["side_effects"],
+            "effectiveness": m["effectiveness"]
         } for m in medications]
 
-        # Additionally, include medication-like supply usage recorded in PatientSupplyUsage
-        try:
-            from database import PatientSupplyUsage, Supply
-
-            usage_records = self.session.query(PatientSupplyUsage).join(Supply).filter(
-                PatientSupplyUsage.patient_id == patient_id,
-                PatientSupplyUsage.prescribed_date >= extended_start,
-                PatientSupplyUsage.prescribed_date <= extended_end
-            ).all()
-
-            for u in usage_records:
-                # Attempt to classify supply category as medication-like
-                supply_category = (u.supply.category.name.lower() if (getattr(u, 'supply', None) and getattr(u.supply, 'category', None)) else '')
-                if any(k in supply_category for k in ['medication', 'drug', 'pharmaceutical', 'medicine']):
-                    meds_list.append({
-                        "medication_name": u.supply.name if u.supply else 'Unknown',
-                        "dosage": u.dosage or None,
-                        "frequency": u.frequency or None,
-                        "duration": None,
-                        "prescribed_by": (f"{u.prescribed_by.first_name} {u.prescribed_by.last_name}" if getattr(u, 'prescribed_by', None) else None),
-                        "start_date": (u.start_date.isoformat() if getattr(u, 'start_date', None) else (u.prescribed_date.isoformat() if getattr(u, 'prescribed_date', None) else None)),
-                        "end_date": (u.end_date.isoformat() if getattr(u, 'end_date', None) else None),
-                        "status": u.status,
-                        "side_effects": getattr(u, 'side_effects', None),
-                        "effectiveness": getattr(u, 'effectiveness', None)
-                    })
-        except Exception:
-            # If supply models aren't available or join fails, skip silently to avoid breaking report generation
-            pass
+        # Additionally, include medication-like supply usage recorded during the stay
+        for u in sections.supply_usage:
+            if not is_medication_category(u["supply_category"]):
+                continue
+            start = u["start_date"] or u["prescribed_date"]
+            meds_list.append({
+                "medication_name": u["supply_name"] or 'Unknown',
+                "dosage": u["dosage"] or None,
+                "frequency": u["frequency"] or None,
+                "duration": None,
+                "prescribed_by": full_name(u["prescriber_first_name"], u["prescriber_last_name"], default=None),
+                "start_date": start.isoformat() if start else None,
+                "end_date": u["end_date"].isoformat() if u["end_date"] else None,
+                "status": u["status"],
+                "side_effects": u["side_effects"],
+                "effectiveness": u["effectiveness"]
+            })
 
         return meds_list
-    
-    def _get_procedures_summary(self, patient_id, admission_date, discharge_date) -> List[Dict[str, Any]]:
+
+    def _get_procedures_summary(self, sections: StaySections) -> List[Dict[str, Any]]:
         """Get procedure treatments."""
-        # Extended date filtering for more inclusive procedure search
-        extended_start = admission_date - timedelta(days=1) if admission_date else datetime.now() - timedelta(days=30)
-        extended_end = discharge_date + timedelta(days=1) if discharge_date else datetime.now()
-        
-        # Primary query: procedures within the stay period
-        procedures = self.session.query(TreatmentRecord).filter(
-            TreatmentRecord.patient_id == patient_id,
-            TreatmentRecord.treatment_type.in_(["procedure", "surgery", "therapy"]),
-            TreatmentRecord.start_date >= extended_start,
-            TreatmentRecord.start_date <= extended_end
-        ).all()
-        
-        # Fallback: if no procedures found with date filtering, get recent procedures for this patient
-        if not procedures:
-            procedures = self.session.query(TreatmentRecord).filter(
-                TreatmentRecord.patient_id == patient_id,
-                TreatmentRecord.treatment_type.in_(["procedure", "surgery", "therapy"])
-            ).order_by(TreatmentRecord.start_date.desc()).limit(10).all()
-        
+        procedures = sections.treatments_of(PROCEDURE_TYPES, recent_limit=10)
+
         return [{
-            "procedure_name": p.treatment_name,
-            "type": p.treatment_type,
-            "description": p.description,
-            "performed_by": f"{p.doctor.first_name} {p.doctor.last_name}" if p.doctor else "Unknown",
-            "date": p.start_date.isoformat(),
-            "status": p.status,
-            "effectiveness": p.effectiveness,
-            "notes": p.notes
+            "procedure_name": p["treatment_name"],
+            "type": p["treatment_type"],
+            "description": p["description"],
+            "performed_by": full_name(p["doctor_first_name"], p["doctor_last_name"]),
+            "date": p["start_date"].isoformat(),
+            "status": p["status"],
+            "effectiveness": p["effectiveness"],
+            "notes": p["notes"]
         } for p in procedures]
-    
+
     def _format_discharge_report(self, data, report_record) -> str:
         """Format the discharge report as a comprehensive document."""
         patient = data["patient_summary"]
@@ -627,118 +661,78 @@ class PatientDischargeReportGenerator:
         
         return report
     
-    def _find_recent_patient_for_bed(self, bed_id: str) -> Optional[Patient]:
-        """Find the most recent patient who was assigned to this bed."""
+    def _find_recent_patients(self, db: Session, bed_ids: List[uuid.UUID]) -> Dict[uuid.UUID, Patient]:
+        """Most recent patient per bed, from turnover logs, then treatments, equipment usage
+        and staff assignments; one query per source for all beds plus one for the patients."""
+        candidates: Dict[uuid.UUID, List[uuid.UUID]] = {bed_id: [] for bed_id in bed_ids}
+        if not bed_ids:
+            return {}
         try:
-            # Primary fallback: check bed turnover logs for the most recent previous patient
-            try:
-                from database import BedTurnover  # local import to avoid circular refs at module load
-                recent_turnover = (self.session.query(BedTurnover)
-                                   .filter(BedTurnover.bed_id == uuid.UUID(bed_id))
-                                   .order_by(BedTurnover.discharge_time.desc())
-                                   .first())
-                if recent_turnover and recent_turnover.previous_patient_id:
-                    patient = self.session.query(Patient).filter(
-                        Patient.id == recent_turnover.previous_patient_id
-                    ).first()
-                    if patient:
-                        return patient
-            except Exception as e:
-                # Continue with legacy fallbacks
-                print(f"Turnover fallback lookup failed: {e}")
-
-            # Look through treatment records for recent activity on this bed
-            recent_treatment = (self.session.query(TreatmentRecord)
-                              .filter(TreatmentRecord.bed_id == uuid.UUID(bed_id))
-                              .order_by(TreatmentRecord.start_date.desc())
-                              .first())
-            
-            if recent_treatment:
-                return self.session.query(Patient).filter(
-                    Patient.id == recent_treatment.patient_id
-                ).first()
-            
-            # Look through equipment usage for recent activity
-            recent_equipment = (self.session.query(EquipmentUsage)
-                              .filter(EquipmentUsage.bed_id == uuid.UUID(bed_id))
-                              .order_by(EquipmentUsage.start_time.desc())
-                              .first())
-            
-            if recent_equipment:
-                return self.session.query(Patient).filter(
-                    Patient.id == recent_equipment.patient_id
-                ).first()
-            
-            # Look through staff assignments
-            recent_assignment = (self.session.query(StaffAssignment)
-                               .filter(StaffAssignment.bed_id == uuid.UUID(bed_id))
-                               .order_by(StaffAssignment.created_at.desc())
-                               .first())
-            
-            if recent_assignment:
-                return self.session.query(Patient).filter(
-                    Patient.id == recent_assignment.patient_id
-                ).first()
-            
-            return None
-            
+            from database import BedTurnover  # local import to avoid circular refs at module load
+            sources = [
+                (BedTurnover.bed_id, BedTurnover.previous_patient_id, BedTurnover.discharge_time),
+                (TreatmentRecord.bed_id, TreatmentRecord.patient_id, TreatmentRecord.start_date),
+                (EquipmentUsage.bed_id, EquipmentUsage.patient_id, EquipmentUsage.start_time),
+                (StaffAssignment.bed_id, StaffAssignment.patient_id, StaffAssignment.created_at),
+            ]
+            for bed_col, patient_col, time_col in sources:
+                rows = (db.query(bed_col, patient_col)
+                        .filter(bed_col.in_(bed_ids), patient_col.isnot(None))
+                        .distinct(bed_col)
+                        .order_by(bed_col, time_col.desc())
+                        .all())
+                for bed_id, patient_id in rows:
+                    candidates[bed_id].append(patient_id)
+
+            wanted = {patient_id for ids in candidates.values() for patient_id in ids}
+            patients = {p.id: p for p in db.query(Patient).filter(Patient.id.in_(wanted)).all()} if wanted else {}
+            found = {}
+            for bed_id, ids in candidates.items():
+                patient = next((patients[i] for i in ids if i in patients), None)
+                if patient:
+                    found[bed_id] = patient
+            return found
+
         except Exception as e:
-            print(f"Error finding recent patient: {e}")
-            return None
+            print(f"Error finding recent patients: {e}")
+            return {}
 
-    def _find_admission_date_for_patient_bed(self, patient_id: uuid.UUID, bed_id: str) -> Optional[datetime]:
-        """Find the admission date for a patient on a specific bed."""
+    def _find_admission_dates(self, db: Session,
+                              pairs: List[Tuple[uuid.UUID, uuid.UUID]]) -> Dict[Tuple[uuid.UUID, uuid.UUID], datetime]:
+        """Admission date per (patient_id, bed_id): the earliest treatment, equipment usage or
+        staff assignment for that patient on that bed, one grouped query per source.
+        Pairs with no records default to a reasonable estimate (1 day before now)."""
+        default = datetime.now() - timedelta(days=1)
+        dates = {}
+        remaining = list(dict.fromkeys(pairs))
         try:
-            # Ensure patient_id is UUID
-            if isinstance(patient_id, str):
-                patient_id = uuid.UUID(patient_id)
-                
-            # Look for the earliest treatment record for this patient on this bed
-            earliest_treatment = (self.session.query(TreatmentRecord)
-                                .filter(
-                                    TreatmentRecord.patient_id == patient_id,
-                                    TreatmentRecord.bed_id == uuid.UUID(bed_id)
-                                )
-                                .order_by(TreatmentRecord.start_date.asc())
-                                .first())
-            
-            if earliest_treatment:
-                return earliest_treatment.start_date
-            
-            # Look for the earliest equipment usage
-            earliest_equipment = (self.session.query(EquipmentUsage)
-                                .filter(
-                                    EquipmentUsage.patient_id == patient_id,
-                                    EquipmentUsage.bed_id == uuid.UUID(bed_id)
-                                )
-                                .order_by(EquipmentUsage.start_time.asc())
-                                .first())
-            
-            if earliest_equipment:
-                return earliest_equipment.start_time
-            
-            # Look for the earliest staff assignment
-            earliest_assignment = (self.session.query(StaffAssignment)
-                                 .filter(
-                                     StaffAssignment.patient_id == patient_id,
-                                     StaffAssignment.bed_id == uuid.UUID(bed_id)
-                                 )
-                                 .order_by(StaffAssignment.created_at.asc())
-                                 .first())
-            
-            if earliest_assignment:
-                return earliest_assignment.created_at
-            
-            # Default to a reasonable estimate (1 day before now)
-            return datetime.now() - timedelta(days=1)
-            
+            sources = [
+                (TreatmentRecord.patient_id, TreatmentRecord.bed_id, TreatmentRecord.start_date),
+                (EquipmentUsage.patient_id, EquipmentUsage.bed_id, EquipmentUsage.start_time),
+                (StaffAssignment.patient_id, StaffAssignment.bed_id, StaffAssignment.created_at),
+            ]
+            for patient_col, bed_col, time_col in sources:
+                if not remaining:
+                    break
+                rows = (db.query(patient_col, bed_col, func.min(time_col))
+                        .filter(tuple_(patient_col, bed_col).in_(remaining))
+                        .group_by(patient_col, bed_col)
+                        .all())
+                for patient_id, bed_id, earliest in rows:
+                    if earliest:
+                        dates[(patient_id, bed_id)] = earliest
+                remaining = [pair for pair in remaining if pair not in dates]
         except Exception as e:
-            print(f"Error finding admission date: {e}")
-            # Default fallback without invalid .strip()
-            return datetime.now() - timedelta(days=1)
+            print(f"Error finding admission dates: {e}")
+        return {pair: dates.get(pair, default) for pair in pairs}
 
 # Convenience function for easy import
 def generate_patient_discharge_report(**kwargs):
     """Generate a discharge report."""
     generator = PatientDischargeReportGenerator()
     return generator.generate_discharge_report(**kwargs)
+
+def generate_patient_discharge_reports(bed_ids: List[str], **kwargs):
+    """Generate discharge reports for several beds in one batch."""
+    generator = PatientDischargeReportGenerator()
+    return generator.generate_discharge_reports(bed_ids, **kwargs)
@@ -0,0 +1,434 @@
+"""
+Email Outbox
+============
+
+Persistent, asynchronous delivery for meeting notifications and ``send_email``:
+- Callers render their messages and ``enqueue`` them in one
+  ``INSERT ... ON CONFLICT (dedup_key) DO NOTHING`` statement, then return;
+  nobody waits on SMTP inside a tool call
+- Meeting mail is deduplicated per (category, meeting, recipient, revision),
+  so enqueueing the same notification again never mails the same person
+  twice; revisions only move forward (reschedules use the meeting's
+  ``updated_at``), so a meeting moved back to an earlier time is still announced
+- ``OutboxSender`` claims due rows with ``FOR UPDATE SKIP LOCKED`` and sends
+  them over a small pool of long-lived SMTP connections (one STARTTLS/login
+  per connection, many messages per session) from parallel workers
+- Failures are retried with exponential backoff; refused recipients and
+  exhausted retries end as ``failed`` with the last error kept on the row,
+  and rows stranded in ``sending`` by a crash are reclaimed
+- Due and stale checks use the database clock, the same one that stamps the rows
+- Without SMTP credentials messages are only queued; no sender thread is started
+
+Usage:
+    python email_outbox.py              # deliver everything that is due, once
+    python email_outbox.py --benchmark  # pooled vs per-message SMTP (see email_outbox_benchmark.py)
+"""
+
+import os
+import queue
+import smtplib
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import func, text, update
+from sqlalchemy.dialects.postgresql import insert
+
+from database import EmailOutbox, SessionLocal
+
+load_dotenv()
+
+POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+BATCH_SIZE = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", "200"))
+POLL_SECONDS = int(os.getenv("EMAIL_OUTBOX_POLL_SECONDS", "30"))
+MAX_ATTEMPTS = 6
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+IDLE_CHECK_SECONDS = 60
+STALE_SENDING_MINUTES = 10
+
+# Due times are written by the database (column defaults, claimed_at + backoff), so the
+# claim compares them with the database clock as well, never the application host's
+_CLAIM_SQL = text("""
+    UPDATE email_outbox o
+    SET status = 'sending', attempts = o.attempts + 1, updated_at = now()
+    WHERE o.id IN (
+        SELECT id FROM email_outbox
+        WHERE next_attempt_at <= now()
+          AND (status = 'pending' OR (status = 'sending'
+                                      AND updated_at < now() - make_interval(mins => :stale_minutes)))
+        ORDER BY next_attempt_at
+        LIMIT :batch
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING o.id, o.recipient, o.sender, o.subject, o.body, o.attempts, o.updated_at AS claimed_at
+""")
+
+
+@dataclass
+class OutboxMessage:
+    """One rendered email waiting to be queued."""
+
+    recipient: str
+    subject: str
+    body: str
+    sender: str
+    category: str = "ad_hoc"
+    meeting_id: Optional[str] = None
+    revision: Optional[str] = None
+
+    @property
+    def dedup_key(self) -> str:
+        if not self.meeting_id:
+            # Ad hoc mail has no natural identity; every call is a new message
+            return f"{self.category}:{uuid.uuid4().hex}"
+        return f"{self.category}:{self.meeting_id}:{self.recipient.strip().lower()}:{self.revision or ''}"
+
+
+def smtp_settings() -> Dict[str, Any]:
+    """SMTP connection settings from the environment (same variables as before)."""
+    username = os.getenv("EMAIL_USERNAME")
+    return {
+        "host": os.getenv("SMTP_SERVER", "smtp.gmail.com"),
+        "port": int(os.getenv("SMTP_PORT", "587")),
+        "username": username,
+        "password": os.getenv("EMAIL_PASSWORD"),
+        "use_tls": os.getenv("SMTP_USE_TLS", "true").lower() != "false",
+    }
+
+
+def default_sender(from_name: str = None) -> str:
+    name = from_name or os.getenv("EMAIL_FROM_NAME", "Hospital Management System")
+    return f"{name} <{os.getenv('EMAIL_FROM_ADDRESS', os.getenv('EMAIL_USERNAME'))}>"
+
+
+def email_configured() -> bool:
+    return bool(os.getenv("EMAIL_USERNAME") and os.getenv("EMAIL_PASSWORD"))
+
+
+class SMTPPool:
+    """Bounded pool of authenticated SMTP connections reused across messages."""
+
+    def __init__(self, host: str, port: int, username: str = None, password: str = None,
+                 use_tls: bool = True, size: int = POOL_SIZE, timeout: int = 30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.size = size
+        self.timeout = timeout
+        self.connects = 0
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            server.starttls()
+        if self.username:
+            server.login(self.username, self.password)
+        self.connects += 1
+        return server
+
+    def acquire(self) -> smtplib.SMTP:
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    server, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if time.monotonic() - last_used < IDLE_CHECK_SECONDS:
+                    return server
+                # Long idle connections are often dropped by the server; probe first
+                try:
+                    if server.noop()[0] == 250:
+                        return server
+                except smtplib.SMTPException:
+                    pass
+                self._close(server)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, server: smtplib.SMTP, broken: bool = False):
+        if broken:
+            self._close(server)
+        else:
+            self._idle.put((server, time.monotonic()))
+        self._slots.release()
+
+    @staticmethod
+    def _close(server: smtplib.SMTP):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def close(self):
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(server)
+
+
+def _mime(row) -> MIMEMultipart:
+    msg = MIMEMultipart()
+    msg["From"] = row.sender
+    msg["To"] = row.recipient
+    msg["Subject"] = row.subject
+    msg.attach(MIMEText(row.body, "plain"))
+    return msg
+
+
+def send_chunk(pool: SMTPPool, rows: List[Any]) -> Dict[Any, Optional[Exception]]:
+    """Send rows over one pooled connection; returns row id -> error (None when sent)."""
+    results: Dict[Any, Optional[Exception]] = {}
+    server = None
+    try:
+        for row in rows:
+            for attempt in range(2):
+                if server is None:
+                    server = pool.acquire()
+                try:
+                    server.send_message(_mime(row))
+                    results[row.id] = None
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as e:
+                    # Rejected message; the session stays usable for the next one
+                    results[row.id] = e
+                except (smtplib.SMTPServerDisconnected, OSError) as e:
+                    # Pooled session was dropped: reconnect once and resend this message
+                    pool.release(server, broken=True)
+                    server = None
+                    results[row.id] = e
+                    continue
+                break
+    except Exception as e:
+        # Relay unreachable: leave the rest of the chunk for the next attempt
+        for row in rows:
+            results.setdefault(row.id, e)
+    finally:
+        if server is not None:
+            pool.release(server)
+    return results
+
+
+def _permanent(error: Exception) -> bool:
+    """Refused recipients and 5xx replies will not succeed on retry."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    code = getattr(error, "smtp_code", None)
+    return isinstance(code, int) and 500 <= code < 600
+
+
+def backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** max(attempts - 1, 0), BACKOFF_MAX_SECONDS))
+
+
+class EmailOutboxService:
+    """Queues messages and delivers due ones through a shared SMTP pool."""
+
+    def __init__(self, session_factory=SessionLocal, pool: SMTPPool = None):
+        self.session_factory = session_factory
+        self._pool = pool
+        self._pool_lock = threading.Lock()
+        self.sender: Optional["OutboxSender"] = None
+
+    @property
+    def pool(self) -> SMTPPool:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = SMTPPool(**smtp_settings())
+            return self._pool
+
+    def enqueue(self, messages: List[OutboxMessage]) -> Dict[str, Any]:
+        """Persist messages for delivery (duplicates are skipped) and wake the sender."""
+        if not messages:
+            return {"success": True, "queued": 0, "duplicates": 0, "ids": []}
+        rows = {}
+        for message in messages:
+            rows.setdefault(message.dedup_key, {
+                "id": uuid.uuid4(),
+                "dedup_key": message.dedup_key,
+                "category": message.category,
+                "meeting_id": uuid.UUID(str(message.meeting_id)) if message.meeting_id else None,
+                "recipient": message.recipient,
+                "sender": message.sender,
+                "subject": message.subject,
+                "body": message.body,
+                "status": "pending",
+                "attempts": 0,
+            })
+        db = self.session_factory()
+        try:
+            ids = db.execute(
+                insert(EmailOutbox).values(list(rows.values()))
+                .on_conflict_do_nothing(index_elements=["dedup_key"])
+                .returning(EmailOutbox.id)
+            ).scalars().all()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            return {"success": False, "queued": 0, "duplicates": 0, "ids": [], "message": str(e)}
+        finally:
+            db.close()
+
+        if ids and email_configured():
+            self.ensure_sender().wake()
+        return {
+            "success": True,
+            "queued": len(ids),
+            "duplicates": len(messages) - len(ids),
+            "ids": [str(i) for i in ids],
+        }
+
+    def deliver_due(self, batch_size: int = BATCH_SIZE) -> Dict[str, int]:
+        """Claim one batch of due messages, send it in parallel chunks, record outcomes."""
+        db = self.session_factory()
+        try:
+            rows = db.execute(_CLAIM_SQL, {
+                "stale_minutes": STALE_SENDING_MINUTES,
+                "batch": batch_size,
+            }).all()
+            db.commit()
+        except Exception:
+            db.rollback()
+            db.close()
+            raise
+        if not rows:
+            db.close()
+            return {"claimed": 0, "sent": 0, "retrying": 0, "failed": 0}
+
+        pool = self.pool
+        workers = max(1, min(pool.size, len(rows)))
+        chunks = [rows[i::workers] for i in range(workers)]
+        results: Dict[Any, Optional[Exception]] = {}
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="email-outbox") as executor:
+            for chunk, future in [(c, executor.submit(send_chunk, pool, c)) for c in chunks]:
+                try:
+                    results.update(future.result())
+                except Exception as e:
+                    results.update({row.id: e for row in chunk})
+
+        sent_ids = [row_id for row_id, error in results.items() if error is None]
+        changes = []
+        failed = 0
+        for row in rows:
+            error = results.get(row.id)
+            if error is None:
+                continue
+            if _permanent(error) or row.attempts >= MAX_ATTEMPTS:
+                failed += 1
+                changes.append({"id": row.id, "status": "failed", "last_error": str(error)[:1000]})
+            else:
+                changes.append({"id": row.id, "status": "pending", "last_error": str(error)[:1000],
+                                "next_attempt_at": row.claimed_at + backoff(row.attempts)})
+        try:
+            if sent_ids:
+                db.execute(
+                    update(EmailOutbox).where(EmailOutbox.id.in_(sent_ids))
+                    .values(status="sent", sent_at=func.now(), last_error=None),
+                    execution_options={"synchronize_session": False},
+                )
+            if changes:
+                db.execute(update(EmailOutbox), changes)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        return {"claimed": len(rows), "sent": len(sent_ids),
+                "retrying": len(changes) - failed, "failed": failed}
+
+    def status(self, meeting_id: str = None) -> Dict[str, int]:
+        """Message counts by delivery status (optionally for one meeting)."""
+        db = self.session_factory()
+        try:
+            sql = "SELECT status, count(*) FROM email_outbox"
+            params = {}
+            if meeting_id:
+                sql += " WHERE meeting_id = CAST(:meeting_id AS uuid)"
+                params["meeting_id"] = str(meeting_id)
+            return dict(db.execute(text(sql + " GROUP BY status"), params).all())
+        finally:
+            db.close()
+
+    def ensure_sender(self) -> "OutboxSender":
+        if self.sender is None:
+            self.sender = OutboxSender(self)
+        self.sender.start()
+        return self.sender
+
+
+class OutboxSender:
+    """Delivers due outbox messages on a daemon thread; ``wake`` skips the poll wait."""
+
+    def __init__(self, service: EmailOutboxService, poll_seconds: int = POLL_SECONDS):
+        self.service = service
+        self.poll_seconds = poll_seconds
+        self.last_result: Optional[Dict[str, int]] = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                result = self.service.deliver_due()
+                self.last_result = result
+                if result["claimed"]:
+                    print(f"📧 Outbox: {result['sent']} sent, {result['retrying']} retrying, "
+                          f"{result['failed']} failed")
+                    continue  # Drain the backlog before waiting again
+            except Exception as e:
+                print(f"⚠️ Email outbox delivery failed: {e}")
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="email-outbox-sender", daemon=True)
+            self._thread.start()
+            print(f"📧 Email outbox sender running (pool of {self.service.pool.size} SMTP connections)")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+
+
+# Global outbox shared by the meeting scheduler and the MCP server
+email_outbox = EmailOutboxService()
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    if "--benchmark" in sys.argv:
+        from email_outbox_benchmark import run_benchmark
+        run_benchmark()
+    else:
+        print(json.dumps(email_outbox.deliver_due(), indent=2))
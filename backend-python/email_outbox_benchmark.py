@@ -0,0 +1,107 @@
+"""
+Email Outbox Benchmark
+======================
+
+Development helper for email_outbox.py, kept out of the production module:
+- A local stand-in SMTP server that accepts every message, counts what it
+  receives and sleeps on connect to simulate TCP + TLS + AUTH on a real relay
+- Per-message connections (the old behaviour of each tool call) vs the pooled
+  ``send_chunk`` workers against that server; no database needed
+
+Usage:
+    python email_outbox_benchmark.py    # or: python email_outbox.py --benchmark
+"""
+
+import smtplib
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from email_outbox import POOL_SIZE, SMTPPool, _mime, send_chunk
+
+
+class _StandInSMTPHandler(socketserver.StreamRequestHandler):
+    """Minimal SMTP server: accepts everything, counts messages, simulates handshake cost."""
+
+    def _reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        time.sleep(self.server.handshake_delay)  # TCP + TLS + AUTH on a real relay
+        self._reply("220 stand-in ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self._reply("250 stand-in")
+            elif command == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                with self.server.lock:
+                    self.server.received += 1
+                self._reply("250 OK queued")
+            elif command.startswith("QUIT"):
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("250 OK")
+
+
+def start_stand_in_smtp(handshake_delay: float = 0.05):
+    """Local SMTP stand-in on a free port; returns the running server."""
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _StandInSMTPHandler)
+    server.daemon_threads = True
+    server.handshake_delay = handshake_delay
+    server.received = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_benchmark(recipients: int = 300, handshake_delay: float = 0.05):
+    """Per-message connections (old behaviour per tool call) vs the pooled sender, no database needed."""
+    smtp = start_stand_in_smtp(handshake_delay)
+    host, port = smtp.server_address
+
+    @dataclass
+    class Row:
+        id: int
+        recipient: str
+        sender: str = "Hospital Management System <noreply@example.org>"
+        subject: str = "Staff meeting"
+        body: str = "Agenda attached."
+
+    rows = [Row(i, f"staff{i}@example.org") for i in range(recipients)]
+    try:
+        started = time.perf_counter()
+        for row in rows:
+            server = smtplib.SMTP(host, port)
+            server.send_message(_mime(row))
+            server.quit()
+        fresh = time.perf_counter() - started
+
+        pool = SMTPPool(host, port, use_tls=False, size=POOL_SIZE)
+        started = time.perf_counter()
+        chunks = [rows[i::pool.size] for i in range(pool.size)]
+        with ThreadPoolExecutor(max_workers=pool.size) as executor:
+            outcomes = [r for f in [executor.submit(send_chunk, pool, c) for c in chunks] for r in f.result().values()]
+        pooled = time.perf_counter() - started
+        pool.close()
+
+        print(f"{recipients} recipients, {handshake_delay * 1000:.0f} ms simulated connection setup")
+        print(f"Connection per message: {fresh:.2f}s ({recipients} connections)")
+        print(f"Pooled sender:          {pooled:.2f}s ({pool.connects} connections, "
+              f"{sum(1 for o in outcomes if o is None)} delivered)")
+        print(f"Stand-in server received {smtp.received} messages")
+    finally:
+        smtp.shutdown()
+        smtp.server_close()
+
+
+if __name__ == "__main__":
+    run_benchmark()
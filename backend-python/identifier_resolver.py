@@ -0,0 +1,202 @@
+"""
+Identifier Resolution Service
+=============================
+
+Resolves the codes people type (patient numbers, equipment codes, employee
+IDs, supply item codes) and internal UUIDs to rows, for many identifiers
+at once:
+- Exact lookups on the unique ``patient_number`` / ``equipment_id`` /
+  ``employee_id`` / ``item_code`` indexes, never a substring search, so
+  ``P10`` cannot resolve to ``P1001``
+- Every kind requested is resolved in one ``UNION ALL`` round trip with
+  ``= ANY(array)`` per kind, however many identifiers a batch carries
+- Codes are also tried upper-cased (``eq001`` -> ``EQ001``); UUIDs match the
+  primary key, and for staff also ``user_id``
+- Read-only: no audit rows are written for lookups
+- Used by the equipment usage tools and medication rounds
+
+Usage:
+    python identifier_resolver.py --benchmark   # per-identifier lookups vs one batched round trip
+"""
+
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+
+# kind -> (table, code column, user id column or None)
+IDENTIFIER_KINDS = {
+    "patient": ("patients", "patient_number", None),
+    "equipment": ("equipment", "equipment_id", None),
+    "staff": ("staff", "employee_id", "user_id"),
+    "supply": ("supplies", "item_code", None),
+}
+
+_KIND_SQL = """
+    SELECT '{kind}' AS kind, id, {code} AS code, {user_id} AS user_id
+    FROM {table}
+    WHERE {code} = ANY(CAST(:{kind}_codes AS varchar[])) OR id = ANY(CAST(:{kind}_ids AS uuid[])){user_match}
+"""
+
+
+def as_uuid(value) -> Optional[uuid.UUID]:
+    """The value as a UUID, or None when it is a code."""
+    if isinstance(value, uuid.UUID):
+        return value
+    try:
+        return uuid.UUID(str(value).strip())
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+class Resolution:
+    """Resolved rows by (kind, identifier as given)."""
+
+    def __init__(self):
+        self._rows: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    def add(self, kind: str, key: str, row: Dict[str, Any]):
+        self._rows[(kind, key)] = row
+
+    def get(self, kind: str, identifier) -> Optional[Dict[str, Any]]:
+        """``{"id", "code", "user_id"}`` for an identifier, or None when it did not resolve."""
+        if identifier is None:
+            return None
+        key = str(identifier).strip()
+        return self._rows.get((kind, key)) or self._rows.get((kind, key.upper()))
+
+    def id(self, kind: str, identifier) -> Optional[uuid.UUID]:
+        row = self.get(kind, identifier)
+        return row["id"] if row else None
+
+
+class IdentifierResolver:
+    """Batched exact resolution of codes and UUIDs to row ids."""
+
+    def __init__(self):
+        self._statements: Dict[Tuple[str, ...], Any] = {}
+
+    def _statement(self, kinds: Tuple[str, ...]):
+        statement = self._statements.get(kinds)
+        if statement is None:
+            parts = []
+            for kind in kinds:
+                table, code, user_id = IDENTIFIER_KINDS[kind]
+                parts.append(_KIND_SQL.format(
+                    kind=kind, table=table, code=code,
+                    user_id=user_id or "CAST(NULL AS uuid)",
+                    user_match=f" OR {user_id} = ANY(CAST(:{kind}_ids AS uuid[]))" if user_id else ""))
+            statement = self._statements[kinds] = text("UNION ALL".join(parts))
+        return statement
+
+    def resolve(self, db: Session, identifiers: Dict[str, Iterable[Any]]) -> Resolution:
+        """Resolve ``{kind: identifiers}`` in one round trip; unknown identifiers are simply absent."""
+        params: Dict[str, Any] = {}
+        kinds = []
+        for kind in sorted(identifiers):
+            if kind not in IDENTIFIER_KINDS:
+                raise ValueError(f"Unknown identifier kind: {kind}")
+            codes, ids = set(), set()
+            for identifier in identifiers[kind]:
+                if identifier is None or str(identifier).strip() == "":
+                    continue
+                value = as_uuid(identifier)
+                if value:
+                    ids.add(value)
+                else:
+                    code = str(identifier).strip()
+                    codes.update((code, code.upper()))
+            if codes or ids:
+                kinds.append(kind)
+                params[f"{kind}_codes"] = sorted(codes)
+                params[f"{kind}_ids"] = sorted(ids, key=str)
+
+        resolution = Resolution()
+        if not kinds:
+            return resolution
+        for row in db.execute(self._statement(tuple(kinds)), params):
+            resolved = {"id": row.id, "code": row.code, "user_id": row.user_id}
+            resolution.add(row.kind, row.code, resolved)
+            resolution.add(row.kind, str(row.id), resolved)
+            if row.user_id:
+                resolution.add(row.kind, str(row.user_id), resolved)
+        return resolution
+
+    def resolve_one(self, db: Session, kind: str, identifier) -> Optional[Dict[str, Any]]:
+        return self.resolve(db, {kind: [identifier]}).get(kind, identifier)
+
+
+# Global resolver shared by the agents and the MCP server
+identifier_resolver = IdentifierResolver()
+
+
+def missing_identifiers(resolution: Resolution, wanted: List[Tuple[str, str, Any]]) -> List[str]:
+    """Error messages for the ``(kind, label, identifier)`` entries that did not resolve."""
+    return [f"{label} '{identifier}' not found" for kind, label, identifier in wanted
+            if identifier and resolution.get(kind, identifier) is None]
+
+
+def run_benchmark(events: int = 200):
+    """Resolve the identifiers of N usage events one lookup at a time vs one batched round trip."""
+    import time
+
+    from sqlalchemy import event
+
+    from database import SessionLocal, engine
+
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    db = SessionLocal()
+    try:
+        patients = [row[0] for row in db.execute(text("SELECT patient_number FROM patients LIMIT 50"))]
+        equipment = [row[0] for row in db.execute(text("SELECT equipment_id FROM equipment LIMIT 50"))]
+        staff = [row[0] for row in db.execute(text("SELECT employee_id FROM staff LIMIT 50"))]
+        if not (patients and equipment and staff):
+            print("⚠️ Resolver benchmark skipped: needs patients, equipment and staff")
+            return
+        usage = [(patients[i % len(patients)], equipment[i % len(equipment)], staff[i % len(staff)])
+                 for i in range(events)]
+
+        event.listen(engine, "before_cursor_execute", count_statement)
+        started = time.perf_counter()
+        for patient, item, employee in usage:
+            identifier_resolver.resolve_one(db, "patient", patient)
+            identifier_resolver.resolve_one(db, "equipment", item)
+            identifier_resolver.resolve_one(db, "staff", employee)
+        single_ms = (time.perf_counter() - started) * 1000
+        single_statements = len(statements)
+
+        statements.clear()
+        started = time.perf_counter()
+        resolution = identifier_resolver.resolve(db, {
+            "patient": [u[0] for u in usage], "equipment": [u[1] for u in usage], "staff": [u[2] for u in usage]
+        })
+        batch_ms = (time.perf_counter() - started) * 1000
+        event.remove(engine, "before_cursor_execute", count_statement)
+
+        unresolved = sum(1 for patient, item, employee in usage
+                         if not (resolution.get("patient", patient) and resolution.get("equipment", item)
+                                 and resolution.get("staff", employee)))
+        print(f"{events} usage events ({3 * events} identifiers):")
+        print(f"  One lookup per identifier  {single_statements:5d} round trips  {single_ms:8.1f} ms")
+        print(f"  Batched resolution         {len(statements):5d} round trips  {batch_ms:8.1f} ms  "
+              f"({unresolved} unresolved)")
+    except Exception as e:
+        print(f"⚠️ Resolver benchmark skipped: {e}")
+    finally:
+        db.rollback()
+        db.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--benchmark" in sys.argv:
+        run_benchmark()
+    else:
+        print(__doc__)
@@ -0,0 +1,751 @@
+"""
+Meeting Query Parser
+====================
+
+Single-pass parser for natural-language meeting requests:
+- One master regular expression, compiled at import, tokenizes the query
+  into typed tokens (dates, times, durations, weekdays, actions, quoted
+  titles, meeting/department IDs, connectors, words) in a single scan
+- ``MeetingIntent`` is built from that token stream: action, title (or the
+  title of the meeting being changed), participants, date/time, duration,
+  department and meeting ID
+- Replaces the per-call regex chains in ``MeetingSchedulerAgent`` and the
+  cancel/reschedule check in the orchestrator's ``route_request``
+- For reschedules the last date/time/duration mentioned wins, so
+  "move the 2pm meeting to 4pm" lands at 4pm
+
+Usage:
+    python meeting_parser.py "Schedule a meeting with Sarah and John tomorrow at 2pm for 1 hour"
+    python meeting_parser.py --benchmark   # corpus accuracy + parse latency (exits 1 on a regression)
+"""
+
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+
+
+ALL_STAFF = "ALL_STAFF_REQUEST"
+DEFAULT_DURATION = (15, "15 minutes")
+DEFAULT_TITLE = "Hospital Staff Meeting"
+
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "fifteen": 15,
+    "twenty": 20, "thirty": 30, "forty": 40, "fortyfive": 45, "sixty": 60, "ninety": 90,
+}
+DAYPART_HOURS = {"morning": 9, "noon": 12, "midday": 12, "afternoon": 14, "evening": 19, "night": 19, "tonight": 19}
+ACRONYMS = {"ai", "it", "er", "icu", "hr", "qa", "qr", "ui", "ux", "opd", "ot"}
+GENERIC_TITLES = {"all hospital staff", "hospital staff", "staff meeting", "meeting", "all staff"}
+HONORIFICS = {"dr", "doctor", "nurse", "mr", "mrs", "ms", "miss", "prof", "professor"}
+DEPARTMENTS = {
+    "cardiology": "Cardiology", "emergency": "Emergency", "icu": "ICU", "intensive care": "ICU",
+    "pediatrics": "Pediatrics", "paediatrics": "Pediatrics", "neurology": "Neurology",
+    "orthopedics": "Orthopedics", "orthopaedics": "Orthopedics", "oncology": "Oncology",
+    "radiology": "Radiology", "surgery": "Surgery", "maternity": "Maternity",
+    "psychiatry": "Psychiatry", "pharmacy": "Pharmacy", "laboratory": "Laboratory",
+    "general medicine": "General Medicine",
+}
+# Surnames recognised even without "with"/"between" (kept from the original scheduler)
+KNOWN_NAMES = frozenset("""
+    shamil nazif mohamed sarah johnson smith brown davis wilson miller moore taylor anderson thomas
+    jackson white harris martin thompson garcia martinez robinson clark rodriguez lewis lee walker
+    hall allen young hernandez king wright lopez hill scott green adams baker gonzalez nelson carter
+    mitchell perez roberts turner phillips campbell parker evans edwards collins stewart sanchez morris
+    rogers reed cook morgan bell murphy bailey rivera cooper richardson cox howard ward torres peterson
+    gray ramirez james watson brooks kelly sanders price bennett wood barnes ross henderson coleman
+    jenkins perry powell long patterson hughes flores washington butler simmons foster gonzales bryant
+    alexander russell griffin diaz hayes
+""".split())
+
+# Words that end a participant list or a title phrase
+STOP_WORDS = frozenset("""
+    a an the at on to for about regarding re in into from by of until till before after via is are be
+    meeting meetings call session discussion sync huddle tomorrow today tonight next this please
+    needs need it our my we us i you schedule book arrange organize organise plan set up and or
+    staff all everyone everybody room conference online virtual google meet link zoom
+    that which who so can could would should will also then
+""".split())
+TITLE_KINDS = frozenset({"WORD", "NUMBER", "DEPT_NAME", "SHIFT_NAME"})
+TITLE_FILLER = frozenset("the a an to of in at on for".split())
+NOUN_MEETING = frozenset("meeting meetings call session discussion sync huddle".split())
+PARTICIPANT_INTRO = frozenset("with between invite inviting including include".split())
+TOPIC_INTRO = frozenset("about regarding discuss discussing re on for".split())
+REFERENCE_INTRO = frozenset("titled called named".split())
+
+_UUID = r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+_MONTH = (r"jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+          r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?")
+
+# Order matters: earlier alternatives win at the same position
+_TOKEN_SPEC = [
+    ("DEPT_ID", rf"department[_\s]?id\s*[:=]?\s*(?P<dept_uuid>{_UUID})"),
+    ("MEETING_ID", rf"(?:meeting[_\s]?)?id\s*[:#=]?\s*(?P<mid>{_UUID}|[0-9a-f]{{6,}}(?:-[0-9a-f]+)*)(?![\w-])"
+                   rf"|\#(?P<hid>[0-9a-f][0-9a-f-]{{3,}})(?![\w-])"),
+    ("UUID", _UUID),
+    ("MARKER", r"(?:exact\s*title|subject|title|topic)\s*[:\-]\s*"),
+    ("QUOTED", r"[\"“”](?P<dq>[^\"“”]{2,}?)[\"“”]|(?<!\w)'(?P<sq>[^']{2,}?)'(?!\w)"),
+    ("DATE_YMD", r"(?P<ymd_y>\d{4})[-/](?P<ymd_m>\d{1,2})[-/](?P<ymd_d>\d{1,2})"),
+    ("DATE_MDY", r"(?P<mdy_m>\d{1,2})[-/](?P<mdy_d>\d{1,2})[-/](?P<mdy_y>\d{4})"),
+    ("DATE_MONTH", rf"(?P<md_mon>{_MONTH})\.?\s+(?P<md_day>\d{{1,2}})(?:st|nd|rd|th)?\b(?:,?\s+(?P<md_year>\d{{4}}))?"),
+    ("DATE_DAYMONTH", rf"(?P<dm_day>\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?(?P<dm_mon>{_MONTH})\b\.?(?:,?\s+(?P<dm_year>\d{{4}}))?"),
+    ("DURATION", r"(?P<dur_h>\d+(?:\.\d+)?)\s*(?:hours?|hrs?|h)\b(?:\s*(?:and\s*)?(?P<dur_hm>\d+)\s*(?:minutes?|mins?|m)\b)?"
+                 r"|(?P<dur_m>\d+)\s*(?:minutes?|mins?|m)\b"
+                 r"|(?P<dur_hh>(?:an?|one)\s+hour\s+and\s+a\s+half|hour\s+and\s+(?:a\s+)?half|half\s+(?:an\s+)?hour)"
+                 r"|(?P<dur_wh>an?|one|two|three|four)\s+hours?\b"
+                 r"|(?P<dur_wm>fifteen|twenty|thirty|forty[-\s]?five|forty|sixty|ninety)\s+min(?:ute)?s?\b"),
+    ("TIME", r"(?P<t_h>\d{1,2})(?:[:.](?P<t_m>\d{2}))?\s*(?P<t_p>[ap])\.?m\b\.?"
+             r"|(?P<oc_h>\d{1,2})\s*o'?clock"
+             r"|(?P<h24>[01]?\d|2[0-3]):(?P<m24>[0-5]\d)(?![\d:])"
+             r"|(?P<t_word>noon|midday|midnight)"),
+    ("BARE_HOUR", r"(?<=at\s)(?P<bare>\d{1,2})(?![\d:./-])(?!\s*(?:hours?|hrs?|h|minutes?|mins?|m|days?|st|nd|rd|th)\b)"),
+    ("IN_DAYS", r"in\s+(?P<in_n>\d+|one|two|three|four|five|six)\s+(?P<in_unit>days?|weeks?)"),
+    ("RELDAY", r"(?P<rel>day\s+after\s+tomorrow|tomorrow|tmrw|today|tonight|next\s+week)\b"),
+    ("WEEKDAY", r"(?:(?P<wd_next>next)\s+)?(?P<wday>monday|tuesday|wednesday|thursday|friday|saturday|sunday)s?\b"),
+    ("SHIFT_NAME", r"(?:night|day|morning|evening|late|early)\s+shifts?\b"),
+    ("DAYPART", r"(?P<part>morning|afternoon|evening|night)\b"),
+    ("ALL_STAFF", r"all\s+(?:of\s+)?(?:the\s+)?(?:hospital\s+)?(?:staffs?|employees|team\s+members|members)\b"
+                  r"|everyone|everybody|entire\s+(?:staff|team)|whole\s+(?:staff|team)"),
+    ("CANCEL", r"cancel(?:l?ed|l?ation|s)?\b|call(?:ed|ing)?[\s-]?off|abort(?:ed)?|stop\s+meeting"),
+    ("RESCHEDULE", r"reschedul\w*|postpon\w*|push(?:ed)?\s+(?:it\s+)?back|mov(?:e|ed|ing)\b|shift(?:ed)?\b|delay(?:ed)?\b"
+                   r"|bring\s+(?:it\s+)?forward|earlier\b|later\b"),
+    ("UPDATE", r"updat(?:e|ed|ing)\b|chang(?:e|ed|ing)\b|edit\b|modify\b"),
+    ("SCHEDULE", r"schedul(?:e|ed|ing)\b|book\b|set\s+up\b|arrange\b|organi[sz]e\b|plan\b|create\b|host\b"),
+    ("DEPT_NAME", r"(?P<dept_name>cardiology|emergency|icu|intensive\s+care|p(?:a)?ediatrics|neurology|orthop(?:a)?edics"
+                  r"|oncology|radiology|surgery|maternity|psychiatry|pharmacy|laboratory|general\s+medicine)\b"
+                  r"(?:\s+(?:department|dept|unit|ward|team)\b)?"),
+    ("AMP", r"&"),
+    ("COMMA", r"[,;]"),
+    ("NUMBER", r"\d+"),
+    ("WORD", r"[a-z][a-z'\-]*"),
+]
+TOKEN_RE = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in _TOKEN_SPEC), re.IGNORECASE)
+_SUBGROUPS = {name: re.compile(pattern).groupindex.keys() for name, pattern in _TOKEN_SPEC}
+TEMPORAL = frozenset({"DATE_YMD", "DATE_MDY", "DATE_MONTH", "DATE_DAYMONTH", "TIME", "BARE_HOUR",
+                      "IN_DAYS", "RELDAY", "WEEKDAY", "DAYPART", "DURATION"})
+ACTIONS = {"CANCEL": "cancel", "RESCHEDULE": "reschedule", "UPDATE": "update", "SCHEDULE": "schedule"}
+
+
+@dataclass
+class Token:
+    kind: str
+    text: str
+    start: int
+    groups: Dict[str, str]
+
+    @property
+    def lower(self) -> str:
+        return self.text.lower()
+
+
+@dataclass
+class MeetingIntent:
+    """Structured result of parsing one meeting request."""
+
+    action: str = "schedule"  # schedule, reschedule, update, cancel
+    title: str = DEFAULT_TITLE
+    meeting_reference: Optional[str] = None  # title of an existing meeting being changed
+    meeting_id: Optional[str] = None
+    participants: List[str] = field(default_factory=list)  # names, or [ALL_STAFF]
+    meeting_datetime: Optional[datetime] = None
+    has_date: bool = False
+    has_time: bool = False
+    duration_minutes: int = DEFAULT_DURATION[0]
+    duration_string: str = DEFAULT_DURATION[1]
+    has_duration: bool = False
+    department: Optional[str] = None  # department name
+    department_id: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def all_staff(self) -> bool:
+        return self.participants == [ALL_STAFF]
+
+    def to_dict(self) -> Dict:
+        return {
+            "action": self.action,
+            "title": self.title,
+            "meeting_reference": self.meeting_reference,
+            "meeting_id": self.meeting_id,
+            "participants": self.participants,
+            "meeting_datetime": self.meeting_datetime.isoformat() if self.meeting_datetime else None,
+            "duration_minutes": self.duration_minutes,
+            "duration_string": self.duration_string,
+            "department": self.department,
+            "department_id": self.department_id,
+            "error": self.error,
+        }
+
+
+def tokenize(query: str) -> List[Token]:
+    """Typed tokens of ``query`` in one scan of the master expression."""
+    tokens = []
+    for match in TOKEN_RE.finditer(query):
+        kind = match.lastgroup
+        groups = {}
+        for name in _SUBGROUPS[kind]:
+            value = match.group(name)
+            if value is not None:
+                groups[name] = value
+        tokens.append(Token(kind, match.group(kind), match.start(), groups))
+    return tokens
+
+
+def _named_spans(tokens: List[Token]) -> set:
+    """Indexes of title-cased words naming a meeting ("the Cancellation Policy Review meeting").
+
+    Quoted titles are single QUOTED tokens already; this covers unquoted names so the
+    words in them are not read as actions. A run that starts the clause keeps its first
+    word, which is the verb ("Cancel Staff meeting").
+    """
+    named = set()
+    for i, token in enumerate(tokens):
+        if token.kind == "WORD" and token.lower in NOUN_MEETING:
+            j = i
+            while j > 0 and tokens[j - 1].text[:1].isupper() and tokens[j - 1].kind in TITLE_KINDS | ACTIONS.keys():
+                j -= 1
+            if j == 0 or tokens[j - 1].kind == "COMMA":
+                j += 1
+            named.update(range(j, i))
+    return named
+
+
+def action_of(tokens: List[Token]) -> Optional[str]:
+    """Action kind of the first action word outside a meeting name, or None.
+
+    The clause-initial verb wins ("Reschedule the Cancellation Policy Review meeting"),
+    so later words never override it.
+    """
+    named = _named_spans(tokens)
+    for i, token in enumerate(tokens):
+        if token.kind in ACTIONS and i not in named:
+            return token.kind
+    return None
+
+
+def is_update_request(query: str) -> bool:
+    """True when free text asks to cancel or reschedule a meeting."""
+    return bool(query) and action_of(tokenize(query)) in ("CANCEL", "RESCHEDULE")
+
+
+def format_duration(minutes: int) -> str:
+    hours, rest = divmod(minutes, 60)
+    if not hours:
+        return f"{minutes} minute{'s' if minutes != 1 else ''}"
+    text = f"{hours} hour{'s' if hours > 1 else ''}"
+    if rest:
+        text += f" {rest} minute{'s' if rest != 1 else ''}"
+    return text
+
+
+def _duration_minutes(token: Token) -> int:
+    g = token.groups
+    if "dur_h" in g:
+        return int(round(float(g["dur_h"]) * 60)) + int(g.get("dur_hm") or 0)
+    if "dur_m" in g:
+        return int(g["dur_m"])
+    if "dur_hh" in g:
+        return 30 if g["dur_hh"].lower().startswith("half") else 90
+    if "dur_wh" in g:
+        word = g["dur_wh"].lower()
+        return 60 * (1 if word in ("a", "an") else NUMBER_WORDS[word])
+    word = re.sub(r"[-\s]", "", g["dur_wm"].lower())
+    return NUMBER_WORDS[word]
+
+
+def _month(name: str) -> int:
+    return MONTHS[name.lower()[:3]]
+
+
+def _explicit_date(token: Token, today: date) -> date:
+    g = token.groups
+    if token.kind == "DATE_YMD":
+        return date(int(g["ymd_y"]), int(g["ymd_m"]), int(g["ymd_d"]))
+    if token.kind == "DATE_MDY":
+        return date(int(g["mdy_y"]), int(g["mdy_m"]), int(g["mdy_d"]))
+    if token.kind == "DATE_MONTH":
+        month, day, year = _month(g["md_mon"]), int(g["md_day"]), g.get("md_year")
+    else:
+        month, day, year = _month(g["dm_mon"]), int(g["dm_day"]), g.get("dm_year")
+    if year:
+        return date(int(year), month, day)
+    candidate = date(today.year, month, day)
+    # "January 5" asked in October means next January
+    return candidate if candidate >= today - timedelta(days=1) else date(today.year + 1, month, day)
+
+
+def _clock(token: Token, daypart: Optional[str]) -> Tuple[int, int]:
+    g = token.groups
+    if token.kind == "BARE_HOUR":
+        hour = int(g["bare"])
+        if daypart in ("afternoon", "evening", "night", "tonight") and hour < 12:
+            hour += 12
+        elif not daypart and 1 <= hour <= 6:
+            hour += 12  # "at 3" in a hospital day means 3 PM
+        return hour % 24, 0
+    if "t_h" in g:
+        hour, minute = int(g["t_h"]), int(g.get("t_m") or 0)
+        if g["t_p"].lower() == "p" and hour < 12:
+            hour += 12
+        elif g["t_p"].lower() == "a" and hour == 12:
+            hour = 0
+        return hour, minute
+    if "oc_h" in g:
+        hour = int(g["oc_h"])
+        if daypart in ("afternoon", "evening", "night", "tonight") and hour < 12:
+            hour += 12
+        return hour, 0
+    if "h24" in g:
+        return int(g["h24"]), int(g["m24"])
+    return (0, 0) if g["t_word"].lower() == "midnight" else (12, 0)
+
+
+def _capitalize_topic(words: List[str]) -> str:
+    out = []
+    for word in " ".join(words).split():
+        if word.lower() in ACRONYMS:
+            out.append(word.upper())
+        elif len(word) > 1:
+            out.append(word[:1].upper() + word[1:].lower())
+        else:
+            out.append(word.lower())
+    return " ".join(out)
+
+
+class MeetingQueryParser:
+    """Builds a ``MeetingIntent`` from one token scan of a query."""
+
+    def parse(self, query: str, now: datetime = None) -> MeetingIntent:
+        now = now or datetime.now()
+        query = query or ""
+        tokens = tokenize(query)
+        intent = MeetingIntent()
+
+        kind = action_of(tokens)
+        if kind:
+            intent.action = ACTIONS[kind]
+        changing = intent.action in ("reschedule", "update", "cancel")
+
+        self._identifiers(tokens, intent)
+        self._duration(tokens, intent, changing)
+        self._participants(tokens, query, intent)
+        intent.meeting_reference = self._reference(tokens, query)
+        intent.title = self._title(tokens, query)
+        try:
+            self._datetime(tokens, intent, now, changing)
+        except ValueError as e:
+            intent.error = f"Failed to parse meeting datetime from '{query}': {e}"
+        return intent
+
+    # ---- identifiers ----
+
+    @staticmethod
+    def _identifiers(tokens: List[Token], intent: MeetingIntent):
+        for token in tokens:
+            if token.kind == "DEPT_ID" and not intent.department_id:
+                intent.department_id = token.groups["dept_uuid"]
+            elif token.kind == "MEETING_ID" and not intent.meeting_id:
+                intent.meeting_id = token.groups.get("mid") or token.groups.get("hid")
+            elif token.kind == "UUID" and not intent.meeting_id:
+                intent.meeting_id = token.text
+            elif token.kind == "DEPT_NAME" and not intent.department:
+                key = re.sub(r"\s+", " ", token.groups["dept_name"].lower())
+                intent.department = DEPARTMENTS.get(key, DEPARTMENTS.get(key.replace("ae", "e")))
+
+    # ---- duration ----
+
+    @staticmethod
+    def _duration(tokens: List[Token], intent: MeetingIntent, changing: bool):
+        durations = [t for t in tokens if t.kind == "DURATION"]
+        if not durations:
+            return
+        token = durations[-1] if changing else durations[0]
+        minutes = _duration_minutes(token)
+        if minutes > 0:
+            intent.duration_minutes = minutes
+            intent.duration_string = format_duration(minutes)
+            intent.has_duration = True
+
+    # ---- participants ----
+
+    @staticmethod
+    def _name_run(tokens: List[Token], start: int, query: str, require_and: bool = False) -> Tuple[List[str], int]:
+        """Names joined by and/,/& starting at ``tokens[start]``; returns (names, next index)."""
+        names, current, saw_and = [], [], False
+        i = start
+        while i < len(tokens):
+            token = tokens[i]
+            word = token.lower
+            if token.kind == "WORD" and word in ("and",):
+                saw_and = True
+            elif token.kind in ("COMMA", "AMP"):
+                pass
+            elif token.kind == "WORD" and word.rstrip(".") in HONORIFICS:
+                i += 1
+                continue
+            elif token.kind == "WORD" and word not in STOP_WORDS and len(word) > 1:
+                current.append(token.text)
+                i += 1
+                continue
+            else:
+                break
+            if current:
+                names.append(" ".join(current))
+                current = []
+            i += 1
+        if current:
+            names.append(" ".join(current))
+        if require_and and not saw_and:
+            return [], start
+        cleaned = [" ".join(part[:1].upper() + part[1:] for part in name.split()) for name in names]
+        return cleaned, i
+
+    def _participants(self, tokens: List[Token], query: str, intent: MeetingIntent):
+        if any(t.kind == "ALL_STAFF" for t in tokens):
+            intent.participants = [ALL_STAFF]
+            return
+        names: List[str] = []
+        for i, token in enumerate(tokens):
+            if token.kind == "WORD" and token.lower in PARTICIPANT_INTRO:
+                found, _ = self._name_run(tokens, i + 1, query)
+                names.extend(n for n in found if n not in names)
+        if not names:
+            # "schedule shamil and nazif ..." / "shamil and nazif meeting"
+            for i, token in enumerate(tokens):
+                if token.kind == "SCHEDULE" or (i == 0 and token.kind == "WORD"):
+                    found, end = self._name_run(tokens, i + 1 if token.kind == "SCHEDULE" else i, query,
+                                                require_and=True)
+                    if found:
+                        names = found
+                        break
+        if not names:
+            seen = []
+            for token in tokens:
+                if token.kind == "WORD" and token.lower in KNOWN_NAMES and token.lower.title() not in seen:
+                    seen.append(token.lower.title())
+            names = seen
+        intent.participants = names
+
+    # ---- titles ----
+
+    @staticmethod
+    def _phrase(tokens: List[Token], start: int, stop_words=STOP_WORDS | PARTICIPANT_INTRO) -> List[str]:
+        words = []
+        for token in tokens[start:]:
+            if token.kind in TITLE_KINDS and token.lower not in stop_words:
+                words.append(token.text)
+            elif token.kind == "WORD" and token.lower in ("and",) and words:
+                words.append("&")
+            else:
+                break
+        while words and words[-1] == "&":
+            words.pop()
+        return words
+
+    @staticmethod
+    def _quoted(token: Token) -> str:
+        return (token.groups.get("dq") or token.groups.get("sq") or "").strip()
+
+    def _title(self, tokens: List[Token], query: str) -> str:
+        # 1) explicit marker: Title: "X" / Subject: X
+        for i, token in enumerate(tokens):
+            if token.kind == "MARKER" and i + 1 < len(tokens):
+                nxt = tokens[i + 1]
+                if nxt.kind == "QUOTED" and self._quoted(nxt).lower() not in GENERIC_TITLES:
+                    return self._quoted(nxt)
+                words = self._phrase(tokens, i + 1, stop_words=frozenset({"with", "between", "on", "at", "for"}))
+                if words:
+                    return " ".join(w if w != "&" else "and" for w in words)
+        # 2) any quoted title
+        for token in tokens:
+            if token.kind == "QUOTED":
+                title = self._quoted(token)
+                if len(title) > 3 and title.lower() not in GENERIC_TITLES:
+                    return title
+        # 3) topic after about/regarding/discuss/on/for
+        for i, token in enumerate(tokens):
+            if token.kind == "WORD" and token.lower in TOPIC_INTRO:
+                words = [w for w in self._phrase(tokens, i + 1) if w.lower() not in TITLE_FILLER]
+                if words and len(" ".join(words)) >= 3 and not self._names_only(words):
+                    return f"{_capitalize_topic(words)} Meeting"
+        # 4) words before "meeting": "schedule a daily improvement meeting"
+        for i, token in enumerate(tokens):
+            if token.kind == "WORD" and token.lower in NOUN_MEETING and i > 0:
+                j = i
+                while j > 0 and tokens[j - 1].kind in TITLE_KINDS and tokens[j - 1].lower not in STOP_WORDS \
+                        and tokens[j - 1].lower not in PARTICIPANT_INTRO:
+                    j -= 1
+                words = [t.text for t in tokens[j:i]]
+                if words and len(" ".join(words)) >= 3 and not self._names_only(words):
+                    return f"{_capitalize_topic(words)} Meeting"
+        # 5) first meaningful words
+        words = [t.text for t in tokens if t.kind == "WORD" and t.lower not in STOP_WORDS and len(t.text) > 2
+                 and t.lower not in KNOWN_NAMES and t.lower not in PARTICIPANT_INTRO
+                 and t.lower not in TOPIC_INTRO]
+        if words:
+            return f"{_capitalize_topic(words[:3])} Meeting"
+        return DEFAULT_TITLE
+
+    @staticmethod
+    def _names_only(words: List[str]) -> bool:
+        return all(w.lower() in KNOWN_NAMES or w == "&" for w in words)
+
+    def _reference(self, tokens: List[Token], query: str) -> Optional[str]:
+        """Title of the meeting a reschedule/cancel request refers to."""
+        for token in tokens:
+            if token.kind == "QUOTED" and len(self._quoted(token)) > 3:
+                return self._quoted(token)
+        for i, token in enumerate(tokens):
+            if token.kind == "WORD" and token.lower in REFERENCE_INTRO:
+                words = self._phrase(tokens, i + 1)
+                if words:
+                    return " ".join(w if w != "&" else "and" for w in words)
+        # "the Tasks Improvements meeting" / "our staff meeting"
+        named = _named_spans(tokens)
+        for i, token in enumerate(tokens):
+            if token.kind == "WORD" and token.lower in NOUN_MEETING:
+                j = i
+                while j > 0 and (tokens[j - 1].kind in TITLE_KINDS or j - 1 in named) and tokens[j - 1].lower not in (
+                        "the", "our", "my", "a", "an", "this", "that", "to", "and", "please"):
+                    if tokens[j - 1].kind == "WORD" and tokens[j - 1].lower in ("cancel", "move", "reschedule"):
+                        break
+                    j -= 1
+                words = [t.text for t in tokens[j:i] if t.lower not in STOP_WORDS or t.lower == "staff"]
+                if words and len(" ".join(words)) > 3:
+                    return " ".join(words)
+        for i, token in enumerate(tokens):
+            if token.kind == "WORD" and token.lower in ("about", "for") and i > 0 and tokens[i - 1].lower in NOUN_MEETING:
+                words = self._phrase(tokens, i + 1)
+                if words:
+                    return " ".join(w if w != "&" else "and" for w in words)
+        return None
+
+    # ---- date and time ----
+
+    def _datetime(self, tokens: List[Token], intent: MeetingIntent, now: datetime, changing: bool):
+        pick = (lambda items: items[-1]) if changing else (lambda items: items[0])
+        dayparts = [t for t in tokens if t.kind == "DAYPART" or (t.kind == "RELDAY" and t.lower == "tonight")]
+        daypart = pick(dayparts).lower.split()[-1] if dayparts else None
+
+        times = [t for t in tokens if t.kind in ("TIME", "BARE_HOUR")]
+        if times:
+            hour, minute = _clock(pick(times), daypart)
+            intent.has_time = True
+        elif daypart:
+            hour, minute = DAYPART_HOURS[daypart], 0
+        else:
+            hour, minute = None, 0
+
+        today = now.date()
+        dates = [t for t in tokens if t.kind in ("DATE_YMD", "DATE_MDY", "DATE_MONTH", "DATE_DAYMONTH",
+                                                 "RELDAY", "WEEKDAY", "IN_DAYS")]
+        target = None
+        if dates:
+            token = pick(dates)
+            target = self._resolve_day(token, today, now, hour)
+            intent.has_date = True
+
+        if hour is None:
+            # Next business hour, as before: 9 AM if early or late, else the coming hour
+            if target is not None and target != today:
+                hour = 9
+            elif now.hour < 8:
+                hour = 9
+            elif now.hour < 17:
+                hour = now.hour + 1
+            else:
+                hour = 9
+                target = target or today + timedelta(days=1)
+
+        if target is None:
+            proposed = datetime.combine(today, time(hour, minute))
+            target = today if proposed > now else today + timedelta(days=1)
+        intent.meeting_datetime = datetime.combine(target, time(hour, minute))
+
+    @staticmethod
+    def _resolve_day(token: Token, today: date, now: datetime, hour: Optional[int]) -> date:
+        if token.kind == "RELDAY":
+            rel = re.sub(r"\s+", " ", token.groups["rel"].lower())
+            return {
+                "today": today, "tonight": today, "tomorrow": today + timedelta(days=1),
+                "tmrw": today + timedelta(days=1), "day after tomorrow": today + timedelta(days=2),
+                "next week": today + timedelta(days=7),
+            }[rel]
+        if token.kind == "WEEKDAY":
+            target = WEEKDAYS.index(token.groups["wday"].lower())
+            ahead = (target - today.weekday()) % 7
+            if ahead == 0 and (token.groups.get("wd_next") or hour is None or now.hour >= hour):
+                ahead = 7
+            return today + timedelta(days=ahead)
+        if token.kind == "IN_DAYS":
+            n = token.groups["in_n"].lower()
+            n = int(n) if n.isdigit() else NUMBER_WORDS[n]
+            return today + timedelta(days=n * (7 if token.groups["in_unit"].lower().startswith("week") else 1))
+        return _explicit_date(token, today)
+
+
+# Global parser (stateless; the grammar is compiled once at import)
+meeting_parser = MeetingQueryParser()
+
+
+# Regression corpus: (query, expected fields). "now" is Wednesday 2025-08-06 10:00.
+CORPUS_NOW = datetime(2025, 8, 6, 10, 0)
+CORPUS = [
+    ("Schedule a meeting with Shamil and Nazif tomorrow at 2pm",
+     {"participants": ["Shamil", "Nazif"], "meeting_datetime": "2025-08-07T14:00", "action": "schedule"}),
+    ("schedule meeting between shamil and nazif at 3:30 pm for 45 minutes",
+     {"participants": ["Shamil", "Nazif"], "meeting_datetime": "2025-08-06T15:30", "duration_minutes": 45}),
+    ("Schedule a meeting with all staff tomorrow at 10am about 'Tasks Improvements'",
+     {"participants": [ALL_STAFF], "title": "Tasks Improvements", "meeting_datetime": "2025-08-07T10:00"}),
+    ('Schedule a "Daily Improvement" meeting with all hospital staff on 2025-08-10 at 9:00 AM for 1 hour',
+     {"title": "Daily Improvement", "participants": [ALL_STAFF], "meeting_datetime": "2025-08-10T09:00",
+      "duration_minutes": 60, "duration_string": "1 hour"}),
+    ("Title: Infection Control Review with Sarah and Johnson on Friday at 11am",
+     {"title": "Infection Control Review", "participants": ["Sarah", "Johnson"],
+      "meeting_datetime": "2025-08-08T11:00"}),
+    ("Set up a meeting about daily improvement between Sarah and Smith today at 4pm",
+     {"title": "Daily Improvement Meeting", "participants": ["Sarah", "Smith"], "meeting_datetime": "2025-08-06T16:00"}),
+    ("book a 30 minute huddle with Dr. Adams tomorrow morning",
+     {"participants": ["Adams"], "meeting_datetime": "2025-08-07T09:00", "duration_minutes": 30}),
+    ("Arrange a 1 hour 30 minutes meeting regarding AI triage with Brown on August 12th at 2pm",
+     {"title": "AI Triage Meeting", "participants": ["Brown"], "duration_minutes": 90,
+      "duration_string": "1 hour 30 minutes", "meeting_datetime": "2025-08-12T14:00"}),
+    ("meeting with everyone next week at 10am for two hours",
+     {"participants": [ALL_STAFF], "meeting_datetime": "2025-08-13T10:00", "duration_minutes": 120}),
+    ("Schedule ICU handover meeting with Nurse Garcia and Dr Lee at 7pm",
+     {"title": "ICU Handover Meeting", "participants": ["Garcia", "Lee"], "meeting_datetime": "2025-08-06T19:00",
+      "department": "ICU"}),
+    ("Schedule a cardiology department meeting on Monday at 9am",
+     {"department": "Cardiology", "meeting_datetime": "2025-08-11T09:00"}),
+    ("Schedule a meeting with the emergency team at 8:15am on 08/20/2025 for 20 mins",
+     {"department": "Emergency", "meeting_datetime": "2025-08-20T08:15", "duration_minutes": 20}),
+    ("Let's have a discussion regarding bed turnover with Wilson at 1pm for half an hour",
+     {"title": "Bed Turnover Meeting", "participants": ["Wilson"], "meeting_datetime": "2025-08-06T13:00",
+      "duration_minutes": 30}),
+    ("schedule a meeting at 9am",
+     {"meeting_datetime": "2025-08-07T09:00", "duration_minutes": 15, "title": DEFAULT_TITLE}),
+    ("Schedule a quality review meeting with Taylor on 5th September at 3 pm",
+     {"title": "Quality Review Meeting", "participants": ["Taylor"], "meeting_datetime": "2025-09-05T15:00"}),
+    ("Schedule a team meeting with Martin on January 15 at 10am",
+     {"participants": ["Martin"], "meeting_datetime": "2026-01-15T10:00"}),
+    ("Schedule the budget meeting with Clark at 3 in the afternoon on Thursday",
+     {"title": "Budget Meeting", "participants": ["Clark"], "meeting_datetime": "2025-08-07T15:00"}),
+    ("Organize a meeting with Harris in 3 days at noon for 45 mins",
+     {"participants": ["Harris"], "meeting_datetime": "2025-08-09T12:00", "duration_minutes": 45}),
+    ("Schedule a meeting with Hall at 14:30 tomorrow",
+     {"participants": ["Hall"], "meeting_datetime": "2025-08-07T14:30"}),
+    ("schedule shamil and nazif for a sync at 5pm",
+     {"participants": ["Shamil", "Nazif"], "meeting_datetime": "2025-08-06T17:00"}),
+    ("Schedule a meeting with Wright next Wednesday at 10am",
+     {"participants": ["Wright"], "meeting_datetime": "2025-08-13T10:00"}),
+    ("Schedule a meeting with Scott on Wednesday at 9am",
+     {"participants": ["Scott"], "meeting_datetime": "2025-08-13T09:00"}),
+    ("Schedule a meeting with Green on Wednesday at 4pm",
+     {"participants": ["Green"], "meeting_datetime": "2025-08-06T16:00"}),
+    ("Schedule a meeting to discuss staffing levels with Baker at 11:00 am for 1.5 hours",
+     {"title": "Staffing Levels Meeting", "participants": ["Baker"], "meeting_datetime": "2025-08-06T11:00",
+      "duration_minutes": 90}),
+    ("Subject: \"Q3 Safety Audit\" with all staff on August 28, 2025 at 10 AM",
+     {"title": "Q3 Safety Audit", "participants": [ALL_STAFF], "meeting_datetime": "2025-08-28T10:00"}),
+    ("Schedule a meeting with Nelson and Carter and Mitchell day after tomorrow at 8am",
+     {"participants": ["Nelson", "Carter", "Mitchell"], "meeting_datetime": "2025-08-08T08:00"}),
+    ("Schedule a meeting with John Peterson, Mary Gray and Tom at 2:45pm",
+     {"participants": ["John Peterson", "Mary Gray", "Tom"], "meeting_datetime": "2025-08-06T14:45"}),
+    ("Schedule a meeting tonight at 8 with Kelly about night shift handover",
+     {"participants": ["Kelly"], "meeting_datetime": "2025-08-06T20:00", "title": "Night Shift Handover Meeting"}),
+    ("please schedule the team standup meeting for 10 minutes at 9:30am tomorrow",
+     {"title": "Team Standup Meeting", "duration_minutes": 10, "meeting_datetime": "2025-08-07T09:30"}),
+    ("Schedule a meeting on 2025/09/01 at 10am with Reed for 2 hrs",
+     {"participants": ["Reed"], "meeting_datetime": "2025-09-01T10:00", "duration_minutes": 120}),
+    # Changes to existing meetings
+    ("Reschedule the 'Tasks Improvements' meeting to tomorrow at 4pm",
+     {"action": "reschedule", "meeting_reference": "Tasks Improvements", "meeting_datetime": "2025-08-07T16:00"}),
+    ("Move the Daily Improvement meeting from 2pm to 5pm",
+     {"action": "reschedule", "meeting_reference": "Daily Improvement", "meeting_datetime": "2025-08-06T17:00"}),
+    ("Postpone meeting id 3f2b9c1e-8d4a-4c2b-9e1f-0a1b2c3d4e5f to Friday at 10am for 1 hour",
+     {"action": "reschedule", "meeting_id": "3f2b9c1e-8d4a-4c2b-9e1f-0a1b2c3d4e5f",
+      "meeting_datetime": "2025-08-08T10:00", "duration_minutes": 60}),
+    ("Reschedule the Cancellation Policy Review meeting to 4pm tomorrow",
+     {"action": "reschedule", "meeting_reference": "Cancellation Policy Review",
+      "meeting_datetime": "2025-08-07T16:00"}),
+    ("Cancel the meeting titled Budget Review",
+     {"action": "cancel", "meeting_reference": "Budget Review"}),
+    ("Please call off our staff meeting tomorrow",
+     {"action": "cancel", "meeting_reference": "staff"}),
+    ("Update meeting #3f2b9c1e to 11am", {"action": "update", "meeting_id": "3f2b9c1e",
+                                          "meeting_datetime": "2025-08-06T11:00"}),
+    ("Change the duration of the \"Bed Flow\" meeting to 45 minutes",
+     {"action": "update", "meeting_reference": "Bed Flow", "duration_minutes": 45}),
+    ("reschedule the ICU review meeting to next Monday at 9am for 30 minutes",
+     {"action": "reschedule", "meeting_reference": "ICU review", "meeting_datetime": "2025-08-11T09:00",
+      "duration_minutes": 30}),
+    ("cancel meeting 3f2b9c1e-8d4a-4c2b-9e1f-0a1b2c3d4e5f",
+     {"action": "cancel", "meeting_id": "3f2b9c1e-8d4a-4c2b-9e1f-0a1b2c3d4e5f"}),
+    ("Schedule a meeting department_id: 0b9c1e2f-8d4a-4c2b-9e1f-0a1b2c3d4e5f at 3pm",
+     {"department_id": "0b9c1e2f-8d4a-4c2b-9e1f-0a1b2c3d4e5f", "meeting_id": None,
+      "meeting_datetime": "2025-08-06T15:00"}),
+]
+
+
+def _actual(intent: MeetingIntent, key: str):
+    value = getattr(intent, key)
+    if key == "meeting_datetime" and value is not None:
+        return value.strftime("%Y-%m-%dT%H:%M")
+    return value
+
+
+def run_corpus(parser: MeetingQueryParser = meeting_parser, verbose: bool = True) -> Tuple[int, int, List[str]]:
+    """Check every corpus query; returns (fields correct, fields checked, failure descriptions)."""
+    correct = total = 0
+    failures = []
+    for query, expected in CORPUS:
+        intent = parser.parse(query, now=CORPUS_NOW)
+        for key, want in expected.items():
+            total += 1
+            got = _actual(intent, key)
+            if got == want:
+                correct += 1
+            else:
+                failures.append(f"{query!r}: {key} = {got!r}, expected {want!r}")
+    if verbose:
+        for failure in failures:
+            print(f"  ❌ {failure}")
+    return correct, total, failures
+
+
+def run_benchmark(rounds: int = 200):
+    """Corpus accuracy and parse latency; exit status 1 if any expectation fails."""
+    import statistics
+    import sys
+    import time as timer
+
+    correct, total, failures = run_corpus()
+    print(f"Accuracy: {correct}/{total} fields ({100.0 * correct / total:.1f}%) over {len(CORPUS)} queries")
+
+    samples = []
+    for _ in range(rounds):
+        for query, _ in CORPUS:
+            started = timer.perf_counter()
+            meeting_parser.parse(query, now=CORPUS_NOW)
+            samples.append((timer.perf_counter() - started) * 1e6)
+    samples.sort()
+    print(f"Parse latency over {len(samples)} parses: mean {statistics.mean(samples):.1f} µs, "
+          f"p50 {samples[len(samples) // 2]:.1f} µs, p95 {samples[int(len(samples) * 0.95)]:.1f} µs")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    if "--benchmark" in sys.argv:
+        run_benchmark()
+    elif len(sys.argv) > 1:
+        print(json.dumps(meeting_parser.parse(" ".join(sys.argv[1:])).to_dict(), indent=2))
+    else:
+        print(__doc__)
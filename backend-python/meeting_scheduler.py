@@ -3,16 +3,15 @@
 import uuid
 from datetime import datetime, timedelta, date
 from typing import List, Dict, Any, Optional
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from sqlalchemy import and_, or_
 from database import Staff, User, Department, SessionLocal, StaffMeeting, StaffMeetingParticipant
 from google_meet_api import GoogleMeetAPIIntegration
 from meeting_management import MeetingManager, Meeting, MeetingParticipant
+from search_service import search_service
+from free_busy import load_free_busy
+from email_outbox import OutboxMessage, email_outbox
+from meeting_parser import MeetingIntent, meeting_parser
 import os
 from dotenv import load_dotenv
-import re
 
 load_dotenv()
 
@@ -30,132 +29,14 @@ class MeetingSchedulerAgent:
 
     def parse_duration(self, query: str) -> tuple:
         """Parse duration from query string and return (minutes, duration_string)."""
-        try:
-            query_lower = query.lower()
-            
-            # Enhanced duration patterns
-            duration_patterns = [
-                r'(\d+)\s*(?:hours?|hrs?|h)\s*(?:and\s*)?(\d+)?\s*(?:minutes?|mins?|m)?',  # 1 hour 30 minutes
-                r'(\d+)\s*(?:minutes?|mins?|m)(?:\s|$)',  # 15 minutes, 30 mins
-                r'(\d+)\s*(?:hours?|hrs?|h)(?:\s|$)',     # 1 hour, 2 hrs
-                r'for\s+(\d+)\s*(?:minutes?|mins?|m)',    # for 15 minutes
-                r'for\s+(\d+)\s*(?:hours?|hrs?|h)',       # for 1 hour
-                r'(\d+)min(?:\s|$)',                       # 15min
-                r'(\d+)hr(?:\s|$)',                        # 1hr
-                r'(\d+)h(?:\s|$)',                         # 1h
-            ]
-            
-            total_minutes = 0
-            duration_string = ""
-            
-            for pattern in duration_patterns:
-                match = re.search(pattern, query_lower)
-                if match:
-                    print(f"Found duration pattern: {pattern} -> {match.groups()}")
-                    
-                    if 'hour' in pattern or 'hr' in pattern or 'h' in pattern:
-                        # Hour patterns
-                        hours = int(match.group(1))
-                        minutes = 0
-                        if len(match.groups()) > 1 and match.group(2):
-                            minutes = int(match.group(2))
-                        
-                        total_minutes = hours * 60 + minutes
-                        
-                        if minutes > 0:
-                            duration_string = f"{hours} hour{'s' if hours > 1 else ''} {minutes} minute{'s' if minutes != 1 else ''}"
-                        else:
-                            duration_string = f"{hours} hour{'s' if hours > 1 else ''}"
-                            
-                    else:
-                        # Minute patterns
-                        total_minutes = int(match.group(1))
-                        duration_string = f"{total_minutes} minute{'s' if total_minutes != 1 else ''}"
-                    
-                    print(f"Parsed duration: {total_minutes} minutes -> '{duration_string}'")
-                    return total_minutes, duration_string
-            
-            # Check for common duration keywords
-            if '15min' in query_lower or 'fifteen min' in query_lower:
-                return 15, "15 minutes"
-            elif '30min' in query_lower or 'thirty min' in query_lower or 'half hour' in query_lower:
-                return 30, "30 minutes"
-            elif '45min' in query_lower or 'forty-five min' in query_lower:
-                return 45, "45 minutes"
-            elif '1hr' in query_lower or 'one hour' in query_lower:
-                return 60, "1 hour"
-            elif '90min' in query_lower or 'hour and half' in query_lower:
-                return 90, "1 hour 30 minutes"
-            elif '2hr' in query_lower or 'two hour' in query_lower:
-                return 120, "2 hours"
-            
-            # Default duration
-            print("No duration found in query, using default 15 minutes")
-            return 15, "15 minutes"
-            
-        except Exception as e:
-            print(f"Error parsing duration: {e}")
-            return 15, "15 minutes"
+        intent = meeting_parser.parse(query)
+        return intent.duration_minutes, intent.duration_string
 
     def extract_participants_from_query(self, query: str) -> List[str]:
-        """Extract specific participant names from the query."""
-        try:
-            query_lower = query.lower()
-            
-            # Check for "all staff" or similar patterns first
-            all_staff_patterns = [
-                r'all\s+(?:the\s+)?staff',
-                r'all\s+(?:the\s+)?staffs',
-                r'all\s+hospital\s+staff',
-                r'everyone',
-                r'all\s+(?:hospital\s+)?employees',
-                r'all\s+(?:team\s+)?members',
-                r'entire\s+staff',
-                r'whole\s+team'
-            ]
-            
-            for pattern in all_staff_patterns:
-                if re.search(pattern, query_lower):
-                    print("Detected 'all staff' request - will get all active staff members")
-                    # Return a special marker to indicate "all staff" request
-                    return ["ALL_STAFF_REQUEST"]
-            
-            # Common patterns to find participant names
-            participant_patterns = [
-                r'between\s+(\w+)\s+and\s+(\w+)',  # "between shamil and nazif"
-                r'with\s+(\w+)\s+and\s+(\w+)',     # "with shamil and nazif"
-                r'(\w+)\s+and\s+(\w+)\s+meeting',  # "shamil and nazif meeting"
-                r'meeting.*?with\s+(\w+)(?:\s+and\s+(\w+))?',  # "meeting with shamil and nazif"
-                r'schedule.*?(\w+)\s+and\s+(\w+)',  # "schedule shamil and nazif"
-            ]
-            
-            participant_names = []
-            
-            for pattern in participant_patterns:
-                match = re.search(pattern, query_lower)
-                if match:
-                    # Add all captured groups (participant names)
-                    for i in range(1, len(match.groups()) + 1):
-                        if match.group(i):
-                            name = match.group(i).strip().title()
-                            if name and len(name) > 1:
-                                participant_names.append(name)
-                    break
-            
-            # Also check for individual mentions
-            if not participant_names:
-                # Look for common names patterns
-                name_pattern = r'\b(shamil|nazif|mohamed|sarah|johnson|smith|brown|davis|wilson|miller|moore|taylor|anderson|thomas|jackson|white|harris|martin|thompson|garcia|martinez|robinson|clark|rodriguez|lewis|lee|walker|hall|allen|young|hernandez|king|wright|lopez|hill|scott|green|adams|baker|gonzalez|nelson|carter|mitchell|perez|roberts|turner|phillips|campbell|parker|evans|edwards|collins|stewart|sanchez|morris|rogers|reed|cook|morgan|bell|murphy|bailey|rivera|cooper|richardson|cox|howard|ward|torres|peterson|gray|ramirez|james|watson|brooks|kelly|sanders|price|bennett|wood|barnes|ross|henderson|coleman|jenkins|perry|powell|long|patterson|hughes|flores|washington|butler|simmons|foster|gonzales|bryant|alexander|russell|griffin|diaz|hayes)\b'
-                
-                matches = re.findall(name_pattern, query_lower)
-                participant_names = [name.title() for name in set(matches)]
-            
-            print(f"Extracted participants from query: {participant_names}")
-            return participant_names
-            
-        except Exception as e:
-            print(f"Error extracting participants: {e}")
-            return []
+        """Extract specific participant names (or the "all staff" marker) from the query."""
+        participants = meeting_parser.parse(query).participants
+        print(f"Extracted participants from query: {participants}")
+        return participants
 
     def find_staff_by_names(self, participant_names: List[str]) -> List[str]:
         """Find staff IDs by matching names from the query."""
@@ -172,19 +53,13 @@ class MeetingSchedulerAgent:
                 print(f"Found {len(staff_ids)} active staff members for meeting")
                 return staff_ids
             
+            # Resolve every name in a single ranked trigram query
+            resolved = search_service.resolve_staff_names(self.session, participant_names)
             for name in participant_names:
-                # Search for staff by first name or last name (case-insensitive)
-                staff = self.session.query(Staff).join(User).filter(
-                    or_(
-                        User.first_name.ilike(f'%{name}%'),
-                        User.last_name.ilike(f'%{name}%')
-                    ),
-                    Staff.status == 'active'
-                ).first()
-                
-                if staff:
-                    staff_ids.append(str(staff.id))
-                    print(f"Found staff: {name} -> {staff.user.first_name} {staff.user.last_name} (ID: {staff.id})")
+                match = resolved.get(name)
+                if match:
+                    staff_ids.append(match["staff_id"])
+                    print(f"Found staff: {name} -> {match['name']} (ID: {match['staff_id']})")
                 else:
                     print(f"Warning: Could not find staff member with name: {name}")
             
@@ -205,363 +80,26 @@ class MeetingSchedulerAgent:
 
     def extract_meeting_title(self, query: str) -> str:
         """Extract meeting title from query."""
-        try:
-            print(f"🔍 DEBUG: Extracting title from query: '{query}'")
-            # 1) Highest priority: explicit title markers or quoted titles
-            # Try explicit markers like: Subject: "...", Exact Title: "...", Title: "...", Topic: "..."
-            marker_patterns = [
-                r'(?:exact\s*title|subject|title|topic)\s*[:\-]\s*["“”\']([^"“”\']+)["“”\']',
-                r'(?:exact\s*title|subject|title|topic)\s*[:\-]\s*([A-Za-z0-9][^\n]+?)(?=\s+(?:with|between|on|at|for)\b|\s*$)'
-            ]
-
-            for pat in marker_patterns:
-                m = re.search(pat, query, re.IGNORECASE)
-                if m:
-                    extracted = m.group(1).strip()
-                    if extracted and extracted.lower() != 'all hospital staff':
-                        return extracted
-
-            # Pattern: Schedule "TITLE" meeting
-            m = re.search(r'schedule\s+[^\n]*?["“”\']([^"“”\']+)["“”\']\s+meeting', query, re.IGNORECASE)
-            if m:
-                extracted = m.group(1).strip()
-                if extracted and extracted.lower() != 'all hospital staff':
-                    return extracted
-
-            # Pattern: discuss "TITLE"
-            m = re.search(r'(?:discuss|about|regarding)\s+["“”\']([^"“”\']+)["“”\']', query, re.IGNORECASE)
-            if m:
-                extracted = m.group(1).strip()
-                if extracted and extracted.lower() != 'all hospital staff':
-                    print(f"✅ Found title via discuss pattern: '{extracted}'")
-                    return extracted
-
-            # 2) High priority: Any quoted text that looks like a title (not just specific markers)
-            # This catches cases like: discuss about 'Tasks Improvements'
-            quoted_patterns = [
-                r'["""\']([^"""\']{3,})["""\']',  # Any quoted text with 3+ characters
-                r'about\s+["""\']([^"""\']{3,})["""\']',  # "about 'Tasks Improvements'"
-                r'discuss\s+["""\']([^"""\']{3,})["""\']',  # "discuss 'Tasks Improvements'"
-                r'regarding\s+["""\']([^"""\']{3,})["""\']',  # "regarding 'Tasks Improvements'"
-            ]
-
-            for pat in quoted_patterns:
-                m = re.search(pat, query, re.IGNORECASE)
-                if m:
-                    extracted = m.group(1).strip()
-                    # Skip generic terms and validate it's a meaningful title
-                    if (extracted and 
-                        extracted.lower() not in ['all hospital staff', 'hospital staff', 'staff meeting', 'meeting'] and
-                        len(extracted) > 3):
-                        print(f"✅ Found title via quoted pattern: '{extracted}'")
-                        return extracted
-
-            # Enhanced patterns to extract meeting topic - prioritize actual topic words over dates/names
-            patterns = [
-                r'meeting.*?(?:about|regarding)\s+([a-zA-Z][a-zA-Z\s]+?)\s+(?:between|with|at|tomorrow|today|on\s+\d)',  # "meeting about daily improvement between"
-                r'(?:about|regarding)\s+([a-zA-Z][a-zA-Z\s]+?)\s+meeting',  # "about daily improvement meeting"  
-                r'schedule.*?meeting.*?(?:about|regarding)\s+([a-zA-Z][a-zA-Z\s]+?)\s+(?:between|with|at|tomorrow|today)',  # "schedule meeting about daily improvement"
-                r'schedule.*?([a-zA-Z][a-zA-Z\s]+?)\s+meeting.*?(?:between|with)',  # "schedule daily improvement meeting between"
-                r'meeting.*?(?:on|for)\s+([a-zA-Z][a-zA-Z\s]+?)\s+(?:between|with|at|tomorrow|today)',  # "meeting for daily improvement between"
-                r'(?:meeting|discussion).*?(?:about|on|for|regarding)\s+([a-zA-Z][a-zA-Z\s]+?)(?:\s+between|\s+with|\s+at|\s+for|\s+tomorrow|\s+today|$)',  # various patterns
-            ]
-            
-            query_lower = query.lower()
-            
-            for pattern in patterns:
-                match = re.search(pattern, query_lower, re.IGNORECASE)
-                if match:
-                    topic = match.group(1).strip()
-                    
-                    # Skip if topic is just a date, number, or single character
-                    if re.match(r'^\d{4}-\d{1,2}-\d{1,2}$', topic) or re.match(r'^\d+$', topic) or len(topic) < 3:
-                        continue
-                        
-                    # Clean up the topic
-                    topic = re.sub(r'\s+', ' ', topic)  # Remove extra spaces
-                    topic = topic.replace(' and ', ' & ')  # Make it more concise
-                    
-                    # Remove common filler words but keep meaningful content
-                    filler_words = ['the', 'a', 'an', 'to', 'of', 'in', 'at', 'on', 'for']
-                    topic_words = [word for word in topic.split() if word not in filler_words and not re.match(r'^\d{4}', word)]
-                    
-                    if not topic_words:  # If all words were filtered out, continue to next pattern
-                        continue
-                        
-                    topic = ' '.join(topic_words)
-                    
-                    # Capitalize properly
-                    words = topic.split()
-                    capitalized_words = []
-                    for word in words:
-                        if word.lower() in ['ai', 'it', 'er', 'icu', 'hr', 'qa', 'qr', 'ui', 'ux']:
-                            capitalized_words.append(word.upper())
-                        elif len(word) > 1:
-                            capitalized_words.append(word.capitalize())
-                        else:
-                            capitalized_words.append(word.lower())
-                    
-                    title = ' '.join(capitalized_words)
-                    if len(title) > 3:  # Make sure we got something meaningful
-                        print(f"Extracted meeting topic: '{title}' from pattern: {pattern}")
-                        return f"{title} Meeting"
-            
-            # Fallback: try to extract any meaningful words (excluding names, dates, and common words)
-            meaningful_words = []
-            words = query_lower.split()
-            skip_words = {
-                'schedule', 'meeting', 'at', 'for', 'on', 'about', 'regarding', 'tomorrow', 'today', 
-                'the', 'a', 'an', 'and', 'or', 'but', 'in', 'with', 'between', 'specifically',
-                'shamil', 'nazif', 'mohamed', 'sarah', 'johnson', 'smith', 'discuss', 'to', 'all', 'staff', 'staffs'
-            }
-            
-            for word in words:
-                # Skip dates, times, numbers, and common words
-                if (word not in skip_words and len(word) > 2 and 
-                    not re.match(r'^\d+$', word) and 
-                    not re.match(r'^\d{4}-\d{1,2}-\d{1,2}$', word) and
-                    not re.match(r'^\d{1,2}:\d{2}$', word) and
-                    not word.endswith('pm') and not word.endswith('am')):
-                    
-                    if word == 'ai':
-                        meaningful_words.append('AI')
-                    elif word == 'improvement' or word == 'improvements':
-                        meaningful_words.append('Improvement')
-                    elif word == 'daily':
-                        meaningful_words.append('Daily')
-                    elif len(word) > 2:
-                        meaningful_words.append(word.capitalize())
-            
-            if meaningful_words:
-                title = ' '.join(meaningful_words[:3])  # Limit to 3 words
-                print(f"Fallback meeting topic: '{title}'")
-                return f"{title} Meeting"
-            
-            print(f"⚠️ No meaningful title found, using default: 'Hospital Staff Meeting'")
-            return "Hospital Staff Meeting"
-            
-        except Exception as e:
-            print(f"Error extracting meeting title: {e}")
-            return "Hospital Staff Meeting"
+        return meeting_parser.parse(query).title
 
     def parse_meeting_datetime(self, query: str) -> datetime:
-        """Parse complete meeting date and time from query string with enhanced NLP."""
-        import calendar
-        
-        try:
-            current_date = datetime.now()
-            query_lower = query.lower()
-            
-            print(f"Parsing datetime from: {query}")
-            
-            # Enhanced date patterns including more flexible formats
-            date_patterns = [
-                # YYYY-MM-DD format
-                r'(\d{4}-\d{1,2}-\d{1,2})',
-                # YYYY/MM/DD format  
-                r'(\d{4}/\d{1,2}/\d{1,2})',
-                # Month DD, YYYY or Month DDth YYYY
-                r'((?:january|february|march|april|may|june|july|august|september|october|november|december)\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4})',
-                # MM/DD/YYYY or DD/MM/YYYY
-                r'(\d{1,2}[/\-]\d{1,2}[/\-]\d{4})',
-                # August 10th, August 10, etc.
-                r'((?:january|february|march|april|may|june|july|august|september|october|november|december)\s+\d{1,2}(?:st|nd|rd|th)?)',
-            ]
-            
-            # Enhanced time patterns - more flexible
-            time_patterns = [
-                r'(\d{1,2}(?::\d{2})?\s*(?:am|pm))',  # 2pm, 10:30am
-                r'at\s+(\d{1,2}(?::\d{2})?\s*(?:am|pm))',  # at 2pm
-                r'(\d{1,2})\s*(?::|\.)\s*(\d{2})\s*(am|pm)',  # 2.30 pm, 2:30 pm
-                r'(\d{1,2})\s*(am|pm)',  # 2 pm (space)
-                r'(\d{1,2})(?:\s*)(o\'clock)',  # 2 o'clock
-            ]
-            
-            # Try to extract time
-            time_match = None
-            time_str = None
-            hours = None
-            minutes = 0
-            period = None
-            
-            for pattern in time_patterns:
-                time_match = re.search(pattern, query, re.IGNORECASE)
-                if time_match:
-                    time_str = time_match.group(1) if len(time_match.groups()) == 1 else time_match.group(0)
-                    print(f"Found time pattern: {pattern} -> {time_str}")
-                    break
-            
-            # If no explicit time found, try to infer from context
-            if not time_match:
-                # Check for time context clues
-                if any(word in query_lower for word in ['morning', 'am', 'early']):
-                    hours = 9
-                    period = 'am'
-                    print("Inferred morning time: 9:00 AM")
-                elif any(word in query_lower for word in ['afternoon', 'pm', 'evening']):
-                    hours = 2
-                    period = 'pm' 
-                    print("Inferred afternoon time: 2:00 PM")
-                elif any(word in query_lower for word in ['night', 'late']):
-                    hours = 7
-                    period = 'pm'
-                    print("Inferred evening time: 7:00 PM")
-                else:
-                    # Default to next available business hour
-                    current_hour = current_date.hour
-                    if current_hour < 8:
-                        hours = 9
-                        period = 'am'
-                    elif current_hour < 17:
-                        hours = current_hour + 1
-                        period = 'pm' if hours > 12 else 'am'
-                    else:
-                        hours = 9
-                        period = 'am'
-                        current_date = current_date + timedelta(days=1)
-                    print(f"Default business hour: {hours}:00 {period}")
-            else:
-                # Parse the found time
-                if 'o\'clock' in time_str.lower():
-                    hours_match = re.search(r'(\d{1,2})', time_str)
-                    if hours_match:
-                        hours = int(hours_match.group(1))
-                        period = 'am' if hours <= 11 else 'pm'
-                else:
-                    time_pattern = re.compile(r'(\d{1,2})(?:[:.](\d{2}))?\s*(am|pm)', re.IGNORECASE)
-                    time_match_obj = time_pattern.search(time_str)
-                    
-                    if time_match_obj:
-                        hours = int(time_match_obj.group(1))
-                        minutes = int(time_match_obj.group(2)) if time_match_obj.group(2) else 0
-                        period = time_match_obj.group(3).lower()
-            
-            if hours is None:
-                # Last resort: default to 2 PM
-                hours = 2
-                minutes = 0
-                period = 'pm'
-                print("Using default time: 2:00 PM")
-            
-            # Convert to 24-hour format
-            if period == 'pm' and hours < 12:
-                hours += 12
-            elif period == 'am' and hours == 12:
-                hours = 0
-            
-            # Try to find a date in the query
-            target_date = None
-            
-            # Check for relative dates first (higher priority)
-            if 'tomorrow' in query_lower:
-                target_date = current_date.date() + timedelta(days=1)
-                print("Found relative date: tomorrow")
-            elif 'today' in query_lower:
-                target_date = current_date.date()
-                print("Found relative date: today")
-            elif any(day in query_lower for day in ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']):
-                # Handle day names
-                days = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
-                for day in days:
-                    if day in query_lower:
-                        today_weekday = current_date.weekday()
-                        target_weekday = days.index(day)
-                        days_ahead = (target_weekday - today_weekday) % 7
-                        if days_ahead == 0:  # Same day
-                            if current_date.hour >= hours:  # Time has passed, next week
-                                days_ahead = 7
-                        target_date = current_date.date() + timedelta(days=days_ahead)
-                        print(f"Found weekday: {day} -> {target_date}")
-                        break
-            elif 'next week' in query_lower:
-                target_date = current_date.date() + timedelta(days=7)
-                print("Found relative date: next week")
-            else:
-                # Try explicit date patterns
-                for pattern in date_patterns:
-                    match = re.search(pattern, query_lower, re.IGNORECASE)
-                    if match:
-                        date_str = match.group(1)
-                        target_date = self.parse_date_string(date_str)
-                        print(f"Found explicit date: {date_str} -> {target_date}")
-                        break
-            
-            # If no date found, determine based on time and current time
-            if target_date is None:
-                proposed_time = current_date.replace(hour=hours, minute=minutes, second=0, microsecond=0)
-                if proposed_time <= current_date:
-                    # Time has passed today, schedule for tomorrow
-                    target_date = current_date.date() + timedelta(days=1)
-                    print(f"Time {hours}:{minutes:02d} has passed today, scheduling for tomorrow")
-                else:
-                    # Time hasn't passed yet, schedule for today
-                    target_date = current_date.date()
-                    print(f"Time {hours}:{minutes:02d} is still available today")
-            
-            # Combine date and time
-            meeting_datetime = datetime.combine(target_date, datetime.min.time().replace(hour=hours, minute=minutes))
-            
-            print(f"Final parsed meeting datetime: {meeting_datetime.strftime('%Y-%m-%d %H:%M')}")
-            return meeting_datetime
-            
-        except Exception as e:
-            # Provide more helpful error message
-            error_msg = f"Failed to parse meeting datetime from '{query}': {str(e)}"
-            print(f"ERROR: {error_msg}")
-            
-            # Try to provide suggestions
-            suggestions = []
-            if not re.search(r'\d{1,2}(?::\d{2})?\s*(?:am|pm)', query, re.IGNORECASE):
-                suggestions.append("Include a time like '2pm', '10:30am', or '3:00 PM'")
-            
-            if not any(word in query.lower() for word in ['today', 'tomorrow', 'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday', '2025']):
-                suggestions.append("Include a date like 'tomorrow', 'Monday', or '2025/08/10'")
-                
-            if suggestions:
-                error_msg += f". Suggestions: {'; '.join(suggestions)}"
-            
-            raise ValueError(error_msg)
-    
+        """Parse complete meeting date and time from query string."""
+        return self._intent_datetime(meeting_parser.parse(query))
+
+    @staticmethod
+    def _intent_datetime(intent: MeetingIntent) -> datetime:
+        if intent.error:
+            raise ValueError(intent.error + ". Suggestions: Include a time like '2pm', '10:30am', or '3:00 PM'; "
+                                            "include a date like 'tomorrow', 'Monday', or '2025/08/10'")
+        return intent.meeting_datetime
+
     def parse_date_string(self, date_str: str) -> date:
         """Parse various date string formats into date object."""
-        from dateutil.parser import parse
-        import calendar
-        
-        try:
-            date_str = date_str.strip()
-            current_year = datetime.now().year
-            
-            # Handle YYYY-MM-DD format
-            if re.match(r'\d{4}-\d{1,2}-\d{1,2}', date_str):
-                return datetime.strptime(date_str, '%Y-%m-%d').date()
-            
-            # Handle YYYY/MM/DD format
-            if re.match(r'\d{4}/\d{1,2}/\d{1,2}', date_str):
-                return datetime.strptime(date_str, '%Y/%m/%d').date()
-            
-            # Handle month names (e.g., "August 10", "August 10th", "August 10, 2025")
-            month_pattern = r'(january|february|march|april|may|june|july|august|september|october|november|december)\s+(\d{1,2})(?:st|nd|rd|th)?,?\s*(\d{4})?'
-            match = re.match(month_pattern, date_str.lower())
-            if match:
-                month_name = match.group(1)
-                day = int(match.group(2))
-                year = int(match.group(3)) if match.group(3) else current_year
-                
-                month_num = {
-                    'january': 1, 'february': 2, 'march': 3, 'april': 4,
-                    'may': 5, 'june': 6, 'july': 7, 'august': 8,
-                    'september': 9, 'october': 10, 'november': 11, 'december': 12
-                }[month_name]
-                
-                return date(year, month_num, day)
-            
-            # Fallback: use dateutil parser
-            parsed_date = parse(date_str, default=datetime(current_year, 1, 1))
-            return parsed_date.date()
-            
-        except Exception as e:
-            print(f"Warning: Could not parse date '{date_str}': {e}")
+        parsed = meeting_parser.parse(date_str)
+        if not parsed.has_date:
+            print(f"Warning: Could not parse date '{date_str}'")
             return datetime.now().date()
+        return parsed.meeting_datetime.date()
 
     def parse_meeting_time(self, time_str: str) -> datetime:
         """Legacy method - redirects to parse_meeting_datetime."""
@@ -569,18 +107,15 @@ class MeetingSchedulerAgent:
         query = f"meeting at {time_str}"
         return self.parse_meeting_datetime(query)
 
-    def parse_department_id(self, query: str) -> Optional[str]:
+    def parse_department_id(self, query: str, intent: MeetingIntent = None) -> Optional[str]:
         """Extract department ID from query if present."""
-        match = re.search(r'department_id: ([0-9a-f-]+)', query)
-        if match:
-            return match.group(1)
+        intent = intent or meeting_parser.parse(query)
+        if intent.department_id:
+            return intent.department_id
         
         # Try to match department name
-        if "cardiology" in query.lower():
-            dept = self.session.query(Department).filter(Department.name == "Cardiology").first()
-            return str(dept.id) if dept else None
-        elif "emergency" in query.lower():
-            dept = self.session.query(Department).filter(Department.name == "Emergency").first()
+        if intent.department:
+            dept = self.session.query(Department).filter(Department.name.ilike(intent.department)).first()
             return str(dept.id) if dept else None
         
         return None
@@ -596,27 +131,58 @@ class MeetingSchedulerAgent:
             
         return query.all()
 
-    def check_availability(self, staff_ids: List[str], proposed_time: datetime, duration_minutes: int = 15) -> bool:
+    def get_conflicts(self, staff_ids: List[str], proposed_time: datetime, duration_minutes: int = 15,
+                      exclude_meeting: Any = None) -> Dict[str, List[Any]]:
+        """Participants with a meeting overlapping the proposed slot, keyed by staff ID."""
+        end_time = proposed_time + timedelta(minutes=duration_minutes)
+        exclude_id, exclude_legacy = self._exclusion(exclude_meeting)
+        index = load_free_busy(self.session, staff_ids, proposed_time, end_time, exclude_id, exclude_legacy)
+        return index.conflicts(proposed_time, end_time)
+
+    def check_availability(self, staff_ids: List[str], proposed_time: datetime, duration_minutes: int = 15,
+                           exclude_meeting: Any = None) -> bool:
         """Check if all staff members are available at the proposed time."""
-        end_time = proposed_time + timedelta(minutes=duration_minutes)  # Use dynamic duration
-        
-        for staff_id in staff_ids:
-            # Since appointments are removed, we only check for existing meetings conflicts
-            # Meeting conflicts are already checked above in the method
-            pass
-        return True
+        return not self.get_conflicts(staff_ids, proposed_time, duration_minutes, exclude_meeting)
 
-    def find_next_available_slot(self, staff_ids: List[str], earliest_time: datetime, latest_time: datetime) -> Optional[datetime]:
+    def find_next_available_slot(self, staff_ids: List[str], earliest_time: datetime, latest_time: datetime,
+                                 duration_minutes: int = 15, exclude_meeting: Any = None) -> Optional[datetime]:
         """Find the next available time slot for all participants."""
-        current_time = earliest_time
-        while current_time <= latest_time:
-            if self.check_availability(staff_ids, current_time):
-                return current_time
-            current_time += timedelta(minutes=30)
-        return None
-
-    def send_meeting_notifications(self, staff_ids: List[str], meeting_time: datetime, subject: str, location: str, meet_link: str = None, duration_string: str = "15 minutes", meeting_title: str = None) -> Dict[str, Any]:
-        """Send meeting notifications to all participants."""
+        exclude_id, exclude_legacy = self._exclusion(exclude_meeting)
+        index = load_free_busy(self.session, staff_ids, earliest_time,
+                               latest_time + timedelta(minutes=duration_minutes), exclude_id, exclude_legacy)
+        # Prefers a slot inside everyone's shift, then any slot free of meetings
+        return index.find_slot(duration_minutes, earliest_time, latest_time)
+
+    @staticmethod
+    def _exclusion(meeting: Any):
+        """Meeting (and its legacy StaffMeeting twin) to ignore when rescheduling it."""
+        if meeting is None:
+            return None, None
+        return str(meeting.id), (meeting.title, meeting.meeting_datetime)
+
+    def _conflict_response(self, staff_ids: List[str], conflicts: Dict[str, List[Any]], meeting_time: datetime,
+                           duration_minutes: int, exclude_meeting: Any = None) -> Dict[str, Any]:
+        """Failure payload naming who is busy and the earliest slot that works for everyone."""
+        suggested = self.find_next_available_slot(
+            staff_ids, meeting_time, meeting_time + timedelta(days=7), duration_minutes, exclude_meeting
+        )
+        return {
+            "success": False,
+            "message": f"Selected time slot has conflicts for {len(conflicts)} participant(s)" + (
+                f". Earliest time that works for everyone: {suggested.strftime('%Y-%m-%d %I:%M %p')}" if suggested else ""),
+            "conflicts": [
+                {"staff_id": staff_id,
+                 "busy": [{"start": i.start.isoformat(), "end": i.end.isoformat(), "source": i.source} for i in intervals]}
+                for staff_id, intervals in conflicts.items()
+            ],
+            "suggested_time": suggested.isoformat() if suggested else None
+        }
+
+    def _email_sender(self) -> str:
+        return f"{self.email_from_name} <{self.email_from_address}>"
+
+    def send_meeting_notifications(self, staff_ids: List[str], meeting_time: datetime, subject: str, location: str, meet_link: str = None, duration_string: str = "15 minutes", meeting_title: str = None, meeting_id: str = None) -> Dict[str, Any]:
+        """Queue meeting invitations for all participants (delivered by the email outbox)."""
         try:
             if not self.email_username or not self.email_password:
                 print("ERROR: Email configuration missing. Set EMAIL_USERNAME and EMAIL_PASSWORD in .env")
@@ -624,9 +190,7 @@ class MeetingSchedulerAgent:
 
             print(f"Attempting to send emails to {len(staff_ids)} staff members...")
             
-            server = smtplib.SMTP(self.email_server, self.email_port)
-            server.starttls()
-            server.login(self.email_username, self.email_password)
+            outbox = []
             
             emails_sent = 0
             failed_emails = []
@@ -656,11 +220,6 @@ class MeetingSchedulerAgent:
                         
                         print(f"Email subject created: {email_subject}")
                         
-                        msg = MIMEMultipart()
-                        msg['From'] = f"{self.email_from_name} <{self.email_from_address}>"
-                        msg['To'] = staff.user.email
-                        msg['Subject'] = email_subject
-
                         # Create meeting link section
                         meet_section = ""
                         if meet_link:
@@ -719,10 +278,12 @@ Best regards,
 📧 Reply to this email for meeting-related questions
 📞 Contact Administration for urgent matters"""
 
-                        msg.attach(MIMEText(body, 'plain'))
-                        server.send_message(msg)
+                        outbox.append(OutboxMessage(
+                            recipient=staff.user.email, subject=email_subject, body=body,
+                            sender=self._email_sender(), category="meeting_invite",
+                            meeting_id=meeting_id, revision=meeting_time.isoformat()))
                         emails_sent += 1
-                        print(f"  SUCCESS: Email sent to {staff.user.email}")
+                        print(f"  SUCCESS: Email queued for {staff.user.email}")
                     else:
                         print(f"  WARNING: Staff member {staff_id} not found or has no email")
                         failed_emails.append(staff_id)
@@ -731,15 +292,18 @@ Best regards,
                     print(f"  ERROR: Failed to send email to staff {staff_id}: {str(e)}")
                     failed_emails.append(staff_id)
 
-            server.quit()
-            print(f"Email sending completed. {emails_sent}/{len(staff_ids)} emails sent successfully.")
+            queued = email_outbox.enqueue(outbox)
+            if not queued["success"]:
+                raise RuntimeError(f"could not queue emails: {queued['message']}")
+            print(f"Email queueing completed. {emails_sent}/{len(staff_ids)} emails queued for delivery.")
             
             return {
                 "success": emails_sent > 0,
                 "emails_sent": emails_sent,
                 "total_recipients": len(staff_ids),
                 "failed_emails": failed_emails,
-                "message": f"Successfully sent {emails_sent} emails out of {len(staff_ids)} recipients"
+                "duplicates_skipped": queued["duplicates"],
+                "message": f"Queued {emails_sent} emails out of {len(staff_ids)} recipients for delivery"
             }
             
         except Exception as e:
@@ -754,25 +318,27 @@ Best regards,
     def schedule_meeting(self, query: str) -> Dict[str, Any]:
         """Process a natural language meeting request and schedule if possible."""
         try:
-            # Extract meeting title from query
-            meeting_title = self.extract_meeting_title(query)
+            # Parse title, duration, participants, date/time and department in one pass
+            intent = meeting_parser.parse(query)
+            meeting_title = intent.title
             print(f"Extracted meeting title: {meeting_title}")
             
-            # Parse duration from query
-            duration_minutes, duration_string = self.parse_duration(query)
+            duration_minutes, duration_string = intent.duration_minutes, intent.duration_string
             print(f"Extracted duration: {duration_minutes} minutes -> '{duration_string}'")
             
             # Extract specific participants from the query
-            participant_names = self.extract_participants_from_query(query)
+            participant_names = intent.participants
             if participant_names:
                 staff_ids = self.find_staff_by_names(participant_names)
                 print(f"Using specific participants: {participant_names} -> {len(staff_ids)} staff members")
             else:
                 # Fallback: If no specific participants mentioned, pick a broader set of active staff
-                # Previously this filtered only doctors/nurses which could be small; use a larger sample
-                available_staff = self.session.query(Staff).join(User).filter(
-                    Staff.status == 'active'
-                ).order_by(User.last_name).limit(50).all()
+                # (the named department's staff when the request mentions one)
+                staff_query = self.session.query(Staff).join(User).filter(Staff.status == 'active')
+                department_id = self.parse_department_id(query, intent)
+                if department_id:
+                    staff_query = staff_query.filter(Staff.department_id == uuid.UUID(department_id))
+                available_staff = staff_query.order_by(User.last_name).limit(50).all()
                 
                 if not available_staff:
                     return {
@@ -785,7 +351,7 @@ Best regards,
             
             # Enhanced parsing with better error handling
             try:
-                meeting_time = self.parse_meeting_datetime(query)
+                meeting_time = self._intent_datetime(intent)
                 print(f"Successfully parsed meeting time: {meeting_time}")
             except ValueError as e:
                 error_message = str(e)
@@ -809,12 +375,10 @@ Best regards,
                     "query_received": query
                 }
             
-            # Check availability for the specified time
-            if not self.check_availability(staff_ids, meeting_time, duration_minutes):
-                return {
-                    "success": False,
-                    "message": "Selected time slot has conflicts"
-                }
+            # Check availability for the specified time against participants' existing meetings
+            conflicts = self.get_conflicts(staff_ids, meeting_time, duration_minutes)
+            if conflicts:
+                return self._conflict_response(staff_ids, conflicts, meeting_time, duration_minutes)
 
             # Generate REAL Google Meet link with your account as host
             meet_link = None
@@ -958,7 +522,8 @@ Best regards,
                 "Conference Room A",
                 meet_link,
                 duration_string,  # Pass duration string to email
-                meeting_title    # Pass meeting_title parameter
+                meeting_title,    # Pass meeting_title parameter
+                meeting_id=meeting_id
             )
 
             if not email_result["success"]:
@@ -995,9 +560,10 @@ Best regards,
         try:
             print(f"🔍 DEBUG: Updating meeting with query: '{query}'")
             
-            # Extract meeting identifier (ID or title)
-            meeting_id = self.extract_meeting_id(query)
-            meeting_title = self.extract_meeting_title_from_update_query(query)
+            # Extract meeting identifier (ID or title), action, new time and duration in one pass
+            intent = meeting_parser.parse(query)
+            meeting_id = intent.meeting_id
+            meeting_title = intent.meeting_reference
             
             if not meeting_id and not meeting_title:
                 return {
@@ -1035,7 +601,7 @@ Best regards,
             print(f"✅ Found meeting: '{meeting.title}' (ID: {meeting.id})")
             
             # Detect if the user intends to cancel the meeting
-            is_cancel = bool(re.search(r'\b(cancel|cancelled|cancelation|cancellation|abort|call off|call-off|calloff|stop meeting)\b', query, re.IGNORECASE))
+            is_cancel = intent.action == "cancel"
 
             if is_cancel:
                 print("Detected cancel request - proceeding to cancel the meeting")
@@ -1130,24 +696,44 @@ Best regards,
 
                 return {"success": True, "message": f"Meeting '{meeting.title}' cancelled and participants notified.", "data": {"meeting_id": str(meeting.id), "status": "cancelled", "emails_sent": email_result.get('emails_sent', 0)}}
 
-            # Extract new date/time from query
-            new_datetime = self.parse_meeting_datetime(query)
-            if not new_datetime:
+            # Get current meeting details
+            old_datetime = meeting.meeting_datetime
+            old_duration = meeting.duration_minutes
+
+            # New date/time from the query; whatever the request does not mention is kept
+            if intent.error or not (intent.has_date or intent.has_time or intent.has_duration):
                 return {
                     "success": False,
                     "message": "Could not parse the new date/time from your request. Please specify when you want to reschedule the meeting."
                 }
+            if intent.has_date:
+                new_datetime = intent.meeting_datetime if intent.has_time else datetime.combine(
+                    intent.meeting_datetime.date(), old_datetime.time())
+            elif intent.has_time:
+                # "move it from 2pm to 5pm" keeps the meeting's day
+                new_datetime = datetime.combine(old_datetime.date(), intent.meeting_datetime.time())
+            else:
+                new_datetime = old_datetime
             
-            # Extract new duration if specified
-            new_duration_minutes, new_duration_string = self.parse_duration(query)
-
-            # Get current meeting details
-            old_datetime = meeting.meeting_datetime
-            old_duration = meeting.duration_minutes
+            # New duration if specified
+            if intent.has_duration:
+                new_duration_minutes = intent.duration_minutes
+            else:
+                new_duration_minutes = old_duration or intent.duration_minutes
 
             print(f"📅 Updating meeting from {old_datetime} to {new_datetime}")
             print(f"⏱️ Duration: {old_duration} minutes → {new_duration_minutes} minutes")
 
+            # Make sure the participants are free at the new time (ignoring this meeting itself)
+            participant_ids = [str(row.staff_id) for row in self.session.query(MeetingParticipant.staff_id).filter(
+                MeetingParticipant.meeting_id == meeting.id
+            )]
+            if participant_ids:
+                conflicts = self.get_conflicts(participant_ids, new_datetime, new_duration_minutes, exclude_meeting=meeting)
+                if conflicts:
+                    return self._conflict_response(participant_ids, conflicts, new_datetime,
+                                                   new_duration_minutes, exclude_meeting=meeting)
+
             # BEFORE updating the legacy StaffMeeting record, fetch legacy participants so we can notify them
             legacy_participant_ids = []
             try:
@@ -1326,73 +912,11 @@ Best regards,
     
     def extract_meeting_id(self, query: str) -> Optional[str]:
         """Extract meeting ID from update query."""
-        # Look for UUID patterns
-        uuid_pattern = r'([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})'
-        match = re.search(uuid_pattern, query, re.IGNORECASE)
-        if match:
-            return match.group(1)
-        
-        # Look for "meeting ID" or "ID" patterns
-        id_patterns = [
-            r'meeting\s+id\s*:?\s*([0-9a-f-]+)',
-            r'id\s*:?\s*([0-9a-f-]+)',
-            r'meeting\s+#([0-9a-f-]+)',
-            r'#([0-9a-f-]+)',
-            r'([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})'  # Full UUID pattern
-        ]
-        
-        # Process patterns in order, but prioritize longer matches
-        best_match = None
-        best_length = 0
-        
-        for pattern in id_patterns:
-            match = re.search(pattern, query, re.IGNORECASE)
-            if match:
-                extracted = match.group(1).strip()
-                if extracted and len(extracted) > best_length:
-                    best_match = extracted
-                    best_length = len(extracted)
-        
-        return best_match
+        return meeting_parser.parse(query).meeting_id
     
     def extract_meeting_title_from_update_query(self, query: str) -> Optional[str]:
         """Extract meeting title from update query, excluding update-related words."""
-        # Remove update-related words to focus on the actual title
-        update_words = ['update', 'reschedule', 'postpone', 'change', 'move', 'shift', 'delay', 'earlier', 'later']
-        query_lower = query.lower()
-        
-        for word in update_words:
-            query_lower = query_lower.replace(word, '')
-        
-        # Look for quoted titles
-        quoted = re.search(r'["""\']([^"""\']+)["""\']', query)
-        if quoted:
-            title = quoted.group(1).strip()
-            if title and len(title) > 3:
-                return title
-        
-        # Look for "meeting titled" or "meeting called" patterns
-        title_patterns = [
-            r'meeting\s+titled\s+([^,\n]+)',
-            r'meeting\s+called\s+([^,\n]+)',
-            r'meeting\s+about\s+([^,\n]+)',
-            r'meeting\s+for\s+([^,\n]+)',
-            r'the\s+([^,\n]+?)\s+meeting',  # "the Tasks Improvements meeting"
-            r'our\s+([^,\n]+?)\s+meeting'   # "our staff meeting"
-        ]
-        
-        for pattern in title_patterns:
-            match = re.search(pattern, query, re.IGNORECASE)
-            if match:
-                title = match.group(1).strip()
-                # Clean up the title by removing trailing words that are not part of the title
-                # Remove words like "needs to be moved", "to tomorrow", etc.
-                title = re.sub(r'\s+(?:needs?\s+to\s+be\s+moved?|to\s+tomorrow|to\s+next|until\s+next?|about\s+).*$', '', title, flags=re.IGNORECASE)
-                title = title.strip()
-                if title and len(title) > 3:
-                    return title
-        
-        return None
+        return meeting_parser.parse(query).meeting_reference
     
     def search_meetings_by_title(self, title_fragment: str) -> List[Any]:
         """Search for meetings by title fragment."""
@@ -1426,8 +950,14 @@ Best regards,
             print(f"Error searching meetings by title: {e}")
             return []
     
+    @staticmethod
+    def _update_revision(meeting: Any) -> str:
+        """Outbox revision for a reschedule: the update's write time, which only moves forward
+        (the target time does not: a meeting moved A -> B -> A would repeat it)."""
+        return (meeting.updated_at or datetime.now()).isoformat()
+
     def send_meeting_update_notifications(self, staff_ids: List[str], meeting: Any, old_datetime: datetime, new_datetime: datetime, old_duration: int, new_duration: int, meet_link: str = None) -> Dict[str, Any]:
-        """Send meeting update notifications to all participants."""
+        """Queue meeting update notifications for all participants (delivered by the email outbox)."""
         try:
             if not self.email_username or not self.email_password:
                 print("ERROR: Email configuration missing. Set EMAIL_USERNAME and EMAIL_PASSWORD in .env")
@@ -1435,9 +965,7 @@ Best regards,
 
             print(f"📧 Sending update notifications to {len(staff_ids)} staff members...")
             
-            server = smtplib.SMTP(self.email_server, self.email_port)
-            server.starttls()
-            server.login(self.email_username, self.email_password)
+            outbox = []
             
             emails_sent = 0
             failed_emails = []
@@ -1475,11 +1003,6 @@ Best regards,
                         # Create email subject
                         email_subject = f"🏥 MEETING UPDATED: {meeting.title} - {new_datetime.strftime('%B %d, %Y')}"
                         
-                        msg = MIMEMultipart()
-                        msg['From'] = f"{self.email_from_name} <{self.email_from_address}>"
-                        msg['To'] = recipient_email
-                        msg['Subject'] = email_subject
-
                         # Create meeting link section
                         meet_section = ""
                         if meet_link:
@@ -1545,10 +1068,12 @@ Best regards,
 📧 Reply to this email for meeting-related questions
 📞 Contact Administration for urgent matters"""
 
-                        msg.attach(MIMEText(body, 'plain'))
-                        server.send_message(msg)
+                        outbox.append(OutboxMessage(
+                            recipient=recipient_email, subject=email_subject, body=body,
+                            sender=self._email_sender(), category="meeting_update",
+                            meeting_id=str(meeting.id), revision=self._update_revision(meeting)))
                         emails_sent += 1
-                        print(f"  ✅ SUCCESS: Update email sent to {recipient_email}")
+                        print(f"  ✅ SUCCESS: Update email queued for {recipient_email}")
                     else:
                         print(f"  ⚠️ WARNING: Participant {staff_id} not found or has no email")
                         failed_emails.append(staff_id)
@@ -1557,15 +1082,18 @@ Best regards,
                     print(f"  ❌ ERROR: Failed to send update email to staff {staff_id}: {str(e)}")
                     failed_emails.append(staff_id)
 
-            server.quit()
-            print(f"📧 Update email sending completed. {emails_sent}/{len(staff_ids)} emails sent successfully.")
+            queued = email_outbox.enqueue(outbox)
+            if not queued["success"]:
+                raise RuntimeError(f"could not queue emails: {queued['message']}")
+            print(f"📧 Update email queueing completed. {emails_sent}/{len(staff_ids)} emails queued for delivery.")
             
             return {
                 "success": emails_sent > 0,
                 "emails_sent": emails_sent,
                 "total_recipients": len(staff_ids),
                 "failed_emails": failed_emails,
-                "message": f"Successfully sent {emails_sent} update emails out of {len(staff_ids)} recipients"
+                "duplicates_skipped": queued["duplicates"],
+                "message": f"Queued {emails_sent} update emails out of {len(staff_ids)} recipients for delivery"
             }
             
         except Exception as e:
@@ -1578,16 +1106,14 @@ Best regards,
             }
 
     def send_meeting_cancellation_notifications(self, staff_ids: List[str], meeting: Any, cancelled_datetime: datetime, meet_link: str = None, google_deleted: bool = False) -> Dict[str, Any]:
-        """Send meeting cancellation notifications to all participants."""
+        """Queue meeting cancellation notifications for all participants (delivered by the email outbox)."""
         try:
             if not self.email_username or not self.email_password:
                 print("ERROR: Email configuration missing. Set EMAIL_USERNAME and EMAIL_PASSWORD in .env")
                 return {"success": False, "emails_sent": 0, "message": "Email configuration missing"}
 
             print(f"📧 Sending cancellation notifications to {len(staff_ids)} staff members...")
-            server = smtplib.SMTP(self.email_server, self.email_port)
-            server.starttls()
-            server.login(self.email_username, self.email_password)
+            outbox = []
 
             emails_sent = 0
             failed_emails = []
@@ -1620,11 +1146,6 @@ Best regards,
                         print(f"  📧 Sending cancellation email to: {recipient_name} ({recipient_email})")
                         email_subject = f"🏥 MEETING CANCELLED: {meeting.title}"
 
-                        msg = MIMEMultipart()
-                        msg['From'] = f"{self.email_from_name} <{self.email_from_address}>"
-                        msg['To'] = recipient_email
-                        msg['Subject'] = email_subject
-
                         meet_section = ""
                         if meet_link:
                             meet_section = f"\n🔗 PREVIOUS MEETING LINK: {meet_link}\n"
@@ -1654,10 +1175,12 @@ Best regards,
 📧 Reply to this email for meeting-related questions
 """
 
-                        msg.attach(MIMEText(body, 'plain'))
-                        server.send_message(msg)
+                        outbox.append(OutboxMessage(
+                            recipient=recipient_email, subject=email_subject, body=body,
+                            sender=self._email_sender(), category="meeting_cancel",
+                            meeting_id=str(meeting.id), revision=cancelled_datetime.isoformat()))
                         emails_sent += 1
-                        print(f"  ✅ SUCCESS: Cancellation email sent to {recipient_email}")
+                        print(f"  ✅ SUCCESS: Cancellation email queued for {recipient_email}")
                     else:
                         print(f"  ⚠️ WARNING: Participant {staff_id} not found or has no email")
                         failed_emails.append(staff_id)
@@ -1666,15 +1189,18 @@ Best regards,
                     print(f"  ❌ ERROR: Failed to send cancellation email to staff {staff_id}: {str(e)}")
                     failed_emails.append(staff_id)
 
-            server.quit()
-            print(f"📧 Cancellation email sending completed. {emails_sent}/{len(staff_ids)} emails sent successfully.")
+            queued = email_outbox.enqueue(outbox)
+            if not queued["success"]:
+                raise RuntimeError(f"could not queue emails: {queued['message']}")
+            print(f"📧 Cancellation email queueing completed. {emails_sent}/{len(staff_ids)} emails queued for delivery.")
 
             return {
                 "success": emails_sent > 0,
                 "emails_sent": emails_sent,
                 "total_recipients": len(staff_ids),
                 "failed_emails": failed_emails,
-                "message": f"Successfully sent {emails_sent} cancellation emails out of {len(staff_ids)} recipients"
+                "duplicates_skipped": queued["duplicates"],
+                "message": f"Queued {emails_sent} cancellation emails out of {len(staff_ids)} recipients for delivery"
             }
 
         except Exception as e:
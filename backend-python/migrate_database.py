@@ -10,7 +10,7 @@ from decimal import Decimal
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from database import (
-    test_connection, SessionLocal, Base, engine,
+    test_connection, SessionLocal, Base, engine, SEARCH_NAME_SQL,
     User, LegacyUser
 )
 from sqlalchemy import text
@@ -115,9 +115,10 @@ def create_new_schema():
         # Enable UUID extension
         db = SessionLocal()
         db.execute(text('CREATE EXTENSION IF NOT EXISTS "uuid-ossp"'))
+        db.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
         db.commit()
         db.close()
-        print("✅ UUID extension enabled")
+        print("✅ UUID and pg_trgm extensions enabled")
         
         # Create all tables
         Base.metadata.create_all(bind=engine)
@@ -195,6 +196,94 @@ def verify_migration():
     finally:
         db.close()
 
+def replace_search_name_sql(table: str) -> str:
+    """Drop a ``search_name`` column generated by an older expression so it is re-added below."""
+    return f"""
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_name = '{table}' AND column_name = 'search_name'
+                         AND generation_expression NOT LIKE '%regexp_replace%') THEN
+                ALTER TABLE {table} DROP COLUMN search_name;
+            END IF;
+        END $$
+    """
+
+
+# Idempotent, non-destructive steps for upgrading a live database in place.
+# Each entry is (description, SQL); every statement is safe to re-run.
+SEARCH_MIGRATION_STEPS = [
+    ("pg_trgm extension", "CREATE EXTENSION IF NOT EXISTS pg_trgm"),
+    ("patients.search_name (drop outdated expression)", replace_search_name_sql("patients")),
+    ("patients.search_name",
+     "ALTER TABLE patients ADD COLUMN IF NOT EXISTS search_name text "
+     f"GENERATED ALWAYS AS ({SEARCH_NAME_SQL}) STORED"),
+    ("patients.phone_normalized",
+     "ALTER TABLE patients ADD COLUMN IF NOT EXISTS phone_normalized varchar(20) "
+     "GENERATED ALWAYS AS (regexp_replace(coalesce(phone, ''), '[^0-9]', '', 'g')) STORED"),
+    ("users.search_name (drop outdated expression)", replace_search_name_sql("users")),
+    ("users.search_name",
+     "ALTER TABLE users ADD COLUMN IF NOT EXISTS search_name text "
+     f"GENERATED ALWAYS AS ({SEARCH_NAME_SQL}) STORED"),
+    ("ix_patients_search_name_trgm",
+     "CREATE INDEX IF NOT EXISTS ix_patients_search_name_trgm ON patients USING gin (search_name gin_trgm_ops)"),
+    ("ix_patients_phone_normalized_trgm",
+     "CREATE INDEX IF NOT EXISTS ix_patients_phone_normalized_trgm ON patients USING gin (phone_normalized gin_trgm_ops)"),
+    ("ix_patients_email_trgm",
+     "CREATE INDEX IF NOT EXISTS ix_patients_email_trgm ON patients USING gin (email gin_trgm_ops)"),
+    ("ix_patients_patient_number_trgm",
+     "CREATE INDEX IF NOT EXISTS ix_patients_patient_number_trgm ON patients USING gin (patient_number gin_trgm_ops)"),
+    ("ix_users_search_name_trgm",
+     "CREATE INDEX IF NOT EXISTS ix_users_search_name_trgm ON users USING gin (search_name gin_trgm_ops)"),
+]
+
+def apply_migration_steps(steps, label: str):
+    """Apply a list of idempotent (description, SQL) steps in one transaction."""
+    print(f"🔧 Applying {label}...")
+    
+    db = SessionLocal()
+    try:
+        for description, statement in steps:
+            db.execute(text(statement))
+            print(f"  ✓ {description}")
+        db.commit()
+        print(f"✅ {label} applied")
+    except Exception as e:
+        print(f"❌ Error applying {label}: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def hot_path_index_steps():
+    """Idempotent CREATE INDEX steps for every index declared on the models.
+    
+    The hot-path indexes were chosen with index_advisor.py from the statements
+    the tools actually issue; see that module for before/after latency numbers.
+    """
+    from index_advisor import model_index_ddl
+    return model_index_ddl()
+
+def new_table_steps():
+    """Idempotent CREATE TABLE steps for tables added to the models since a database was created."""
+    from sqlalchemy.schema import CreateTable
+    return [
+        (table.name, str(CreateTable(table, if_not_exists=True).compile(dialect=engine.dialect)))
+        for table in Base.metadata.sorted_tables
+    ]
+
+def rollup_backfill_steps():
+    """Rebuild the daily supply usage rollups from inventory transactions (see supply_rollups.py)."""
+    from supply_rollups import backfill_steps
+    return backfill_steps()
+
+def apply_incremental_migrations():
+    """Upgrade an existing database in place without dropping any data."""
+    apply_migration_steps(new_table_steps(), "new tables")
+    apply_migration_steps(SEARCH_MIGRATION_STEPS, "search columns and trigram indexes")
+    apply_migration_steps(hot_path_index_steps(), "hot-path indexes")
+    apply_migration_steps(rollup_backfill_steps(), "supply usage rollups")
+
 def main():
     """Main migration function."""
     print("🏥 Hospital Management System Database Migration")
@@ -238,6 +327,13 @@ def main():
         return False
 
 if __name__ == "__main__":
+    if "--incremental" in sys.argv:
+        # Non-destructive upgrade of an existing database
+        if not test_connection():
+            sys.exit(1)
+        apply_incremental_migrations()
+        sys.exit(0)
+    
     success = main()
     if not success:
         sys.exit(1)
@@ -0,0 +1,252 @@
+"""
+Monitoring History
+==================
+
+Bounded in-memory history for the real-time monitoring system:
+- ``MetricRingBuffer`` keeps one fixed-capacity NumPy ring per monitor:
+  a timestamp column plus one float column per numeric metric
+- Appends and evictions are O(1): the write head wraps around and samples
+  older than the retention window are dropped from the tail
+- Window statistics (mean, least-squares slope per hour, percentiles) are
+  computed vectorized over the ring instead of rebuilding dict lists
+- ``AlertHistory`` caps the alert log and indexes alerts by id for O(1)
+  lookup, acknowledgement and resolution
+
+Usage:
+    python monitoring_history.py --benchmark   # compare with the list-of-dicts history, no database needed
+"""
+
+import math
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+
+HISTORY_HOURS = 24
+ALERT_HISTORY_LIMIT = 5000
+PERCENTILES = (50, 90, 95)
+
+
+def capacity_for(interval_seconds: float, hours: float = HISTORY_HOURS) -> int:
+    """Samples needed to hold ``hours`` of history at one sample per ``interval_seconds``."""
+    return max(int(math.ceil(hours * 3600 / max(interval_seconds, 1))) + 1, 8)
+
+
+def _timestamp(value) -> float:
+    if value is None:
+        return datetime.now().timestamp()
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    return float(value)
+
+
+class MetricRingBuffer:
+    """Fixed-capacity, time-ordered metric samples for one monitor."""
+
+    def __init__(self, capacity: int, retention_seconds: float = HISTORY_HOURS * 3600,
+                 columns: Sequence[str] = ()):
+        self.capacity = capacity
+        self.retention_seconds = retention_seconds
+        self.columns: Dict[str, int] = {}
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.values = np.full((capacity, 0), np.nan, dtype=np.float64)
+        self._start = 0
+        self._size = 0
+        for name in columns:
+            self._column(name)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _column(self, name: str) -> int:
+        index = self.columns.get(name)
+        if index is None:
+            # New metrics are rare (first samples only); growing by one column keeps appends O(1)
+            index = len(self.columns)
+            self.columns[name] = index
+            self.values = np.hstack([self.values, np.full((self.capacity, 1), np.nan)])
+        return index
+
+    def append(self, metrics: Dict[str, Any], timestamp=None):
+        """Store the numeric values of ``metrics``; evicts the oldest sample when full."""
+        ts = _timestamp(timestamp if timestamp is not None else metrics.get("timestamp"))
+        if self._size == self.capacity:
+            self._start = (self._start + 1) % self.capacity
+            self._size -= 1
+        slot = (self._start + self._size) % self.capacity
+        self.timestamps[slot] = ts
+        self.values[slot, :] = np.nan
+        for name, value in metrics.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                column = self._column(name)
+                self.values[slot, column] = value
+        self._size += 1
+        self.evict_before(ts - self.retention_seconds)
+
+    def evict_before(self, cutoff: float) -> int:
+        """Drop samples older than ``cutoff`` (epoch seconds) from the tail."""
+        evicted = 0
+        while self._size and self.timestamps[self._start] <= cutoff:
+            self._start = (self._start + 1) % self.capacity
+            self._size -= 1
+            evicted += 1
+        return evicted
+
+    def _slots(self, last: Optional[int] = None, seconds: Optional[float] = None) -> np.ndarray:
+        """Ring slots in chronological order, limited to the newest ``last`` samples / ``seconds``."""
+        count = self._size if last is None else min(last, self._size)
+        slots = (self._start + np.arange(self._size - count, self._size)) % self.capacity
+        if seconds is not None and count:
+            newest = self.timestamps[slots[-1]]
+            slots = slots[self.timestamps[slots] > newest - seconds]
+        return slots
+
+    def series(self, metric: str, last: Optional[int] = None, seconds: Optional[float] = None):
+        """``(timestamps, values)`` for one metric, oldest first, missing samples dropped."""
+        if metric not in self.columns:
+            return np.empty(0), np.empty(0)
+        slots = self._slots(last, seconds)
+        values = self.values[slots, self.columns[metric]]
+        present = ~np.isnan(values)
+        return self.timestamps[slots][present], values[present]
+
+    def latest(self) -> Dict[str, Any]:
+        if not self._size:
+            return {}
+        slot = (self._start + self._size - 1) % self.capacity
+        sample = {name: float(self.values[slot, i]) for name, i in self.columns.items()
+                  if not np.isnan(self.values[slot, i])}
+        sample["timestamp"] = datetime.fromtimestamp(self.timestamps[slot]).isoformat()
+        return sample
+
+    def window_stats(self, metric: str, last: Optional[int] = None,
+                     seconds: Optional[float] = None) -> Dict[str, Any]:
+        """Mean, least-squares slope (units per hour), percentiles and range over a window."""
+        ts, values = self.series(metric, last, seconds)
+        stats: Dict[str, Any] = {"metric": metric, "count": int(values.size)}
+        if not values.size:
+            return stats
+        stats.update({
+            "latest": float(values[-1]),
+            "mean": float(values.mean()),
+            "min": float(values.min()),
+            "max": float(values.max()),
+            "std": float(values.std()),
+            "slope_per_hour": 0.0,
+        })
+        for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+            stats[f"p{p}"] = float(v)
+        if values.size >= 2:
+            hours = (ts - ts.mean()) / 3600.0
+            denominator = float(np.dot(hours, hours))
+            if denominator > 0:
+                stats["slope_per_hour"] = float(np.dot(hours, values - values.mean()) / denominator)
+        return stats
+
+    def to_records(self, last: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Samples as dicts (oldest first) for callers that still expect the old format."""
+        records = []
+        for slot in self._slots(last):
+            record = {name: float(self.values[slot, i]) for name, i in self.columns.items()
+                      if not np.isnan(self.values[slot, i])}
+            record["timestamp"] = datetime.fromtimestamp(self.timestamps[slot]).isoformat()
+            records.append(record)
+        return records
+
+
+class AlertHistory:
+    """Capped alert log with lookup by alert id; the oldest alerts drop off first."""
+
+    def __init__(self, limit: int = ALERT_HISTORY_LIMIT):
+        self.limit = limit
+        self._alerts: "OrderedDict[str, Any]" = OrderedDict()
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._alerts)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._alerts.values())
+
+    def __contains__(self, alert_id: str) -> bool:
+        return alert_id in self._alerts
+
+    def append(self, alert):
+        self._alerts[alert.id] = alert
+        self._alerts.move_to_end(alert.id)
+        while len(self._alerts) > self.limit:
+            self._alerts.popitem(last=False)
+            self.dropped += 1
+
+    def get(self, alert_id: str):
+        return self._alerts.get(alert_id)
+
+    def recent(self, count: int = 50) -> List[Any]:
+        alerts = []
+        for alert in reversed(self._alerts.values()):
+            if len(alerts) >= count:
+                break
+            alerts.append(alert)
+        return alerts
+
+    def active(self) -> Dict[str, Any]:
+        """Unresolved alerts by id."""
+        return {alert_id: alert for alert_id, alert in self._alerts.items() if not alert.resolved}
+
+
+def run_benchmark(samples: int = 1440, interval_seconds: int = 60):
+    """One day of one-minute samples: list-of-dicts history against the ring buffer."""
+    import random
+    import time as timer
+    from datetime import timedelta
+
+    random.seed(11)
+    start = datetime.now() - timedelta(seconds=samples * interval_seconds)
+    stream = []
+    for i in range(samples):
+        stream.append({
+            "total_beds": 400,
+            "occupied_beds": 300 + i % 80,
+            "available_beds": 100 - i % 80,
+            "occupancy_rate": 75 + (i % 80) / 4 + random.random(),
+            "timestamp": (start + timedelta(seconds=i * interval_seconds)).isoformat(),
+        })
+
+    # Previous behaviour: append, then rebuild the list parsing every timestamp
+    started = timer.perf_counter()
+    history: List[Dict[str, Any]] = []
+    for metrics in stream:
+        history.append(metrics)
+        cutoff = datetime.fromisoformat(metrics["timestamp"]) - timedelta(hours=HISTORY_HOURS)
+        history = [m for m in history if datetime.fromisoformat(m["timestamp"]) > cutoff]
+    legacy_store = timer.perf_counter() - started
+
+    started = timer.perf_counter()
+    buffer = MetricRingBuffer(capacity_for(interval_seconds))
+    for metrics in stream:
+        buffer.append(metrics)
+    ring_store = timer.perf_counter() - started
+
+    started = timer.perf_counter()
+    for _ in range(100):
+        stats = buffer.window_stats("occupancy_rate", seconds=4 * 3600)
+    stats_ms = (timer.perf_counter() - started) * 10
+
+    print(f"{samples} samples, {len(buffer)} retained (capacity {buffer.capacity})")
+    print(f"List history store: {legacy_store * 1e6 / samples:.1f} µs/sample ({legacy_store:.2f} s total)")
+    print(f"Ring buffer store:  {ring_store * 1e6 / samples:.1f} µs/sample ({ring_store:.3f} s total)")
+    print(f"4h window stats: {stats_ms:.3f} ms -> mean {stats['mean']:.1f}, "
+          f"slope {stats['slope_per_hour']:+.2f}/h, p95 {stats['p95']:.1f}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--benchmark" in sys.argv:
+        run_benchmark()
+    else:
+        print(__doc__)
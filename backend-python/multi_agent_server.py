@@ -6,7 +6,6 @@ import random
 import sys
 import traceback
 import uuid
-import re
 from datetime import datetime, date, timedelta
 from decimal import Decimal
 from typing import Any, Dict, List, Optional
@@ -26,7 +25,7 @@ from mcp.server.fastmcp import FastMCP
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
+from report_file_server import ReportFileApp
 
 # Import database modules
 try:
@@ -40,55 +39,65 @@ except ImportError:
     DATABASE_AVAILABLE = False
     print("WARNING: Database modules not available. Install dependencies: pip install sqlalchemy psycopg2-binary")
 
-# Import multi-agent system
-try:
-    from agents.orchestrator_agent import OrchestratorAgent
-    MULTI_AGENT_AVAILABLE = True
-except ImportError:
-    MULTI_AGENT_AVAILABLE = False
-    print("WARNING: Multi-agent system not available")
-
-# Import advanced LangChain/LangGraph systems
-try:
-    from agents.master_integration_system import MasterHospitalManagementSystem, IntegrationLevel
-    from agents.enhanced_orchestrator_agent import EnhancedOrchestratorAgent
-    from agents.real_time_monitoring_agent import RealTimeMonitoringAgent
-    from agents.predictive_analytics_agent import AdvancedPredictiveSystem, PredictionType, ForecastHorizon
-    from agents.multilingual_support_agent import MultiLanguageSupport, LanguageCode, ContentType
-    from agents.equipment_lifecycle_agent import EquipmentLifecycleManager
-    ADVANCED_AI_AVAILABLE = True
-    print("✅ Advanced LangChain/LangGraph systems loaded successfully")
-except ImportError as e:
-    ADVANCED_AI_AVAILABLE = False
-    print(f"⚠️ Advanced AI systems not available: {e}")
-
 # Initialize FastMCP server
 mcp = FastMCP("hospital-management-system-multi-agent")
 
-# Initialize orchestrator agent (legacy)
+# PDF render workers are spawned processes that re-import this module as __mp_main__
+# (report_manager's render pool); they only render, so they skip the agent setup below
+RENDER_WORKER_PROCESS = __name__ == "__mp_main__"
+
+MULTI_AGENT_AVAILABLE = False
+ADVANCED_AI_AVAILABLE = False
 orchestrator = None
-if MULTI_AGENT_AVAILABLE:
+master_ai_system = None
+
+if not RENDER_WORKER_PROCESS:
+    # Import multi-agent system
     try:
-        orchestrator = OrchestratorAgent()
-        print("🤖 Legacy multi-agent system initialized successfully!")
-    except Exception as e:
-        print(f"❌ Failed to initialize legacy multi-agent system: {str(e)}")
+        from agents.orchestrator_agent import OrchestratorAgent
+        MULTI_AGENT_AVAILABLE = True
+    except ImportError:
         MULTI_AGENT_AVAILABLE = False
+        print("WARNING: Multi-agent system not available")
 
-# Initialize Advanced AI Master System
-master_ai_system = None
-if ADVANCED_AI_AVAILABLE:
+    # Import advanced LangChain/LangGraph systems
     try:
-        master_ai_system = MasterHospitalManagementSystem(IntegrationLevel.ENTERPRISE)
-        print("🚀 Master AI Hospital Management System initialized successfully!")
-        print(f"   - Enhanced Orchestrator: ✅")
-        print(f"   - Real-time Monitoring: ✅")
-        print(f"   - Predictive Analytics: ✅")
-        print(f"   - Multi-language Support: ✅")
-        print(f"   - Equipment Lifecycle: ✅")
-    except Exception as e:
-        print(f"❌ Failed to initialize Master AI system: {str(e)}")
+        from agents.master_integration_system import MasterHospitalManagementSystem, IntegrationLevel
+        from agents.enhanced_orchestrator_agent import EnhancedOrchestratorAgent
+        from agents.real_time_monitoring_agent import RealTimeMonitoringAgent
+        from agents.predictive_analytics_agent import AdvancedPredictiveSystem, PredictionType, ForecastHorizon
+        from agents.multilingual_support_agent import MultiLanguageSupport, LanguageCode, ContentType
+        from agents.equipment_lifecycle_agent import EquipmentLifecycleManager
+        ADVANCED_AI_AVAILABLE = True
+        print("✅ Advanced LangChain/LangGraph systems loaded successfully")
+    except ImportError as e:
         ADVANCED_AI_AVAILABLE = False
+        print(f"⚠️ Advanced AI systems not available: {e}")
+
+    # Initialize orchestrator agent (legacy)
+    orchestrator = None
+    if MULTI_AGENT_AVAILABLE:
+        try:
+            orchestrator = OrchestratorAgent()
+            print("🤖 Legacy multi-agent system initialized successfully!")
+        except Exception as e:
+            print(f"❌ Failed to initialize legacy multi-agent system: {str(e)}")
+            MULTI_AGENT_AVAILABLE = False
+
+    # Initialize Advanced AI Master System
+    master_ai_system = None
+    if ADVANCED_AI_AVAILABLE:
+        try:
+            master_ai_system = MasterHospitalManagementSystem(IntegrationLevel.ENTERPRISE)
+            print("🚀 Master AI Hospital Management System initialized successfully!")
+            print(f"   - Enhanced Orchestrator: ✅")
+            print(f"   - Real-time Monitoring: ✅")
+            print(f"   - Predictive Analytics: ✅")
+            print(f"   - Multi-language Support: ✅")
+            print(f"   - Equipment Lifecycle: ✅")
+        except Exception as e:
+            print(f"❌ Failed to initialize Master AI system: {str(e)}")
+            ADVANCED_AI_AVAILABLE = False
 
 # Database helper functions (kept for backward compatibility)
 def get_db_session() -> Session:
@@ -702,13 +711,13 @@ def check_bed_status(bed_id: str) -> Dict[str, Any]:
 
 @mcp.tool()
 def auto_update_expired_cleaning_beds() -> Dict[str, Any]:
-    """🔄 Automatically update beds that completed their 30-minute cleaning to 'available' status.
+    """🔄 Automatically update beds that completed their cleaning to 'available' status.
     
     This tool:
-    - Checks all beds in 'cleaning' status
-    - Updates beds to 'available' if cleaning time (30 min) has elapsed
+    - Checks all beds in 'cleaning' status with set-based updates (constant round trips)
+    - Updates beds to 'available' if their estimated cleaning duration has elapsed
     - Fixes orphaned beds stuck in cleaning status
-    - Returns list of updated beds
+    - Returns list of updated beds (the server also runs this sweep every minute)
     
     Use this to:
     - Force update of expired cleaning beds
@@ -745,12 +754,36 @@ def get_patient_by_id(patient_id: str) -> Dict[str, Any]:
 
 @mcp.tool()
 def search_patients(patient_number: str = None, first_name: str = None, 
-                   last_name: str = None, phone: str = None, email: str = None) -> Dict[str, Any]:
-    """Search for patients by various criteria."""
+                   last_name: str = None, phone: str = None, email: str = None,
+                   status: str = None, limit: int = 50) -> Dict[str, Any]:
+    """Search for patients by various criteria. Matching is fuzzy and results are ranked best match first."""
     if MULTI_AGENT_AVAILABLE and orchestrator:
         result = orchestrator.route_request("search_patients",
                                            patient_number=patient_number, first_name=first_name,
-                                           last_name=last_name, phone=phone, email=email)
+                                           last_name=last_name, phone=phone, email=email,
+                                           status=status, limit=limit)
+        return result.get("result", result)
+    
+    return {"error": "Multi-agent system required for this operation"}
+
+@mcp.tool()
+def resolve_patient_names(names: List[str]) -> Dict[str, Any]:
+    """Resolve many patient names to their best-matching patient in a single lookup.
+    
+    Args:
+        names: Free-text patient names, e.g. ["John Smith", "Garcia"]
+    """
+    if MULTI_AGENT_AVAILABLE and orchestrator:
+        result = orchestrator.route_request("resolve_patient_names", names=names)
+        return result.get("result", result)
+    
+    return {"error": "Multi-agent system required for this operation"}
+
+@mcp.tool()
+def lookup_patient_numbers(prefix: str, limit: int = 10) -> Dict[str, Any]:
+    """Autocomplete patient numbers by prefix (e.g. "P10")."""
+    if MULTI_AGENT_AVAILABLE and orchestrator:
+        result = orchestrator.route_request("lookup_patient_numbers", prefix=prefix, limit=limit)
         return result.get("result", result)
     
     return {"error": "Multi-agent system required for this operation"}
@@ -964,6 +997,19 @@ def assign_bed_to_patient(bed_id: str, patient_id: str, admission_date: str = No
     
     return {"success": False, "message": "Multi-agent system required for this operation"}
 
+@mcp.tool()
+def allocate_bed(patient_id: str, department_id: str = None, room_type: str = None,
+                 bed_type: str = None, isolation: bool = False, admission_date: str = None) -> Dict[str, Any]:
+    """Find and atomically claim a free bed for a patient, filtered by department, room type, bed type and isolation needs."""
+    if MULTI_AGENT_AVAILABLE and orchestrator:
+        result = orchestrator.route_request("allocate_bed",
+                                           patient_id=patient_id, department_id=department_id,
+                                           room_type=room_type, bed_type=bed_type,
+                                           isolation=isolation, admission_date=admission_date)
+        return result.get("result", result)
+    
+    return {"success": False, "message": "Multi-agent system required for this operation"}
+
 @mcp.tool()
 def discharge_bed(bed_id: str, discharge_date: str = None) -> Dict[str, Any]:
     """Discharge a patient from a bed.
@@ -1075,6 +1121,26 @@ def record_patient_supply_usage_by_code(patient_number: str = None, patient_id:
     
     return {"error": "Multi-agent system required for this operation"}
 
+@mcp.tool()
+def record_medication_round(administrations: List[Dict[str, Any]], administered_by: str = None,
+                            partial: bool = False) -> Dict[str, Any]:
+    """Record a whole medication/nursing round in one transaction.
+
+    Each administration is a dict with patient_id or patient_number, supply_id or
+    supply_item_code, quantity_used, and optional dosage, frequency, administration_route,
+    indication, bed_id, staff_id/employee_id, prescribed_by_id. administered_by is the
+    default administering staff (Employee ID or User UUID). With partial=True entries
+    that fail (unknown identifiers, insufficient stock) are skipped instead of failing the round.
+    """
+    if MULTI_AGENT_AVAILABLE and orchestrator:
+        result = orchestrator.route_request("record_medication_round",
+                                           administrations=administrations,
+                                           administered_by=administered_by,
+                                           partial=partial)
+        return result.get("result", result)
+
+    return {"error": "Multi-agent system required for this operation"}
+
 @mcp.tool()
 def list_patient_medications(patient_id: str) -> Dict[str, Any]:
     """List all medications/supplies used by a patient."""
@@ -1338,11 +1404,30 @@ def list_inventory_transactions(supply_id: str = None, transaction_type: str = N
 
 @mcp.tool()
 def get_supply_usage_report(supply_id: str = None, start_date: str = None, 
-                           end_date: str = None) -> Dict[str, Any]:
-    """Get supply usage report with optional filtering."""
+                           end_date: str = None, include_details: bool = False,
+                           page: int = 1, page_size: int = 100) -> Dict[str, Any]:
+    """Get supply usage report with optional filtering; raw transactions only with include_details, paginated."""
     if MULTI_AGENT_AVAILABLE and orchestrator:
         result = orchestrator.route_request("get_supply_usage_report",
-                                           supply_id=supply_id, start_date=start_date, end_date=end_date)
+                                           supply_id=supply_id, start_date=start_date, end_date=end_date,
+                                           include_details=include_details, page=page, page_size=page_size)
+        return result.get("result", result)
+    
+    return {"error": "Multi-agent system required for this operation"}
+
+@mcp.tool()
+def get_inventory_plan(supply_id: str = None, history_days: int = 90, service_level: float = 0.95,
+                       lead_time_days: float = None, lead_time_std_days: float = None,
+                       supplier_lead_times: Dict[str, float] = None, trials: int = 2000,
+                       only_at_risk: bool = False, limit: int = 50) -> Dict[str, Any]:
+    """Consumption-based reorder points, safety stock, days of cover and Monte Carlo stock-out risk per supply."""
+    if MULTI_AGENT_AVAILABLE and orchestrator:
+        result = orchestrator.route_request("get_inventory_plan",
+                                           supply_id=supply_id, history_days=history_days,
+                                           service_level=service_level, lead_time_days=lead_time_days,
+                                           lead_time_std_days=lead_time_std_days,
+                                           supplier_lead_times=supplier_lead_times, trials=trials,
+                                           only_at_risk=only_at_risk, limit=limit)
         return result.get("result", result)
     
     return {"error": "Multi-agent system required for this operation"}
@@ -1421,6 +1506,24 @@ def update_staff_status(staff_id: str, status: str, notes: str = None) -> Dict[s
     
     return {"error": "Multi-agent system required for this operation"}
 
+@mcp.tool()
+def resolve_staff_names(names: List[str], active_only: bool = True) -> Dict[str, Any]:
+    """Resolve many staff names to their best-matching staff member in a single lookup."""
+    if MULTI_AGENT_AVAILABLE and orchestrator:
+        result = orchestrator.route_request("resolve_staff_names", names=names, active_only=active_only)
+        return result.get("result", result)
+    
+    return {"error": "Multi-agent system required for this operation"}
+
+@mcp.tool()
+def lookup_employee_ids(prefix: str, limit: int = 10) -> Dict[str, Any]:
+    """Autocomplete employee IDs by prefix (e.g. "EMP0")."""
+    if MULTI_AGENT_AVAILABLE and orchestrator:
+        result = orchestrator.route_request("lookup_employee_ids", prefix=prefix, limit=limit)
+        return result.get("result", result)
+    
+    return {"error": "Multi-agent system required for this operation"}
+
 # Continue with remaining tools...
 # [The file would continue with all other tools following the same pattern]
 
@@ -1574,7 +1677,8 @@ def update_meeting_status(meeting_id: str = None, status: str = None, query: str
         nl = (status or "").strip()
 
     # Detect NL cancel/reschedule/update intent heuristically
-    if nl and re.search(r"\b(cancel|cancelled|cancellation|call off|postpone|reschedul|move|shift|postponed|abort)\b", nl, re.IGNORECASE):
+    from meeting_parser import is_update_request
+    if is_update_request(nl):
         # Build a reasonable query string including meeting id if provided
         composed_query = nl
         if meeting_id:
@@ -1615,64 +1719,39 @@ def add_meeting_notes(meeting_id: str, notes: str, action_items: str = None) ->
 def send_email(to_emails: str, subject: str, message: str, from_name: str = "Hospital Management System") -> Dict[str, Any]:
     """Send email notifications to staff members.
     
+    Messages are queued in the email outbox and delivered in the background,
+    so this returns as soon as they are stored.
+    
     Args:
         to_emails: Comma-separated list of email addresses
         subject: Email subject line
         message: Email message content
         from_name: Sender name (default: Hospital Management System)
     """
+    if not DATABASE_AVAILABLE:
+        return {"success": False, "message": "Database required for the email outbox"}
     try:
-        import smtplib
-        from email.mime.text import MIMEText
-        from email.mime.multipart import MIMEMultipart
-        from dotenv import load_dotenv
-        import os
+        from email_outbox import OutboxMessage, default_sender, email_configured, email_outbox
         
-        # Load email configuration
-        load_dotenv()
-        
-        smtp_server = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
-        smtp_port = int(os.getenv('SMTP_PORT', '587'))
-        email_username = os.getenv('EMAIL_USERNAME')
-        email_password = os.getenv('EMAIL_PASSWORD')
-        from_email = os.getenv('EMAIL_FROM_ADDRESS', email_username)
-        
-        if not email_username or not email_password:
+        if not email_configured():
             return {"success": False, "message": "Email credentials not configured"}
         
         # Parse email addresses
-        email_list = [email.strip() for email in to_emails.split(',')]
-        
-        # Create email message
-        msg = MIMEMultipart()
-        msg['From'] = f"{from_name} <{from_email}>"
-        msg['Subject'] = subject
-        msg.attach(MIMEText(message, 'plain'))
-        
-        # Send emails
-        sent_count = 0
-        failed_emails = []
-        
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(email_username, email_password)
-            
-            for email_addr in email_list:
-                try:
-                    msg['To'] = email_addr
-                    server.send_message(msg)
-                    sent_count += 1
-                except Exception as e:
-                    failed_emails.append(f"{email_addr}: {str(e)}")
-                finally:
-                    del msg['To']  # Remove for next iteration
+        email_list = [email.strip() for email in to_emails.split(',') if email.strip()]
+        sender = default_sender(from_name)
+        queued = email_outbox.enqueue([
+            OutboxMessage(recipient=email_addr, subject=subject, body=message, sender=sender)
+            for email_addr in email_list
+        ])
+        if not queued["success"]:
+            return {"success": False, "message": f"Email queueing failed: {queued['message']}"}
         
         return {
             "success": True,
-            "message": f"Sent {sent_count}/{len(email_list)} emails successfully",
-            "sent_count": sent_count,
+            "message": f"Queued {queued['queued']}/{len(email_list)} emails for delivery",
+            "queued_count": queued["queued"],
             "total_emails": len(email_list),
-            "failed_emails": failed_emails
+            "outbox_ids": queued["ids"]
         }
         
     except Exception as e:
@@ -1704,6 +1783,28 @@ def generate_discharge_report(
     
     return {"error": "Multi-agent system required for discharge report generation"}
 
+@mcp.tool()
+def generate_discharge_reports_batch(
+    bed_ids: List[str],
+    discharge_condition: str = "stable",
+    discharge_destination: str = "home"
+) -> Dict[str, Any]:
+    """Generate discharge reports for several beds at once (e.g. end-of-shift discharges).
+    
+    Args:
+        bed_ids: List of bed IDs whose patients are being discharged
+        discharge_condition: Condition of patients at discharge (default: stable)
+        discharge_destination: Where patients are going (default: home)
+    """
+    if MULTI_AGENT_AVAILABLE and orchestrator:
+        result = orchestrator.route_request("generate_discharge_reports_batch",
+                                           bed_ids=bed_ids,
+                                           discharge_condition=discharge_condition,
+                                           discharge_destination=discharge_destination)
+        return result.get("result", result)
+    
+    return {"error": "Multi-agent system required for discharge report generation"}
+
 @mcp.tool()
 def discharge_patient_complete(
     patient_id: str = None,
@@ -2108,6 +2209,40 @@ def add_treatment_record_simple(
     
     return {"error": "Multi-agent system required for adding treatment records"}
 
+def _record_equipment_usage(patient_id: str, equipment_id: str, staff_id: str, purpose: str,
+                            start_time: str = None, end_time: str = None, notes: str = None) -> Dict[str, Any]:
+    """Record one usage event through the batch path: codes or UUIDs resolved in one exact lookup."""
+    result = orchestrator.route_request("record_equipment_usage_batch", events=[{
+        "patient_id": patient_id, "equipment_id": equipment_id, "staff_id": staff_id,
+        "purpose": purpose, "start_time": start_time, "end_time": end_time, "notes": notes
+    }])
+    response = result.get("result", result)
+    if not isinstance(response, dict) or not response.get("success"):
+        rejected = (response or {}).get("rejected") or []
+        errors = rejected[0]["errors"] if rejected else []
+        return {
+            "success": False,
+            "message": "; ".join(errors) if errors else (response or {}).get("message", "Failed to add equipment usage"),
+            "codes_provided": {"patient": patient_id, "equipment": equipment_id, "staff": staff_id},
+            "suggestion": "Verify that all codes exist in the database"
+        }
+    
+    recorded = dict(response["recorded"][0])
+    recorded.pop("index", None)
+    return {
+        "success": True,
+        "message": "Equipment usage recorded successfully with automatic code resolution",
+        "data": recorded,
+        "codes_resolved": {
+            "original_patient": patient_id,
+            "original_equipment": equipment_id,
+            "original_staff": staff_id,
+            "resolved_patient": recorded["patient_id"],
+            "resolved_equipment": recorded["equipment_id"],
+            "resolved_staff": recorded["staff_id"]
+        }
+    }
+
 @mcp.tool()
 def add_equipment_usage_with_codes(
     patient_id: str = None,
@@ -2159,103 +2294,8 @@ def add_equipment_usage_with_codes(
     if not actual_purpose:
         return {"success": False, "message": "Purpose is required (use 'purpose' or 'purpose_of_use' parameter)"}
     
-    # Handle alternative time parameter names
-    actual_start_time = start_time or start_date_time
-    actual_end_time = end_time or end_date_time
-    
-    # Check if inputs are user-friendly codes (short strings without hyphens)
-    is_patient_code = patient_id and len(patient_id) < 20 and '-' not in patient_id
-    is_equipment_code = equipment_id and len(equipment_id) < 20 and '-' not in equipment_id  
-    is_staff_code = actual_staff_id and len(actual_staff_id) < 20 and '-' not in actual_staff_id
-    
-    if is_patient_code or is_equipment_code or is_staff_code:
-        # Perform code-to-UUID conversion locally
-        try:
-            resolved_patient_id = patient_id
-            resolved_equipment_id = equipment_id
-            resolved_staff_id = actual_staff_id
-            
-            # Resolve patient code to UUID
-            if is_patient_code:
-                patient_lookup = orchestrator.route_request("search_patients", patient_number=patient_id)
-                patient_result = patient_lookup.get("result", {})
-                if patient_result.get("data"):
-                    resolved_patient_id = patient_result["data"][0]["id"]
-                else:
-                    return {"success": False, "message": f"Patient '{patient_id}' not found in database"}
-            
-            # Resolve equipment code to UUID
-            if is_equipment_code:
-                equipment_lookup = orchestrator.route_request("list_equipment")
-                equipment_result = equipment_lookup.get("result", {})
-                resolved_equipment_id = None
-                if equipment_result.get("data"):
-                    for eq in equipment_result["data"]:
-                        if eq.get("equipment_id") == equipment_id:
-                            resolved_equipment_id = eq["id"]
-                            break
-                if not resolved_equipment_id:
-                    return {"success": False, "message": f"Equipment '{equipment_id}' not found in database"}
-            
-            # Resolve staff code to UUID  
-            if is_staff_code:
-                staff_lookup = orchestrator.route_request("list_staff")
-                staff_result = staff_lookup.get("result", {})
-                resolved_staff_id = None
-                if staff_result.get("data"):
-                    for staff in staff_result["data"]:
-                        if staff.get("employee_id") == actual_staff_id:
-                            resolved_staff_id = staff["id"]
-                            break
-                if not resolved_staff_id:
-                    return {"success": False, "message": f"Staff member '{actual_staff_id}' not found in database"}
-            
-            # Success: call with resolved UUIDs - use a different tool name to avoid routing conflicts
-            result = orchestrator.route_request("add_equipment_usage_simple",
-                                               patient_id=resolved_patient_id,
-                                               equipment_id=resolved_equipment_id,
-                                               staff_id=resolved_staff_id,
-                                               purpose=actual_purpose,
-                                               start_time=actual_start_time,
-                                               end_time=actual_end_time,
-                                               notes=notes)
-            
-            # Add success metadata showing what was resolved
-            response = result.get("result", result)
-            if isinstance(response, dict) and response.get("success"):
-                response["codes_resolved"] = {
-                    "original_patient": patient_id,
-                    "original_equipment": equipment_id,
-                    "original_staff": actual_staff_id,
-                    "resolved_patient": resolved_patient_id,
-                    "resolved_equipment": resolved_equipment_id,
-                    "resolved_staff": resolved_staff_id
-                }
-                response["message"] = "Equipment usage recorded successfully with automatic code resolution"
-            return response
-            
-        except Exception as e:
-            return {
-                "success": False,
-                "message": f"Code resolution failed: {str(e)}",
-                "codes_provided": {
-                    "patient": patient_id,
-                    "equipment": equipment_id,
-                    "staff": staff_id
-                },
-                "suggestion": "Verify that all codes exist in the database"
-            }
-    else:
-        # Use UUIDs directly
-        result = orchestrator.route_request("add_equipment_usage_simple",
-                                           patient_id=patient_id,
-                                           equipment_id=equipment_id,
-                                           staff_id=staff_id,
-                                           purpose=purpose,
-                                           start_time=start_time,
-                                           end_time=end_time,
-                                           notes=notes)
-        return result.get("result", result)
+    return _record_equipment_usage(patient_id, equipment_id, actual_staff_id, actual_purpose,
+                                   start_time or start_date_time, end_time or end_date_time, notes)
 
 
 @mcp.tool()
@@ -2289,100 +2329,22 @@ def add_equipment_usage_simple(
     if not MULTI_AGENT_AVAILABLE or not orchestrator:
         return {"success": False, "message": "Multi-agent system required for equipment usage"}
     
-    # Check if inputs are user-friendly codes (short strings)
-    is_patient_code = patient_id and len(patient_id) < 20 and not '-' in patient_id
-    is_equipment_code = equipment_id and len(equipment_id) < 20 and not '-' in equipment_id  
-    is_staff_code = staff_id and len(staff_id) < 20 and not '-' in staff_id
+    return _record_equipment_usage(patient_id, equipment_id, staff_id, purpose, start_time, end_time, notes)
+
+@mcp.tool()
+def record_equipment_usage_batch(events: List[Dict[str, Any]], partial: bool = False) -> Dict[str, Any]:
+    """Record many equipment usage events in one transaction.
     
-    if is_patient_code or is_equipment_code or is_staff_code:
-        # Perform code-to-UUID conversion locally
-        try:
-            resolved_patient_id = patient_id
-            resolved_equipment_id = equipment_id
-            resolved_staff_id = staff_id
-            
-            # Resolve patient code to UUID
-            if is_patient_code:
-                patient_lookup = orchestrator.route_request("search_patients", patient_number=patient_id)
-                patient_result = patient_lookup.get("result", {})
-                if patient_result.get("data"):
-                    resolved_patient_id = patient_result["data"][0]["id"]
-                else:
-                    return {"success": False, "message": f"Patient '{patient_id}' not found in database"}
-            
-            # Resolve equipment code to UUID
-            if is_equipment_code:
-                equipment_lookup = orchestrator.route_request("list_equipment")
-                equipment_result = equipment_lookup.get("result", {})
-                resolved_equipment_id = None
-                if equipment_result.get("data"):
-                    for eq in equipment_result["data"]:
-                        if eq.get("equipment_id") == equipment_id:
-                            resolved_equipment_id = eq["id"]
-                            break
-                if not resolved_equipment_id:
-                    return {"success": False, "message": f"Equipment '{equipment_id}' not found in database"}
-            
-            # Resolve staff code to UUID  
-            if is_staff_code:
-                staff_lookup = orchestrator.route_request("list_staff")
-                staff_result = staff_lookup.get("result", {})
-                resolved_staff_id = None
-                if staff_result.get("data"):
-                    for staff in staff_result["data"]:
-                        if staff.get("employee_id") == staff_id:
-                            resolved_staff_id = staff["id"]
-                            break
-                if not resolved_staff_id:
-                    return {"success": False, "message": f"Staff member '{staff_id}' not found in database"}
-            
-            # Success: call with resolved UUIDs
-            result = orchestrator.route_request("add_equipment_usage_simple",
-                                               patient_id=resolved_patient_id,
-                                               equipment_id=resolved_equipment_id,
-                                               staff_id=resolved_staff_id,
-                                               purpose=purpose,
-                                               start_time=start_time,
-                                               end_time=end_time,
-                                               notes=notes)
-            
-            # Add success metadata
-            response = result.get("result", result)
-            if isinstance(response, dict) and response.get("success"):
-                response["codes_resolved"] = {
-                    "original_patient": patient_id,
-                    "original_equipment": equipment_id,
-                    "original_staff": staff_id,
-                    "resolved_patient": resolved_patient_id,
-                    "resolved_equipment": resolved_equipment_id,
-                    "resolved_staff": resolved_staff_id
-                }
-            return response
-            
-        except Exception as e:
-            return {
-                "success": False,
-                "message": f"Code resolution failed: {str(e)}",
-                "codes_provided": {
-                    "patient": patient_id,
-                    "equipment": equipment_id,
-                    "staff": staff_id
-                },
-                "suggestion": "Verify that all codes exist in the database"
-            }
-    else:
-        # Use UUIDs directly
-        result = orchestrator.route_request("add_equipment_usage_simple",
-                                           patient_id=patient_id,
-                                           equipment_id=equipment_id,
-                                           staff_id=staff_id,
-                                           purpose=purpose,
-                                           start_time=start_time,
-                                           end_time=end_time,
-                                           notes=notes)
+    Each event: patient_id (or patient_number), equipment_id (or equipment_code), staff_id
+    (or employee_id / used_by) as codes like P002 / EQ001 / EMP001 or UUIDs, purpose, and
+    optional start_time, end_time, notes. All codes are resolved in one lookup. Without
+    partial, one invalid event rejects the whole batch; with partial=True it is skipped.
+    """
+    if MULTI_AGENT_AVAILABLE and orchestrator:
+        result = orchestrator.route_request("record_equipment_usage_batch", events=events, partial=partial)
         return result.get("result", result)
     
-    return {"error": "Multi-agent system required for adding equipment usage records"}
+    return {"error": "Multi-agent system required for equipment usage"}
 
 @mcp.tool()
 def add_equipment_usage_by_codes(
@@ -2431,21 +2393,30 @@ def add_equipment_usage_by_codes(
 @mcp.tool()
 def assign_staff_to_patient_simple(
     patient_id: str,
-    staff_id: str,
-    role: str
+    staff_id: str = None,
+    role: str = "assigned",
+    department_id: str = None,
+    shift: str = None,
+    specialization: str = None
 ) -> Dict[str, Any]:
     """Assign staff to patient for discharge reporting.
     
     Args:
         patient_id: The ID of the patient
-        staff_id: The ID of the staff member
-        role: Role of staff member in patient care
+        staff_id: The ID of the staff member, or omit/"auto" to pick the least-loaded eligible clinician
+        role: Role of staff member in patient care (e.g. primary_doctor, primary_nurse)
+        department_id: Department to pick from when staff_id is omitted
+        shift: Shift to pick for (day, night) when staff_id is omitted
+        specialization: Required specialization when staff_id is omitted
     """
     if MULTI_AGENT_AVAILABLE and orchestrator:
         result = orchestrator.route_request("assign_staff_to_patient_simple",
                                            patient_id=patient_id,
                                            staff_id=staff_id,
-                                           role=role)
+                                           role=role,
+                                           department_id=department_id,
+                                           shift=shift,
+                                           specialization=specialization)
         return result.get("result", result)
     
     return {"error": "Multi-agent system required for staff assignment"}
@@ -2526,17 +2497,25 @@ def get_bed_status_with_time_remaining(bed_id: str) -> Dict[str, Any]:
     return {"error": "Multi-agent system required for bed status"}
 
 @mcp.tool()
-def add_patient_to_queue(patient_id: str, queue_type: str, priority: str = "normal") -> Dict[str, Any]:
+def add_patient_to_queue(patient_id: str, queue_type: str, priority: str = "normal",
+                         department_id: str = None, bed_type_required: str = "general",
+                         medical_condition: str = "") -> Dict[str, Any]:
     """Add patient to queue.
     
     Args:
         patient_id: The ID of the patient
         queue_type: Type of queue (admission, discharge, surgery, etc.)
-        priority: Priority level (low, normal, high, urgent)
+        priority: Priority level (low, normal, high, urgent); urgent patients are queued first
+        department_id: Department whose bed queue the patient joins
+        bed_type_required: Bed type needed (general, icu, private, ...)
+        medical_condition: Short description of the patient's condition
     """
     if MULTI_AGENT_AVAILABLE and orchestrator:
         result = orchestrator.route_request("add_patient_to_queue",
-                                           patient_id=patient_id, queue_type=queue_type, priority=priority)
+                                           patient_id=patient_id, queue_type=queue_type, priority=priority,
+                                           priority_level=priority, department_id=department_id,
+                                           bed_type_required=bed_type_required,
+                                           medical_condition=medical_condition)
         return result.get("result", result)
     
     return {"error": "Multi-agent system required for patient queue"}
@@ -2884,16 +2863,17 @@ def list_available_discharge_reports(status: str = "all", patient_name: str = No
         return {"success": False, "error": str(e), "message": f"Failed to list reports: {str(e)}"}
 
 @mcp.tool()
-def archive_old_discharge_reports(days_old: int = 30) -> Dict[str, Any]:
+def archive_old_discharge_reports(days_old: int = 30, mode: str = "bundle") -> Dict[str, Any]:
     """Archive discharge reports older than specified days.
     
     Args:
         days_old: Reports older than this many days will be archived (default: 30)
+        mode: "bundle" packs reports into compressed monthly bundles, "files" moves individual files (default: bundle)
     """
     try:
         from report_manager import ReportManager
         manager = ReportManager()
-        result = manager.archive_old_reports(days_old)
+        result = manager.archive_old_reports(days_old, mode)
         return result
     except Exception as e:
         return {"success": False, "error": str(e), "message": f"Failed to archive reports: {str(e)}"}
@@ -2920,27 +2900,17 @@ def ai_clinical_assistant(query: str, context: Dict[str, Any] = None) -> Dict[st
         return {"success": False, "error": f"AI clinical assistant error: {str(e)}"}
 
 @mcp.tool()
-def natural_language_query(query: str) -> Dict[str, Any]:
+def natural_language_query(query: str, session_id: str = None) -> Dict[str, Any]:
     """Process natural language queries for hospital management tasks.
     
     Args:
         query: Natural language query (e.g., "Discharge Patient P1025", "List all patients")
+        session_id: Optional conversation id; recent queries in the session give the planner context
     """
-    import asyncio
-    from client import HospitalManagementClient
+    from nl_query_service import nl_query_service
     
     try:
-        # Create a client instance to handle the natural language query
-        client = HospitalManagementClient()
-        
-        # Use asyncio to run the intelligent query handler
-        result = asyncio.run(client.intelligent_query_handler(query))
-        
-        return {
-            "success": True,
-            "query": query,
-            "response": result
-        }
+        return nl_query_service.handle(query, dispatch_tool_call, session_id=session_id)
     except Exception as e:
         return {
             "success": False, 
@@ -3272,6 +3242,58 @@ async def get_category_mappings_handler(request: Request):
             "error": str(e)
         }, status_code=500)
 
+# Tool call dispatch shared by /tools/call and /tools/batch
+def dispatch_tool_call(tool_name: str, arguments: Dict[str, Any]) -> Any:
+    """Run one tool call and return its raw result (blocking)."""
+    # System-level tools that should not be routed through orchestrator
+    system_tools = ["get_system_status", "get_agent_info", "list_agents", "execute_workflow", 
+                   "download_discharge_report", "get_discharge_report_storage_stats", 
+                   "list_available_discharge_reports", "archive_old_discharge_reports",
+                   "add_equipment_usage_with_codes", "search_discharged_patients", 
+                   "get_patient_with_discharge_details", "check_bed_status"]
+    
+    if tool_name in system_tools:
+        # Handle system tools directly
+        if tool_name == "get_system_status":
+            result = get_system_status()
+        elif tool_name == "get_agent_info":
+            result = get_agent_info(**arguments)
+        elif tool_name == "list_agents":
+            result = list_agents()
+        elif tool_name == "execute_workflow":
+            result = execute_workflow(**arguments)
+        elif tool_name == "download_discharge_report":
+            result = download_discharge_report(**arguments)
+        elif tool_name == "add_equipment_usage_with_codes":
+            result = add_equipment_usage_with_codes(**arguments)
+        elif tool_name == "get_discharge_report_storage_stats":
+            result = get_discharge_report_storage_stats(**arguments)
+        elif tool_name == "list_available_discharge_reports":
+            result = list_available_discharge_reports(**arguments)
+        elif tool_name == "archive_old_discharge_reports":
+            result = archive_old_discharge_reports(**arguments)
+        elif tool_name == "search_discharged_patients":
+            result = search_discharged_patients(**arguments)
+        elif tool_name == "get_patient_with_discharge_details":
+            result = get_patient_with_discharge_details(**arguments)
+        elif tool_name == "check_bed_status":
+            result = check_bed_status(**arguments)
+        else:
+            result = {"error": f"System tool {tool_name} not implemented"}
+    else:
+        # Try to execute through orchestrator for other tools
+        if MULTI_AGENT_AVAILABLE and orchestrator:
+            try:
+                result = orchestrator.route_request(tool_name, **arguments)
+            except Exception as agent_error:
+                print(f"⚠️ Agent routing failed for {tool_name}: {agent_error}")
+                # Fall through to direct tool execution
+                result = {"error": f"Agent routing failed: {str(agent_error)}"}
+        else:
+            result = {"error": "Multi-agent system not available"}
+    return result
+
+
 # Tool call endpoint handler
 async def call_tool_http(request: Request):
     try:
@@ -3282,52 +3304,7 @@ async def call_tool_http(request: Request):
         if not tool_name:
             raise HTTPException(status_code=400, detail="Tool name is required")
         
-        # System-level tools that should not be routed through orchestrator
-        system_tools = ["get_system_status", "get_agent_info", "list_agents", "execute_workflow", 
-                       "download_discharge_report", "get_discharge_report_storage_stats", 
-                       "list_available_discharge_reports", "archive_old_discharge_reports",
-                       "add_equipment_usage_with_codes", "search_discharged_patients", 
-                       "get_patient_with_discharge_details", "check_bed_status"]
-        
-        if tool_name in system_tools:
-            # Handle system tools directly
-            if tool_name == "get_system_status":
-                result = get_system_status()
-            elif tool_name == "get_agent_info":
-                result = get_agent_info(**arguments)
-            elif tool_name == "list_agents":
-                result = list_agents()
-            elif tool_name == "execute_workflow":
-                result = execute_workflow(**arguments)
-            elif tool_name == "download_discharge_report":
-                result = download_discharge_report(**arguments)
-            elif tool_name == "add_equipment_usage_with_codes":
-                result = add_equipment_usage_with_codes(**arguments)
-            elif tool_name == "get_discharge_report_storage_stats":
-                result = get_discharge_report_storage_stats(**arguments)
-            elif tool_name == "list_available_discharge_reports":
-                result = list_available_discharge_reports(**arguments)
-            elif tool_name == "archive_old_discharge_reports":
-                result = archive_old_discharge_reports(**arguments)
-            elif tool_name == "search_discharged_patients":
-                result = search_discharged_patients(**arguments)
-            elif tool_name == "get_patient_with_discharge_details":
-                result = get_patient_with_discharge_details(**arguments)
-            elif tool_name == "check_bed_status":
-                result = check_bed_status(**arguments)
-            else:
-                result = {"error": f"System tool {tool_name} not implemented"}
-        else:
-            # Try to execute through orchestrator for other tools
-            if MULTI_AGENT_AVAILABLE and orchestrator:
-                try:
-                    result = orchestrator.route_request(tool_name, **arguments)
-                except Exception as agent_error:
-                    print(f"⚠️ Agent routing failed for {tool_name}: {agent_error}")
-                    # Fall through to direct tool execution
-                    result = {"error": f"Agent routing failed: {str(agent_error)}"}
-            else:
-                result = {"error": "Multi-agent system not available"}
+        result = dispatch_tool_call(tool_name, arguments)
         
         return JSONResponse({
             "jsonrpc": "2.0",
@@ -3359,6 +3336,22 @@ async def call_tool_http(request: Request):
             }
         }, status_code=500)
 
+# Batched tool call endpoint handler (see tool_batch.py)
+async def batch_tools_http(request: Request):
+    from tool_batch import tool_batch_executor, PARSE_ERROR
+    
+    try:
+        body = await request.json()
+    except Exception:
+        return JSONResponse({
+            "jsonrpc": "2.0",
+            "id": None,
+            "error": {"code": PARSE_ERROR, "message": "Parse error"}
+        }, status_code=400)
+    
+    payload, status_code = await tool_batch_executor.execute(body, dispatch_tool_call)
+    return JSONResponse(payload, status_code=status_code)
+
 # List tools endpoint handler
 async def list_tools_http(request: Request):
     try:
@@ -3501,13 +3494,14 @@ if __name__ == "__main__":
         
         custom_routes = [
             Route("/tools/call", call_tool_http, methods=["POST"]),
+            Route("/tools/batch", batch_tools_http, methods=["POST"]),
             Route("/tools/list", list_tools_http, methods=["GET"]),
             Route("/health", health_check, methods=["GET"]),
             Route("/api/bulk-upload", bulk_upload_handler, methods=["POST"]),
             Route("/api/rooms/by-numbers", get_room_mappings_handler, methods=["POST"]),
             Route("/api/departments/by-names", get_department_mappings_handler, methods=["POST"]),
             Route("/api/categories/by-names", get_category_mappings_handler, methods=["POST"]),
-            Mount("/discharge", StaticFiles(directory=reports_dir), name="static"),
+            Mount("/discharge", ReportFileApp(reports_dir), name="static"),
         ]
         
         # Add routes to existing app
@@ -3528,8 +3522,22 @@ if __name__ == "__main__":
             allow_headers=["*"],
         )
         
+        if DATABASE_AVAILABLE:
+            from bed_turnover_sweeper import turnover_sweeper
+            turnover_sweeper.start()
+            from supply_rollups import rollup_compactor
+            rollup_compactor.start()
+            # Fit the local intent router on tool docstrings and logged queries before the first chat
+            from intent_router import intent_router
+            intent_router.train_from_system(orchestrator.get_tools_with_descriptions() if orchestrator else None)
+            # Deliver mail queued before a restart without waiting for the next enqueue
+            from email_outbox import email_configured, email_outbox
+            if email_configured():
+                email_outbox.ensure_sender()
+        
         print("📡 Added custom HTTP endpoints:")
         print("   POST /tools/call - Call MCP tools via HTTP")
+        print("   POST /tools/batch - Call many MCP tools in one JSON-RPC batch")
         print("   GET /tools/list - List available tools")
         print("   GET /health - Health check")
         print("   POST /api/bulk-upload - Bulk data upload from CSV")
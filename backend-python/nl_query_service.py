@@ -0,0 +1,460 @@
+"""
+Natural Language Query Service
+==============================
+
+Server-resident handler behind the ``natural_language_query`` MCP tool:
+- One long-lived service per server process: the Gemini model is configured once
+  and reused, instead of a new ``HospitalManagementClient`` (and event loop) per query
+- Queries are reduced to a shape ("check bed {bed}", "list patients") and the
+  tool-calling plan for each read-only shape is cached (LRU), so repeated shapes skip
+  planning; rules cover the common intents, then the local intent router, and the
+  LLM only plans what is left and may only choose read-only tools
+- A discharge is planned only for a bare command ("Discharge patient P1025") with no
+  negation or question in it, and is never cached; any other query mentioning
+  discharge goes to the router and the LLM, which cannot plan writes
+- Tools are called in-process through the server's dispatch table; the calls of a
+  multi-tool plan (hospital overview) run concurrently
+- Thread-safe: the plan cache and session history are guarded by one lock
+- Recent queries per ``session_id`` are kept as context for LLM planning
+
+Usage:
+    python nl_query_service.py "List all patients"   # answer one query
+    python nl_query_service.py --benchmark           # cold planning vs cached plans
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from intent_router import SCOPE_RE, IntentMatch, describe_result, intent_router
+from tool_batch import call_failed, is_read_only
+
+try:
+    import google.generativeai as genai
+    GENAI_AVAILABLE = True
+except ImportError:
+    GENAI_AVAILABLE = False
+
+PATIENT_RE = re.compile(r"\bpatient\s+([a-z]?\d+)\b", re.IGNORECASE)
+BED_RE = re.compile(r"\bbed\s+(\d+[a-z]?)\b", re.IGNORECASE)
+
+# The only shape that plans discharge_patient_complete; matched against the whole shape
+DISCHARGE_COMMAND_RE = re.compile(r"^(?:please )?discharge patient \{patient\}(?: now| please)?$")
+DISCHARGE_MENTION_RE = re.compile(r"\bdischarg")
+# Checked on the raw query: the shape drops "?" and apostrophes
+NOT_A_COMMAND_RE = re.compile(r"\?|\b(?:not|no|don'?t|never|yet|when|what|why|how|whether|if|can|could|should"
+                              r"|is|was|has|have|status|report)\b", re.IGNORECASE)
+
+# (intent, keyword pattern), checked in order
+INTENT_RULES = [
+    ("bed_status", re.compile(r"\bbed \{bed\}")),
+    ("overview", re.compile(r"\b(analy[sz]e|analysis|hospital state|overview|optimi[sz]e|autonomous)\b")),
+    ("patients", re.compile(r"\bpatients?\b")),
+    ("beds", re.compile(r"\b(beds|bed availability|available beds)\b")),
+    ("staff", re.compile(r"\b(staff|doctors|nurses|employees)\b")),
+    ("departments", re.compile(r"\bdepartments?\b")),
+    ("equipment", re.compile(r"\b(equipment|machines|devices)\b")),
+    ("supplies", re.compile(r"\b(supplies|inventory|stock)\b")),
+]
+
+# intent -> tool calls; "{slot}" strings are filled from the query
+INTENT_PLANS = {
+    "discharge": [("discharge_patient_complete", {"patient_number": "{patient}", "discharge_condition": "stable",
+                                                  "discharge_destination": "home"})],
+    "bed_status": [("get_bed_status_with_time_remaining", {"bed_id": "{bed}"})],
+    "overview": [("list_users", {}), ("list_departments", {}), ("list_patients", {}), ("list_beds", {}),
+                 ("list_equipment", {}), ("list_supplies", {"low_stock_only": True})],
+    "patients": [("list_patients", {})],
+    "beds": [("list_beds", {})],
+    "staff": [("list_staff", {})],
+    "departments": [("list_departments", {})],
+    "equipment": [("list_equipment", {})],
+    "supplies": [("list_supplies", {}), ("list_supplies", {"low_stock_only": True})],
+}
+
+# Tools the LLM may plan for shapes the rules do not cover
+LLM_PLANNABLE_TOOLS = [
+    "list_patients", "search_patients", "get_patient_by_id", "list_beds", "list_staff", "list_departments",
+    "list_rooms", "list_equipment", "get_equipment_by_status", "list_supplies", "get_low_stock_supplies",
+    "get_inventory_plan", "list_meetings", "get_dashboard_stats",
+]
+
+HELP_MESSAGE = ("I can help you with hospital management tasks. Try asking about patients, beds, staff, "
+                "departments, equipment, supplies, patient discharge, or hospital analysis.")
+
+
+def query_shape(query: str) -> Tuple[str, Dict[str, str]]:
+    """The query with identifiers replaced by ``{slot}`` placeholders, and the slot values."""
+    slots = {}
+    shape = " ".join(query.strip().lower().split())
+
+    patient = PATIENT_RE.search(shape)
+    if patient:
+        number = patient.group(1).upper()
+        slots["patient"] = number if number.startswith("P") else f"P{number}"
+        shape = shape[:patient.start(1)] + "{patient}" + shape[patient.end(1):]
+    bed = BED_RE.search(shape)
+    if bed:
+        slots["bed"] = bed.group(1).upper()
+        shape = shape[:bed.start(1)] + "{bed}" + shape[bed.end(1):]
+    return re.sub(r"[^\w{} ]", "", shape).strip(), slots
+
+
+def template_arguments(arguments: Dict[str, Any], slots: Dict[str, str]) -> Dict[str, Any]:
+    """Arguments with slot values put back as ``{slot}`` placeholders, so a plan serves the whole shape."""
+    templated = {}
+    for key, value in arguments.items():
+        for slot, slot_value in slots.items():
+            if isinstance(value, str) and value.upper() == slot_value:
+                value = "{" + slot + "}"
+        templated[key] = value
+    return templated
+
+
+@dataclass
+class QueryPlan:
+    """The tool calls answering one query shape."""
+    intent: str
+    calls: List[Tuple[str, Dict[str, Any]]] = field(default_factory=list)
+    source: str = "rules"
+
+    def bind(self, slots: Dict[str, str]) -> List[Tuple[str, Dict[str, Any]]]:
+        bound = []
+        for tool_name, arguments in self.calls:
+            bound.append((tool_name, {key: value.format(**slots) if isinstance(value, str) and "{" in value else value
+                                      for key, value in arguments.items()}))
+        return bound
+
+
+def _items(result: Any) -> List[Dict[str, Any]]:
+    """The record list of a list_* result, whichever envelope it came in."""
+    payload = result.get("result", result) if isinstance(result, dict) else result
+    if isinstance(payload, list):
+        return payload
+    if not isinstance(payload, dict):
+        return []
+    for key in ("data", "patients", "beds", "staff", "departments", "equipment", "supplies", "users"):
+        if isinstance(payload.get(key), list):
+            return payload[key]
+    return []
+
+
+class NLQueryService:
+    """Plans natural language queries into tool calls and runs them in-process."""
+
+    def __init__(self, cache_size: int = None, max_workers: int = None):
+        self.cache_size = cache_size or int(os.getenv("NL_PLAN_CACHE_SIZE", "256"))
+        self._plans: "OrderedDict[str, QueryPlan]" = OrderedDict()
+        self._history: "OrderedDict[str, deque]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._llm_lock = threading.Lock()
+        self._llm_model = None
+        self._llm_ready = False
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or int(os.getenv("NL_QUERY_WORKERS", "8")),
+                                        thread_name_prefix="nl-query")
+        self.hits = 0
+        self.misses = 0
+
+    # --- planning -----------------------------------------------------------------
+
+    def _llm(self):
+        """The shared Gemini model, configured on first use."""
+        if not self._llm_ready:
+            with self._llm_lock:
+                if not self._llm_ready:
+                    api_key = os.getenv("GEMINI_API_KEY")
+                    if GENAI_AVAILABLE and api_key:
+                        try:
+                            genai.configure(api_key=api_key)
+                            self._llm_model = genai.GenerativeModel("gemini-2.0-flash-exp")
+                        except Exception as e:
+                            print(f"⚠️ NL query LLM unavailable: {e}")
+                    self._llm_ready = True
+        return self._llm_model
+
+    def _rule_plan(self, query: str, shape: str, slots: Dict[str, str]) -> Optional[QueryPlan]:
+        if DISCHARGE_MENTION_RE.search(shape):
+            # A write: plan it only for an explicit command, leave questions about discharge to the router/LLM
+            if NOT_A_COMMAND_RE.search(query):
+                return None
+            if DISCHARGE_COMMAND_RE.match(shape):
+                return QueryPlan(intent="discharge", calls=INTENT_PLANS["discharge"])
+            if shape.startswith("discharge") and "patient" not in slots:
+                return QueryPlan(intent="discharge_missing_patient")
+            return None
+        if SCOPE_RE.search(shape):
+            # "patients in cardiology": the keyword plans would answer with the unfiltered list
+            return None
+        for intent, pattern in INTENT_RULES:
+            if pattern.search(shape):
+                return QueryPlan(intent=intent, calls=INTENT_PLANS[intent])
+        return None
+
+    def _router_plan(self, query: str, slots: Dict[str, str]) -> Optional[QueryPlan]:
+        match = intent_router.route(query)
+        if not match.routed:
+            return None
+        arguments = template_arguments(match.arguments, slots)
+        return QueryPlan(intent=match.tool, calls=[(match.tool, arguments)], source="router")
+
+    def _llm_plan(self, query: str, shape: str, slots: Dict[str, str], history: List[str]) -> Optional[QueryPlan]:
+        model = self._llm()
+        if model is None:
+            return None
+        prompt = (
+            "You route hospital management questions to one tool.\n"
+            f"Tools: {', '.join(LLM_PLANNABLE_TOOLS)}\n"
+            f"Recent questions: {history or 'none'}\n"
+            f"Question: {query}\n"
+            'Reply with JSON only: {"tool": "<tool name or none>", "arguments": {}}'
+        )
+        try:
+            reply = model.generate_content(prompt).text
+            match = re.search(r"\{.*\}", reply, re.DOTALL)
+            suggestion = json.loads(match.group(0)) if match else {}
+        except Exception as e:
+            print(f"⚠️ NL query planning failed: {e}")
+            return None
+
+        tool_name = suggestion.get("tool")
+        if tool_name not in LLM_PLANNABLE_TOOLS or not is_read_only(tool_name):
+            return None
+        arguments = template_arguments(suggestion.get("arguments") or {}, slots)
+        return QueryPlan(intent=tool_name, calls=[(tool_name, arguments)], source="llm")
+
+    def plan(self, query: str, session_id: str = None) -> Tuple[QueryPlan, Dict[str, str], bool]:
+        """``(plan, slots, cached)`` for a query."""
+        shape, slots = query_shape(query)
+        with self._lock:
+            plan = self._plans.get(shape)
+            if plan is not None:
+                self._plans.move_to_end(shape)
+                self.hits += 1
+                return plan, slots, True
+            self.misses += 1
+            history = list(self._history.get(session_id, ())) if session_id else []
+
+        plan = (self._rule_plan(query, shape, slots) or self._router_plan(query, slots)
+                or self._llm_plan(query, shape, slots, history))
+        if plan is None:
+            # Not cached: the LLM may be configured later
+            return QueryPlan(intent="unknown"), slots, False
+        if not all(is_read_only(tool_name) for tool_name, _ in plan.calls):
+            # Writes are re-planned from the full query every time, never served by shape
+            return plan, slots, False
+        with self._lock:
+            self._plans[shape] = plan
+            if len(self._plans) > self.cache_size:
+                self._plans.popitem(last=False)
+        return plan, slots, False
+
+    # --- execution ----------------------------------------------------------------
+
+    def _call(self, dispatch: Callable, tool_name: str, arguments: Dict[str, Any]) -> Tuple[Any, float]:
+        started = time.perf_counter()
+        try:
+            result = dispatch(tool_name, arguments)
+        except Exception as e:
+            result = {"success": False, "message": str(e)}
+        return result, (time.perf_counter() - started) * 1000
+
+    def handle(self, query: str, dispatch: Callable[[str, Dict[str, Any]], Any],
+               session_id: str = None) -> Dict[str, Any]:
+        """Answer a query, calling tools through ``dispatch(tool_name, arguments)``."""
+        plan, slots, cached = self.plan(query, session_id)
+        calls = plan.bind(slots)
+        if len(calls) > 1:
+            outcomes = list(self._pool.map(lambda call: self._call(dispatch, *call), calls))
+        else:
+            outcomes = [self._call(dispatch, *call) for call in calls]
+        results = [result for result, _ in outcomes]
+
+        if session_id:
+            with self._lock:
+                self._history.setdefault(session_id, deque(maxlen=5)).append(f"{query} -> {plan.intent}")
+                self._history.move_to_end(session_id)
+                if len(self._history) > 200:
+                    self._history.popitem(last=False)
+
+        return {
+            "success": not any(call_failed(result) for result in results),
+            "query": query,
+            "response": self._format(plan, slots, results),
+            "intent": plan.intent,
+            "plan_source": "cache" if cached else plan.source,
+            "tool_calls": [
+                {"tool": tool_name, "arguments": arguments, "elapsed_ms": round(elapsed_ms, 1),
+                 "success": not call_failed(result)}
+                for (tool_name, arguments), (result, elapsed_ms) in zip(calls, outcomes)
+            ],
+        }
+
+    # --- responses ----------------------------------------------------------------
+
+    def _format(self, plan: QueryPlan, slots: Dict[str, str], results: List[Any]) -> str:
+        intent = plan.intent
+        if intent == "unknown":
+            return HELP_MESSAGE
+        if intent == "discharge_missing_patient":
+            return "❌ Please specify a patient number (e.g., 'Discharge Patient P1025')"
+        if plan.source == "router":
+            return describe_result(IntentMatch(tool=plan.intent), results[0])
+        if plan.source == "llm":
+            return json.dumps(results[0], default=str)
+
+        if intent == "discharge":
+            return self._format_discharge(slots["patient"], results[0])
+        if intent == "bed_status":
+            return self._format_bed_status(slots["bed"], results[0])
+        if intent == "overview":
+            return self._format_overview(*[_items(result) for result in results])
+
+        items = _items(results[0])
+        if intent == "patients":
+            if not items:
+                return "No patients found in the system."
+            return f"Found {len(items)} patients:\n" + "\n".join(
+                f"• {p.get('first_name', '')} {p.get('last_name', '')} (ID: {p.get('patient_number', 'N/A')})"
+                for p in items[:5]
+            ) + (f"\n... and {len(items) - 5} more" if len(items) > 5 else "")
+        if intent == "beds":
+            available = sum(1 for b in items if b.get("status") == "available")
+            occupied = sum(1 for b in items if b.get("status") == "occupied")
+            return f"Bed Status: {available} available, {occupied} occupied out of {len(items)} total beds"
+        if intent == "staff":
+            return f"Found {len(items)} staff members in the system"
+        if intent == "departments":
+            if not items:
+                return "No departments found."
+            return f"Hospital Departments ({len(items)}):\n" + "\n".join(
+                f"• {d.get('name', 'Unknown')} - Floor {d.get('floor', d.get('floor_number', 'N/A'))}" for d in items
+            )
+        if intent == "equipment":
+            return f"Found {len(items)} equipment items in the system"
+        if intent == "supplies":
+            return f"Inventory: {len(items)} total items, {len(_items(results[1]))} items need restocking"
+        return json.dumps(results, default=str)
+
+    def _format_discharge(self, patient_number: str, result: Any) -> str:
+        discharge = result.get("result", result) if isinstance(result, dict) else {}
+        if call_failed(result):
+            return f"❌ Failed to discharge patient {patient_number}: {discharge.get('message', 'Unknown error')}"
+
+        parts = [f"✅ {discharge.get('message', 'Patient discharged successfully')}"]
+        if "report_number" in discharge:
+            parts.append(f"📄 Discharge Report: {discharge['report_number']}")
+        if "report_download_url" in discharge:
+            parts.append(f"📥 Download: {discharge['report_download_url']}")
+        if (discharge.get("bed_turnover") or {}).get("success"):
+            parts.append(f"🛏️ Bed cleaning initiated - estimated {discharge.get('cleaning_timer', '30 minutes')}")
+        if discharge.get("next_steps"):
+            parts.append("📋 Next Steps:")
+            parts.extend(f"   • {step}" for step in discharge["next_steps"])
+        return "\n".join(parts)
+
+    def _format_bed_status(self, bed_number: str, result: Any) -> str:
+        status = result.get("result", result) if isinstance(result, dict) else {}
+        if call_failed(result):
+            return f"❌ {status.get('message', f'Status of bed {bed_number} unavailable')}"
+
+        line = f"🛏️ Bed {bed_number}: {status.get('current_status', 'unknown')}"
+        if status.get("process_status") in ("cleaning", "initiated"):
+            line += (f" - cleaning, {status.get('time_remaining_minutes', 0)} min remaining "
+                     f"({status.get('progress_percentage', 0):.0f}% done)")
+        if status.get("message"):
+            line += f"\n{status['message']}"
+        return line
+
+    def _format_overview(self, users, departments, patients, beds, equipment, low_stock) -> str:
+        occupied = sum(1 for b in beds if b.get("status") == "occupied")
+        available = sum(1 for b in beds if b.get("status") == "available")
+        occupancy = occupied / len(beds) * 100 if beds else 0
+        issues = sum(1 for e in equipment if e.get("status") in ("maintenance", "out_of_order", "broken"))
+
+        recommendations = []
+        if occupancy > 85:
+            recommendations.append("Consider adding more beds or optimizing discharge planning")
+        elif occupancy < 50:
+            recommendations.append("Bed utilization is low - consider cost optimization")
+        if issues:
+            recommendations.append(f"Schedule maintenance for {issues} equipment items")
+        if low_stock:
+            recommendations.append(f"Restock {len(low_stock)} low-inventory items")
+        if len(patients) > available:
+            recommendations.append("Patient capacity exceeds available beds - consider expansion")
+
+        lines = [
+            "📊 Hospital State Analysis:",
+            f"   👥 Users: {len(users)}",
+            f"   🏢 Departments: {len(departments)}",
+            f"   🤒 Patients: {len(patients)}",
+            f"   🛏️ Bed Occupancy: {occupancy:.1f}%",
+            f"   🔧 Equipment Issues: {issues}",
+            f"   📦 Supply Alerts: {len(low_stock)}",
+        ]
+        if recommendations:
+            lines.append(f"💡 Recommendations ({len(recommendations)}):")
+            lines.extend(f"   {i}. {rec}" for i, rec in enumerate(recommendations, 1))
+        return "\n".join(lines)
+
+
+# Global service shared by every request to the MCP server
+nl_query_service = NLQueryService()
+
+
+def _local_dispatch():
+    from agents.orchestrator_agent import OrchestratorAgent
+
+    orchestrator = OrchestratorAgent()
+    return lambda tool_name, arguments: orchestrator.route_request(tool_name, **arguments)
+
+
+def run_benchmark(rounds: int = 200):
+    """Planning cost for fresh shapes vs cached plans, and the end-to-end in-process query time."""
+    queries = ["List all patients", "Discharge Patient P1025", "check bed 302A status", "show available beds",
+               "list departments", "how is our inventory stock", "list staff", "hospital overview"]
+
+    service = NLQueryService()
+    started = time.perf_counter()
+    for i in range(rounds):
+        service.plan(f"{queries[i % len(queries)]} {i}")  # a new shape every time
+    cold_us = (time.perf_counter() - started) / rounds * 1e6
+
+    started = time.perf_counter()
+    for i in range(rounds):
+        service.plan(queries[i % len(queries)].replace("P1025", f"P{1000 + i}"))
+    cached_us = (time.perf_counter() - started) / rounds * 1e6
+
+    print(f"Planning ({rounds} queries):")
+    print(f"  Uncached shapes   {cold_us:8.1f} us/query")
+    print(f"  Cached shapes     {cached_us:8.1f} us/query  ({service.hits} hits, {service.misses} misses)")
+
+    try:
+        dispatch = _local_dispatch()
+    except Exception as e:
+        print(f"⚠️ End-to-end benchmark skipped: {e}")
+        return
+    for query in ("List all patients", "list departments", "hospital overview"):
+        service.handle(query, dispatch)  # warm
+        started = time.perf_counter()
+        answer = service.handle(query, dispatch)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        calls = ", ".join(f"{c['tool']} {c['elapsed_ms']}" for c in answer["tool_calls"])
+        print(f"  {query:20s} {elapsed_ms:7.1f} ms  [{answer['plan_source']}; {calls} ms]")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--benchmark" in sys.argv:
+        run_benchmark()
+    elif len(sys.argv) > 1:
+        print(nl_query_service.handle(" ".join(sys.argv[1:]), _local_dispatch())["response"])
+    else:
+        print(__doc__)
@@ -0,0 +1,494 @@
+"""
+PDF Render Worker
+=================
+
+Renders discharge report markdown into letterhead PDFs inside ReportManager's
+spawned render pool:
+- Imports only reportlab and the report catalog counters, so a
+  worker process starts without the database layer or the agents
+- render_pdf_file writes to a temporary file and atomically moves it into
+  place, so readers never see a partial PDF
+- DischargePdfRenderer holds no database state; ReportManager inherits it
+  for inline renders
+"""
+
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.lib import colors
+
+from report_catalog import record_storage
+
+
+class DischargePdfRenderer:
+    """Renders discharge report markdown into a letterhead PDF.
+
+    Holds no database state, so it can be used from process-pool workers.
+    """
+
+    def _generate_pdf(self, markdown_content: str, output_path: str, report_data: Dict[str, Any]) -> bool:
+        """
+        Generate a professional PDF from markdown content with letterhead and footer.
+        
+        Args:
+            markdown_content: The markdown content to convert
+            output_path: Path where PDF should be saved
+            report_data: Report metadata for enhanced formatting
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            # Create PDF document with margins
+            doc = SimpleDocTemplate(
+                output_path, 
+                pagesize=A4,
+                topMargin=1*inch,
+                bottomMargin=1*inch,
+                leftMargin=0.8*inch,
+                rightMargin=0.8*inch
+            )
+            
+            styles = getSampleStyleSheet()
+            story = []
+            
+            # Add professional letterhead
+            story.extend(self._create_letterhead())
+            
+            # Custom styles
+            title_style = ParagraphStyle(
+                'CustomTitle',
+                parent=styles['Heading1'],
+                fontSize=20,
+                spaceAfter=20,
+                spaceBefore=10,
+                textColor=colors.Color(0.1, 0.3, 0.6),  # Professional blue
+                alignment=1,  # Center alignment
+                fontName='Helvetica-Bold'
+            )
+            
+            heading_style = ParagraphStyle(
+                'CustomHeading',
+                parent=styles['Heading2'],
+                fontSize=14,
+                spaceAfter=12,
+                spaceBefore=15,
+                textColor=colors.Color(0.1, 0.3, 0.6),
+                fontName='Helvetica-Bold',
+                borderWidth=1,
+                borderColor=colors.Color(0.8, 0.8, 0.9),
+                borderPadding=8,
+                backColor=colors.Color(0.95, 0.95, 0.98)
+            )
+            
+            normal_style = ParagraphStyle(
+                'CustomNormal',
+                parent=styles['Normal'],
+                fontSize=11,
+                spaceAfter=6,
+                leading=14,
+                fontName='Helvetica'
+            )
+            
+            field_style = ParagraphStyle(
+                'FieldStyle',
+                parent=styles['Normal'],
+                fontSize=10,
+                spaceAfter=4,
+                leading=12,
+                leftIndent=20,
+                fontName='Helvetica'
+            )
+            
+            # Parse markdown content into sections
+            lines = markdown_content.strip().split('\n')
+            current_paragraph = []
+            in_list = False
+            
+            for line in lines:
+                line = line.strip()
+                
+                if not line:
+                    if current_paragraph:
+                        formatted_text = self._format_text(' '.join(current_paragraph))
+                        story.append(Paragraph(formatted_text, normal_style))
+                        current_paragraph = []
+                    if not in_list:
+                        story.append(Spacer(1, 8))
+                    continue
+                
+                # Handle main title
+                if line.startswith('# '):
+                    if current_paragraph:
+                        formatted_text = self._format_text(' '.join(current_paragraph))
+                        story.append(Paragraph(formatted_text, normal_style))
+                        current_paragraph = []
+                    title_text = self._clean_formatting(line[2:])
+                    story.append(Paragraph(title_text, title_style))
+                    story.append(Spacer(1, 15))
+                    in_list = False
+                    
+                elif line.startswith('## '):
+                    if current_paragraph:
+                        formatted_text = self._format_text(' '.join(current_paragraph))
+                        story.append(Paragraph(formatted_text, normal_style))
+                        current_paragraph = []
+                    heading_text = self._clean_formatting(line[3:])
+                    story.append(Paragraph(heading_text, heading_style))
+                    story.append(Spacer(1, 10))
+                    in_list = False
+                    
+                elif line.startswith('### '):
+                    if current_paragraph:
+                        formatted_text = self._format_text(' '.join(current_paragraph))
+                        story.append(Paragraph(formatted_text, normal_style))
+                        current_paragraph = []
+                    subheading_text = self._clean_formatting(line[4:])
+                    subheading_style = ParagraphStyle(
+                        'SubHeading',
+                        parent=normal_style,
+                        fontSize=12,
+                        fontName='Helvetica-Bold',
+                        spaceAfter=8,
+                        spaceBefore=12,
+                        textColor=colors.Color(0.2, 0.2, 0.2)
+                    )
+                    story.append(Paragraph(subheading_text, subheading_style))
+                    story.append(Spacer(1, 6))
+                    in_list = False
+                    
+                elif line.startswith('- ') or line.startswith('* '):
+                    # Bullet points - handle field formatting
+                    if current_paragraph:
+                        formatted_text = self._format_text(' '.join(current_paragraph))
+                        story.append(Paragraph(formatted_text, normal_style))
+                        current_paragraph = []
+                    
+                    bullet_text = line[2:] if line.startswith('- ') else line[2:]
+                    formatted_bullet = self._format_field(bullet_text)
+                    story.append(Paragraph(f"• {formatted_bullet}", field_style))
+                    in_list = True
+                    
+                elif line.startswith('---'):
+                    # Separator line
+                    if current_paragraph:
+                        formatted_text = self._format_text(' '.join(current_paragraph))
+                        story.append(Paragraph(formatted_text, normal_style))
+                        current_paragraph = []
+                    story.append(Spacer(1, 15))
+                    in_list = False
+                    
+                else:
+                    # Regular content - clean all formatting
+                    cleaned_line = self._clean_formatting(line)
+                    if cleaned_line:  # Only add non-empty lines
+                        current_paragraph.append(cleaned_line)
+                    in_list = False
+            
+            # Add any remaining paragraph
+            if current_paragraph:
+                formatted_text = self._format_text(' '.join(current_paragraph))
+                story.append(Paragraph(formatted_text, normal_style))
+            
+            # Add professional footer
+            story.extend(self._create_footer(report_data))
+            
+            # Build PDF
+            doc.build(story)
+            return True
+            
+        except Exception as e:
+            print(f"PDF generation error: {e}")
+            return False
+    
+    def _create_letterhead(self):
+        """Create professional letterhead with real logo image."""
+        elements = []
+        
+        # Create a table for the header with logo and hospital info
+        from reportlab.platypus import Image
+        from reportlab.lib.colors import Color
+        import os
+        
+        # Define colors to match the healthcare logo design
+        logo_blue = Color(0.0, 0.4, 0.8)        # Primary logo blue
+        dark_blue = Color(0.15, 0.25, 0.55)     # Dark navy for hospital name
+        light_blue = Color(0.4, 0.75, 0.9)      # Light blue accent  
+        gray_text = Color(0.4, 0.4, 0.4)        # Professional gray for contact info
+        
+        # Load the real healthcare logo
+        logo_path = os.path.join("reports", "discharge", "archive", "image.png")
+        try:
+            # Create logo image with proper sizing
+            logo_img = Image(logo_path, width=0.7*inch, height=0.7*inch)
+        except Exception as e:
+            print(f"Could not load logo image: {e}")
+            # Fallback to text logo if image fails
+            logo_img = "◉\n♡"
+        
+        # Header content with real logo - three columns layout
+        header_data = [
+            # Single row: Logo, Hospital Name + Subtitle, Address + Contact Info
+            [logo_img, "GENERAL HOSPITAL\nHealth Care", "123 Healthcare Ave., Medical City, MC 12345\n+123-456-7890\nhello@metrohospital.com\nwww.metrohospital.com"]
+        ]
+        
+        # Create the main header table with better proportions for three columns
+        header_table = Table(header_data, colWidths=[0.8*inch, 3.2*inch, 2.6*inch])
+        
+        header_table.setStyle(TableStyle([
+            # Logo styling - center the image (Column 1)
+            ('ALIGN', (0, 0), (0, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (0, -1), 'MIDDLE'),
+            
+            # Hospital name + subtitle styling (Column 2)
+            ('FONTNAME', (1, 0), (1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (1, 0), (1, 0), 16),
+            ('TEXTCOLOR', (1, 0), (1, 0), dark_blue),
+            ('ALIGN', (1, 0), (1, 0), 'LEFT'),
+            ('VALIGN', (1, 0), (1, 0), 'MIDDLE'),
+            ('LEADING', (1, 0), (1, 0), 18),  # Line spacing between hospital name and subtitle
+            
+            # Address + contact info styling (Column 3)
+            ('FONTNAME', (2, 0), (2, 0), 'Helvetica'),
+            ('FONTSIZE', (2, 0), (2, 0), 8),
+            ('TEXTCOLOR', (2, 0), (2, 0), gray_text),
+            ('ALIGN', (2, 0), (2, 0), 'RIGHT'),
+            ('VALIGN', (2, 0), (2, 0), 'TOP'),
+            ('LEADING', (2, 0), (2, 0), 10),  # Tight line spacing for contact info
+            
+            # Clean spacing - no borders, reduced padding
+            ('GRID', (0, 0), (-1, -1), 0, colors.white),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('LEFTPADDING', (0, 0), (-1, -1), 5),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 5),
+        ]))
+        
+        elements.append(header_table)
+        elements.append(Spacer(1, 10))  # Reduced spacing after header
+        
+        # Professional accent line
+        line_data = [["", ""]]
+        accent_line_table = Table(line_data, colWidths=[4.0*inch, 2.6*inch])
+        accent_line_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (0, 0), light_blue),
+            ('BACKGROUND', (1, 0), (1, 0), dark_blue),
+            ('GRID', (0, 0), (-1, -1), 0, colors.white),
+            ('TOPPADDING', (0, 0), (-1, -1), 3),  # Reduced padding
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),  # Reduced padding
+        ]))
+        
+        elements.append(accent_line_table)
+        # Reduced spacing to prevent overlapping but keep content closer
+        elements.append(Spacer(1, 25))  
+        
+        return elements
+    
+    def _create_footer(self, report_data: Dict[str, Any]):
+        """Create professional footer  template."""
+        elements = []
+        
+        # Add minimal space before footer to save space
+        elements.append(Spacer(1, 15))  # Reduced from 30
+        
+        # Create a signature area with professional layout
+        from reportlab.platypus import Image
+        from reportlab.lib.colors import Color
+        import os
+        
+        # Define colors for footer
+        dark_blue = Color(0.15, 0.25, 0.55)
+        gray_text = Color(0.4, 0.4, 0.4)
+        light_gray = Color(0.8, 0.8, 0.8)
+        
+        # Create a more compact signature area
+        signature_data = [
+            ["Discharge authorized by:", ""],
+            ["", ""],
+            ["Dr. _________________________________", "Date: ____________________"],
+            ["Attending Physician", ""],
+            ["Signature: _____________________________", ""]
+        ]
+        
+        signature_table = Table(signature_data, colWidths=[4*inch, 2*inch])
+        signature_table.setStyle(TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('VALIGN', (0, 0), (-1, -1), 'BOTTOM'),
+            ('GRID', (0, 0), (-1, -1), 0, colors.white),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),  # Reduced padding
+            ('TOPPADDING', (0, 0), (-1, -1), 3),     # Reduced padding
+        ]))
+        
+        elements.append(signature_table)
+        elements.append(Spacer(1, 20))  # Reduced spacing
+        
+        # Professional footer separator line (like DAYA template)
+        footer_line_data = [["", ""]]
+        footer_line_table = Table(footer_line_data, colWidths=[6.5*inch])
+        footer_line_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), light_gray),
+            ('GRID', (0, 0), (-1, -1), 0, colors.white),
+            ('TOPPADDING', (0, 0), (-1, -1), 2),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+        ]))
+        
+        elements.append(footer_line_table)
+        elements.append(Spacer(1, 5))  # Reduced from 10
+        
+        # Footer with logo and contact information - smaller logo for compactness
+        logo_path = os.path.join("reports", "discharge", "archive", "image.png")
+        try:
+            # Create smaller logo for footer to save space
+            footer_logo = Image(logo_path, width=0.3*inch, height=0.3*inch)  # Reduced from 0.4
+        except Exception as e:
+            print(f"Could not load footer logo: {e}")
+            footer_logo = "◉"
+        
+        # Footer content matching DAYA template layout
+        generation_time = datetime.now().strftime('%B %d, %Y at %I:%M %p')
+        
+        # Compact footer content without "DAYA" and reduced gaps
+        footer_data = [
+            # Row 1: All contact info in one line, hospital name, and logo
+            ["Viyyur, Thrissur | 0487 3501000, 0487 2475100\nEmergency Hotline: 0487 2323000\nwww.dayageneralhospital.com", "GENERAL HOSPITAL", footer_logo],
+            # Row 2: Centered document information
+            ["This is an official medical document. Please retain for your records.", "", ""],
+            ["General Hospital - Patient Discharge Summary", "", ""]
+        ]
+        
+        footer_table = Table(footer_data, colWidths=[3.5*inch, 2.0*inch, 1.0*inch])
+        footer_table.setStyle(TableStyle([
+            # Contact info styling (left column) - compact with no gaps between lines
+            ('FONTNAME', (0, 0), (0, 0), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (0, 0), 8),
+            ('TEXTCOLOR', (0, 0), (0, 0), gray_text),
+            ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+            ('VALIGN', (0, 0), (0, 0), 'TOP'),
+            ('LEADING', (0, 0), (0, 0), 9),  # Tight line spacing for contact info
+            
+            # Hospital name styling (middle column) - reduced size
+            ('FONTNAME', (1, 0), (1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (1, 0), (1, 0), 11),  # Reduced from 12
+            ('TEXTCOLOR', (1, 0), (1, 0), dark_blue),
+            ('ALIGN', (1, 0), (1, 0), 'CENTER'),
+            ('VALIGN', (1, 0), (1, 0), 'MIDDLE'),
+            
+            # Logo styling (right column)
+            ('ALIGN', (2, 0), (2, 0), 'CENTER'),
+            ('VALIGN', (2, 0), (2, 0), 'MIDDLE'),
+            
+            # Document metadata styling (rows 2-3) - centered across all columns
+            ('FONTNAME', (0, 1), (0, 2), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (0, 2), 8),  # Smaller font size
+            ('TEXTCOLOR', (0, 1), (0, 2), Color(0.5, 0.5, 0.5)),
+            ('ALIGN', (0, 1), (2, 2), 'CENTER'),  # Center across all 3 columns
+            ('VALIGN', (0, 1), (0, 2), 'MIDDLE'),
+            ('SPAN', (0, 1), (2, 1)),  # Span first metadata line across all columns
+            ('SPAN', (0, 2), (2, 2)),  # Span second metadata line across all columns
+            
+            # Minimal borders and very compact padding
+            ('GRID', (0, 0), (-1, -1), 0, colors.white),
+            ('TOPPADDING', (0, 0), (-1, -1), 3),     # Very compact
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+            ('LEFTPADDING', (0, 0), (-1, -1), 3),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 3),
+            
+            # Minimal extra spacing for metadata rows
+            ('TOPPADDING', (0, 1), (2, 2), 6),  # Reduced from 15
+            ('BOTTOMPADDING', (0, 1), (2, 2), 3), # Reduced from 10
+        ]))
+        
+        elements.append(footer_table)
+        
+        return elements
+    
+    def _clean_formatting(self, text: str) -> str:
+        """Remove ALL markdown formatting marks but preserve the text."""
+        if not text:
+            return ""
+        
+        # Remove ** formatting (multiple passes to catch nested cases)
+        text = re.sub(r'\*\*([^*]*?)\*\*', r'\1', text)
+        text = re.sub(r'\*\*([^*]*)', r'\1', text)  # Handle cases where ** is at start
+        text = re.sub(r'([^*]*)\*\*', r'\1', text)  # Handle cases where ** is at end
+        text = text.replace('**', '')  # Remove any remaining **
+        
+        # Remove single * formatting
+        text = re.sub(r'(?<!\*)\*([^*]+)\*(?!\*)', r'\1', text)
+        text = text.replace('*', '')  # Remove any remaining *
+        
+        # Remove ### formatting
+        text = re.sub(r'###\s*', '', text)
+        
+        return text.strip()
+    
+    def _format_text(self, text: str) -> str:
+        """Format text for PDF, converting markdown to HTML-like tags and removing all ** marks."""
+        if not text:
+            return ""
+        
+        # First, convert **text** to bold HTML tags
+        text = re.sub(r'\*\*([^*]+?)\*\*', r'<b>\1</b>', text)
+        
+        # Remove any remaining ** that weren't converted
+        text = text.replace('**', '')
+        
+        # Convert *text* to italic (but not ** cases)
+        text = re.sub(r'(?<!\*)\*([^*]+)\*(?!\*)', r'<i>\1</i>', text)
+        
+        # Remove any remaining single *
+        text = text.replace('*', '')
+        
+        return text
+    
+    def _format_field(self, text: str) -> str:
+        """Format field entries (like Name: John Doe) with better styling."""
+        if not text:
+            return ""
+        
+        # Handle field: value patterns
+        if ':' in text:
+            parts = text.split(':', 1)
+            if len(parts) == 2:
+                field_name = self._clean_formatting(parts[0].strip())
+                field_value = self._clean_formatting(parts[1].strip())
+                return f"<b>{field_name}:</b> {field_value}"
+        
+        # Clean any remaining formatting
+        return self._clean_formatting(text)
+
+
+def render_pdf_file(markdown_content: str, output_path: str, report_data: Dict[str, Any],
+                    reports_dir: str = None) -> bool:
+    """Render a PDF to a temporary file and atomically move it into place.
+
+    Runs inside the render process pool; readers never see a partial file.
+    When ``reports_dir`` is given the new file is counted in the report catalog.
+    """
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        if DischargePdfRenderer()._generate_pdf(markdown_content, tmp_path, report_data):
+            try:
+                replaced_size = os.path.getsize(output_path)
+            except FileNotFoundError:
+                replaced_size = None
+            os.replace(tmp_path, output_path)
+            if reports_dir:
+                # A re-render overwrites the cached file: count only the size difference
+                record_storage(Path(reports_dir), "pdf_cache", 0 if replaced_size is not None else 1,
+                               os.path.getsize(output_path) - (replaced_size or 0))
+            return True
+        return False
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
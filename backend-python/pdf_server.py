@@ -1,43 +1,21 @@
 #!/usr/bin/env python3
 """
-Simple static file server for PDF reports
-Serves files from the reports directory on port 3000
+Static file server for PDF reports
+Serves files from the reports directory on port 3000 (threaded, with
+sendfile, Range, ETag and 304 support from report_file_server)
 """
 
-import os
 import sys
-from http.server import HTTPServer, SimpleHTTPRequestHandler
-import urllib.parse
 from pathlib import Path
 
-class ReportFileHandler(SimpleHTTPRequestHandler):
-    def __init__(self, *args, **kwargs):
-        # Set the directory to serve from
-        self.reports_directory = Path(__file__).parent / "reports"
-        super().__init__(*args, directory=str(self.reports_directory), **kwargs)
-    
-    def end_headers(self):
-        # Add CORS headers to allow cross-origin requests
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-        super().end_headers()
-    
-    def do_OPTIONS(self):
-        # Handle preflight requests
-        self.send_response(200)
-        self.end_headers()
-    
-    def log_message(self, format, *args):
-        # Custom logging for clarity
-        print(f"📁 [{self.address_string()}] {format % args}")
+from report_file_server import make_report_server
 
 def start_pdf_server(port=3000):
     """Start the PDF file server"""
-    server_address = ('', port)
-    
     try:
-        httpd = HTTPServer(server_address, ReportFileHandler)
+        # POST stays in the advertised CORS methods for existing frontends
+        httpd = make_report_server(port, Path(__file__).parent / "reports",
+                                   cors_methods="GET, HEAD, POST, OPTIONS")
         print(f"🚀 PDF Report Server starting on http://localhost:{port}")
         print(f"📂 Serving files from: {Path(__file__).parent / 'reports'}")
         print("📋 Available endpoints:")
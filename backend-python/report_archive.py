@@ -0,0 +1,113 @@
+"""
+Discharge Report Archive Bundles
+================================
+
+Packs archived discharge reports into one compressed zip bundle per month
+(``archive/bundles/discharge-reports-YYYY-MM.zip``):
+
+- Each report contributes its markdown file and its metadata JSON as two
+  deflate-compressed members, so a bundle is self-describing and opens with
+  any zip tool
+- The byte offset, compressed size and CRC of every member are recorded in
+  the report catalog, so a single report is read by seeking straight to its
+  local header and inflating only that member, without parsing the bundle's
+  central directory or decompressing anything else
+- Bundles are append-only; members already written keep their offsets
+"""
+
+import struct
+import zipfile
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+BUNDLE_DIRNAME = "bundles"
+BUNDLE_PREFIX = "discharge-reports-"
+
+# Local file header: signature, version, flags, method, mtime, mdate, crc,
+# compressed size, uncompressed size, name length, extra length
+_LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+
+
+@dataclass
+class BundleMember:
+    """Location of one member inside a bundle."""
+
+    bundle_path: str
+    member_name: str
+    header_offset: int
+    compressed_size: int
+    compress_type: int
+    crc: int
+
+
+def bundle_path_for(archive_dir: Path, month: str) -> Path:
+    """Bundle file for a ``YYYY-MM`` month."""
+    bundle_dir = Path(archive_dir) / BUNDLE_DIRNAME
+    bundle_dir.mkdir(parents=True, exist_ok=True)
+    return bundle_dir / f"{BUNDLE_PREFIX}{month}.zip"
+
+
+def append_to_bundle(bundle_path: Path, members: List[Tuple[str, bytes]]) -> Dict[str, BundleMember]:
+    """Append ``(name, data)`` members to a bundle and return their locations by name."""
+    mode = "a" if Path(bundle_path).exists() else "w"
+    written = {}
+    with zipfile.ZipFile(bundle_path, mode, compression=zipfile.ZIP_DEFLATED, compresslevel=9) as bundle:
+        for name, data in members:
+            bundle.writestr(name, data)
+            # getinfo returns the most recent entry when a name repeats
+            info = bundle.getinfo(name)
+            written[name] = BundleMember(
+                bundle_path=str(bundle_path),
+                member_name=name,
+                header_offset=info.header_offset,
+                compressed_size=info.compress_size,
+                compress_type=info.compress_type,
+                crc=info.CRC,
+            )
+    return written
+
+
+def read_bundle_member(bundle_path: str, header_offset: int, compressed_size: int,
+                       compress_type: int, crc: int) -> bytes:
+    """Read one member by seeking to its local header; only that member is inflated."""
+    with open(bundle_path, "rb") as f:
+        f.seek(header_offset)
+        header = f.read(_LOCAL_HEADER.size)
+        fields = _LOCAL_HEADER.unpack(header)
+        if fields[0] != _LOCAL_HEADER_SIGNATURE:
+            raise ValueError(f"Bad bundle member header at offset {header_offset} in {bundle_path}")
+        name_length, extra_length = fields[9], fields[10]
+        f.seek(name_length + extra_length, 1)
+        raw = f.read(compressed_size)
+
+    if compress_type == zipfile.ZIP_DEFLATED:
+        data = zlib.decompress(raw, -zlib.MAX_WBITS)
+    elif compress_type == zipfile.ZIP_STORED:
+        data = raw
+    else:
+        raise ValueError(f"Unsupported bundle compression type {compress_type}")
+
+    if zlib.crc32(data) & 0xFFFFFFFF != crc:
+        raise ValueError(f"CRC mismatch for member at offset {header_offset} in {bundle_path}")
+    return data
+
+
+def iter_bundle_members(archive_dir: Path) -> Iterator[Tuple[BundleMember, zipfile.ZipFile]]:
+    """Yield every member of every bundle (used to rebuild the catalog)."""
+    bundle_dir = Path(archive_dir) / BUNDLE_DIRNAME
+    if not bundle_dir.exists():
+        return
+    for bundle_path in sorted(bundle_dir.glob(f"{BUNDLE_PREFIX}*.zip")):
+        with zipfile.ZipFile(bundle_path) as bundle:
+            for info in bundle.infolist():
+                yield BundleMember(
+                    bundle_path=str(bundle_path),
+                    member_name=info.filename,
+                    header_offset=info.header_offset,
+                    compressed_size=info.compress_size,
+                    compress_type=info.compress_type,
+                    crc=info.CRC,
+                ), bundle
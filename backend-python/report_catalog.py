@@ -0,0 +1,387 @@
+"""
+Discharge Report Catalog
+========================
+
+Embedded SQLite index over the discharge report files kept by ReportManager:
+
+- One row per saved report with its metadata, file locations and status
+- Indexes on generated_at and status so listing the newest reports never
+  opens metadata files, and an FTS5 trigram index for patient name searches
+- Storage counters per bucket (current, archived, downloads, pdf_cache)
+  maintained incrementally whenever a file is written, moved or removed
+- Offsets of reports packed into monthly archive bundles (report_archive.py)
+- One-time rebuild from the existing ``*_metadata.json`` files and bundles
+
+The catalog is local to the server, like the report files it indexes, but is
+kept outside the directory served at ``/discharge``: in ``reports/.catalog/``
+next to it, or in ``REPORT_CATALOG_DIR`` when set. A catalog left inside the
+reports directory by an older version is moved there on first open.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from report_archive import BundleMember, iter_bundle_members
+
+CATALOG_FILENAME = "catalog.sqlite3"  # legacy location, inside the reports directory
+SQLITE_SIDE_FILES = ("", "-wal", "-shm")
+STORAGE_BUCKETS = ("current", "archived", "downloads", "pdf_cache")
+MIN_INDEXED_NAME_SEARCH = 3  # the trigram index cannot answer shorter search terms
+
+# Catalog files whose schema this process has already created or migrated
+_initialized_paths = set()
+_init_lock = threading.Lock()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    file_name          TEXT PRIMARY KEY,
+    report_number      TEXT NOT NULL,
+    patient_name       TEXT,
+    patient_name_lower TEXT,
+    patient_id         TEXT,
+    generated_at       TEXT NOT NULL,
+    status             TEXT NOT NULL,
+    file_path          TEXT,
+    metadata_path      TEXT,
+    size_bytes         INTEGER NOT NULL DEFAULT 0,
+    metadata           TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_reports_generated_at ON reports (generated_at DESC);
+CREATE INDEX IF NOT EXISTS ix_reports_status_generated_at ON reports (status, generated_at DESC);
+DROP INDEX IF EXISTS ix_reports_patient_name;
+CREATE INDEX IF NOT EXISTS ix_reports_report_number ON reports (report_number);
+
+-- Substring search over patient names; kept in sync with reports by the triggers below
+-- (REPLACE fires the delete trigger because connections enable recursive_triggers)
+CREATE VIRTUAL TABLE IF NOT EXISTS report_names USING fts5(
+    patient_name_lower, content='reports', content_rowid='rowid', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS reports_names_ai AFTER INSERT ON reports BEGIN
+    INSERT INTO report_names (rowid, patient_name_lower) VALUES (new.rowid, new.patient_name_lower);
+END;
+CREATE TRIGGER IF NOT EXISTS reports_names_ad AFTER DELETE ON reports BEGIN
+    INSERT INTO report_names (report_names, rowid, patient_name_lower)
+    VALUES ('delete', old.rowid, old.patient_name_lower);
+END;
+CREATE TRIGGER IF NOT EXISTS reports_names_au AFTER UPDATE ON reports BEGIN
+    INSERT INTO report_names (report_names, rowid, patient_name_lower)
+    VALUES ('delete', old.rowid, old.patient_name_lower);
+    INSERT INTO report_names (rowid, patient_name_lower) VALUES (new.rowid, new.patient_name_lower);
+END;
+
+CREATE TABLE IF NOT EXISTS bundle_members (
+    file_name       TEXT PRIMARY KEY,
+    bundle_path     TEXT NOT NULL,
+    member_name     TEXT NOT NULL,
+    header_offset   INTEGER NOT NULL,
+    compressed_size INTEGER NOT NULL,
+    compress_type   INTEGER NOT NULL,
+    crc             INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS storage_counters (
+    bucket TEXT PRIMARY KEY,
+    files  INTEGER NOT NULL DEFAULT 0,
+    bytes  INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS catalog_info (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def catalog_path(reports_dir: Path) -> Path:
+    """Where the catalog for ``reports_dir`` lives; never inside the served directory itself."""
+    base = os.getenv("REPORT_CATALOG_DIR")
+    directory = Path(base) if base else Path(reports_dir).resolve().parent / ".catalog"
+    return directory / f"{Path(reports_dir).resolve().name}.sqlite3"
+
+
+def _move_legacy_catalog(reports_dir: Path, path: Path) -> None:
+    """Move (or, if a catalog already exists at ``path``, remove) a catalog kept in the reports directory."""
+    legacy = reports_dir / CATALOG_FILENAME
+    if not legacy.exists():
+        return
+    adopt = not path.exists()
+    for suffix in SQLITE_SIDE_FILES:
+        source = Path(f"{legacy}{suffix}")
+        if not source.exists():
+            continue
+        if adopt:
+            os.replace(source, f"{path}{suffix}")
+        else:
+            source.unlink()
+
+
+class ReportCatalog:
+    """SQLite-backed catalog of discharge report files and storage counters."""
+
+    def __init__(self, reports_dir: Path):
+        self.reports_dir = Path(reports_dir)
+        self.path = catalog_path(self.reports_dir)
+        with _init_lock:
+            initialized = self.path in _initialized_paths
+            if not initialized:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                _move_legacy_catalog(self.reports_dir, self.path)
+            self.conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            self.conn.row_factory = sqlite3.Row
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("PRAGMA recursive_triggers=ON")
+            if not initialized:
+                self._initialize()
+                _initialized_paths.add(self.path)
+
+    def _initialize(self):
+        """Create or migrate the schema; runs once per catalog file and process."""
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        new_name_index = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'report_names'").fetchone() is None
+        self.conn.executescript(_SCHEMA)
+        if new_name_index:
+            self.conn.execute("INSERT INTO report_names (report_names) VALUES ('rebuild')")
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO storage_counters (bucket, files, bytes) VALUES (?, 0, 0)",
+            [(bucket,) for bucket in STORAGE_BUCKETS]
+        )
+        if self._info("initialized_at") is None:
+            self.rebuild()
+
+    @contextmanager
+    def transaction(self):
+        """Write transaction; takes the write lock up front so counters never race."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        else:
+            self.conn.execute("COMMIT")
+
+    def close(self):
+        self.conn.close()
+
+    def _info(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM catalog_info WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    # ---- report rows ----
+
+    @staticmethod
+    def _row_values(metadata: Dict[str, Any], metadata_path: str, size_bytes: int):
+        file_path = metadata.get("file_path") or ""
+        patient_name = metadata.get("patient_name") or ""
+        return (
+            Path(file_path).name or Path(metadata_path).name,
+            metadata.get("report_number", ""),
+            patient_name,
+            patient_name.lower(),
+            metadata.get("patient_id") or "",
+            metadata.get("generated_at") or datetime.now().isoformat(),
+            metadata.get("status") or "current",
+            file_path,
+            metadata_path,
+            size_bytes,
+            json.dumps(metadata),
+        )
+
+    def add_report(self, conn, metadata: Dict[str, Any], metadata_path: str, size_bytes: int):
+        """Insert a report row and count it in its status bucket (call inside ``transaction``)."""
+        values = self._row_values(metadata, metadata_path, size_bytes)
+        conn.execute(
+            """INSERT OR REPLACE INTO reports (file_name, report_number, patient_name, patient_name_lower,
+                   patient_id, generated_at, status, file_path, metadata_path, size_bytes, metadata)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            values
+        )
+        self.adjust(conn, values[6], 1, size_bytes)
+
+    def move_report(self, conn, file_name: str, metadata: Dict[str, Any], metadata_path: str, size_bytes: int):
+        """Update a report's location/status and move its bytes between counter buckets."""
+        old = conn.execute("SELECT status, size_bytes FROM reports WHERE file_name = ?", (file_name,)).fetchone()
+        if old:
+            self.adjust(conn, old["status"], -1, -old["size_bytes"])
+            conn.execute("DELETE FROM reports WHERE file_name = ?", (file_name,))
+        self.add_report(conn, metadata, metadata_path, size_bytes)
+
+    def bundle_report(self, conn, file_name: str, metadata: Dict[str, Any],
+                      report_member: BundleMember, metadata_member: BundleMember):
+        """Point a report at its bundle members; its archived size becomes the compressed size."""
+        size = report_member.compressed_size + metadata_member.compressed_size
+        self.move_report(conn, file_name, metadata, report_member.bundle_path, size)
+        conn.execute(
+            """INSERT OR REPLACE INTO bundle_members (file_name, bundle_path, member_name, header_offset,
+                   compressed_size, compress_type, crc) VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (file_name, report_member.bundle_path, report_member.member_name, report_member.header_offset,
+             report_member.compressed_size, report_member.compress_type, report_member.crc)
+        )
+
+    def adjust(self, conn, bucket: str, files: int, size_bytes: int):
+        conn.execute(
+            "UPDATE storage_counters SET files = MAX(files + ?, 0), bytes = MAX(bytes + ?, 0) WHERE bucket = ?",
+            (files, size_bytes, bucket)
+        )
+
+    def record_file(self, bucket: str, files: int, size_bytes: int):
+        """Adjust a storage counter in its own transaction (downloads, cached PDFs)."""
+        with self.transaction() as conn:
+            self.adjust(conn, bucket, files, size_bytes)
+
+    # ---- queries ----
+
+    def list_reports(self, status: str = "all", patient_name: str = None,
+                     from_date: str = None, to_date: str = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Newest-first report metadata with the same filters as ReportManager.list_reports."""
+        clauses, params = [], []
+        if status == "current":
+            clauses.append("status = 'current'")
+        elif status == "archived":
+            clauses.append("status = 'archived'")
+        if patient_name:
+            term = patient_name.lower()
+            if len(term) >= MIN_INDEXED_NAME_SEARCH:
+                clauses.append("rowid IN (SELECT rowid FROM report_names WHERE report_names MATCH ?)")
+                params.append('"' + term.replace('"', '""') + '"')
+            else:
+                clauses.append("instr(patient_name_lower, ?) > 0")
+                params.append(term)
+        if from_date:
+            clauses.append("generated_at >= ?")
+            params.append(datetime.strptime(from_date, '%Y-%m-%d').date().isoformat())
+        if to_date:
+            clauses.append("generated_at < ?")
+            params.append((datetime.strptime(to_date, '%Y-%m-%d').date() + timedelta(days=1)).isoformat())
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self.conn.execute(
+            f"SELECT metadata, status FROM reports {where} ORDER BY generated_at DESC LIMIT ?",
+            (*params, limit)
+        ).fetchall()
+        reports = []
+        for row in rows:
+            metadata = json.loads(row["metadata"])
+            metadata["status"] = row["status"]
+            reports.append(metadata)
+        return reports
+
+    def find_report(self, report_number: str) -> Optional[Dict[str, Any]]:
+        """Latest catalog entry for a report number, preferring current over archived."""
+        row = self.conn.execute(
+            """SELECT r.metadata, r.status, b.bundle_path, b.member_name, b.header_offset,
+                      b.compressed_size, b.compress_type, b.crc
+               FROM reports r LEFT JOIN bundle_members b ON b.file_name = r.file_name
+               WHERE r.report_number = ?
+               ORDER BY CASE r.status WHEN 'current' THEN 0 ELSE 1 END, r.generated_at DESC LIMIT 1""",
+            (report_number,)
+        ).fetchone()
+        if not row:
+            return None
+        metadata = json.loads(row["metadata"])
+        metadata["status"] = row["status"]
+        if row["bundle_path"]:
+            metadata["bundle"] = {
+                "bundle_path": row["bundle_path"],
+                "member_name": row["member_name"],
+                "header_offset": row["header_offset"],
+                "compressed_size": row["compressed_size"],
+                "compress_type": row["compress_type"],
+                "crc": row["crc"],
+            }
+        return metadata
+
+    def reports_older_than(self, cutoff: datetime, status: str = "current") -> List[Dict[str, Any]]:
+        rows = self.conn.execute(
+            "SELECT file_name, metadata_path, metadata FROM reports WHERE status = ? AND generated_at < ?",
+            (status, cutoff.isoformat())
+        ).fetchall()
+        return [{"file_name": r["file_name"], "metadata_path": r["metadata_path"],
+                 "metadata": json.loads(r["metadata"])} for r in rows]
+
+    def unbundled_reports_older_than(self, cutoff: datetime) -> List[Dict[str, Any]]:
+        """Current and loose archived reports older than ``cutoff`` that are not in a bundle yet."""
+        rows = self.conn.execute(
+            """SELECT r.file_name, r.metadata_path, r.metadata FROM reports r
+               WHERE r.generated_at < ? AND r.status IN ('current', 'archived')
+                 AND NOT EXISTS (SELECT 1 FROM bundle_members b WHERE b.file_name = r.file_name)
+               ORDER BY r.generated_at""",
+            (cutoff.isoformat(),)
+        ).fetchall()
+        return [{"file_name": r["file_name"], "metadata_path": r["metadata_path"],
+                 "metadata": json.loads(r["metadata"])} for r in rows]
+
+    def storage_counters(self) -> Dict[str, Dict[str, int]]:
+        return {row["bucket"]: {"files": row["files"], "bytes": row["bytes"]}
+                for row in self.conn.execute("SELECT bucket, files, bytes FROM storage_counters")}
+
+    # ---- rebuild ----
+
+    def rebuild(self) -> Dict[str, int]:
+        """Re-index every metadata file and bundle, and recount all buckets from disk."""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM reports")
+            conn.execute("DELETE FROM bundle_members")
+            conn.execute("UPDATE storage_counters SET files = 0, bytes = 0")
+
+            # Bundled reports first; a loose copy left behind by an interrupted
+            # archive run is then skipped rather than counted twice
+            members = {}
+            bundled_metadata = []
+            for member, bundle in iter_bundle_members(self.reports_dir / "archive"):
+                members[(member.bundle_path, member.member_name)] = member
+                if member.member_name.endswith("_metadata.json"):
+                    bundled_metadata.append((member, json.loads(bundle.read(member.member_name))))
+            for metadata_member, metadata in bundled_metadata:
+                report_member = members.get((metadata_member.bundle_path, metadata.get("bundle_member")))
+                if report_member:
+                    self.bundle_report(conn, report_member.member_name, metadata, report_member, metadata_member)
+
+            for subdir in ("current", "archive"):
+                directory = self.reports_dir / subdir
+                if not directory.exists():
+                    continue
+                for metadata_file in directory.glob("*_metadata.json"):
+                    try:
+                        with open(metadata_file, 'r', encoding='utf-8') as f:
+                            metadata = json.load(f)
+                    except (OSError, ValueError):
+                        continue
+                    metadata["status"] = "archived" if subdir == "archive" else "current"
+                    file_name = Path(metadata.get("file_path") or "").name
+                    if file_name and conn.execute(
+                            "SELECT 1 FROM bundle_members WHERE file_name = ?", (file_name,)).fetchone():
+                        continue
+                    size = metadata_file.stat().st_size
+                    report_path = Path(metadata.get("file_path") or "")
+                    if report_path.is_file():
+                        size += report_path.stat().st_size
+                    self.add_report(conn, metadata, str(metadata_file), size)
+
+            for bucket, directory, pattern in (("downloads", self.reports_dir / "downloads", "*"),
+                                               ("pdf_cache", self.reports_dir / "cache" / "pdf", "*.pdf")):
+                files = [p for p in directory.glob(pattern) if p.is_file()] if directory.exists() else []
+                self.adjust(conn, bucket, len(files), sum(p.stat().st_size for p in files))
+
+            conn.execute("INSERT INTO report_names (report_names) VALUES ('rebuild')")
+            conn.execute(
+                "INSERT OR REPLACE INTO catalog_info (key, value) VALUES ('initialized_at', ?)",
+                (datetime.now().isoformat(),)
+            )
+        return {bucket: counts["files"] for bucket, counts in self.storage_counters().items()}
+
+
+def record_storage(reports_dir: Path, bucket: str, files: int, size_bytes: int) -> None:
+    """Adjust one storage counter from code that has no ReportManager (e.g. render workers)."""
+    catalog = ReportCatalog(reports_dir)
+    try:
+        catalog.record_file(bucket, files, size_bytes)
+    finally:
+        catalog.close()
@@ -0,0 +1,374 @@
+"""
+Report File Server
+==================
+
+Serves discharge report files (PDF, markdown, zip) for both the main
+Starlette app and the standalone report servers:
+
+- ReportFileApp: ASGI app mountable at ``/discharge`` in place of StaticFiles
+- ReportFileHandler: threaded ``http.server`` handler used by pdf_server.py
+  and pdf_file_server.py, streaming bodies with zero-copy ``socket.sendfile``
+- Strong ETags from content hashes (memoised per file version), 304 handling
+  for If-None-Match / If-Modified-Since, single-range HTTP Range requests
+  with If-Range, and gzip-precompressed variants for markdown/text reports
+- Only report artifacts are served (PDF, markdown and archive bundles, including
+  the rendered PDFs under ``cache/pdf`` that download_report hands out); dotfiles,
+  precompressed variants, temporary files and anything else under the root are not
+- Optional fallback that renders ``/<report_number>.pdf`` on demand through
+  ReportManager's PDF cache when no such file exists on disk
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+CHUNK_SIZE = 256 * 1024
+PRECOMPRESS_TYPES = {".md", ".json", ".txt", ".html", ".csv"}
+PRECOMPRESS_MIN_BYTES = 1024
+REPORT_PDF_PATTERN = re.compile(r"^/(DR-[A-Za-z0-9_-]+)\.pdf$")
+# Report artifacts: PDFs, markdown reports and monthly archive bundles (report_archive.py)
+SERVED_SUFFIXES = {".pdf", ".md", ".zip"}
+
+
+@dataclass
+class FileEntry:
+    """A servable representation of a file."""
+
+    path: Path
+    size: int
+    mtime: float
+    etag: str
+    content_type: str
+    content_encoding: Optional[str] = None
+
+
+class ReportFileStore:
+    """Path resolution, ETags, precompression and conditional/range logic shared by both servers."""
+
+    def __init__(self, root: Path, cache_dir: Path = None,
+                 fallback: Callable[[str], Optional[Path]] = None, etag_cache_size: int = 4096):
+        self.root = Path(root).resolve()
+        self.cache_dir = Path(cache_dir) if cache_dir else self.root / "cache" / "precompressed"
+        self.fallback = fallback
+        self._etags: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self._etag_cache_size = etag_cache_size
+        self._lock = threading.Lock()
+
+    # ---- lookup ----
+
+    def resolve(self, url_path: str) -> Optional[Path]:
+        """Map a URL path onto a file below the root, or None (also for traversal attempts)."""
+        relative = unquote(url_path).lstrip("/")
+        candidate = (self.root / relative).resolve()
+        if candidate != self.root and self.root not in candidate.parents:
+            return None
+        if self.servable(candidate) and candidate.is_file():
+            return candidate
+        if self.fallback:
+            return self.fallback(url_path)
+        return None
+
+    def servable(self, path: Path) -> bool:
+        """Whether a resolved path below the root is a report artifact that may be served."""
+        parts = path.relative_to(self.root).parts
+        if not parts or any(part.startswith(".") for part in parts):
+            return False
+        return path.suffix.lower() in SERVED_SUFFIXES
+
+    def entry(self, path: Path) -> FileEntry:
+        st = path.stat()
+        content_type, _ = mimetypes.guess_type(str(path))
+        if path.suffix.lower() == ".md":
+            content_type = "text/markdown; charset=utf-8"
+        return FileEntry(path=path, size=st.st_size, mtime=st.st_mtime,
+                         etag=self._etag(path, st), content_type=content_type or "application/octet-stream")
+
+    def _etag(self, path: Path, st: os.stat_result) -> str:
+        key = (str(path), st.st_mtime_ns, st.st_size)
+        with self._lock:
+            etag = self._etags.get(key)
+            if etag is not None:
+                self._etags.move_to_end(key)
+                return etag
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+        etag = f'"{digest.hexdigest()[:32]}"'
+        with self._lock:
+            self._etags[key] = etag
+            while len(self._etags) > self._etag_cache_size:
+                self._etags.popitem(last=False)
+        return etag
+
+    def precompressed(self, entry: FileEntry, accept_encoding: str) -> FileEntry:
+        """Return the gzip variant for text reports when the client accepts it, building it once."""
+        if (entry.path.suffix.lower() not in PRECOMPRESS_TYPES or entry.size < PRECOMPRESS_MIN_BYTES
+                or "gzip" not in (accept_encoding or "").lower()):
+            return entry
+        gz_path = self.cache_dir / f"{entry.etag.strip(chr(34))}.gz"
+        if not gz_path.exists():
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = gz_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(entry.path, "rb") as src, gzip.open(tmp_path, "wb", compresslevel=9) as dst:
+                for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                    dst.write(chunk)
+            os.replace(tmp_path, gz_path)
+        return FileEntry(path=gz_path, size=gz_path.stat().st_size, mtime=entry.mtime,
+                         etag=f'{entry.etag[:-1]}-gzip"', content_type=entry.content_type,
+                         content_encoding="gzip")
+
+    # ---- HTTP semantics ----
+
+    @staticmethod
+    def not_modified(headers: Dict[str, str], entry: FileEntry) -> bool:
+        """RFC 9110 conditional GET: If-None-Match wins over If-Modified-Since."""
+        if_none_match = headers.get("if-none-match")
+        if if_none_match:
+            tags = [t.strip() for t in if_none_match.split(",")]
+            return "*" in tags or entry.etag in tags or f"W/{entry.etag}" in tags
+        if_modified_since = headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(entry.mtime) <= since
+        return False
+
+    @staticmethod
+    def byte_range(headers: Dict[str, str], entry: FileEntry):
+        """Parse a single ``bytes=`` range.
+
+        Returns None to serve the full body, ``(start, end)`` inclusive for a
+        206, or ``"unsatisfiable"`` for a 416. Multi-range requests get the
+        full body, which RFC 9110 allows.
+        """
+        header = headers.get("range")
+        if not header or not header.startswith("bytes=") or "," in header:
+            return None
+        if_range = headers.get("if-range")
+        if if_range and if_range.strip() != entry.etag:
+            return None
+        start_text, _, end_text = header[6:].strip().partition("-")
+        try:
+            if start_text == "":
+                length = int(end_text)
+                if length <= 0:
+                    return "unsatisfiable"
+                start, end = max(entry.size - length, 0), entry.size - 1
+            else:
+                start = int(start_text)
+                end = int(end_text) if end_text else entry.size - 1
+        except ValueError:
+            return None
+        if start >= entry.size or start > end:
+            return "unsatisfiable"
+        return start, min(end, entry.size - 1)
+
+    def plan(self, method: str, url_path: str, headers: Dict[str, str]):
+        """Decide the response for a request.
+
+        Returns ``(status, header_list, entry, offset, length)``; ``entry`` is None
+        when there is no body to send.
+        """
+        path = self.resolve(url_path)
+        if path is None:
+            return HTTPStatus.NOT_FOUND, [("Content-Length", "0")], None, 0, 0
+
+        entry = self.entry(path)
+        wants_range = "range" in headers
+        if not wants_range:
+            entry = self.precompressed(entry, headers.get("accept-encoding", ""))
+
+        common = [
+            ("ETag", entry.etag),
+            ("Last-Modified", formatdate(entry.mtime, usegmt=True)),
+            ("Accept-Ranges", "bytes"),
+            ("Cache-Control", "private, max-age=0, must-revalidate"),
+        ]
+        if entry.path.suffix.lower() in PRECOMPRESS_TYPES or entry.content_encoding:
+            common.append(("Vary", "Accept-Encoding"))
+
+        if self.not_modified(headers, entry):
+            return HTTPStatus.NOT_MODIFIED, common, None, 0, 0
+
+        common.append(("Content-Type", entry.content_type))
+        if entry.content_encoding:
+            common.append(("Content-Encoding", entry.content_encoding))
+
+        byte_range = self.byte_range(headers, entry) if wants_range else None
+        if byte_range == "unsatisfiable":
+            return (HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE,
+                    common + [("Content-Range", f"bytes */{entry.size}"), ("Content-Length", "0")], None, 0, 0)
+        if byte_range:
+            start, end = byte_range
+            length = end - start + 1
+            return (HTTPStatus.PARTIAL_CONTENT,
+                    common + [("Content-Range", f"bytes {start}-{end}/{entry.size}"),
+                              ("Content-Length", str(length))],
+                    entry if method != "HEAD" else None, start, length)
+        return (HTTPStatus.OK, common + [("Content-Length", str(entry.size))],
+                entry if method != "HEAD" else None, 0, entry.size)
+
+
+def report_pdf_fallback(reports_dir: Path) -> Callable[[str], Optional[Path]]:
+    """Fallback that renders ``/<report_number>.pdf`` via ReportManager's PDF cache."""
+    def _fallback(url_path: str) -> Optional[Path]:
+        match = REPORT_PDF_PATTERN.match(unquote(url_path))
+        if not match:
+            return None
+        from report_manager import ReportManager
+        manager = ReportManager()
+        try:
+            result = manager.download_report(match.group(1), "pdf")
+        finally:
+            manager.close()
+        if result.get("success"):
+            return Path(result["download_path"]).resolve()
+        return None
+    return _fallback
+
+
+# ================================
+# ASGI app (Starlette Mount)
+# ================================
+
+class ReportFileApp:
+    """ASGI app serving report files; drop-in for ``StaticFiles`` under a Mount."""
+
+    def __init__(self, directory: str, render_missing_pdfs: bool = True):
+        root = Path(directory)
+        self.store = ReportFileStore(root, fallback=report_pdf_fallback(root) if render_missing_pdfs else None)
+
+    async def __call__(self, scope, receive, send):
+        import anyio
+
+        if scope["type"] != "http":
+            return
+        method = scope["method"]
+        if method not in ("GET", "HEAD"):
+            await send({"type": "http.response.start", "status": 405,
+                        "headers": [(b"allow", b"GET, HEAD"), (b"content-length", b"0")]})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        # Starlette Mount keeps the full path and sets root_path to the mount prefix
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+
+        # Hashing, precompression and fallback rendering are blocking; keep them off the loop
+        status, response_headers, entry, offset, length = await anyio.to_thread.run_sync(
+            self.store.plan, method, path, headers)
+
+        await send({
+            "type": "http.response.start",
+            "status": int(status),
+            "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in response_headers],
+        })
+        if entry is None:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        with open(entry.path, "rb") as f:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({"type": "http.response.zerocopysend", "file": f,
+                            "offset": offset, "count": length})
+                return
+            f.seek(offset)
+            remaining = length
+            while remaining > 0:
+                chunk = await anyio.to_thread.run_sync(f.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b""})
+
+
+# ================================
+# Threaded standalone server
+# ================================
+
+class ReportFileHandler(BaseHTTPRequestHandler):
+    """Threaded handler with sendfile bodies; configure ``store`` and ``url_prefix`` on a subclass."""
+
+    protocol_version = "HTTP/1.1"
+    store: ReportFileStore = None
+    url_prefix = ""
+    cors_methods = "GET, HEAD, OPTIONS"
+
+    def _route_path(self) -> Optional[str]:
+        path = urlparse(self.path).path
+        if self.url_prefix:
+            if not path.startswith(self.url_prefix + "/"):
+                return None
+            path = path[len(self.url_prefix):]
+        return path
+
+    def _send_cors(self):
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', self.cors_methods)
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Range, If-None-Match, If-Modified-Since')
+        self.send_header('Access-Control-Expose-Headers', 'ETag, Content-Range, Accept-Ranges')
+
+    def _serve(self, method: str):
+        path = self._route_path()
+        if path is None:
+            status, headers, entry, offset, length = HTTPStatus.NOT_FOUND, [("Content-Length", "0")], None, 0, 0
+        else:
+            request_headers = {k.lower(): v for k, v in self.headers.items()}
+            status, headers, entry, offset, length = self.store.plan(method, path, request_headers)
+
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self._send_cors()
+        self.end_headers()
+
+        if entry is not None:
+            with open(entry.path, "rb") as f:
+                # Zero-copy on Linux; socket.sendfile falls back to send() elsewhere
+                self.connection.sendfile(f, offset, length)
+
+    def do_GET(self):
+        self._serve("GET")
+
+    def do_HEAD(self):
+        self._serve("HEAD")
+
+    def do_OPTIONS(self):
+        # Handle preflight requests
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Length", "0")
+        self._send_cors()
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        print(f"📁 [{self.address_string()}] {format % args}")
+
+
+def make_report_server(port: int, root: Path, url_prefix: str = "", render_missing_pdfs: bool = False,
+                       cors_methods: str = ReportFileHandler.cors_methods) -> ThreadingHTTPServer:
+    """Build a threaded report server; one slow client no longer blocks other downloads."""
+    store = ReportFileStore(root, fallback=report_pdf_fallback(root) if render_missing_pdfs else None)
+    handler = type("ConfiguredReportFileHandler", (ReportFileHandler,),
+                   {"store": store, "url_prefix": url_prefix.rstrip("/"), "cors_methods": cors_methods})
+    server = ThreadingHTTPServer(("", port), handler)
+    server.daemon_threads = True
+    return server
@@ -5,8 +5,10 @@ Hospital Discharge Report Management System
 This module provides comprehensive management for discharge reports including:
 - Report generation and storage
 - Report retrieval and download
-- Report search and filtering
-- Report archiving and cleanup
+- Report search and filtering through an indexed catalog (report_catalog.py)
+- Report archiving into compressed monthly bundles (report_archive.py) and cleanup
+- Rendered PDF cache keyed by report content hash, rendered in a process pool
+  of spawned workers that import only pdf_render_worker.py
 
 Author: Hospital Management System
 Date: August 7, 2025
@@ -15,26 +17,96 @@ Date: August 7, 2025
 import os
 import shutil
 import zipfile
+import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import List, Dict, Optional, Any
 import json
 import uuid
-import re
-
-# PDF generation imports
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib import colors
-import markdown2
 
 from database import SessionLocal, DischargeReport, Patient, User
 from discharge_service import PatientDischargeReportGenerator
+from pdf_render_worker import DischargePdfRenderer, render_pdf_file
+from report_catalog import ReportCatalog
+from report_archive import append_to_bundle, bundle_path_for, read_bundle_member
+
+
+# Bump when the letterhead, footer or markdown-to-PDF layout changes so that
+# previously cached PDFs are no longer served.
+PDF_TEMPLATE_VERSION = "discharge-letterhead-v1"
+PDF_RENDER_TIMEOUT_SECONDS = 120
+
+_render_pool: Optional[ProcessPoolExecutor] = None
+_render_lock = threading.Lock()
+_inflight_renders: Dict[str, Future] = {}
+_prerender_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="report-prerender")
+
+
+def _get_render_pool() -> ProcessPoolExecutor:
+    global _render_pool
+    if _render_pool is None:
+        workers = int(os.getenv("REPORT_PDF_WORKERS", "0")) or min(2, os.cpu_count() or 1)
+        # Spawned, not forked: the server process holds logging and connection pool locks
+        # that a forked worker could inherit in a locked state. Workers unpickle
+        # render_pdf_file from pdf_render_worker, which imports only reportlab and the
+        # catalog counters; the server module skips its agent setup in them.
+        _render_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _render_pool
+
+
+def submit_pdf_render(cache_key: str, output_path: str, markdown_content: str,
+                      report_data: Dict[str, Any], reports_dir: str = None) -> Future:
+    """Schedule a render for ``cache_key``; concurrent requests share one in-flight render."""
+    global _render_pool
+    with _render_lock:
+        future = _inflight_renders.get(cache_key)
+        if future is not None:
+            return future
+        try:
+            future = _get_render_pool().submit(render_pdf_file, markdown_content, output_path,
+                                              report_data, reports_dir)
+        except (BrokenProcessPool, RuntimeError, OSError) as e:
+            # Pool unavailable (e.g. broken worker or restricted platform): render inline
+            print(f"⚠️ PDF render pool unavailable, rendering inline: {e}")
+            _render_pool = None
+            future = Future()
+            try:
+                future.set_result(render_pdf_file(markdown_content, output_path, report_data, reports_dir))
+            except Exception as render_error:
+                future.set_exception(render_error)
+            return future
+        _inflight_renders[cache_key] = future
+
+    def _done(_):
+        with _render_lock:
+            _inflight_renders.pop(cache_key, None)
+
+    future.add_done_callback(_done)
+    return future
+
+
+def _inflight_cache_keys() -> set:
+    with _render_lock:
+        return set(_inflight_renders)
+
+
+def _prerender_report(report_number: str) -> None:
+    manager = ReportManager()
+    try:
+        report_data = manager.get_report_by_number(report_number)
+        if report_data:
+            manager.render_pdf(report_data, wait=False)
+    except Exception as e:
+        print(f"⚠️ Background PDF pre-render failed for {report_number}: {e}")
+    finally:
+        manager.close()
 
 
-class ReportManager:
+class ReportManager(DischargePdfRenderer):
     """Manages discharge reports - storage, retrieval, and download."""
     
     def __init__(self):
@@ -46,6 +118,11 @@ class ReportManager:
         (self.reports_dir / "current").mkdir(exist_ok=True)
         (self.reports_dir / "archive").mkdir(exist_ok=True)
         (self.reports_dir / "downloads").mkdir(exist_ok=True)
+        self.pdf_cache_dir = self.reports_dir / "cache" / "pdf"
+        self.pdf_cache_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Indexed catalog of saved reports and storage counters
+        self.catalog = ReportCatalog(self.reports_dir)
     
     def save_report(self, report_data: Dict[str, Any], report_content: str) -> Dict[str, Any]:
         """
@@ -87,6 +164,19 @@ class ReportManager:
             with open(metadata_filepath, 'w', encoding='utf-8') as f:
                 json.dump(metadata, f, indent=2)
             
+            # Register in the catalog; without a catalog row the files would be invisible
+            try:
+                with self.catalog.transaction() as conn:
+                    self.catalog.add_report(conn, metadata, str(metadata_filepath),
+                                            metadata["file_size"] + os.path.getsize(metadata_filepath))
+            except Exception:
+                filepath.unlink(missing_ok=True)
+                metadata_filepath.unlink(missing_ok=True)
+                raise
+            
+            # Warm the PDF cache so the first download does not pay for rendering
+            _prerender_executor.submit(_prerender_report, report_number)
+            
             return {
                 "success": True,
                 "report_number": report_number,
@@ -147,35 +237,23 @@ class ReportManager:
                 report_data['content'] = self._generate_markdown_content(report_data)
                 return report_data
             
-            # Search in current reports first (file system fallback)
-            current_dir = self.reports_dir / "current"
-            for metadata_file in current_dir.glob(f"{report_number}_*_metadata.json"):
-                with open(metadata_file, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
-                
-                # Read the report content
+            # File system fallback: catalog lookup (current reports take precedence over archived)
+            metadata = self.catalog.find_report(report_number)
+            if metadata and metadata.get('bundle'):
+                # Archived into a monthly bundle: seek to the member and inflate just that report
+                bundle = metadata.pop('bundle')
+                metadata['content'] = read_bundle_member(
+                    bundle['bundle_path'], bundle['header_offset'], bundle['compressed_size'],
+                    bundle['compress_type'], bundle['crc']
+                ).decode('utf-8')
+                return metadata
+            if metadata:
                 report_filepath = Path(metadata['file_path'])
                 if report_filepath.exists():
                     with open(report_filepath, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    
-                    metadata['content'] = content
-                    metadata['source'] = "file_system"
-                    return metadata
-            
-            # Search in archive if not found in current
-            archive_dir = self.reports_dir / "archive"
-            for metadata_file in archive_dir.glob(f"{report_number}_*_metadata.json"):
-                with open(metadata_file, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
-                
-                report_filepath = Path(metadata['file_path'])
-                if report_filepath.exists():
-                    with open(report_filepath, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    
-                    metadata['content'] = content
-                    metadata['status'] = 'archived'
+                        metadata['content'] = f.read()
+                    if metadata['status'] == 'current':
+                        metadata['source'] = "file_system"
                     return metadata
             
             return None
@@ -311,45 +389,14 @@ class ReportManager:
         Returns:
             List of report metadata
         """
-        reports = []
-        
         try:
-            # Determine which directories to search
-            dirs_to_search = []
-            if status in ["all", "current"]:
-                dirs_to_search.append(self.reports_dir / "current")
-            if status in ["all", "archived"]:
-                dirs_to_search.append(self.reports_dir / "archive")
-            
-            for search_dir in dirs_to_search:
-                if not search_dir.exists():
-                    continue
-                    
-                for metadata_file in search_dir.glob("*_metadata.json"):
-                    with open(metadata_file, 'r', encoding='utf-8') as f:
-                        metadata = json.load(f)
-                    
-                    # Apply filters
-                    if patient_name and patient_name.lower() not in metadata.get('patient_name', '').lower():
-                        continue
-                    
-                    if from_date:
-                        report_date = datetime.fromisoformat(metadata['generated_at']).date()
-                        if report_date < datetime.strptime(from_date, '%Y-%m-%d').date():
-                            continue
-                    
-                    if to_date:
-                        report_date = datetime.fromisoformat(metadata['generated_at']).date()
-                        if report_date > datetime.strptime(to_date, '%Y-%m-%d').date():
-                            continue
-                    
-                    # Add status information
-                    metadata['status'] = 'archived' if 'archive' in str(search_dir) else 'current'
-                    reports.append(metadata)
-            
-            # Sort by generation date (newest first) and apply limit
-            reports.sort(key=lambda x: x['generated_at'], reverse=True)
-            return reports[:limit]
+            return self.catalog.list_reports(
+                status=status,
+                patient_name=patient_name,
+                from_date=from_date,
+                to_date=to_date,
+                limit=limit
+            )
             
         except Exception as e:
             print(f"Error listing reports: {e}")
@@ -386,6 +433,7 @@ class ReportManager:
                 
                 with open(download_path, 'w', encoding='utf-8') as f:
                     f.write(report_data['content'])
+                self.catalog.record_file("downloads", 1, os.path.getsize(download_path))
                 
                 return {
                     "success": True,
@@ -408,6 +456,7 @@ class ReportManager:
                     metadata_clean = {k: v for k, v in report_data.items() if k != 'content'}
                     zipf.writestr(f"{report_number}_metadata.json", 
                                 json.dumps(metadata_clean, indent=2))
+                self.catalog.record_file("downloads", 1, os.path.getsize(download_path))
                 
                 return {
                     "success": True,
@@ -418,20 +467,18 @@ class ReportManager:
                 }
             
             elif download_format == "pdf":
-                # Generate PDF from markdown content
-                download_filename = f"{report_number}_{timestamp}.pdf"
-                download_path = downloads_dir / download_filename
-                
-                # Convert markdown to PDF
-                pdf_success = self._generate_pdf(report_data['content'], str(download_path), report_data)
+                # Serve the cached render for this exact content, rendering on a miss
+                render = self.render_pdf(report_data)
                 
-                if pdf_success:
+                if render["success"]:
+                    download_path = Path(render["path"])
                     return {
                         "success": True,
                         "download_path": str(download_path),
-                        "filename": download_filename,
+                        "filename": f"{report_number}.pdf",
                         "format": "pdf",
-                        "file_size": os.path.getsize(download_path)
+                        "file_size": os.path.getsize(download_path),
+                        "cached": render["cached"]
                     }
                 else:
                     return {
@@ -454,57 +501,175 @@ class ReportManager:
                 "message": "Failed to prepare download"
             }
     
-    def archive_old_reports(self, days_old: int = 30) -> Dict[str, Any]:
+    def _pdf_cache_key(self, markdown_content: str) -> str:
+        """Hash of the template version and the exact content being rendered."""
+        digest = hashlib.sha256()
+        digest.update(PDF_TEMPLATE_VERSION.encode('utf-8'))
+        digest.update(b"\0")
+        digest.update(markdown_content.encode('utf-8'))
+        return digest.hexdigest()
+    
+    def render_pdf(self, report_data: Dict[str, Any], wait: bool = True) -> Dict[str, Any]:
+        """
+        Return the cached PDF for a report, rendering it in the process pool on a miss.
+        
+        Args:
+            report_data: Report data as returned by get_report_by_number
+            wait: Block until the render finishes (False just schedules it)
+            
+        Returns:
+            Dictionary with success flag, cache path and whether it was a cache hit
+        """
+        cache_key = self._pdf_cache_key(report_data['content'])
+        cache_path = self.pdf_cache_dir / f"{cache_key}.pdf"
+        
+        if cache_path.exists():
+            # Touch so cleanup_downloads evicts least recently used entries first
+            os.utime(cache_path, None)
+            return {"success": True, "path": str(cache_path), "cached": True}
+        
+        render_data = {k: v for k, v in report_data.items() if k != 'content'}
+        future = submit_pdf_render(cache_key, str(cache_path), report_data['content'], render_data,
+                                   str(self.reports_dir))
+        if not wait:
+            return {"success": True, "path": str(cache_path), "cached": False, "pending": True}
+        
+        try:
+            success = future.result(timeout=PDF_RENDER_TIMEOUT_SECONDS)
+        except Exception as e:
+            print(f"PDF generation error: {e}")
+            success = False
+        return {"success": bool(success) and cache_path.exists(), "path": str(cache_path), "cached": False}
+    
+    def archive_old_reports(self, days_old: int = 30, mode: str = "bundle") -> Dict[str, Any]:
         """
         Archive reports older than specified days.
         
         Args:
             days_old: Reports older than this many days will be archived
+            mode: "bundle" packs them into compressed monthly bundles (including
+                  loose files archived earlier); "files" moves individual files
+                  into the archive directory
             
         Returns:
             Archive operation result
         """
+        if mode == "bundle":
+            return self._archive_to_bundles(days_old)
+        
         try:
             cutoff_date = datetime.now() - timedelta(days=days_old)
             archived_count = 0
-            current_dir = self.reports_dir / "current"
             archive_dir = self.reports_dir / "archive"
             
-            for metadata_file in current_dir.glob("*_metadata.json"):
-                with open(metadata_file, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
+            # Candidates come from the catalog's generated_at index, not a directory scan
+            for entry in self.catalog.reports_older_than(cutoff_date):
+                metadata = entry['metadata']
+                metadata_file = Path(entry['metadata_path'])
+                report_filepath = Path(metadata['file_path'])
                 
-                report_date = datetime.fromisoformat(metadata['generated_at'])
+                if not report_filepath.exists():
+                    continue
                 
-                if report_date < cutoff_date:
-                    # Move both metadata and report files to archive
-                    report_filepath = Path(metadata['file_path'])
+                # File moves and the catalog update commit together; a failed
+                # move rolls back the catalog row for this report
+                with self.catalog.transaction() as conn:
+                    # Move report file
+                    archive_report_path = archive_dir / report_filepath.name
+                    shutil.move(str(report_filepath), str(archive_report_path))
+                    
+                    # Update metadata with new path
+                    metadata['file_path'] = str(archive_report_path)
+                    metadata['status'] = 'archived'
+                    metadata['archived_at'] = datetime.now().isoformat()
                     
-                    if report_filepath.exists():
-                        # Move report file
-                        archive_report_path = archive_dir / report_filepath.name
-                        shutil.move(str(report_filepath), str(archive_report_path))
+                    # Move metadata file
+                    archive_metadata_path = archive_dir / metadata_file.name
+                    with open(archive_metadata_path, 'w', encoding='utf-8') as f:
+                        json.dump(metadata, f, indent=2)
+                    
+                    # Remove original metadata file
+                    metadata_file.unlink(missing_ok=True)
+                    
+                    size = os.path.getsize(archive_report_path) + os.path.getsize(archive_metadata_path)
+                    self.catalog.move_report(conn, entry['file_name'], metadata, str(archive_metadata_path), size)
+                
+                archived_count += 1
+            
+            return {
+                "success": True,
+                "archived_count": archived_count,
+                "cutoff_date": cutoff_date.isoformat(),
+                "message": f"Archived {archived_count} reports older than {days_old} days"
+            }
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "message": "Failed to archive reports"
+            }
+    
+    def _archive_to_bundles(self, days_old: int) -> Dict[str, Any]:
+        """Pack reports older than the cutoff into per-month compressed bundles."""
+        try:
+            cutoff_date = datetime.now() - timedelta(days=days_old)
+            archive_dir = self.reports_dir / "archive"
+            
+            by_month: Dict[str, List[Dict[str, Any]]] = {}
+            for entry in self.catalog.unbundled_reports_older_than(cutoff_date):
+                month = entry['metadata']['generated_at'][:7]
+                by_month.setdefault(month, []).append(entry)
+            
+            archived_count = 0
+            bundles = []
+            for month, entries in sorted(by_month.items()):
+                bundle_path = bundle_path_for(archive_dir, month)
+                packed = []
+                
+                # The catalog write lock is held while appending, so concurrent
+                # archive runs cannot interleave members in the same bundle
+                with self.catalog.transaction() as conn:
+                    members = []
+                    for entry in entries:
+                        metadata = entry['metadata']
+                        report_filepath = Path(metadata['file_path'])
+                        if not report_filepath.exists():
+                            continue
+                        member_name = entry['file_name']
+                        metadata_member = f"{Path(member_name).stem}_metadata.json"
                         
-                        # Update metadata with new path
-                        metadata['file_path'] = str(archive_report_path)
                         metadata['status'] = 'archived'
                         metadata['archived_at'] = datetime.now().isoformat()
+                        metadata['file_path'] = f"{bundle_path}::{member_name}"
+                        metadata['archive_bundle'] = str(bundle_path)
+                        metadata['bundle_member'] = member_name
                         
-                        # Move metadata file
-                        archive_metadata_path = archive_dir / metadata_file.name
-                        with open(archive_metadata_path, 'w', encoding='utf-8') as f:
-                            json.dump(metadata, f, indent=2)
-                        
-                        # Remove original metadata file
-                        metadata_file.unlink()
-                        
-                        archived_count += 1
+                        members.append((member_name, report_filepath.read_bytes()))
+                        members.append((metadata_member, json.dumps(metadata, indent=2).encode('utf-8')))
+                        packed.append((entry, report_filepath, member_name, metadata_member))
+                    
+                    if not packed:
+                        continue
+                    written = append_to_bundle(bundle_path, members)
+                    for entry, _, member_name, metadata_member in packed:
+                        self.catalog.bundle_report(conn, entry['file_name'], entry['metadata'],
+                                                   written[member_name], written[metadata_member])
+                
+                # Loose files are removed only once the bundle and catalog are committed
+                for entry, report_filepath, _, _ in packed:
+                    report_filepath.unlink(missing_ok=True)
+                    Path(entry['metadata_path']).unlink(missing_ok=True)
+                
+                archived_count += len(packed)
+                bundles.append({"month": month, "bundle": str(bundle_path), "reports": len(packed)})
             
             return {
                 "success": True,
                 "archived_count": archived_count,
+                "bundles": bundles,
                 "cutoff_date": cutoff_date.isoformat(),
-                "message": f"Archived {archived_count} reports older than {days_old} days"
+                "message": f"Archived {archived_count} reports older than {days_old} days into {len(bundles)} monthly bundles"
             }
             
         except Exception as e:
@@ -514,12 +679,16 @@ class ReportManager:
                 "message": "Failed to archive reports"
             }
     
-    def cleanup_downloads(self, hours_old: int = 24) -> Dict[str, Any]:
+    def cleanup_downloads(self, hours_old: int = 24, cache_max_mb: float = 512) -> Dict[str, Any]:
         """
-        Clean up old download files.
+        Clean up old download files and trim the rendered PDF cache.
+        
+        Cached PDFs are touched on every hit, so they are evicted by last use
+        rather than creation time. Renders still in flight are never removed.
         
         Args:
-            hours_old: Delete download files older than this many hours
+            hours_old: Delete download files (and cached PDFs unused for) older than this many hours
+            cache_max_mb: Evict least recently used cached PDFs beyond this total size
             
         Returns:
             Cleanup operation result
@@ -527,21 +696,51 @@ class ReportManager:
         try:
             cutoff_time = datetime.now() - timedelta(hours=hours_old)
             cleaned_count = 0
+            cleaned_bytes = 0
             downloads_dir = self.reports_dir / "downloads"
             
             for download_file in downloads_dir.glob("*"):
                 if download_file.is_file():
-                    file_time = datetime.fromtimestamp(download_file.stat().st_mtime)
+                    stat = download_file.stat()
+                    file_time = datetime.fromtimestamp(stat.st_mtime)
                     
                     if file_time < cutoff_time:
                         download_file.unlink()
                         cleaned_count += 1
+                        cleaned_bytes += stat.st_size
+            if cleaned_count:
+                self.catalog.record_file("downloads", -cleaned_count, -cleaned_bytes)
+            
+            # Rendered PDF cache: drop stale entries, then trim to size by LRU
+            inflight = _inflight_cache_keys()
+            cache_entries = []
+            for cached_file in self.pdf_cache_dir.glob("*.pdf"):
+                if cached_file.stem in inflight:
+                    continue
+                stat = cached_file.stat()
+                cache_entries.append((stat.st_mtime, stat.st_size, cached_file))
+            cache_entries.sort()
+            
+            evicted_count = 0
+            cache_bytes = sum(size for _, size, _ in cache_entries)
+            max_bytes = cache_max_mb * 1024 * 1024
+            for mtime, size, cached_file in cache_entries:
+                if datetime.fromtimestamp(mtime) >= cutoff_time and cache_bytes <= max_bytes:
+                    break
+                cached_file.unlink(missing_ok=True)
+                cache_bytes -= size
+                evicted_count += 1
+            if evicted_count:
+                evicted_bytes = sum(size for _, size, _ in cache_entries[:evicted_count])
+                self.catalog.record_file("pdf_cache", -evicted_count, -evicted_bytes)
             
             return {
                 "success": True,
                 "cleaned_count": cleaned_count,
+                "cache_evicted_count": evicted_count,
+                "cache_size_mb": round(cache_bytes / (1024 * 1024), 2),
                 "cutoff_time": cutoff_time.isoformat(),
-                "message": f"Cleaned up {cleaned_count} download files older than {hours_old} hours"
+                "message": f"Cleaned up {cleaned_count} download files older than {hours_old} hours and evicted {evicted_count} cached PDFs"
             }
             
         except Exception as e:
@@ -561,36 +760,31 @@ class ReportManager:
                 "total_size_mb": 0,
                 "current_size_mb": 0,
                 "archived_size_mb": 0,
-                "downloads_size_mb": 0
+                "downloads_size_mb": 0,
+                "cached_pdfs": 0,
+                "pdf_cache_size_mb": 0
             }
             
-            # Count current reports
-            current_dir = self.reports_dir / "current"
-            if current_dir.exists():
-                stats["current_reports"] = len(list(current_dir.glob("*.md")))
-                for file in current_dir.glob("*"):
-                    stats["current_size_mb"] += file.stat().st_size / (1024 * 1024)
-            
-            # Count archived reports
-            archive_dir = self.reports_dir / "archive"
-            if archive_dir.exists():
-                stats["archived_reports"] = len(list(archive_dir.glob("*.md")))
-                for file in archive_dir.glob("*"):
-                    stats["archived_size_mb"] += file.stat().st_size / (1024 * 1024)
-            
-            # Count download files
-            downloads_dir = self.reports_dir / "downloads"
-            if downloads_dir.exists():
-                stats["download_files"] = len(list(downloads_dir.glob("*")))
-                for file in downloads_dir.glob("*"):
-                    stats["downloads_size_mb"] += file.stat().st_size / (1024 * 1024)
+            # Counters are maintained incrementally by the catalog, so this does not
+            # walk the report directories
+            counters = self.catalog.storage_counters()
+            mb = 1024 * 1024
+            stats["current_reports"] = counters["current"]["files"]
+            stats["current_size_mb"] = counters["current"]["bytes"] / mb
+            stats["archived_reports"] = counters["archived"]["files"]
+            stats["archived_size_mb"] = counters["archived"]["bytes"] / mb
+            stats["download_files"] = counters["downloads"]["files"]
+            stats["downloads_size_mb"] = counters["downloads"]["bytes"] / mb
+            stats["cached_pdfs"] = counters["pdf_cache"]["files"]
+            stats["pdf_cache_size_mb"] = counters["pdf_cache"]["bytes"] / mb
             
             stats["total_size_mb"] = (stats["current_size_mb"] + 
                                     stats["archived_size_mb"] + 
-                                    stats["downloads_size_mb"])
+                                    stats["downloads_size_mb"] +
+                                    stats["pdf_cache_size_mb"])
             
             # Round to 2 decimal places
-            for key in ["total_size_mb", "current_size_mb", "archived_size_mb", "downloads_size_mb"]:
+            for key in ["total_size_mb", "current_size_mb", "archived_size_mb", "downloads_size_mb", "pdf_cache_size_mb"]:
                 stats[key] = round(stats[key], 2)
             
             return {
@@ -605,444 +799,24 @@ class ReportManager:
                 "message": "Failed to get storage stats"
             }
     
-    def _generate_pdf(self, markdown_content: str, output_path: str, report_data: Dict[str, Any]) -> bool:
-        """
-        Generate a professional PDF from markdown content with letterhead and footer.
-        
-        Args:
-            markdown_content: The markdown content to convert
-            output_path: Path where PDF should be saved
-            report_data: Report metadata for enhanced formatting
-            
-        Returns:
-            True if successful, False otherwise
-        """
+    def rebuild_catalog(self) -> Dict[str, Any]:
+        """Re-index report files and recount storage (e.g. after manual file changes)."""
         try:
-            # Create PDF document with margins
-            doc = SimpleDocTemplate(
-                output_path, 
-                pagesize=A4,
-                topMargin=1*inch,
-                bottomMargin=1*inch,
-                leftMargin=0.8*inch,
-                rightMargin=0.8*inch
-            )
-            
-            styles = getSampleStyleSheet()
-            story = []
-            
-            # Add professional letterhead
-            story.extend(self._create_letterhead())
-            
-            # Custom styles
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=20,
-                spaceAfter=20,
-                spaceBefore=10,
-                textColor=colors.Color(0.1, 0.3, 0.6),  # Professional blue
-                alignment=1,  # Center alignment
-                fontName='Helvetica-Bold'
-            )
-            
-            heading_style = ParagraphStyle(
-                'CustomHeading',
-                parent=styles['Heading2'],
-                fontSize=14,
-                spaceAfter=12,
-                spaceBefore=15,
-                textColor=colors.Color(0.1, 0.3, 0.6),
-                fontName='Helvetica-Bold',
-                borderWidth=1,
-                borderColor=colors.Color(0.8, 0.8, 0.9),
-                borderPadding=8,
-                backColor=colors.Color(0.95, 0.95, 0.98)
-            )
-            
-            normal_style = ParagraphStyle(
-                'CustomNormal',
-                parent=styles['Normal'],
-                fontSize=11,
-                spaceAfter=6,
-                leading=14,
-                fontName='Helvetica'
-            )
-            
-            field_style = ParagraphStyle(
-                'FieldStyle',
-                parent=styles['Normal'],
-                fontSize=10,
-                spaceAfter=4,
-                leading=12,
-                leftIndent=20,
-                fontName='Helvetica'
-            )
-            
-            # Parse markdown content into sections
-            lines = markdown_content.strip().split('\n')
-            current_paragraph = []
-            in_list = False
-            
-            for line in lines:
-                line = line.strip()
-                
-                if not line:
-                    if current_paragraph:
-                        formatted_text = self._format_text(' '.join(current_paragraph))
-                        story.append(Paragraph(formatted_text, normal_style))
-                        current_paragraph = []
-                    if not in_list:
-                        story.append(Spacer(1, 8))
-                    continue
-                
-                # Handle main title
-                if line.startswith('# '):
-                    if current_paragraph:
-                        formatted_text = self._format_text(' '.join(current_paragraph))
-                        story.append(Paragraph(formatted_text, normal_style))
-                        current_paragraph = []
-                    title_text = self._clean_formatting(line[2:])
-                    story.append(Paragraph(title_text, title_style))
-                    story.append(Spacer(1, 15))
-                    in_list = False
-                    
-                elif line.startswith('## '):
-                    if current_paragraph:
-                        formatted_text = self._format_text(' '.join(current_paragraph))
-                        story.append(Paragraph(formatted_text, normal_style))
-                        current_paragraph = []
-                    heading_text = self._clean_formatting(line[3:])
-                    story.append(Paragraph(heading_text, heading_style))
-                    story.append(Spacer(1, 10))
-                    in_list = False
-                    
-                elif line.startswith('### '):
-                    if current_paragraph:
-                        formatted_text = self._format_text(' '.join(current_paragraph))
-                        story.append(Paragraph(formatted_text, normal_style))
-                        current_paragraph = []
-                    subheading_text = self._clean_formatting(line[4:])
-                    subheading_style = ParagraphStyle(
-                        'SubHeading',
-                        parent=normal_style,
-                        fontSize=12,
-                        fontName='Helvetica-Bold',
-                        spaceAfter=8,
-                        spaceBefore=12,
-                        textColor=colors.Color(0.2, 0.2, 0.2)
-                    )
-                    story.append(Paragraph(subheading_text, subheading_style))
-                    story.append(Spacer(1, 6))
-                    in_list = False
-                    
-                elif line.startswith('- ') or line.startswith('* '):
-                    # Bullet points - handle field formatting
-                    if current_paragraph:
-                        formatted_text = self._format_text(' '.join(current_paragraph))
-                        story.append(Paragraph(formatted_text, normal_style))
-                        current_paragraph = []
-                    
-                    bullet_text = line[2:] if line.startswith('- ') else line[2:]
-                    formatted_bullet = self._format_field(bullet_text)
-                    story.append(Paragraph(f"• {formatted_bullet}", field_style))
-                    in_list = True
-                    
-                elif line.startswith('---'):
-                    # Separator line
-                    if current_paragraph:
-                        formatted_text = self._format_text(' '.join(current_paragraph))
-                        story.append(Paragraph(formatted_text, normal_style))
-                        current_paragraph = []
-                    story.append(Spacer(1, 15))
-                    in_list = False
-                    
-                else:
-                    # Regular content - clean all formatting
-                    cleaned_line = self._clean_formatting(line)
-                    if cleaned_line:  # Only add non-empty lines
-                        current_paragraph.append(cleaned_line)
-                    in_list = False
-            
-            # Add any remaining paragraph
-            if current_paragraph:
-                formatted_text = self._format_text(' '.join(current_paragraph))
-                story.append(Paragraph(formatted_text, normal_style))
-            
-            # Add professional footer
-            story.extend(self._create_footer(report_data))
-            
-            # Build PDF
-            doc.build(story)
-            return True
-            
+            counts = self.catalog.rebuild()
+            return {"success": True, "counts": counts, "message": "Report catalog rebuilt"}
         except Exception as e:
-            print(f"PDF generation error: {e}")
-            return False
+            return {"success": False, "error": str(e), "message": "Failed to rebuild report catalog"}
     
-    def _create_letterhead(self):
-        """Create professional letterhead with real logo image."""
-        elements = []
-        
-        # Create a table for the header with logo and hospital info
-        from reportlab.platypus import Table, TableStyle, Image
-        from reportlab.lib.colors import Color
-        import os
-        
-        # Define colors to match the healthcare logo design
-        logo_blue = Color(0.0, 0.4, 0.8)        # Primary logo blue
-        dark_blue = Color(0.15, 0.25, 0.55)     # Dark navy for hospital name
-        light_blue = Color(0.4, 0.75, 0.9)      # Light blue accent  
-        gray_text = Color(0.4, 0.4, 0.4)        # Professional gray for contact info
-        
-        # Load the real healthcare logo
-        logo_path = os.path.join("reports", "discharge", "archive", "image.png")
-        try:
-            # Create logo image with proper sizing
-            logo_img = Image(logo_path, width=0.7*inch, height=0.7*inch)
-        except Exception as e:
-            print(f"Could not load logo image: {e}")
-            # Fallback to text logo if image fails
-            logo_img = "◉\n♡"
-        
-        # Header content with real logo - three columns layout
-        header_data = [
-            # Single row: Logo, Hospital Name + Subtitle, Address + Contact Info
-            [logo_img, "GENERAL HOSPITAL\nHealth Care", "123 Healthcare Ave., Medical City, MC 12345\n+123-456-7890\nhello@metrohospital.com\nwww.metrohospital.com"]
-        ]
-        
-        # Create the main header table with better proportions for three columns
-        header_table = Table(header_data, colWidths=[0.8*inch, 3.2*inch, 2.6*inch])
-        
-        header_table.setStyle(TableStyle([
-            # Logo styling - center the image (Column 1)
-            ('ALIGN', (0, 0), (0, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (0, -1), 'MIDDLE'),
-            
-            # Hospital name + subtitle styling (Column 2)
-            ('FONTNAME', (1, 0), (1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (1, 0), (1, 0), 16),
-            ('TEXTCOLOR', (1, 0), (1, 0), dark_blue),
-            ('ALIGN', (1, 0), (1, 0), 'LEFT'),
-            ('VALIGN', (1, 0), (1, 0), 'MIDDLE'),
-            ('LEADING', (1, 0), (1, 0), 18),  # Line spacing between hospital name and subtitle
-            
-            # Address + contact info styling (Column 3)
-            ('FONTNAME', (2, 0), (2, 0), 'Helvetica'),
-            ('FONTSIZE', (2, 0), (2, 0), 8),
-            ('TEXTCOLOR', (2, 0), (2, 0), gray_text),
-            ('ALIGN', (2, 0), (2, 0), 'RIGHT'),
-            ('VALIGN', (2, 0), (2, 0), 'TOP'),
-            ('LEADING', (2, 0), (2, 0), 10),  # Tight line spacing for contact info
-            
-            # Clean spacing - no borders, reduced padding
-            ('GRID', (0, 0), (-1, -1), 0, colors.white),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('LEFTPADDING', (0, 0), (-1, -1), 5),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 5),
-        ]))
-        
-        elements.append(header_table)
-        elements.append(Spacer(1, 10))  # Reduced spacing after header
-        
-        # Professional accent line
-        line_data = [["", ""]]
-        accent_line_table = Table(line_data, colWidths=[4.0*inch, 2.6*inch])
-        accent_line_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, 0), light_blue),
-            ('BACKGROUND', (1, 0), (1, 0), dark_blue),
-            ('GRID', (0, 0), (-1, -1), 0, colors.white),
-            ('TOPPADDING', (0, 0), (-1, -1), 3),  # Reduced padding
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),  # Reduced padding
-        ]))
-        
-        elements.append(accent_line_table)
-        # Reduced spacing to prevent overlapping but keep content closer
-        elements.append(Spacer(1, 25))  
-        
-        return elements
-    
-    def _create_footer(self, report_data: Dict[str, Any]):
-        """Create professional footer  template."""
-        elements = []
-        
-        # Add minimal space before footer to save space
-        elements.append(Spacer(1, 15))  # Reduced from 30
-        
-        # Create a signature area with professional layout
-        from reportlab.platypus import Table, TableStyle, Image
-        from reportlab.lib.colors import Color
-        import os
-        
-        # Define colors for footer
-        dark_blue = Color(0.15, 0.25, 0.55)
-        gray_text = Color(0.4, 0.4, 0.4)
-        light_gray = Color(0.8, 0.8, 0.8)
-        
-        # Create a more compact signature area
-        signature_data = [
-            ["Discharge authorized by:", ""],
-            ["", ""],
-            ["Dr. _________________________________", "Date: ____________________"],
-            ["Attending Physician", ""],
-            ["Signature: _____________________________", ""]
-        ]
-        
-        signature_table = Table(signature_data, colWidths=[4*inch, 2*inch])
-        signature_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('VALIGN', (0, 0), (-1, -1), 'BOTTOM'),
-            ('GRID', (0, 0), (-1, -1), 0, colors.white),
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),  # Reduced padding
-            ('TOPPADDING', (0, 0), (-1, -1), 3),     # Reduced padding
-        ]))
-        
-        elements.append(signature_table)
-        elements.append(Spacer(1, 20))  # Reduced spacing
-        
-        # Professional footer separator line (like DAYA template)
-        footer_line_data = [["", ""]]
-        footer_line_table = Table(footer_line_data, colWidths=[6.5*inch])
-        footer_line_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), light_gray),
-            ('GRID', (0, 0), (-1, -1), 0, colors.white),
-            ('TOPPADDING', (0, 0), (-1, -1), 2),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-        ]))
-        
-        elements.append(footer_line_table)
-        elements.append(Spacer(1, 5))  # Reduced from 10
-        
-        # Footer with logo and contact information - smaller logo for compactness
-        logo_path = os.path.join("reports", "discharge", "archive", "image.png")
-        try:
-            # Create smaller logo for footer to save space
-            footer_logo = Image(logo_path, width=0.3*inch, height=0.3*inch)  # Reduced from 0.4
-        except Exception as e:
-            print(f"Could not load footer logo: {e}")
-            footer_logo = "◉"
-        
-        # Footer content matching DAYA template layout
-        generation_time = datetime.now().strftime('%B %d, %Y at %I:%M %p')
-        
-        # Compact footer content without "DAYA" and reduced gaps
-        footer_data = [
-            # Row 1: All contact info in one line, hospital name, and logo
-            ["Viyyur, Thrissur | 0487 3501000, 0487 2475100\nEmergency Hotline: 0487 2323000\nwww.dayageneralhospital.com", "GENERAL HOSPITAL", footer_logo],
-            # Row 2: Centered document information
-            ["This is an official medical document. Please retain for your records.", "", ""],
-            ["General Hospital - Patient Discharge Summary", "", ""]
-        ]
-        
-        footer_table = Table(footer_data, colWidths=[3.5*inch, 2.0*inch, 1.0*inch])
-        footer_table.setStyle(TableStyle([
-            # Contact info styling (left column) - compact with no gaps between lines
-            ('FONTNAME', (0, 0), (0, 0), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (0, 0), 8),
-            ('TEXTCOLOR', (0, 0), (0, 0), gray_text),
-            ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-            ('VALIGN', (0, 0), (0, 0), 'TOP'),
-            ('LEADING', (0, 0), (0, 0), 9),  # Tight line spacing for contact info
-            
-            # Hospital name styling (middle column) - reduced size
-            ('FONTNAME', (1, 0), (1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (1, 0), (1, 0), 11),  # Reduced from 12
-            ('TEXTCOLOR', (1, 0), (1, 0), dark_blue),
-            ('ALIGN', (1, 0), (1, 0), 'CENTER'),
-            ('VALIGN', (1, 0), (1, 0), 'MIDDLE'),
-            
-            # Logo styling (right column)
-            ('ALIGN', (2, 0), (2, 0), 'CENTER'),
-            ('VALIGN', (2, 0), (2, 0), 'MIDDLE'),
-            
-            # Document metadata styling (rows 2-3) - centered across all columns
-            ('FONTNAME', (0, 1), (0, 2), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (0, 2), 8),  # Smaller font size
-            ('TEXTCOLOR', (0, 1), (0, 2), Color(0.5, 0.5, 0.5)),
-            ('ALIGN', (0, 1), (2, 2), 'CENTER'),  # Center across all 3 columns
-            ('VALIGN', (0, 1), (0, 2), 'MIDDLE'),
-            ('SPAN', (0, 1), (2, 1)),  # Span first metadata line across all columns
-            ('SPAN', (0, 2), (2, 2)),  # Span second metadata line across all columns
-            
-            # Minimal borders and very compact padding
-            ('GRID', (0, 0), (-1, -1), 0, colors.white),
-            ('TOPPADDING', (0, 0), (-1, -1), 3),     # Very compact
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-            ('LEFTPADDING', (0, 0), (-1, -1), 3),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 3),
-            
-            # Minimal extra spacing for metadata rows
-            ('TOPPADDING', (0, 1), (2, 2), 6),  # Reduced from 15
-            ('BOTTOMPADDING', (0, 1), (2, 2), 3), # Reduced from 10
-        ]))
-        
-        elements.append(footer_table)
-        
-        return elements
-    
-    def _clean_formatting(self, text: str) -> str:
-        """Remove ALL markdown formatting marks but preserve the text."""
-        if not text:
-            return ""
-        
-        # Remove ** formatting (multiple passes to catch nested cases)
-        text = re.sub(r'\*\*([^*]*?)\*\*', r'\1', text)
-        text = re.sub(r'\*\*([^*]*)', r'\1', text)  # Handle cases where ** is at start
-        text = re.sub(r'([^*]*)\*\*', r'\1', text)  # Handle cases where ** is at end
-        text = text.replace('**', '')  # Remove any remaining **
-        
-        # Remove single * formatting
-        text = re.sub(r'(?<!\*)\*([^*]+)\*(?!\*)', r'\1', text)
-        text = text.replace('*', '')  # Remove any remaining *
-        
-        # Remove ### formatting
-        text = re.sub(r'###\s*', '', text)
-        
-        return text.strip()
-    
-    def _format_text(self, text: str) -> str:
-        """Format text for PDF, converting markdown to HTML-like tags and removing all ** marks."""
-        if not text:
-            return ""
-        
-        # First, convert **text** to bold HTML tags
-        text = re.sub(r'\*\*([^*]+?)\*\*', r'<b>\1</b>', text)
-        
-        # Remove any remaining ** that weren't converted
-        text = text.replace('**', '')
-        
-        # Convert *text* to italic (but not ** cases)
-        text = re.sub(r'(?<!\*)\*([^*]+)\*(?!\*)', r'<i>\1</i>', text)
-        
-        # Remove any remaining single *
-        text = text.replace('*', '')
-        
-        return text
-    
-    def _format_field(self, text: str) -> str:
-        """Format field entries (like Name: John Doe) with better styling."""
-        if not text:
-            return ""
-        
-        # Handle field: value patterns
-        if ':' in text:
-            parts = text.split(':', 1)
-            if len(parts) == 2:
-                field_name = self._clean_formatting(parts[0].strip())
-                field_value = self._clean_formatting(parts[1].strip())
-                return f"<b>{field_name}:</b> {field_value}"
-        
-        # Clean any remaining formatting
-        return self._clean_formatting(text)
+    def close(self):
+        """Close the database session and catalog connection."""
+        if hasattr(self, 'session'):
+            self.session.close()
+        if hasattr(self, 'catalog'):
+            self.catalog.close()
     
     def __del__(self):
         """Close database session when object is destroyed."""
-        if hasattr(self, 'session'):
-            self.session.close()
+        self.close()
 
 
 # Convenience functions for easy integration
@@ -0,0 +1,414 @@
+"""
+Hospital Search Service
+=======================
+
+Indexed fuzzy lookup for patients and staff:
+- Trigram (pg_trgm) similarity search over normalized name, phone and email columns
+- Ranked results (best match first) instead of unordered ILIKE scans
+- Batch name resolution that resolves many names in a single round trip
+- In-process prefix index for patient numbers and employee IDs
+
+The normalized columns (``search_name``, ``phone_normalized``) are generated by
+PostgreSQL, so rows written through bulk upload or raw SQL stay searchable.
+Run ``python migrate_database.py --incremental`` to add them to an existing database.
+"""
+
+import bisect
+import re
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, text
+from sqlalchemy.orm import Session
+
+from database import SEARCH_NAME_SQL, Patient, SessionLocal, Staff
+
+
+DEFAULT_SIMILARITY_THRESHOLD = 0.3
+PREFIX_INDEX_TTL_SECONDS = 300
+
+
+def normalize_name(value: Optional[str]) -> str:
+    """Lowercase a name and collapse whitespace, matching ``search_name`` (``database.SEARCH_NAME_SQL``)."""
+    if not value:
+        return ""
+    cleaned = re.sub(r"[^\w\s'.-]", " ", value.lower())
+    return " ".join(cleaned.split())
+
+
+def normalize_phone(value: Optional[str]) -> str:
+    """Strip everything except digits, matching ``phone_normalized``."""
+    if not value:
+        return ""
+    return re.sub(r"\D", "", value)
+
+
+def _like_escape(value: str) -> str:
+    """Escape LIKE wildcards in user input."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class PrefixIndex:
+    """Sorted in-memory index supporting exact and prefix lookups.
+
+    Keys are stored upper-cased in a sorted list so a prefix lookup is a
+    binary search followed by a short forward scan.
+    """
+
+    def __init__(self):
+        self._keys: List[str] = []
+        self._values: Dict[str, str] = {}
+        self._lock = threading.RLock()
+        self.loaded_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def rebuild(self, pairs: Iterable[Tuple[str, str]]):
+        """Replace the index contents with (key, value) pairs."""
+        values = {key.upper(): value for key, value in pairs if key}
+        keys = sorted(values)
+        with self._lock:
+            self._values = values
+            self._keys = keys
+            self.loaded_at = time.monotonic()
+
+    def add(self, key: str, value: str):
+        """Insert or replace a single key."""
+        if not key:
+            return
+        key = key.upper()
+        with self._lock:
+            if key not in self._values:
+                bisect.insort(self._keys, key)
+            self._values[key] = value
+
+    def remove(self, key: str):
+        """Remove a key if present."""
+        if not key:
+            return
+        key = key.upper()
+        with self._lock:
+            if key in self._values:
+                del self._values[key]
+                position = bisect.bisect_left(self._keys, key)
+                if position < len(self._keys) and self._keys[position] == key:
+                    self._keys.pop(position)
+
+    def get(self, key: str) -> Optional[str]:
+        """Exact lookup."""
+        if not key:
+            return None
+        return self._values.get(key.upper())
+
+    def lookup(self, prefix: str, limit: int = 10) -> List[Tuple[str, str]]:
+        """Return up to ``limit`` (key, value) pairs whose key starts with ``prefix``."""
+        prefix = (prefix or "").upper()
+        with self._lock:
+            position = bisect.bisect_left(self._keys, prefix)
+            matches = []
+            while position < len(self._keys) and len(matches) < limit:
+                key = self._keys[position]
+                if not key.startswith(prefix):
+                    break
+                matches.append((key, self._values[key]))
+                position += 1
+        return matches
+
+    def is_stale(self, ttl_seconds: int = PREFIX_INDEX_TTL_SECONDS) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > ttl_seconds
+
+
+class HospitalSearchService:
+    """Ranked patient/staff search backed by trigram GIN indexes."""
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self.patient_numbers = PrefixIndex()
+        self.employee_ids = PrefixIndex()
+
+    # ------------------------------------------------------------------
+    # Patient search
+    # ------------------------------------------------------------------
+
+    def _set_thresholds(self, db: Session, min_similarity: float):
+        """Apply the similarity threshold used by the %/<% operators to this transaction."""
+        db.execute(
+            text("SELECT set_config('pg_trgm.similarity_threshold', :t, true), "
+                 "set_config('pg_trgm.word_similarity_threshold', :t, true)"),
+            {"t": str(min_similarity)}
+        )
+
+    def search_patients(self, db: Session, patient_number: str = None, first_name: str = None,
+                        last_name: str = None, phone: str = None, email: str = None,
+                        status: str = None, limit: int = 50,
+                        min_similarity: float = DEFAULT_SIMILARITY_THRESHOLD) -> List[Tuple[Patient, float]]:
+        """Search patients and return (patient, score) pairs, best match first.
+
+        Every supplied criterion must match (as with the previous ILIKE search),
+        but matches are fuzzy and ranked by trigram similarity.
+        """
+        self._set_thresholds(db, min_similarity)
+
+        filters = []
+        score_terms = []
+
+        name_term = normalize_name(" ".join(part for part in (first_name, last_name) if part))
+        if name_term:
+            contains = Patient.search_name.like(f"%{_like_escape(name_term)}%")
+            filters.append(or_(Patient.search_name.op("%>")(name_term), contains))
+            score_terms.append(func.word_similarity(name_term, Patient.search_name))
+
+        if patient_number:
+            number = patient_number.strip().upper()
+            filters.append(Patient.patient_number.ilike(f"%{_like_escape(number)}%"))
+            score_terms.append(func.similarity(Patient.patient_number, number))
+
+        digits = normalize_phone(phone)
+        if digits:
+            filters.append(Patient.phone_normalized.like(f"%{digits}%"))
+            score_terms.append(func.similarity(Patient.phone_normalized, digits))
+
+        if email:
+            email_term = email.strip().lower()
+            filters.append(Patient.email.ilike(f"%{_like_escape(email_term)}%"))
+            score_terms.append(func.similarity(func.lower(Patient.email), email_term))
+
+        query = db.query(Patient)
+        if status and status != "all":
+            query = query.filter(Patient.status == status)
+
+        if not score_terms:
+            patients = query.order_by(Patient.created_at.desc()).limit(limit).all()
+            return [(patient, 0.0) for patient in patients]
+
+        score = score_terms[0]
+        for term in score_terms[1:]:
+            score = score + term
+        score = (score / len(score_terms)).label("match_score")
+
+        rows = (
+            query.add_columns(score)
+            .filter(and_(*filters))
+            .order_by(score.desc(), Patient.created_at.desc())
+            .limit(limit)
+            .all()
+        )
+        return [(patient, float(match_score or 0)) for patient, match_score in rows]
+
+    def find_patient_by_name(self, db: Session, patient_name: str,
+                             min_similarity: float = DEFAULT_SIMILARITY_THRESHOLD) -> Optional[Patient]:
+        """Return the best-ranked patient for a free-text name, or None."""
+        resolved = self.resolve_patient_names(db, [patient_name], min_similarity=min_similarity)
+        match = resolved.get(patient_name)
+        if not match:
+            return None
+        return db.query(Patient).filter(Patient.id == match["id"]).first()
+
+    # ------------------------------------------------------------------
+    # Batch resolution (one round trip for many names)
+    # ------------------------------------------------------------------
+
+    def resolve_patient_names(self, db: Session, names: List[str],
+                              min_similarity: float = DEFAULT_SIMILARITY_THRESHOLD) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Resolve many patient names to their best match in a single query.
+
+        Returns a mapping of each input name to a dict describing the best
+        match (or None when nothing is similar enough).
+        """
+        terms = [normalize_name(name) for name in names]
+        results: Dict[str, Optional[Dict[str, Any]]] = {name: None for name in names}
+        if not any(terms):
+            return results
+
+        self._set_thresholds(db, min_similarity)
+        rows = db.execute(text("""
+            SELECT q.ord, m.id, m.patient_number, m.first_name, m.last_name, m.status, m.score
+            FROM unnest(CAST(:terms AS text[])) WITH ORDINALITY AS q(term, ord)
+            LEFT JOIN LATERAL (
+                SELECT p.id, p.patient_number, p.first_name, p.last_name, p.status,
+                       word_similarity(q.term, p.search_name) AS score
+                FROM patients p
+                WHERE q.term <> '' AND q.term <% p.search_name
+                ORDER BY score DESC, (p.status = 'active') DESC, p.created_at DESC
+                LIMIT 1
+            ) m ON true
+            ORDER BY q.ord
+        """), {"terms": terms}).fetchall()
+
+        for row in rows:
+            if row.id is None:
+                continue
+            results[names[row.ord - 1]] = {
+                "id": str(row.id),
+                "patient_number": row.patient_number,
+                "name": f"{row.first_name} {row.last_name}",
+                "status": row.status,
+                "match_score": float(row.score),
+            }
+        return results
+
+    def resolve_staff_names(self, db: Session, names: List[str], active_only: bool = True,
+                            min_similarity: float = DEFAULT_SIMILARITY_THRESHOLD) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Resolve many staff names (first, last or full) to staff records in a single query."""
+        terms = [normalize_name(name) for name in names]
+        results: Dict[str, Optional[Dict[str, Any]]] = {name: None for name in names}
+        if not any(terms):
+            return results
+
+        self._set_thresholds(db, min_similarity)
+        rows = db.execute(text("""
+            SELECT q.ord, m.staff_id, m.employee_id, m.first_name, m.last_name, m.email, m.score
+            FROM unnest(CAST(:terms AS text[])) WITH ORDINALITY AS q(term, ord)
+            LEFT JOIN LATERAL (
+                SELECT s.id AS staff_id, s.employee_id, u.first_name, u.last_name, u.email,
+                       word_similarity(q.term, u.search_name) AS score
+                FROM users u
+                JOIN staff s ON s.user_id = u.id
+                WHERE q.term <> '' AND q.term <% u.search_name
+                  AND (NOT :active_only OR s.status = 'active')
+                ORDER BY score DESC, u.last_name
+                LIMIT 1
+            ) m ON true
+            ORDER BY q.ord
+        """), {"terms": terms, "active_only": active_only}).fetchall()
+
+        for row in rows:
+            if row.staff_id is None:
+                continue
+            results[names[row.ord - 1]] = {
+                "staff_id": str(row.staff_id),
+                "employee_id": row.employee_id,
+                "name": f"{row.first_name} {row.last_name}",
+                "email": row.email,
+                "match_score": float(row.score),
+            }
+        return results
+
+    # ------------------------------------------------------------------
+    # Prefix indexes for identifiers
+    # ------------------------------------------------------------------
+
+    def refresh_prefix_indexes(self, db: Session = None):
+        """Reload patient numbers and employee IDs from the database."""
+        own_session = db is None
+        db = db or self.session_factory()
+        try:
+            self.patient_numbers.rebuild(
+                (number, str(patient_id))
+                for number, patient_id in db.query(Patient.patient_number, Patient.id)
+            )
+            self.employee_ids.rebuild(
+                (employee_id, str(staff_id))
+                for employee_id, staff_id in db.query(Staff.employee_id, Staff.id)
+            )
+        finally:
+            if own_session:
+                db.close()
+
+    def _ensure_prefix_indexes(self):
+        if self.patient_numbers.is_stale() or self.employee_ids.is_stale():
+            self.refresh_prefix_indexes()
+
+    def lookup_patient_numbers(self, prefix: str, limit: int = 10) -> List[Dict[str, str]]:
+        """Autocomplete patient numbers from the in-process prefix index."""
+        self._ensure_prefix_indexes()
+        return [{"patient_number": key, "id": value}
+                for key, value in self.patient_numbers.lookup(prefix, limit)]
+
+    def lookup_employee_ids(self, prefix: str, limit: int = 10) -> List[Dict[str, str]]:
+        """Autocomplete employee IDs from the in-process prefix index."""
+        self._ensure_prefix_indexes()
+        return [{"employee_id": key, "id": value}
+                for key, value in self.employee_ids.lookup(prefix, limit)]
+
+
+# Shared instance used by agents and tools
+search_service = HospitalSearchService()
+
+
+def run_benchmark(patient_count: int = 100_000, iterations: int = 200):
+    """Benchmark the prefix index and trigram search at ``patient_count`` patients.
+
+    The database part seeds a TEMP table so no real patient data is touched.
+    """
+    import random
+
+    print(f"🧪 Search benchmark with {patient_count:,} patients")
+    print("=" * 50)
+
+    numbers = [f"P{100000 + i}" for i in range(patient_count)]
+    index = PrefixIndex()
+    started = time.perf_counter()
+    index.rebuild((number, str(i)) for i, number in enumerate(numbers))
+    print(f"Prefix index build: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    probes = [random.choice(numbers)[:5] for _ in range(iterations)]
+    started = time.perf_counter()
+    for probe in probes:
+        index.lookup(probe, 10)
+    indexed_us = (time.perf_counter() - started) / iterations * 1_000_000
+
+    started = time.perf_counter()
+    for probe in probes:
+        [n for n in numbers if n.startswith(probe)][:10]
+    scan_us = (time.perf_counter() - started) / iterations * 1_000_000
+    print(f"Prefix lookup: {indexed_us:.1f} µs indexed vs {scan_us:.1f} µs linear scan")
+
+    db = SessionLocal()
+    try:
+        db.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        db.execute(text(f"""
+            CREATE TEMP TABLE bench_patients (
+                id serial PRIMARY KEY,
+                first_name varchar(50) NOT NULL,
+                last_name varchar(50) NOT NULL,
+                search_name text GENERATED ALWAYS AS ({SEARCH_NAME_SQL}) STORED
+            ) ON COMMIT DROP
+        """))
+        db.execute(text("""
+            INSERT INTO bench_patients (first_name, last_name)
+            SELECT (ARRAY['John','Jane','Michael','Sarah','David','Emily','Robert','Lisa','Shamil','Nazif'])[1 + i % 10]
+                       || substr(md5(i::text), 1, 3),
+                   (ARRAY['Smith','Johnson','Williams','Brown','Jones','Garcia','Miller','Davis'])[1 + i % 8]
+                       || substr(md5((i * 7)::text), 1, 4)
+            FROM generate_series(1, :n) AS i
+        """), {"n": patient_count})
+        db.execute(text("ANALYZE bench_patients"))
+        sample = [row[0] for row in db.execute(
+            text("SELECT search_name FROM bench_patients ORDER BY random() LIMIT 20")).fetchall()]
+
+        def timed(sql: str) -> float:
+            started = time.perf_counter()
+            for term in sample:
+                db.execute(text(sql), {"term": term, "like": f"%{term}%"}).fetchall()
+            return (time.perf_counter() - started) / len(sample) * 1000
+
+        ilike_ms = timed("SELECT id FROM bench_patients "
+                         "WHERE first_name || ' ' || last_name ILIKE :like")
+        db.execute(text("CREATE INDEX ON bench_patients USING gin (search_name gin_trgm_ops)"))
+        db.execute(text("ANALYZE bench_patients"))
+        trigram_ms = timed("SELECT id, word_similarity(:term, search_name) AS score FROM bench_patients "
+                           "WHERE :term <% search_name ORDER BY score DESC LIMIT 20")
+        print(f"Name search: {ilike_ms:.2f} ms ILIKE scan vs {trigram_ms:.2f} ms trigram GIN (ranked)")
+
+        started = time.perf_counter()
+        db.execute(text("""
+            SELECT q.ord, m.id FROM unnest(CAST(:terms AS text[])) WITH ORDINALITY AS q(term, ord)
+            LEFT JOIN LATERAL (
+                SELECT id FROM bench_patients WHERE q.term <% search_name
+                ORDER BY word_similarity(q.term, search_name) DESC LIMIT 1
+            ) m ON true
+        """), {"terms": sample}).fetchall()
+        print(f"Batch resolve of {len(sample)} names: {(time.perf_counter() - started) * 1000:.2f} ms (1 round trip)")
+        db.rollback()
+    except Exception as e:
+        print(f"⚠️ Database benchmark skipped: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    run_benchmark()
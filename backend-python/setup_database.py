@@ -6,6 +6,7 @@ import uuid
 import random
 from datetime import datetime, date, timedelta
 from decimal import Decimal
+from sqlalchemy import text
 
 # Add the current directory to the Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -1091,6 +1092,25 @@ def main():
     except Exception as e:
         print(f"❌ Error creating sample data: {e}")
     
+    # Ensure hot-path indexes (idempotent; create_all normally creates them already)
+    print("4. Ensuring hot-path indexes...")
+    try:
+        from migrate_database import apply_migration_steps, hot_path_index_steps
+        apply_migration_steps(hot_path_index_steps(), "hot-path indexes")
+        hot_tables = ["beds", "patients", "patient_supply_usage", "inventory_transactions",
+                          "bed_turnovers", "patient_queue", "extracted_medical_data", "agent_interactions"]
+        db = SessionLocal()
+        for table in hot_tables:
+            db.execute(text(f"ANALYZE {table}"))
+        db.commit()
+        db.close()
+        if "--index-report" in sys.argv:
+            # Dry run: print uncovered index proposals for the freshly seeded data
+            from index_advisor import main as run_index_advisor
+            run_index_advisor(apply=False)
+    except Exception as e:
+        print(f"⚠️ Could not ensure hot-path indexes: {e}")
+    
     print("\n🎉 Database setup completed successfully!")
 
 if __name__ == "__main__":
@@ -0,0 +1,158 @@
+"""
+Staff Assignment Service
+========================
+
+Load-balanced clinician assignment for admissions and scheduling:
+- A clinician's workload is their number of open ``staff_assignments``
+  (``end_date IS NULL``), counted through a partial index on ``staff_id``
+- The least-loaded eligible clinician is picked by one indexed query,
+  filtered by role, department, shift and specialization, with ties broken
+  by staff id so picks are deterministic
+- The pick locks the chosen ``staff`` row (``FOR UPDATE SKIP LOCKED``) until
+  the caller commits the new assignment, so concurrent admissions spread
+  across clinicians instead of all landing on the same person
+- Used by the admission workflow, ``assign_staff_to_patient_simple`` and the
+  orchestrator's staff scheduling workflow
+"""
+
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session
+
+from database import Staff, StaffAssignment, User
+
+
+ROTATING_SHIFT = "rotating"
+
+
+def current_shift(now: datetime = None) -> str:
+    """Shift label matching ``staff.shift_pattern`` for a point in time."""
+    hour = (now or datetime.now()).hour
+    return "day" if 7 <= hour < 19 else "night"
+
+
+def role_for_assignment(assignment_type: Optional[str]) -> str:
+    """User role implied by an assignment label such as ``primary_nurse``."""
+    return "nurse" if "nurse" in (assignment_type or "").lower() else "doctor"
+
+
+class StaffAssignmentService:
+    """Picks the least-loaded eligible clinician and records assignments."""
+
+    @staticmethod
+    def _active_count():
+        return (select(func.count(StaffAssignment.id))
+                .where(StaffAssignment.staff_id == Staff.id, StaffAssignment.end_date.is_(None))
+                .correlate(Staff)
+                .scalar_subquery())
+
+    def _eligible(self, query, role: str = None, department_id: str = None,
+                  shift: str = None, specialization: str = None):
+        query = query.where(Staff.status == "active")
+        if role:
+            query = query.where(User.role == role)
+        if department_id:
+            query = query.where(Staff.department_id == uuid.UUID(str(department_id)))
+        if shift:
+            query = query.where(or_(Staff.shift_pattern.is_(None),
+                                    Staff.shift_pattern.in_([shift, ROTATING_SHIFT])))
+        if specialization:
+            query = query.where(Staff.specialization.ilike(f"%{specialization}%"))
+        return query
+
+    def pick_least_loaded(self, db: Session, role: str, department_id: str = None, shift: str = None,
+                          specialization: str = None, exclude: List[str] = None) -> Optional[Dict[str, Any]]:
+        """Lock and return the eligible clinician with the fewest open assignments.
+
+        Filters are relaxed in order (specialization, then shift, then
+        department) when nobody matches all of them.
+        """
+        attempts = [
+            (department_id, shift, specialization),
+            (department_id, shift, None),
+            (department_id, None, None),
+            (None, None, None),
+        ]
+        seen = set()
+        for filters in attempts:
+            if filters in seen:
+                continue
+            seen.add(filters)
+            active = self._active_count().label("active_assignments")
+            query = self._eligible(
+                select(Staff.id, Staff.employee_id, Staff.position, Staff.department_id,
+                       User.first_name, User.last_name, active).join(User, User.id == Staff.user_id),
+                role, *filters,
+            )
+            if exclude:
+                query = query.where(Staff.id.notin_([uuid.UUID(str(s)) for s in exclude]))
+            row = db.execute(
+                query.order_by(active, Staff.id).limit(1).with_for_update(of=Staff, skip_locked=True)
+            ).first()
+            if row:
+                return {
+                    "staff_id": str(row.id),
+                    "employee_id": row.employee_id,
+                    "position": row.position,
+                    "department_id": str(row.department_id) if row.department_id else None,
+                    "first_name": row.first_name,
+                    "last_name": row.last_name,
+                    "active_assignments": row.active_assignments,
+                }
+        return None
+
+    def assign(self, db: Session, patient_id: str, assignment_type: str, role: str = None,
+               department_id: str = None, shift: str = None, specialization: str = None,
+               bed_id: str = None, responsibilities: str = None, notes: str = None,
+               exclude: List[str] = None) -> Optional[Dict[str, Any]]:
+        """Pick the least-loaded clinician and add their assignment; the caller commits."""
+        shift = shift or current_shift()
+        staff = self.pick_least_loaded(db, role or role_for_assignment(assignment_type),
+                                       department_id, shift, specialization, exclude)
+        if not staff:
+            return None
+        assignment = StaffAssignment(
+            id=uuid.uuid4(),
+            patient_id=uuid.UUID(str(patient_id)),
+            staff_id=uuid.UUID(staff["staff_id"]),
+            bed_id=uuid.UUID(str(bed_id)) if bed_id else None,
+            assignment_type=assignment_type,
+            start_date=datetime.now(),
+            shift=shift,
+            responsibilities=responsibilities,
+            notes=notes,
+        )
+        db.add(assignment)
+        staff["assignment_id"] = str(assignment.id)
+        staff["active_assignments"] += 1
+        return staff
+
+    def workloads(self, db: Session, department_id: str = None, role: str = None) -> List[Dict[str, Any]]:
+        """Open-assignment counts for active staff, least loaded first (one grouped query)."""
+        active = func.count(StaffAssignment.id).label("active_assignments")
+        query = self._eligible(
+            select(Staff.id, Staff.position, Staff.shift_pattern, User.first_name, User.last_name,
+                   User.role, active)
+            .join(User, User.id == Staff.user_id)
+            .outerjoin(StaffAssignment, and_(StaffAssignment.staff_id == Staff.id,
+                                             StaffAssignment.end_date.is_(None))),
+            role, department_id,
+        ).group_by(Staff.id, Staff.position, Staff.shift_pattern, User.first_name, User.last_name, User.role)
+        return [
+            {
+                "staff_id": str(row.id),
+                "name": f"{row.first_name} {row.last_name}",
+                "role": row.role,
+                "position": row.position,
+                "shift_pattern": row.shift_pattern,
+                "active_assignments": row.active_assignments,
+            }
+            for row in db.execute(query.order_by(active, Staff.id))
+        ]
+
+
+# Global service instance
+staff_assignment_service = StaffAssignmentService()
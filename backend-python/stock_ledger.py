@@ -0,0 +1,365 @@
+"""
+Stock Ledger Service
+====================
+
+Atomic stock movements for supplies and medications:
+- A movement is a single guarded statement,
+  ``UPDATE supplies SET current_stock = current_stock + :delta
+  WHERE id = :id AND current_stock + :delta >= 0 RETURNING ...``,
+  so concurrent dispensing can neither lose updates nor drive stock negative
+- Every movement is written to ``inventory_transactions`` and added to
+  its day's ``supply_daily_rollup`` row (supply_rollups.py) in the same
+  transaction as the stock change
+- Nursing rounds (many patients x supplies) are recorded in one
+  transaction: supply rows are locked once in id order (no deadlocks
+  between concurrent rounds), stock is changed by one ``UPDATE ... FROM
+  unnest(...)``, and usage and ledger rows are inserted one multi-row
+  INSERT per chunk
+- Used by ``update_supply_stock``, ``record_patient_supply_usage`` and
+  ``record_medication_round``
+
+Usage:
+    python stock_ledger.py --benchmark   # concurrent dispensing: read-modify-write vs atomic update (cleaned up)
+"""
+
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+
+from database import InventoryTransaction, PatientSupplyUsage, SessionLocal
+from supply_rollups import supply_rollups
+
+
+CHUNK_SIZE = 500
+
+_MOVE_SQL = text("""
+    UPDATE supplies
+    SET current_stock = current_stock + :delta, updated_at = now()
+    WHERE id = :supply_id AND current_stock + :delta >= 0
+    RETURNING *
+""")
+
+_STOCK_SQL = text("SELECT current_stock FROM supplies WHERE id = :supply_id")
+
+# Lock every supply touched by a round in a fixed order before changing any of them
+_LOCK_SQL = text("""
+    SELECT id, current_stock, unit_cost FROM supplies
+    WHERE id = ANY(CAST(:ids AS uuid[]))
+    ORDER BY id
+    FOR UPDATE
+""")
+
+_BATCH_MOVE_SQL = text("""
+    UPDATE supplies s
+    SET current_stock = s.current_stock + d.delta, updated_at = now()
+    FROM unnest(CAST(:ids AS uuid[]), CAST(:deltas AS integer[])) AS d(id, delta)
+    WHERE s.id = d.id AND s.current_stock + d.delta >= 0
+    RETURNING s.id, s.current_stock
+""")
+
+
+@dataclass
+class StockMovement:
+    """One signed stock change; negative quantities consume stock."""
+
+    supply_id: str
+    quantity: int
+    transaction_type: str = "out"
+    performed_by: Optional[str] = None
+    notes: Optional[str] = None
+    reference_number: Optional[str] = None
+
+
+def _uuid(value) -> Optional[uuid.UUID]:
+    if value is None or isinstance(value, uuid.UUID):
+        return value
+    return uuid.UUID(str(value))
+
+
+def _plain(row) -> Dict[str, Any]:
+    """Row mapping with JSON-friendly values (same conversions as ``BaseAgent.serialize_model``)."""
+    result = {}
+    for key, value in row._mapping.items():
+        if isinstance(value, uuid.UUID):
+            value = str(value)
+        elif isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = float(value)
+        result[key] = value
+    return result
+
+
+def _chunks(rows: List[Dict[str, Any]], size: int = CHUNK_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+class StockLedgerService:
+    """Applies stock movements atomically and records them in the ledger."""
+
+    def apply_movement(self, db: Session, movement: StockMovement, commit: bool = True) -> Dict[str, Any]:
+        """Apply one movement with a single guarded UPDATE plus its ledger row."""
+        supply_id = _uuid(movement.supply_id)
+        row = db.execute(_MOVE_SQL, {"supply_id": supply_id, "delta": movement.quantity}).first()
+        if row is None:
+            # Failure path only: tell a missing supply from insufficient stock
+            current = db.execute(_STOCK_SQL, {"supply_id": supply_id}).scalar()
+            if commit:
+                db.rollback()
+            if current is None:
+                return {"success": False, "message": "Supply not found"}
+            return {"success": False,
+                    "message": f"Insufficient stock. Current: {current}, Requested: {abs(movement.quantity)}"}
+
+        supply = _plain(row)
+        previous_stock = supply["current_stock"] - movement.quantity
+        unit_cost = supply.get("unit_cost")
+        transaction = {
+            "id": uuid.uuid4(),
+            "supply_id": supply_id,
+            "transaction_type": movement.transaction_type,
+            "quantity": movement.quantity,
+            "unit_cost": unit_cost,
+            "total_cost": round(unit_cost * abs(movement.quantity), 2) if unit_cost is not None else None,
+            "reference_number": movement.reference_number,
+            "performed_by": _uuid(movement.performed_by),
+            "notes": f"{movement.notes or ''} | Stock changed from {previous_stock} to {supply['current_stock']}".strip(" |"),
+            "transaction_date": datetime.now(),
+        }
+        db.execute(insert(InventoryTransaction).values(transaction))
+        supply_rollups.record(db, [transaction])
+        if commit:
+            db.commit()
+
+        return {
+            "success": True,
+            "previous_stock": previous_stock,
+            "supply": supply,
+            "transaction": {key: (str(value) if isinstance(value, uuid.UUID)
+                                  else value.isoformat() if isinstance(value, datetime) else value)
+                            for key, value in transaction.items()},
+        }
+
+    def apply_movements(self, db: Session, movements: List[StockMovement],
+                        partial: bool = False) -> Dict[str, Any]:
+        """Apply many movements in the caller's transaction (not committed here).
+
+        Deltas are summed per supply and checked against the locked stock
+        levels. Without ``partial`` any shortage rejects the whole batch; with
+        it, only the movements for short or unknown supplies are dropped.
+        """
+        deltas: Dict[uuid.UUID, int] = {}
+        for movement in movements:
+            supply_id = _uuid(movement.supply_id)
+            deltas[supply_id] = deltas.get(supply_id, 0) + movement.quantity
+        if not deltas:
+            return {"success": True, "applied": [], "stock": {}, "rejected": {}}
+
+        locked = {_uuid(row.id): row for row in db.execute(_LOCK_SQL, {"ids": list(deltas)})}
+        rejected = {}
+        for supply_id, delta in deltas.items():
+            row = locked.get(supply_id)
+            if row is None:
+                rejected[str(supply_id)] = "Supply not found"
+            elif row.current_stock + delta < 0:
+                rejected[str(supply_id)] = f"Insufficient stock. Current: {row.current_stock}, Requested: {abs(delta)}"
+        if rejected and not partial:
+            return {"success": False, "message": "Insufficient stock for part of the batch",
+                    "applied": [], "stock": {}, "rejected": rejected}
+
+        feasible = {supply_id: delta for supply_id, delta in deltas.items() if str(supply_id) not in rejected}
+        stock = {}
+        if feasible:
+            for row in db.execute(_BATCH_MOVE_SQL, {"ids": list(feasible), "deltas": list(feasible.values())}):
+                stock[str(row.id)] = row.current_stock
+
+        now = datetime.now()
+        applied = [m for m in movements if str(_uuid(m.supply_id)) in stock]
+        ledger_rows = []
+        for movement in applied:
+            unit_cost = locked[_uuid(movement.supply_id)].unit_cost
+            ledger_rows.append({
+                "id": uuid.uuid4(),
+                "supply_id": _uuid(movement.supply_id),
+                "transaction_type": movement.transaction_type,
+                "quantity": movement.quantity,
+                "unit_cost": unit_cost,
+                "total_cost": round(unit_cost * abs(movement.quantity), 2) if unit_cost is not None else None,
+                "reference_number": movement.reference_number,
+                "performed_by": _uuid(movement.performed_by),
+                "notes": movement.notes,
+                "transaction_date": now,
+            })
+        for chunk in _chunks(ledger_rows):
+            db.execute(insert(InventoryTransaction).values(chunk))
+        supply_rollups.record(db, ledger_rows)
+
+        return {
+            "success": True,
+            "applied": applied,
+            "stock": stock,
+            "unit_costs": {str(supply_id): row.unit_cost for supply_id, row in locked.items()},
+            "rejected": rejected,
+        }
+
+    def record_round(self, db: Session, administrations: List[Dict[str, Any]],
+                     partial: bool = False) -> Dict[str, Any]:
+        """Record resolved administrations (usage rows + stock movements) in one transaction.
+
+        Each administration needs ``patient_id``, ``supply_id`` and
+        ``quantity_used``; optional keys mirror ``PatientSupplyUsage`` columns.
+        """
+        usage_ids = [uuid.uuid4() for _ in administrations]
+        movements = [
+            StockMovement(
+                supply_id=entry["supply_id"],
+                quantity=-int(entry.get("quantity_used") or 1),
+                transaction_type="out",
+                performed_by=entry.get("administered_by_id"),
+                notes=entry.get("ledger_note") or "Patient supply usage",
+                reference_number=f"usage:{usage_id}",
+            )
+            for entry, usage_id in zip(administrations, usage_ids)
+        ]
+        try:
+            moved = self.apply_movements(db, movements, partial=partial)
+            if not moved["success"]:
+                db.rollback()
+                return moved
+
+            now = datetime.now()
+            usage_rows = []
+            recorded = []
+            for entry, usage_id in zip(administrations, usage_ids):
+                supply_key = str(_uuid(entry["supply_id"]))
+                if supply_key not in moved["stock"]:
+                    continue
+                quantity = int(entry.get("quantity_used") or 1)
+                unit_cost = moved["unit_costs"].get(supply_key) or 0
+                usage_rows.append({
+                    "id": usage_id,
+                    "patient_id": _uuid(entry["patient_id"]),
+                    "supply_id": _uuid(entry["supply_id"]),
+                    "quantity_used": quantity,
+                    "unit_cost": unit_cost,
+                    "total_cost": float(unit_cost) * quantity,
+                    "prescribed_by_id": _uuid(entry.get("prescribed_by_id")),
+                    "administered_by_id": _uuid(entry.get("administered_by_id")),
+                    "bed_id": _uuid(entry.get("bed_id")),
+                    "dosage": entry.get("dosage"),
+                    "frequency": entry.get("frequency"),
+                    "administration_route": entry.get("administration_route") or "oral",
+                    "indication": entry.get("indication"),
+                    "prescribed_date": entry.get("prescribed_date") or now,
+                    "start_date": entry.get("start_date") or date.today(),
+                    "end_date": entry.get("end_date"),
+                    "status": entry.get("status") or "prescribed",
+                    "created_at": now,
+                })
+                recorded.append({
+                    "id": str(usage_id),
+                    "patient_id": str(entry["patient_id"]),
+                    "supply_id": supply_key,
+                    "quantity_used": quantity,
+                    "unit_cost": float(unit_cost),
+                    "total_cost": float(unit_cost) * quantity,
+                    "remaining_stock": moved["stock"][supply_key],
+                })
+            for chunk in _chunks(usage_rows):
+                db.execute(insert(PatientSupplyUsage).values(chunk))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        return {
+            "success": True,
+            "recorded": recorded,
+            "rejected": moved["rejected"],
+            "stock": moved["stock"],
+        }
+
+
+# Global ledger used by the inventory and supply usage agents
+stock_ledger = StockLedgerService()
+
+
+def run_benchmark(workers: int = 8, moves_each: int = 50):
+    """Concurrent single-unit dispensing of one supply: ORM read-modify-write vs the atomic ledger."""
+    import threading
+    import time
+
+    from database import Supply
+
+    def legacy_dispense(supply_id):
+        db = SessionLocal()
+        try:
+            for _ in range(moves_each):
+                supply = db.query(Supply).filter(Supply.id == supply_id).first()
+                supply.current_stock = supply.current_stock - 1
+                db.commit()
+        finally:
+            db.close()
+
+    def ledger_dispense(supply_id):
+        db = SessionLocal()
+        try:
+            for _ in range(moves_each):
+                stock_ledger.apply_movement(db, StockMovement(supply_id=supply_id, quantity=-1,
+                                                              notes="ledger benchmark"))
+        finally:
+            db.close()
+
+    db = SessionLocal()
+    supply_id = uuid.uuid4()
+    start_stock = workers * moves_each * 2
+    try:
+        category_id = db.execute(text("SELECT id FROM supply_categories LIMIT 1")).scalar()
+        if category_id is None:
+            print("⚠️ Ledger benchmark skipped: no supply categories")
+            return
+        db.execute(text("INSERT INTO supplies (id, item_code, name, category_id, unit_of_measure, current_stock) "
+                        "VALUES (:id, :code, 'Ledger benchmark', :category, 'unit', :stock)"),
+                   {"id": supply_id, "code": f"BENCH{str(supply_id)[:6]}", "category": category_id,
+                    "stock": start_stock})
+        db.commit()
+
+        for label, worker in (("Read-modify-write", legacy_dispense), ("Atomic ledger", ledger_dispense)):
+            db.execute(text("UPDATE supplies SET current_stock = :stock WHERE id = :id"),
+                       {"stock": start_stock, "id": supply_id})
+            db.commit()
+            threads = [threading.Thread(target=worker, args=(supply_id,)) for _ in range(workers)]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+            final = db.execute(_STOCK_SQL, {"supply_id": supply_id}).scalar()
+            db.commit()
+            expected = start_stock - workers * moves_each
+            print(f"{label:<18} {workers}x{moves_each} dispenses: stock {final} (expected {expected}, "
+                  f"{final - expected} lost updates), {workers * moves_each / elapsed:.0f} moves/s")
+    except Exception as e:
+        print(f"⚠️ Ledger benchmark skipped: {e}")
+    finally:
+        db.rollback()
+        db.execute(text("DELETE FROM inventory_transactions WHERE supply_id = :id"), {"id": supply_id})
+        db.execute(text("DELETE FROM supplies WHERE id = :id"), {"id": supply_id})
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--benchmark" in sys.argv:
+        run_benchmark()
+    else:
+        print(__doc__)
@@ -0,0 +1,372 @@
+"""
+Supply Usage Rollups
+====================
+
+Daily per-supply movement totals for inventory reporting:
+- ``supply_daily_rollup`` holds one row per supply and day (units in,
+  units out, transaction count, cost); ``in``/``out`` transactions count by
+  absolute quantity and adjustments by their sign, as the usage report
+  always has
+- The stock ledger adds every movement to its day's row in the same
+  transaction (``INSERT ... ON CONFLICT DO UPDATE``), so rollups are
+  current without a refresh
+- ``compact`` rebuilds a day range from ``inventory_transactions`` with one
+  ``GROUP BY``; ``RollupCompactor`` re-compacts the last days on a schedule
+  so writers that bypass the ledger (bulk imports, legacy scripts) are
+  folded in, and ``migrate_database.py --incremental`` backfills history
+- ``usage_totals`` answers a period report from rollups for whole days and
+  from raw transactions only for the partial first and last day, all in
+  one ``GROUP BY`` statement
+
+Usage:
+    python supply_rollups.py --compact [days]  # rebuild rollups for the last N days (default 2)
+    python supply_rollups.py --backfill        # rebuild rollups for all history
+    python supply_rollups.py --benchmark       # year report: Python loop vs SQL GROUP BY vs rollups (rolled back)
+"""
+
+import os
+import threading
+import uuid
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+
+
+COMPACTION_DAYS = int(os.getenv("SUPPLY_ROLLUP_COMPACTION_DAYS", "2"))
+COMPACTION_INTERVAL_SECONDS = int(os.getenv("SUPPLY_ROLLUP_COMPACTION_SECONDS", str(24 * 3600)))
+
+# Units in / out of one transaction; keep in step with ``split_quantity``
+_IN_SQL = ("CASE WHEN transaction_type = 'in' THEN abs(quantity) "
+           "WHEN transaction_type = 'out' THEN 0 ELSE greatest(quantity, 0) END")
+_OUT_SQL = ("CASE WHEN transaction_type = 'in' THEN 0 "
+            "WHEN transaction_type = 'out' THEN abs(quantity) ELSE greatest(-quantity, 0) END")
+
+_UPSERT_SQL = text("""
+    INSERT INTO supply_daily_rollup AS r
+        (supply_id, usage_date, total_in, total_out, transaction_count, total_cost, updated_at)
+    SELECT d.supply_id, d.usage_date, d.total_in, d.total_out, d.transaction_count, d.total_cost, now()
+    FROM unnest(CAST(:supply_ids AS uuid[]), CAST(:days AS date[]), CAST(:ins AS integer[]),
+                CAST(:outs AS integer[]), CAST(:counts AS integer[]), CAST(:costs AS numeric[]))
+         AS d(supply_id, usage_date, total_in, total_out, transaction_count, total_cost)
+    ON CONFLICT (supply_id, usage_date) DO UPDATE
+    SET total_in = r.total_in + EXCLUDED.total_in,
+        total_out = r.total_out + EXCLUDED.total_out,
+        transaction_count = r.transaction_count + EXCLUDED.transaction_count,
+        total_cost = r.total_cost + EXCLUDED.total_cost,
+        updated_at = now()
+""")
+
+# Compaction waits for in-flight ledger upserts and holds new ones back until it
+# commits, so a rebuilt day can neither miss nor double-count a movement
+_LOCK_SQL = "LOCK TABLE supply_daily_rollup IN SHARE ROW EXCLUSIVE MODE"
+
+_REBUILD_SQL = f"""
+    INSERT INTO supply_daily_rollup
+        (supply_id, usage_date, total_in, total_out, transaction_count, total_cost, updated_at)
+    SELECT supply_id, CAST(transaction_date AS date), sum({_IN_SQL}), sum({_OUT_SQL}),
+           count(*), coalesce(sum(total_cost), 0), now()
+    FROM inventory_transactions
+    WHERE transaction_date IS NOT NULL {{range_filter}}
+    GROUP BY supply_id, CAST(transaction_date AS date)
+"""
+
+_TOTALS_SQL = f"""
+    WITH movements AS (
+        SELECT supply_id, total_in, total_out, transaction_count, total_cost
+        FROM supply_daily_rollup
+        WHERE usage_date >= :first_day AND usage_date < :last_day {{rollup_supply}}
+        UNION ALL
+        SELECT supply_id, {_IN_SQL}, {_OUT_SQL}, 1, coalesce(total_cost, 0)
+        FROM inventory_transactions
+        WHERE ({{raw_ranges}}) {{raw_supply}}
+    )
+    SELECT supply_id, sum(total_in) AS total_in, sum(total_out) AS total_out,
+           sum(transaction_count) AS transaction_count, sum(total_cost) AS total_cost
+    FROM movements
+    GROUP BY supply_id
+    ORDER BY supply_id
+"""
+
+
+def split_quantity(transaction_type: str, quantity: int) -> Tuple[int, int]:
+    """Units in and out for one transaction (Python twin of ``_IN_SQL``/``_OUT_SQL``)."""
+    if transaction_type == "in":
+        return abs(quantity), 0
+    if transaction_type == "out":
+        return 0, abs(quantity)
+    return max(quantity, 0), max(-quantity, 0)
+
+
+def whole_days(start: datetime, end: datetime) -> Tuple[date, date]:
+    """``[first_day, last_day)`` of days lying entirely inside ``[start, end]``."""
+    first_day = start.date() if start.time() == time.min else start.date() + timedelta(days=1)
+    return first_day, end.date()
+
+
+class SupplyRollupService:
+    """Maintains ``supply_daily_rollup`` and answers period totals from it."""
+
+    def record(self, db: Session, transactions: List[Dict[str, Any]]):
+        """Add ledger rows to their daily rollups in the caller's transaction (not committed here).
+
+        Rows need ``supply_id``, ``transaction_type``, ``quantity``,
+        ``total_cost`` and ``transaction_date``.
+        """
+        days: Dict[Tuple[uuid.UUID, date], List] = {}
+        for row in transactions:
+            units_in, units_out = split_quantity(row["transaction_type"], row["quantity"])
+            key = (row["supply_id"], row["transaction_date"].date())
+            totals = days.setdefault(key, [0, 0, 0, Decimal("0")])
+            totals[0] += units_in
+            totals[1] += units_out
+            totals[2] += 1
+            totals[3] += Decimal(str(row.get("total_cost") or 0))
+        if not days:
+            return
+
+        # Sorted keys give concurrent rounds the same row lock order
+        keys = sorted(days, key=lambda key: (str(key[0]), key[1]))
+        db.execute(_UPSERT_SQL, {
+            "supply_ids": [key[0] for key in keys],
+            "days": [key[1] for key in keys],
+            "ins": [days[key][0] for key in keys],
+            "outs": [days[key][1] for key in keys],
+            "counts": [days[key][2] for key in keys],
+            "costs": [days[key][3] for key in keys],
+        })
+
+    def rebuild(self, db: Session, start_day: date = None, end_day: date = None) -> Tuple[int, int]:
+        """Rebuild rollups for ``[start_day, end_day]`` in the caller's transaction (not committed here).
+
+        Without a start day all history is rebuilt; without an end day the
+        range runs to today. Returns (rows removed, rows written).
+        """
+        db.execute(text(_LOCK_SQL))
+        if start_day is None:
+            deleted = db.execute(text("DELETE FROM supply_daily_rollup")).rowcount
+            inserted = db.execute(text(_REBUILD_SQL.format(range_filter=""))).rowcount
+            return deleted, inserted
+
+        params = {"start_day": start_day, "end_day": end_day or date.today()}
+        deleted = db.execute(text("DELETE FROM supply_daily_rollup "
+                                  "WHERE usage_date >= :start_day AND usage_date <= :end_day"),
+                             params).rowcount
+        inserted = db.execute(text(_REBUILD_SQL.format(
+            range_filter="AND transaction_date >= :start_day "
+                         "AND transaction_date < CAST(:end_day AS date) + 1")), params).rowcount
+        return deleted, inserted
+
+    def compact(self, db: Session, start_day: date = None, end_day: date = None) -> Dict[str, Any]:
+        """``rebuild`` a day range and commit."""
+        try:
+            deleted, inserted = self.rebuild(db, start_day, end_day)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return {
+            "success": True,
+            "start_day": start_day.isoformat() if start_day else None,
+            "end_day": (end_day or date.today()).isoformat(),
+            "rows_removed": deleted,
+            "rows_written": inserted,
+        }
+
+    def usage_totals(self, db: Session, start: datetime, end: datetime,
+                     supply_id: Optional[str] = None) -> Dict[str, Any]:
+        """Per-supply in/out/net totals for ``start <= transaction_date <= end``.
+
+        Days wholly inside the window come from the rollups; the partial
+        first and last day come from raw transactions.
+        """
+        first_day, last_day = whole_days(start, end)
+        params: Dict[str, Any] = {"start": start, "end": end}
+        if first_day < last_day:
+            params.update(first_day=first_day, last_day=last_day,
+                          first_midnight=datetime.combine(first_day, time.min),
+                          last_midnight=datetime.combine(last_day, time.min))
+            raw_ranges = ("(transaction_date >= :start AND transaction_date < :first_midnight) OR "
+                          "(transaction_date >= :last_midnight AND transaction_date <= :end)")
+        else:
+            params.update(first_day=first_day, last_day=first_day)
+            raw_ranges = "transaction_date >= :start AND transaction_date <= :end"
+
+        supply_filter = ""
+        if supply_id:
+            params["supply_id"] = uuid.UUID(str(supply_id))
+            supply_filter = "AND supply_id = :supply_id"
+
+        rows = db.execute(text(_TOTALS_SQL.format(rollup_supply=supply_filter, raw_supply=supply_filter,
+                                                  raw_ranges=raw_ranges)), params)
+        totals = {}
+        for row in rows:
+            totals[str(row.supply_id)] = {
+                "total_in": int(row.total_in),
+                "total_out": int(row.total_out),
+                "net_change": int(row.total_in) - int(row.total_out),
+                "transaction_count": int(row.transaction_count),
+                "total_cost": round(float(row.total_cost or 0), 2),
+            }
+        return {
+            "usage_statistics": totals,
+            "rollup_days": max((last_day - first_day).days, 0),
+        }
+
+
+# Global rollup service used by the stock ledger and the inventory agent
+supply_rollups = SupplyRollupService()
+
+
+class RollupCompactor:
+    """Re-compacts the last ``days`` of rollups every ``interval_seconds`` on a daemon thread."""
+
+    def __init__(self, interval_seconds: int = COMPACTION_INTERVAL_SECONDS, days: int = COMPACTION_DAYS):
+        self.interval_seconds = interval_seconds
+        self.days = days
+        self.last_result: Optional[Dict[str, Any]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def compact_once(self) -> Dict[str, Any]:
+        db = SessionLocal()
+        try:
+            result = supply_rollups.compact(db, start_day=date.today() - timedelta(days=self.days - 1))
+        except Exception as e:
+            result = {"success": False, "message": f"Rollup compaction failed: {e}"}
+            print(f"⚠️ {result['message']}")
+        finally:
+            db.close()
+        self.last_result = result
+        return result
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            self.compact_once()
+
+    def start(self):
+        if self.interval_seconds <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="supply-rollup-compactor", daemon=True)
+        self._thread.start()
+        print(f"📦 Supply rollup compaction running every {self.interval_seconds}s")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+
+# Global compactor started by the MCP server
+rollup_compactor = RollupCompactor()
+
+
+def backfill_steps():
+    """Idempotent (description, SQL) steps that rebuild every rollup from raw transactions."""
+    return [
+        ("lock supply_daily_rollup", _LOCK_SQL),
+        ("clear supply_daily_rollup", "DELETE FROM supply_daily_rollup"),
+        ("rebuild supply_daily_rollup", _REBUILD_SQL.format(range_filter="")),
+    ]
+
+
+def run_benchmark(supplies: int = 50, per_day: int = 20, days: int = 365):
+    """Seed a year of movements inside a transaction, time the year report three ways, roll back."""
+    import time as timer
+
+    from database import InventoryTransaction
+
+    db = SessionLocal()
+    try:
+        category_id = db.execute(text("SELECT id FROM supply_categories LIMIT 1")).scalar()
+        if category_id is None:
+            print("⚠️ Rollup benchmark skipped: no supply categories")
+            return
+        supply_ids = [uuid.uuid4() for _ in range(supplies)]
+        db.execute(text("INSERT INTO supplies (id, item_code, name, category_id, unit_of_measure, current_stock) "
+                        "SELECT id, 'ROLL' || ord, 'Rollup benchmark ' || ord, :category, 'unit', 0 "
+                        "FROM unnest(CAST(:ids AS uuid[])) WITH ORDINALITY AS s(id, ord)"),
+                   {"ids": supply_ids, "category": category_id})
+        db.execute(text("""
+            INSERT INTO inventory_transactions (id, supply_id, transaction_type, quantity, unit_cost,
+                                                total_cost, transaction_date)
+            SELECT gen_random_uuid(), s.id,
+                   (ARRAY['in', 'out', 'out', 'adjustment'])[1 + n % 4],
+                   CASE WHEN n % 4 = 3 THEN (n % 7) - 3 ELSE 1 + n % 5 END,
+                   2.50, 2.50 * (1 + n % 5),
+                   date_trunc('day', now()) - make_interval(days => n % :days) + make_interval(mins => n % 1440)
+            FROM unnest(CAST(:ids AS uuid[])) AS s(id), generate_series(0, :per_supply - 1) AS n
+        """), {"ids": supply_ids, "days": days, "per_supply": per_day * days})
+        rows = supplies * per_day * days
+
+        started = timer.perf_counter()
+        supply_rollups.rebuild(db)
+        print(f"Backfill of {rows} transactions: {(timer.perf_counter() - started) * 1000:.0f} ms")
+
+        end = datetime.now()
+        start = end - timedelta(days=days)
+
+        started = timer.perf_counter()
+        legacy = {}
+        for transaction in db.query(InventoryTransaction).filter(InventoryTransaction.transaction_date >= start,
+                                                                 InventoryTransaction.transaction_date <= end):
+            units_in, units_out = split_quantity(transaction.transaction_type, transaction.quantity)
+            stats = legacy.setdefault(str(transaction.supply_id), [0, 0, 0])
+            stats[0] += units_in
+            stats[1] += units_out
+            stats[2] += 1
+        legacy_ms = (timer.perf_counter() - started) * 1000
+        db.expunge_all()
+
+        started = timer.perf_counter()
+        raw = db.execute(text(f"SELECT supply_id, sum({_IN_SQL}), sum({_OUT_SQL}), count(*) "
+                              "FROM inventory_transactions WHERE transaction_date >= :start "
+                              "AND transaction_date <= :end GROUP BY supply_id"),
+                         {"start": start, "end": end}).all()
+        raw_ms = (timer.perf_counter() - started) * 1000
+
+        started = timer.perf_counter()
+        report = supply_rollups.usage_totals(db, start, end)
+        rollup_ms = (timer.perf_counter() - started) * 1000
+
+        stats = report["usage_statistics"]
+        mismatches = sum(1 for supply_id, (units_in, units_out, count) in legacy.items()
+                         if (stats[supply_id]["total_in"], stats[supply_id]["total_out"],
+                             stats[supply_id]["transaction_count"]) != (units_in, units_out, count))
+        print(f"Year report over {rows} transactions ({len(raw)} supplies):")
+        print(f"  Python loop over ORM rows  {legacy_ms:8.1f} ms")
+        print(f"  SQL GROUP BY on raw rows   {raw_ms:8.1f} ms")
+        print(f"  Rollups + partial days     {rollup_ms:8.1f} ms  ({report['rollup_days']} rollup days, "
+              f"{mismatches} mismatches vs the loop)")
+    except Exception as e:
+        print(f"⚠️ Rollup benchmark skipped: {e}")
+    finally:
+        db.rollback()
+        db.close()
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    if "--benchmark" in sys.argv:
+        run_benchmark()
+    elif "--backfill" in sys.argv or "--compact" in sys.argv:
+        session = SessionLocal()
+        try:
+            if "--backfill" in sys.argv:
+                result = supply_rollups.compact(session)
+            else:
+                position = sys.argv.index("--compact")
+                days = int(sys.argv[position + 1]) if len(sys.argv) > position + 1 else COMPACTION_DAYS
+                result = supply_rollups.compact(session, start_day=date.today() - timedelta(days=days - 1))
+        finally:
+            session.close()
+        print(json.dumps(result, indent=2))
+    else:
+        print(__doc__)
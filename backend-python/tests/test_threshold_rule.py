@@ -0,0 +1,38 @@
+"""ThresholdRule: hysteresis and per-level cooldowns (agents/real_time_monitoring_agent.py)."""
+
+from agents.real_time_monitoring_agent import ThresholdRule
+
+
+def make_rule():
+    return ThresholdRule(metric="occupancy_rate", warning=85, critical=None, hysteresis=2, cooldown=900)
+
+
+def test_rise_during_cooldown_fires_once_cooldown_expires():
+    rule = make_rule()
+
+    first = rule.update(86, now=0)
+    assert first["rising"] and first["cooled_down"] and rule.level == 1
+
+    cleared = rule.update(80, now=300)
+    assert not cleared["rising"] and rule.level == 0
+
+    suppressed = rule.update(87, now=600)
+    assert suppressed["rising"] and not suppressed["cooled_down"]
+    assert rule.level == 0
+
+    # The breach continues: still inside the cooldown, still suppressed
+    assert not rule.update(87.5, now=800)["cooled_down"]
+
+    fired = rule.update(88, now=900)
+    assert fired["rising"] and fired["cooled_down"] and rule.level == 1
+
+    # Held at the warning level afterwards, no repeat alerts
+    assert all(rule.update(value, now=1000 + i) is None for i, value in enumerate([89, 90, 91]))
+
+
+def test_hovering_around_threshold_does_not_flap():
+    rule = make_rule()
+    assert rule.update(86, now=0)["rising"]
+    assert rule.update(84, now=10) is None  # within hysteresis
+    assert rule.update(85.5, now=20) is None
+    assert rule.update(82, now=30)["to"] == 0
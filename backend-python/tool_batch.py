@@ -0,0 +1,392 @@
+"""
+Batched Tool Calls
+==================
+
+Executes a JSON-RPC batch of MCP tool calls in one HTTP request (``POST /tools/batch``):
+- Read-only tools (listed in ``READ_ONLY_TOOLS``) run concurrently
+  in worker threads, bounded by ``TOOL_BATCH_CONCURRENCY`` (default 8); a write call
+  is a barrier, so calls still observe each other in request order
+- Identical in-flight read calls (same tool, same arguments) from any client are
+  coalesced into one execution (singleflight) and every caller receives its result;
+  the audit rows the execution logs are recorded once for each caller
+- ``"transaction": true`` runs the calls in order on one shared session: agent
+  ``commit()`` only flushes, and the batch commits once at the end or rolls back
+  as a whole when any call fails (``SessionLocal()`` hands out the shared session
+  through a provider registered with ``database``); a rollback drops the in-memory admission queues
+  and bed availability index, which may hold state from the discarded writes
+- Audit interactions logged while a batch runs are written in one insert at the end
+  instead of one session and commit per call
+
+Request body, either a plain JSON-RPC batch array or an object with options:
+    [{"jsonrpc": "2.0", "id": 1, "method": "tools/call",
+      "params": {"name": "list_beds", "arguments": {}}}, ...]
+    {"transaction": true, "requests": [...]}
+
+Usage:
+    python tool_batch.py --benchmark   # sequential calls vs one concurrent, coalesced batch
+"""
+
+import asyncio
+import contextvars
+import json
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Tools that never write, so batches may run and coalesce them concurrently. Status reads
+# of bed cleanings (get_bed_status_with_time_remaining, check_bed_status) settle finished
+# cleanings and are deliberately absent.
+READ_ONLY_TOOLS = frozenset({
+    "get_agent_info", "get_ai_system_dashboard", "get_ai_system_health", "get_bed_by_id", "get_bed_by_number",
+    "get_bed_turnover_details", "get_dashboard_stats", "get_department_by_id",
+    "get_discharge_report_storage_stats", "get_drug_interactions", "get_emergency_alerts",
+    "get_emergency_phrases", "get_equipment_by_id", "get_equipment_by_status", "get_equipment_dashboard",
+    "get_equipment_turnover_status", "get_fleet_overview", "get_inventory_plan",
+    "get_langraph_workflow_status", "get_live_bed_occupancy", "get_low_stock_supplies",
+    "get_medical_timeline", "get_meeting_by_id", "get_patient_by_id", "get_patient_discharge_status",
+    "get_patient_flow_data", "get_patient_medical_history", "get_patient_queue", "get_patient_supply_usage",
+    "get_patient_with_discharge_details", "get_recent_activity", "get_staff_by_id", "get_supply_by_id",
+    "get_supply_usage_for_discharge_report", "get_supply_usage_report", "get_supported_languages",
+    "get_system_status", "get_user_by_id", "list_agents", "list_available_discharge_reports", "list_beds",
+    "list_departments", "list_discharge_reports", "list_equipment", "list_equipment_categories",
+    "list_inventory_transactions", "list_meetings", "list_patient_medications", "list_patients", "list_rooms",
+    "list_staff", "list_supplies", "list_users", "search_discharged_patients", "search_medical_documents",
+    "search_patients", "search_supply_usage_by_patient",
+})
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+ROLLED_BACK = -32000
+
+_scope: contextvars.ContextVar = contextvars.ContextVar("tool_batch_scope", default=None)
+
+
+def is_read_only(tool_name: str) -> bool:
+    return tool_name in READ_ONLY_TOOLS
+
+
+def call_failed(result: Any) -> bool:
+    """Whether a tool result reports failure (``success: False`` or an ``error`` key, also one level down)."""
+    if not isinstance(result, dict):
+        return False
+    if result.get("success") is False or result.get("error"):
+        return True
+    return call_failed(result.get("result"))
+
+
+class BatchScope:
+    """State shared by the calls of one batch: its transaction (if any) and deferred audit rows."""
+
+    def __init__(self, session=None):
+        self.session = session
+        self.interactions: List[Any] = []
+        self.rolled_back = False
+
+
+class SharedSession:
+    """The batch transaction as handed out by ``SessionLocal()``: commit flushes, close is a no-op."""
+
+    def __init__(self, session, scope: BatchScope):
+        self._session = session
+        self._scope = scope
+
+    def commit(self):
+        self._session.flush()
+
+    def rollback(self):
+        self._scope.rolled_back = True
+        self._session.rollback()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+def shared_session() -> Optional[SharedSession]:
+    """The current batch's shared transaction, or None outside a transactional batch."""
+    scope = _scope.get()
+    if scope is None or scope.session is None:
+        return None
+    return SharedSession(scope.session, scope)
+
+
+def defer_interaction(interaction) -> bool:
+    """Queue an audit row for the batch's single insert; False outside a batch."""
+    scope = _scope.get()
+    if scope is None:
+        return False
+    scope.interactions.append(interaction)
+    return True
+
+
+class SingleFlight:
+    """Coalesces identical concurrent async calls into one execution."""
+
+    def __init__(self):
+        self._inflight: Dict[Any, asyncio.Task] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key, factory: Callable[[], Any]):
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._inflight.pop(key, None)
+                                   if self._inflight.get(key) is done else None)
+        else:
+            self.coalesced += 1
+        # A client disconnecting must not cancel the execution other callers wait on
+        return await asyncio.shield(task)
+
+
+def _copy_interaction(interaction):
+    """A new unsaved audit row with the same column values (fresh primary key)."""
+    from sqlalchemy import inspect
+
+    mapper = inspect(type(interaction))
+    return type(interaction)(**{attr.key: getattr(interaction, attr.key) for attr in mapper.column_attrs
+                                if not any(column.primary_key for column in attr.columns)})
+
+
+def _invalidate_caches():
+    """Drop in-memory state built from writes a rolled-back transaction discarded."""
+    from admission_queue import admission_queue
+    from bed_allocation import bed_allocator
+
+    admission_queue.invalidate()
+    bed_allocator.index.invalidate()
+
+
+def _response(request_id, result=None, error: Tuple[int, str] = None) -> Dict[str, Any]:
+    if error:
+        return {"jsonrpc": "2.0", "id": request_id, "error": {"code": error[0], "message": error[1]}}
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "result": {"content": [{"type": "text", "text": result if isinstance(result, str)
+                                else json.dumps(result, default=str)}]}
+    }
+
+
+class ToolBatchExecutor:
+    """Runs JSON-RPC batches of tool calls through a synchronous ``dispatch(tool_name, arguments)``."""
+
+    def __init__(self, max_concurrency: int = None, max_calls: int = None):
+        self.max_concurrency = max_concurrency or int(os.getenv("TOOL_BATCH_CONCURRENCY", "8"))
+        self.max_calls = max_calls or int(os.getenv("TOOL_BATCH_MAX_CALLS", "50"))
+        self.singleflight = SingleFlight()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop = None
+
+    def _parse(self, body) -> Tuple[Optional[List[Dict[str, Any]]], bool, Optional[str]]:
+        transaction = False
+        requests = body
+        if isinstance(body, dict):
+            requests = body.get("requests")
+            transaction = bool(body.get("transaction", False))
+        if not isinstance(requests, list) or not requests:
+            return None, False, "Batch must be a non-empty array of JSON-RPC requests"
+        if len(requests) > self.max_calls:
+            return None, False, f"Batch exceeds {self.max_calls} calls"
+        return requests, transaction, None
+
+    async def execute(self, body, dispatch: Callable[[str, Dict[str, Any]], Any]) -> Tuple[Any, int]:
+        """Execute a batch body; returns ``(JSON-RPC payload, HTTP status)``."""
+        requests, transaction, problem = self._parse(body)
+        if problem:
+            return _response(None, error=(INVALID_REQUEST, problem)), 400
+
+        responses: List[Optional[Dict[str, Any]]] = [None] * len(requests)
+        calls = []
+        for index, request in enumerate(requests):
+            request_id = request.get("id", index) if isinstance(request, dict) else index
+            if not isinstance(request, dict) or not isinstance(request.get("params", {}), dict):
+                responses[index] = _response(request_id, error=(INVALID_REQUEST, "Invalid request"))
+            elif request.get("method", "tools/call") != "tools/call":
+                responses[index] = _response(request_id, error=(METHOD_NOT_FOUND, f"Method not found: {request.get('method')}"))
+            elif not request.get("params", {}).get("name"):
+                responses[index] = _response(request_id, error=(INVALID_PARAMS, "Tool name is required"))
+            else:
+                params = request["params"]
+                calls.append((index, request_id, params["name"], params.get("arguments") or {}))
+
+        scope = BatchScope()
+        token = _scope.set(scope)
+        try:
+            if transaction:
+                await asyncio.to_thread(self._run_transaction, calls, responses, dispatch, scope)
+            else:
+                await self._run_concurrent(calls, responses, dispatch)
+        finally:
+            _scope.reset(token)
+        if scope.interactions:
+            await asyncio.to_thread(self._write_interactions, scope.interactions)
+        return responses, 200
+
+    async def _run_concurrent(self, calls, responses, dispatch):
+        if self._loop is not asyncio.get_running_loop():
+            self._loop = asyncio.get_running_loop()
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(call):
+            index, request_id, tool_name, arguments = call
+            try:
+                if is_read_only(tool_name):
+                    key = (tool_name, json.dumps(arguments, sort_keys=True, default=str))
+                    result, interactions = await self.singleflight.do(
+                        key, lambda: self._flight(dispatch, tool_name, arguments))
+                    # Every coalesced caller is audited as if it had run the call itself
+                    for interaction in interactions:
+                        defer_interaction(_copy_interaction(interaction))
+                else:
+                    result = await self._bounded(dispatch, tool_name, arguments)
+                responses[index] = _response(request_id, result)
+            except Exception as e:
+                print(f"❌ Batch tool call {tool_name} failed: {e}")
+                responses[index] = _response(request_id, error=(INTERNAL_ERROR, f"Internal error: {str(e)}"))
+
+        # Consecutive read-only calls run together; each write waits for everything before it
+        pending = []
+        for call in calls:
+            if is_read_only(call[2]):
+                pending.append(call)
+                continue
+            if pending:
+                await asyncio.gather(*(run(c) for c in pending))
+                pending = []
+            await run(call)
+        if pending:
+            await asyncio.gather(*(run(c) for c in pending))
+
+    async def _bounded(self, dispatch, tool_name, arguments):
+        async with self._semaphore:
+            return await asyncio.to_thread(dispatch, tool_name, arguments)
+
+    async def _flight(self, dispatch, tool_name, arguments):
+        """One shared execution; its audit rows are collected apart from any caller's batch."""
+        flight = BatchScope()
+        _scope.set(flight)  # the singleflight task runs in its own copy of the context
+        result = await self._bounded(dispatch, tool_name, arguments)
+        return result, flight.interactions
+
+    def _run_transaction(self, calls, responses, dispatch, scope: BatchScope):
+        from database import SessionLocal, register_session_provider
+
+        register_session_provider(shared_session)
+        scope.session = SessionLocal()
+        executed = []
+        failed_id = None
+        try:
+            for position, (index, request_id, tool_name, arguments) in enumerate(calls):
+                try:
+                    result = dispatch(tool_name, arguments)
+                    responses[index] = _response(request_id, result)
+                    if call_failed(result) or scope.rolled_back:
+                        failed_id = request_id
+                except Exception as e:
+                    responses[index] = _response(request_id, error=(INTERNAL_ERROR, f"Internal error: {str(e)}"))
+                    failed_id = request_id
+                if failed_id is not None:
+                    for later_index, later_id, _, _ in calls[position + 1:]:
+                        responses[later_index] = _response(later_id, error=(
+                            ROLLED_BACK, f"Not executed: call {failed_id} failed and the transaction was rolled back"))
+                    break
+                executed.append((index, request_id))
+
+            if failed_id is None:
+                scope.session.commit()
+                return
+            scope.session.rollback()
+            _invalidate_caches()
+            for index, request_id in executed:
+                responses[index] = _response(request_id, error=(
+                    ROLLED_BACK, f"Rolled back: call {failed_id} failed"))
+        except Exception as e:
+            scope.session.rollback()
+            _invalidate_caches()
+            for index, request_id in executed:
+                responses[index] = _response(request_id, error=(INTERNAL_ERROR, f"Commit failed: {str(e)}"))
+        finally:
+            scope.session.close()
+            scope.session = None
+
+    def _write_interactions(self, interactions):
+        from database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            db.add_all(interactions)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️ Failed to write {len(interactions)} batched agent interactions: {e}")
+        finally:
+            db.close()
+
+
+# Global executor shared by every client of the MCP server
+tool_batch_executor = ToolBatchExecutor()
+
+
+def run_benchmark(clients: int = 10):
+    """Sequential /tools/call-style dispatch vs one batch, then N clients sending the same batch."""
+    from agents.orchestrator_agent import OrchestratorAgent
+
+    orchestrator = OrchestratorAgent()
+
+    def dispatch(tool_name, arguments):
+        return orchestrator.route_request(tool_name, **arguments)
+
+    tools = [("list_users", {}), ("list_departments", {}), ("list_patients", {}), ("list_beds", {}),
+             ("list_equipment", {}), ("list_supplies", {}), ("list_supplies", {"low_stock_only": True}),
+             ("list_staff", {}), ("list_rooms", {})]
+    batch = [{"jsonrpc": "2.0", "id": i, "method": "tools/call", "params": {"name": name, "arguments": args}}
+             for i, (name, args) in enumerate(tools)]
+
+    dispatch("list_departments", {})  # warm the connection pool
+    started = time.perf_counter()
+    for name, args in tools:
+        dispatch(name, args)
+    sequential_ms = (time.perf_counter() - started) * 1000
+
+    executor = ToolBatchExecutor()
+    started = time.perf_counter()
+    responses, _ = asyncio.run(executor.execute(batch, dispatch))
+    batch_ms = (time.perf_counter() - started) * 1000
+    errors = sum(1 for r in responses if "error" in r)
+
+    async def many_clients():
+        return await asyncio.gather(*(executor.execute(batch, dispatch) for _ in range(clients)))
+
+    executor.singleflight.executions = executor.singleflight.coalesced = 0
+    started = time.perf_counter()
+    asyncio.run(many_clients())
+    clients_ms = (time.perf_counter() - started) * 1000
+
+    print(f"{len(tools)} read-only tool calls:")
+    print(f"  Sequential calls         {sequential_ms:8.1f} ms")
+    print(f"  One concurrent batch     {batch_ms:8.1f} ms  ({errors} errors)")
+    print(f"  {clients} clients, same batch {clients_ms:8.1f} ms  "
+          f"({executor.singleflight.executions} executions, {executor.singleflight.coalesced} coalesced)")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--benchmark" in sys.argv:
+        run_benchmark()
+    else:
+        print(__doc__)